@@ -6,21 +6,30 @@ from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Literal, Optional, Dict, Any, Union
 import json
 import asyncio
 import time
 import uuid
 import structlog
 
+from core.config import settings
+from core.models import FilterOptions, RerankOptions
 from core.security import security, verify_token
+from services.code_jobs import job_owner
+from services.collection_registry import CollectionNotFoundError
 from services.ollama_client import OllamaService
 from services.function_calling import FunctionCallingService
+from services.rag import RAGService
 from utils.streaming import StreamingResponseGenerator
 
 logger = structlog.get_logger()
 chat_router = APIRouter()
 
+# Tool output events buffered for a slow streaming client before the tool
+# run is paused
+TOOL_STREAM_QUEUE_SIZE = 64
+
 class ChatMessage(BaseModel):
     role: str = Field(..., description="Message role: system, user, or assistant")
     content: str = Field(..., description="Message content")
@@ -35,6 +44,16 @@ class ToolDefinition(BaseModel):
     type: str = Field("function", description="Tool type")
     function: FunctionDefinition = Field(..., description="Function definition")
 
+class RAGOptions(FilterOptions):
+    collection: Optional[str] = Field(None, description="Collection (namespace) to retrieve from")
+    embedding_model: Optional[str] = Field(None, description="Embedding model whose vectors to search")
+    vector: Optional[str] = Field(None, description="Named vector to search in a multi-vector collection")
+    limit: int = Field(5, gt=0, description="Maximum number of chunks to retrieve")
+    score_threshold: float = Field(0.5, description="Minimum similarity score")
+    mode: Literal["vector", "hybrid"] = Field("vector", description="Dense only, or dense fused with BM25")
+    max_context_tokens: Optional[int] = Field(None, gt=0, description="Token budget for retrieved context")
+    rerank: Optional[RerankOptions] = Field(None, description="Rerank retrieved chunks before packing the context")
+
 class ChatCompletionRequest(BaseModel):
     model: str = Field(..., description="Model to use for completion")
     messages: List[ChatMessage] = Field(..., description="List of messages")
@@ -43,6 +62,7 @@ class ChatCompletionRequest(BaseModel):
     stream: Optional[bool] = Field(False, description="Whether to stream responses")
     tools: Optional[List[ToolDefinition]] = Field(None, description="Available tools")
     tool_choice: Optional[Union[str, Dict[str, Any]]] = Field("auto", description="Tool choice strategy")
+    rag: Optional[RAGOptions] = Field(None, description="Answer from documents retrieved from the vector store")
     
 class ChatCompletionResponse(BaseModel):
     id: str
@@ -51,6 +71,8 @@ class ChatCompletionResponse(BaseModel):
     model: str
     choices: List[Dict[str, Any]]
     usage: Dict[str, int]
+    citations: Optional[List[Dict[str, Any]]] = None
+    timings: Optional[Dict[str, float]] = None
 
 @chat_router.post("/chat/completions")
 async def create_chat_completion(
@@ -66,15 +88,42 @@ async def create_chat_completion(
     - Function calling with tools
     - Streaming responses
     - Temperature and token control
+    - Tool calls in streaming mode too: code_interpreter output is streamed
+      as `tool_output` chunks while it runs, then the tool result and the
+      model's follow-up answer
+    - Retrieval-augmented answers with `rag`: the last user message is
+      embedded and searched in the vector store, the best chunks are packed
+      into the prompt up to a token budget, and the response carries
+      `citations` plus separate retrieval and generation `timings`
     """
     
     # Verify authentication
     if credentials and not await verify_token(credentials.credentials):
         raise HTTPException(status_code=401, detail="Invalid API key")
     
+    question = next((msg.content for msg in reversed(request.messages) if msg.role == "user"), None)
+    if request.rag and not question:
+        raise HTTPException(status_code=400, detail="RAG requires a user message to retrieve for")
+    
     try:
         ollama_service = OllamaService()
-        function_service = FunctionCallingService()
+        function_service = FunctionCallingService(job_owner(credentials.credentials if credentials else None))
+        
+        rag_task = None
+        if request.rag:
+            rag_service = RAGService(ollama_service=ollama_service)
+            # Retrieval runs while the rest of the prompt is assembled
+            rag_task = asyncio.create_task(rag_service.retrieve(
+                question,
+                collection=request.rag.collection,
+                limit=request.rag.limit,
+                score_threshold=request.rag.score_threshold,
+                mode=request.rag.mode,
+                filters=request.rag.filters,
+                model=request.rag.embedding_model,
+                vector_name=request.rag.vector,
+                rerank=request.rag.rerank.model_dump() if request.rag.rerank else None
+            ))
         
         # Prepare messages for the model
         formatted_messages = []
@@ -101,6 +150,22 @@ async def create_chat_completion(
                 "content": tool_prompt
             })
         
+        citations = None
+        timings = {}
+        if rag_task is not None:
+            try:
+                hits, timings = await rag_task
+            except CollectionNotFoundError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Retrieval failed: {str(e)}")
+            context, citations = rag_service.pack_context(
+                hits, request.rag.max_context_tokens or settings.RAG_CONTEXT_TOKENS
+            )
+            # Context goes right before the question it answers
+            last_user = max(i for i, msg in enumerate(formatted_messages) if msg["role"] == "user")
+            formatted_messages.insert(last_user, rag_service.context_message(context))
+        
         # Generate completion ID
         completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
         created_timestamp = int(time.time())
@@ -109,25 +174,85 @@ async def create_chat_completion(
             # Streaming response
             async def generate_stream():
                 try:
-                    async for chunk in ollama_service.stream_chat(
-                        model=request.model,
-                        messages=formatted_messages,
-                        temperature=request.temperature,
-                        max_tokens=request.max_tokens
-                    ):
-                        # Format as OpenAI streaming response
-                        stream_chunk = {
+                    if citations is not None:
+                        # Sources are known before the first token, send them up front
+                        citation_chunk = {
                             "id": completion_id,
                             "object": "chat.completion.chunk",
                             "created": created_timestamp,
                             "model": request.model,
                             "choices": [{
                                 "index": 0,
-                                "delta": {"content": chunk},
+                                "delta": {"role": "assistant"},
                                 "finish_reason": None
-                            }]
+                            }],
+                            "citations": citations,
+                            "timings": timings
                         }
-                        yield f"data: {json.dumps(stream_chunk)}\n\n"
+                        yield f"data: {json.dumps(citation_chunk)}\n\n"
+                    
+                    generation_start = time.perf_counter()
+                    first_token_ms = None
+                    # Like the non-streaming path: one round of tool calls, then the final answer
+                    rounds = 2 if available_tools else 1
+                    for round_index in range(rounds):
+                        response_parts = []
+                        async for chunk in ollama_service.stream_chat(
+                            model=request.model,
+                            messages=formatted_messages,
+                            temperature=request.temperature,
+                            max_tokens=request.max_tokens
+                        ):
+                            if first_token_ms is None:
+                                first_token_ms = round((time.perf_counter() - generation_start) * 1000, 2)
+                            response_parts.append(chunk)
+                            
+                            # Format as OpenAI streaming response
+                            stream_chunk = {
+                                "id": completion_id,
+                                "object": "chat.completion.chunk",
+                                "created": created_timestamp,
+                                "model": request.model,
+                                "choices": [{
+                                    "index": 0,
+                                    "delta": {"content": chunk},
+                                    "finish_reason": None
+                                }]
+                            }
+                            yield f"data: {json.dumps(stream_chunk)}\n\n"
+                        
+                        if round_index == rounds - 1:
+                            break
+                        function_calls = [
+                            call for call in function_service.extract_function_calls("".join(response_parts))
+                            if call["name"] in available_tools
+                        ]
+                        if not function_calls:
+                            break
+                        for call in function_calls:
+                            async for event in _stream_tool_call(function_service, call, available_tools[call["name"]]):
+                                tool_chunk = {
+                                    "id": completion_id,
+                                    "object": "chat.completion.chunk",
+                                    "created": created_timestamp,
+                                    "model": request.model,
+                                    "choices": [{
+                                        "index": 0,
+                                        "delta": {},
+                                        "finish_reason": None
+                                    }],
+                                    **event
+                                }
+                                yield f"data: {json.dumps(tool_chunk)}\n\n"
+                            formatted_messages.append({
+                                "role": "assistant",
+                                "content": f"I'll use the {call['name']} function with these parameters: {call['arguments']}"
+                            })
+                            formatted_messages.append({
+                                "role": "function",
+                                "name": call["name"],
+                                "content": json.dumps(event["tool_result"]["result"])
+                            })
                     
                     # Send final chunk
                     final_chunk = {
@@ -141,6 +266,12 @@ async def create_chat_completion(
                             "finish_reason": "stop"
                         }]
                     }
+                    if citations is not None:
+                        final_chunk["timings"] = {
+                            **timings,
+                            "time_to_first_token_ms": first_token_ms,
+                            "generation_ms": round((time.perf_counter() - generation_start) * 1000, 2)
+                        }
                     yield f"data: {json.dumps(final_chunk)}\n\n"
                     yield "data: [DONE]\n\n"
                     
@@ -162,6 +293,7 @@ async def create_chat_completion(
         
         else:
             # Non-streaming response
+            generation_start = time.perf_counter()
             response_content = await ollama_service.chat_completion(
                 model=request.model,
                 messages=formatted_messages,
@@ -205,6 +337,9 @@ async def create_chat_completion(
                     max_tokens=request.max_tokens
                 )
             
+            if citations is not None:
+                timings["generation_ms"] = round((time.perf_counter() - generation_start) * 1000, 2)
+            
             # Format OpenAI-compatible response
             return ChatCompletionResponse(
                 id=completion_id,
@@ -222,13 +357,50 @@ async def create_chat_completion(
                     "prompt_tokens": len(json.dumps(formatted_messages)),
                     "completion_tokens": len(response_content.split()),
                     "total_tokens": len(json.dumps(formatted_messages)) + len(response_content.split())
-                }
+                },
+                citations=citations,
+                timings=timings or None
             )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Chat completion failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Chat completion failed: {str(e)}")
 
+async def _stream_tool_call(
+    function_service: FunctionCallingService,
+    call: Dict[str, Any],
+    tool_definition: Dict[str, Any]
+):
+    """`tool_output` events while a tool runs, then one `tool_result` event"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=TOOL_STREAM_QUEUE_SIZE)
+    
+    async def forward(stream: str, data: str):
+        await queue.put({"tool_output": {"name": call["name"], "stream": stream, "data": data}})
+    
+    async def run():
+        try:
+            result = await function_service.execute_function(
+                call["name"], call["arguments"], tool_definition, on_output=forward
+            )
+        except Exception as e:
+            logger.error("Function execution failed", function=call["name"], error=str(e))
+            result = {"error": str(e), "success": False}
+        await queue.put({"tool_result": {"name": call["name"], "arguments": call["arguments"], "result": result}})
+    
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event = await queue.get()
+            yield event
+            if "tool_result" in event:
+                break
+    finally:
+        # The client went away: stop the tool instead of letting it fill the queue
+        if not task.done():
+            task.cancel()
+
 @chat_router.get("/chat/models")
 async def list_chat_models():
     """List available chat models"""
@@ -2,35 +2,82 @@
 Code interpreter API for secure Python execution
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, UploadFile, File
 from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import asyncio
-import subprocess
-import tempfile
+import json
 import os
+import re
 import time
-import json
 import structlog
 
 from core.security import security, verify_token
 from core.config import settings
+from services.artifacts import ArtifactNotFoundError, artifact_store, content_type
+from services.code_cache import result_cache
+from services.code_execution import execute_python_code, is_code_safe, result_usage
+from services.code_jobs import JobNotFoundError, JobQueueFullError, job_owner, job_queue
+from services.code_sessions import SessionLimitError, SessionNotFoundError, session_manager
+from services.datasets import DatasetNotFoundError, DatasetQuotaError, dataset_store
+from services.sandbox import sandbox_pool, spill_path
 
 logger = structlog.get_logger()
 code_router = APIRouter()
 
+# Output events buffered between the sandbox and a slow SSE client; when
+# full, the run itself is paused until the client catches up
+STREAM_QUEUE_SIZE = 64
+ARTIFACT_CHUNK_SIZE = 64 * 1024
+
 class CodeExecutionRequest(BaseModel):
     code: str = Field(..., description="Python code to execute")
     language: str = Field("python", description="Programming language (only python supported)")
     timeout: Optional[int] = Field(30, description="Execution timeout in seconds")
     packages: Optional[List[str]] = Field(None, description="Required packages")
+    session_id: Optional[str] = Field(
+        None,
+        pattern=r"^[A-Za-z0-9_.-]{1,64}$",
+        description="Run in this session, keeping variables between calls (started on first use)"
+    )
+    stream: bool = Field(False, description="Stream stdout/stderr as server-sent events while the code runs")
+    datasets: Optional[List[str]] = Field(
+        None,
+        description="Ids of uploaded datasets to attach, available to the code as datasets[name]"
+    )
+    cache: bool = Field(False, description="Answer from, and store in, the result cache if the code is pure")
+    pure: Optional[bool] = Field(
+        None,
+        description="Whether the result depends only on the code; inferred from its imports and calls if not given"
+    )
+
+class CodeJobRequest(BaseModel):
+    code: str = Field(..., description="Python code to execute")
+    language: str = Field("python", description="Programming language (only python supported)")
+    timeout: Optional[int] = Field(30, description="Execution timeout in seconds, not counting time in the queue")
+    session_id: Optional[str] = Field(
+        None,
+        pattern=r"^[A-Za-z0-9_.-]{1,64}$",
+        description="Run in this session, keeping variables between calls (started on first use)"
+    )
+    datasets: Optional[List[str]] = Field(
+        None,
+        description="Ids of uploaded datasets to attach, available to the code as datasets[name]"
+    )
 
 class CodeExecutionResponse(BaseModel):
     success: bool
     output: Optional[str] = None
     error: Optional[str] = None
     execution_time: float
+    usage: Optional[Dict[str, Any]] = None
+    session: Optional[Dict[str, Any]] = None
+    truncated: bool = False
+    spill: Optional[Dict[str, Any]] = None
+    cached: bool = False
+    artifacts: List[Dict[str, Any]] = []
     
 @code_router.post("/code/execute")
 async def execute_code(
@@ -42,6 +89,28 @@ async def execute_code(
     
     This endpoint allows safe execution of Python code with proper isolation,
     timeout controls, and resource limitations.
+    
+    With a `session_id`, the code runs in that session's persistent
+    namespace instead of a fresh one, so variables, imports and loaded data
+    carry over to the next call with the same id and API key.
+    
+    With `stream`, output is sent as server-sent events while the code
+    runs: `{"type": "stdout"|"stderr", "data": ...}` chunks, a `truncated`
+    notice if the output passes CODE_MAX_OUTPUT_BYTES, and a final `exit`
+    event with the status and resource usage. Output past the limit is not
+    sent or returned but saved, see `/code/outputs/{output_id}`.
+    
+    With `cache`, a pure run outside a session is answered from the result
+    cache when the same code ran before with the same packages and
+    interpreter, see services/code_cache.py.
+    
+    `datasets` attaches uploaded datasets (see `/code/datasets`) as
+    read-only, memory-mapped `datasets[name]` objects with `bytes`, `text()`,
+    `json()` and, for CSV and .npy uploads, a NumPy `array`.
+    
+    Files the code writes to its working directory and matplotlib figures
+    it leaves open are returned as `artifacts`: references with a content
+    type, size and download URL, see `/code/artifacts/{run_id}/{name}`.
     """
     
     # Verify authentication
@@ -58,14 +127,29 @@ async def execute_code(
         start_time = time.time()
         
         # Security checks
-        if not _is_code_safe(request.code):
+        if not is_code_safe(request.code):
             raise HTTPException(status_code=400, detail="Code contains potentially unsafe operations")
         
+        owner = job_owner(credentials.credentials if credentials else None)
+        datasets = _attach_datasets(request.datasets, credentials)
+        
+        if request.stream:
+            return StreamingResponse(
+                _stream_execution(request, owner, datasets),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache"}
+            )
+        
         # Execute code in sandbox
-        result = await _execute_python_code(
+        result = await execute_python_code(
             code=request.code,
             timeout=request.timeout or settings.CODE_TIMEOUT,
-            packages=request.packages
+            packages=request.packages,
+            session_id=request.session_id,
+            owner=owner,
+            cache=request.cache,
+            pure=request.pure,
+            datasets=datasets
         )
         
         execution_time = time.time() - start_time
@@ -74,167 +158,428 @@ async def execute_code(
             success=result["success"],
             output=result.get("output"),
             error=result.get("error"),
-            execution_time=execution_time
+            execution_time=execution_time,
+            usage=result_usage(result),
+            session=result.get("session"),
+            truncated=result.get("truncated", False),
+            spill=result.get("spill"),
+            cached=result.get("cached", False),
+            artifacts=result.get("artifacts") or []
         )
         
+    except SessionLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except DatasetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Code execution failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Code execution failed: {str(e)}")
 
-def _is_code_safe(code: str) -> bool:
-    """Basic code safety checks"""
-    # List of potentially dangerous operations
-    dangerous_patterns = [
-        "import os",
-        "import sys", 
-        "import subprocess",
-        "import socket",
-        "import urllib",
-        "import requests",
-        "open(",
-        "exec(",
-        "eval(",
-        "__import__",
-        "compile(",
-        "globals(",
-        "locals(",
-        "vars(",
-        "dir(",
-        "getattr(",
-        "setattr(",
-        "delattr(",
-        "hasattr("
-    ]
-    
-    code_lower = code.lower()
-    for pattern in dangerous_patterns:
-        if pattern in code_lower:
-            logger.warning("Unsafe code pattern detected", pattern=pattern)
-            return False
-    
-    return True
-
-async def _execute_python_code(
-    code: str,
-    timeout: int = 30,
-    packages: Optional[List[str]] = None
-) -> Dict[str, Any]:
-    """Execute Python code in a sandboxed environment"""
-    
-    try:
-        # Create temporary file for code
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            # Add safety imports and restrictions
-            safe_code = f"""
-import sys
-import io
-import contextlib
-import signal
-import resource
-
-# Set resource limits
-resource.setrlimit(resource.RLIMIT_CPU, ({timeout}, {timeout}))
-resource.setrlimit(resource.RLIMIT_AS, ({settings.CODE_MEMORY_LIMIT * 1024 * 1024}, {settings.CODE_MEMORY_LIMIT * 1024 * 1024}))
-
-# Capture output
-output_buffer = io.StringIO()
-
-try:
-    with contextlib.redirect_stdout(output_buffer), contextlib.redirect_stderr(output_buffer):
-        # User code starts here
-{code}
-        # User code ends here
-    
-    print("EXECUTION_SUCCESS")
-    print("OUTPUT_START")
-    print(output_buffer.getvalue())
-    print("OUTPUT_END")
-
-except Exception as e:
-    print("EXECUTION_ERROR")
-    print(f"Error: {{str(e)}}")
-    print(f"Type: {{type(e).__name__}}")
+def _attach_datasets(
+    dataset_ids: Optional[List[str]],
+    credentials: Optional[HTTPAuthorizationCredentials]
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    if not dataset_ids:
+        return None
+    return dataset_store.attach(dataset_ids, job_owner(credentials.credentials if credentials else None))
 
-"""
-            f.write(safe_code)
-            temp_file = f.name
-        
+async def _stream_execution(
+    request: CodeExecutionRequest,
+    owner: str,
+    datasets: Optional[Dict[str, Dict[str, Any]]] = None
+):
+    """Server-sent events of a run, see `execute_code`"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    start_time = time.time()
+    
+    async def forward(stream: str, data: str):
+        await queue.put({"type": stream, "data": data})
+    
+    async def run():
         try:
-            # Execute with timeout
-            process = await asyncio.create_subprocess_exec(
-                "python3", temp_file,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd="/tmp"  # Run in safe directory
+            result = await execute_python_code(
+                code=request.code,
+                timeout=request.timeout or settings.CODE_TIMEOUT,
+                packages=request.packages,
+                session_id=request.session_id,
+                owner=owner,
+                on_output=forward,
+                cache=request.cache,
+                pure=request.pure,
+                datasets=datasets
             )
-            
-            try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=timeout
-                )
-            except asyncio.TimeoutError:
-                process.kill()
-                return {
-                    "success": False,
-                    "error": "Code execution timed out"
-                }
-            
-            # Parse output
-            output_text = stdout.decode('utf-8')
-            error_text = stderr.decode('utf-8')
-            
-            if "EXECUTION_SUCCESS" in output_text:
-                # Extract actual output
-                lines = output_text.split('\n')
-                output_start_idx = -1
-                output_end_idx = -1
-                
-                for i, line in enumerate(lines):
-                    if line.strip() == "OUTPUT_START":
-                        output_start_idx = i + 1
-                    elif line.strip() == "OUTPUT_END":
-                        output_end_idx = i
-                        break
-                
-                if output_start_idx != -1 and output_end_idx != -1:
-                    actual_output = '\n'.join(lines[output_start_idx:output_end_idx])
-                else:
-                    actual_output = ""
-                
-                return {
-                    "success": True,
-                    "output": actual_output
-                }
-            
-            elif "EXECUTION_ERROR" in output_text:
-                error_lines = output_text.split('\n')[1:]  # Skip "EXECUTION_ERROR" line
-                error_info = '\n'.join(error_lines)
-                
-                return {
-                    "success": False,
-                    "error": error_info
-                }
-            
-            else:
-                return {
-                    "success": False,
-                    "error": f"Unexpected output: {output_text}\nStderr: {error_text}"
-                }
-        
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+        except SessionLimitError as e:
+            result = {"success": False, "error": str(e)}
+        await queue.put({
+            "type": "exit",
+            "success": result["success"],
+            "error": result.get("error"),
+            "timed_out": result.get("timed_out", False),
+            "truncated": result.get("truncated", False),
+            "spill": result.get("spill"),
+            "usage": result_usage(result),
+            "session": result.get("session"),
+            "cached": result.get("cached", False),
+            "artifacts": result.get("artifacts") or [],
+            "execution_time": time.time() - start_time
+        })
+    
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event = await queue.get()
+            yield f"data: {json.dumps(event)}\n\n"
+            if event["type"] == "exit":
+                break
+        yield "data: [DONE]\n\n"
+    finally:
+        # The client went away: stop the run instead of letting it fill the queue
+        if not task.done():
+            task.cancel()
+
+@code_router.post("/code/jobs", status_code=202)
+async def submit_code_job(
+    request: CodeJobRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Queue code for execution and return at once with a job id
+    
+    Poll `/code/jobs/{job_id}` for the result, optionally waiting for it.
+    Jobs of different API keys are served in turn.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    if not settings.ENABLE_CODE_EXECUTION:
+        raise HTTPException(status_code=403, detail="Code execution is disabled")
+    
+    if request.language != "python":
+        raise HTTPException(status_code=400, detail="Only Python code execution is supported")
+    
+    if not is_code_safe(request.code):
+        raise HTTPException(status_code=400, detail="Code contains potentially unsafe operations")
+    
+    try:
+        job = job_queue.submit(
+            job_owner(credentials.credentials if credentials else None),
+            request.code,
+            timeout=request.timeout or settings.CODE_TIMEOUT,
+            session_id=request.session_id,
+            datasets=_attach_datasets(request.datasets, credentials)
+        )
+        return job.describe()
+    
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except DatasetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Code job submission failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Job submission failed: {str(e)}")
+
+@code_router.get("/code/jobs")
+async def list_code_jobs(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """List this API key's jobs with queue statistics and its resource usage"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    owner = job_owner(credentials.credentials if credentials else None)
+    return {
+        "jobs": job_queue.list(owner),
+        "stats": job_queue.stats(owner)
+    }
+
+@code_router.get("/code/jobs/{job_id}")
+async def get_code_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish before answering"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Status of a job, with its result and resource usage once it has finished"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        job = await job_queue.wait(
+            job_id,
+            job_owner(credentials.credentials if credentials else None),
+            timeout=min(wait, settings.CODE_JOB_MAX_WAIT_SECONDS)
+        )
+        return job.describe()
+    
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@code_router.delete("/code/jobs/{job_id}")
+async def cancel_code_job(
+    job_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Cancel a waiting or running job"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        job = job_queue.cancel(job_id, job_owner(credentials.credentials if credentials else None))
+        return {"job_id": job_id, "status": job.status}
+    
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@code_router.post("/code/datasets", status_code=201)
+async def upload_dataset(
+    file: UploadFile = File(...),
+    name: Optional[str] = Query(
+        None,
+        pattern=r"^[A-Za-z_][A-Za-z0-9_]{0,63}$",
+        description="Key of the dataset in `datasets` during runs, the file name without extension by default"
+    ),
+    ttl_seconds: Optional[int] = Query(None, gt=0, description="Seconds to keep the dataset, at most DATASET_TTL_SECONDS"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Upload a dataset once to attach it to any number of runs
+    
+    CSV files (with a header row) are also parsed into a NumPy array at
+    upload, .npy files are used as arrays directly. Other files are
+    attached as raw bytes.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    filename = file.filename or "dataset"
+    if name is None:
+        name = re.sub(r"\W", "_", os.path.splitext(os.path.basename(filename))[0])[:64] or "dataset"
+        if name[0].isdigit():
+            name = f"_{name}"
+    
+    try:
+        return await dataset_store.create(
+            job_owner(credentials.credentials if credentials else None),
+            name,
+            filename,
+            file.file,
+            ttl=ttl_seconds
+        )
+    
+    except DatasetQuotaError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Dataset upload failed", filename=filename, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Dataset upload failed: {str(e)}")
+
+@code_router.get("/code/datasets")
+async def list_datasets(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """List this API key's datasets with its quota usage"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    owner = job_owner(credentials.credentials if credentials else None)
+    return {
+        "datasets": dataset_store.list(owner),
+        "usage": dataset_store.usage(owner)
+    }
+
+@code_router.get("/code/datasets/{dataset_id}")
+async def get_dataset(
+    dataset_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Describe a dataset"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        owner = job_owner(credentials.credentials if credentials else None)
+        return dataset_store.describe(dataset_store.get(dataset_id, owner))
+    
+    except DatasetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@code_router.delete("/code/datasets/{dataset_id}")
+async def delete_dataset(
+    dataset_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Delete a dataset; runs that already attached it keep their mapping"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        dataset_store.delete(dataset_id, job_owner(credentials.credentials if credentials else None))
+        return {"dataset_id": dataset_id, "deleted": True}
+    
+    except DatasetNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def _byte_range(header: Optional[str], size: int) -> Optional[tuple]:
+    """(start, end) of a single `bytes=` range, inclusive; None for the whole file"""
+    if not header:
+        return None
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header)
+    if not match or match.group(1) == match.group(2) == "":
+        # Multiple or malformed ranges are answered with the whole file
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def _read_file(path: str, start: int, length: int):
+    with open(path, "rb") as source:
+        source.seek(start)
+        while length > 0:
+            chunk = source.read(min(ARTIFACT_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+@code_router.get("/code/artifacts/{run_id}/{name:path}")
+async def download_artifact(
+    run_id: str,
+    name: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Stream an artifact of a run, or the byte range asked for with a Range header"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        path = artifact_store.path(run_id, name, job_owner(credentials.credentials if credentials else None))
+    except ArtifactNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes"}
+    byte_range = _byte_range(range_header, size)
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _read_file(path, start, end - start + 1),
+        status_code=status_code,
+        media_type=content_type(name),
+        headers=headers
+    )
+
+@code_router.get("/code/outputs/{output_id}")
+async def get_spilled_output(
+    output_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Download the part of a run's output that was cut off at CODE_MAX_OUTPUT_BYTES, for the key that ran it"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    path = spill_path(output_id, job_owner(credentials.credentials if credentials else None))
+    if not re.fullmatch(r"[0-9a-f]{32}", output_id) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Output {output_id} not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8")
+
+@code_router.get("/code/sessions")
+async def list_code_sessions(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """List the caller's live code sessions with reuse statistics"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    owner = job_owner(credentials.credentials if credentials else None)
+    return {
+        "sessions": session_manager.list(owner),
+        "stats": session_manager.stats(owner)
+    }
+
+@code_router.post("/code/sessions/{session_id}/reset")
+async def reset_code_session(
+    session_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Clear a session's variables, keeping its warm process"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        await session_manager.reset(job_owner(credentials.credentials if credentials else None), session_id)
+        return {"session_id": session_id, "reset": True}
+    
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Code session reset failed", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Session reset failed: {str(e)}")
+
+@code_router.delete("/code/sessions/{session_id}")
+async def close_code_session(
+    session_id: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Close a session and stop its process"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        await session_manager.close_session(job_owner(credentials.credentials if credentials else None), session_id)
+        return {"session_id": session_id, "closed": True}
     
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error("Code execution subprocess failed", error=str(e))
-        return {
-            "success": False,
-            "error": f"Execution failed: {str(e)}"
-        }
+        logger.error("Closing code session failed", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Session close failed: {str(e)}")
 
 @code_router.get("/code/capabilities")
 async def get_code_capabilities():
@@ -245,6 +590,11 @@ async def get_code_capabilities():
         "timeout_limit": settings.CODE_TIMEOUT,
         "memory_limit_mb": settings.CODE_MEMORY_LIMIT,
         "allowed_packages": settings.PYTHON_PACKAGES_WHITELIST,
+        "sandbox_pool": sandbox_pool.stats(),
+        "sessions": session_manager.stats(),
+        "jobs": job_queue.stats(),
+        "result_cache": result_cache.stats(),
+        "artifacts": artifact_store.stats(),
         "safety_features": [
             "Resource limits (CPU, memory)",
             "Execution timeout", 
@@ -2,25 +2,99 @@
 Embeddings API - OpenAI compatible
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Request
 from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Set, Union
+import asyncio
 import time
 import structlog
 
+from core.config import settings
+from core.models import FilterOptions, RerankOptions
 from core.security import security, verify_token
+from services.collection_dump import CollectionDumpService
+from services.collection_registry import CollectionNotFoundError, collection_registry
+from services.dim_reduction import new_reduction
+from services.federated_search import FederatedSearchService, is_pattern
 from services.ollama_client import OllamaService
-from services.vector_store import VectorStoreService
+from services.payload_filter import parse_filters
+from services.reranker import RerankService
+from services.similarity import SimilarityService
+from services.vector_store import VectorStoreService, reciprocal_rank_fusion
 
 logger = structlog.get_logger()
 embeddings_router = APIRouter()
 
+HYBRID_CANDIDATE_FACTOR = 3
+
 class EmbeddingRequest(BaseModel):
     input: Union[str, List[str]] = Field(..., description="Text to embed")
     model: str = Field("nomic-embed-text", description="Embedding model to use")
     encoding_format: Optional[str] = Field("float", description="Encoding format")
 
+class NamedVectorConfig(BaseModel):
+    model: str = Field(..., description="Embedding model producing this vector")
+    vector_size: Optional[int] = Field(None, gt=0, description="Embedding dimension, detected from the model if omitted")
+    distance: Literal["cosine", "dot", "euclid"] = Field("cosine", description="Distance metric")
+
+class ReductionConfig(BaseModel):
+    method: Literal["truncate", "pca"] = Field(..., description="Matryoshka truncation or a fitted PCA projection")
+    dimensions: int = Field(..., gt=0, description="Stored vector size, smaller than the model's")
+    sample: Optional[List[str]] = Field(
+        None, description="Texts to fit the PCA projection on (more than `dimensions`)"
+    )
+
+class ReductionFitRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=2, description="Sample texts representative of the collection")
+
+class CollectionCreateRequest(BaseModel):
+    name: str = Field(..., description="Collection name")
+    model: Optional[str] = Field(None, description="Embedding model that fills the collection")
+    vector_size: Optional[int] = Field(None, gt=0, description="Embedding dimension, detected from the model if omitted")
+    distance: Literal["cosine", "dot", "euclid"] = Field("cosine", description="Distance metric")
+    quantization: Optional[Literal["scalar", "binary"]] = Field(
+        None, description="Keep int8 (scalar) or 1-bit (binary) codes in RAM and rescore from disk"
+    )
+    vectors: Optional[Dict[str, NamedVectorConfig]] = Field(
+        None, description="Named vectors, one per embedding model, stored for every document"
+    )
+    reduction: Optional[ReductionConfig] = Field(
+        None, description="Store embeddings with fewer dimensions (truncated or PCA-projected)"
+    )
+
+class BatchSearchQuery(FilterOptions):
+    query: str = Field(..., description="Query text")
+    limit: int = Field(10, gt=0, description="Maximum number of hits")
+    score_threshold: float = Field(0.7, description="Minimum similarity score")
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery] = Field(..., min_length=1, description="Queries to run")
+    collection: Optional[str] = Field(None, description="Collection (namespace) to search")
+    model: Optional[str] = Field(None, description="Embedding model, selects the model's collection or vector")
+    vector: Optional[str] = Field(None, description="Named vector to search in multi-vector collections")
+    deduplicate: bool = Field(False, description="Return each hit only under the query it scored highest for")
+
+class SimilarityRequest(BaseModel):
+    texts: Optional[List[str]] = Field(None, description="Texts to embed and compare")
+    ids: Optional[List[str]] = Field(None, description="Stored point IDs to compare, from `collection`")
+    collection: Optional[str] = Field(None, description="Collection (namespace) holding the points")
+    model: Optional[str] = Field(None, description="Embedding model, selects the model's collection or vector")
+    vector: Optional[str] = Field(None, description="Named vector to compare in multi-vector collections")
+
+class SimilarPairsRequest(SimilarityRequest):
+    top_k: int = Field(10, gt=0, le=10000, description="Number of most similar pairs")
+    min_score: Optional[float] = Field(None, description="Leave out pairs below this cosine similarity")
+
+class ClusterRequest(SimilarityRequest):
+    method: Literal["kmeans", "agglomerative"] = Field("kmeans", description="Clustering algorithm")
+    n_clusters: Optional[int] = Field(None, gt=0, description="Number of clusters (required for kmeans)")
+    threshold: Optional[float] = Field(
+        None, ge=-1, le=1, description="Agglomerative only: stop merging below this average cosine similarity"
+    )
+    max_iterations: int = Field(50, gt=0, le=1000, description="k-means iterations")
+
 class EmbeddingResponse(BaseModel):
     object: str = "list"
     data: List[dict]
@@ -77,11 +151,246 @@ async def create_embeddings(
         logger.error("Embedding generation failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Embedding generation failed: {str(e)}")
 
+@embeddings_router.post("/collections")
+async def create_collection(
+    request: CollectionCreateRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Create a vector collection
+    
+    The vector size is detected from `model` (the default embedding model if
+    neither is given) unless `vector_size` is set. With `vectors`, every
+    document stores one embedding per named vector, each from its own model.
+    
+    Quantized collections keep compact codes in memory and the original
+    float32 vectors on disk. Searches oversample on the codes and rescore
+    the best candidates at full precision.
+    
+    With `reduction`, embeddings (documents and queries) are shrunk to
+    `reduction.dimensions` before they reach the index: `truncate` keeps the
+    leading components of Matryoshka models, `pca` projects onto principal
+    components fitted on `reduction.sample` (or later, see
+    `POST /collections/{name}/reduction`). `vector_size` is then the model's size.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    if collection_registry.get(request.name):
+        raise HTTPException(status_code=409, detail=f"Collection {request.name} already exists")
+    
+    try:
+        vector_service = VectorStoreService()
+        
+        vectors = None
+        model = None
+        config = {}
+        vector_size = request.vector_size
+        if request.vectors and request.reduction:
+            raise ValueError("Dimensionality reduction is not supported for multi-vector collections")
+        if request.vectors:
+            vectors = {}
+            for vector_name, vector_config in request.vectors.items():
+                vectors[vector_name] = {
+                    "model": vector_config.model,
+                    "size": vector_config.vector_size or await collection_registry.dimension(vector_config.model),
+                    "distance": vector_config.distance
+                }
+        elif vector_size is None or request.model:
+            model = request.model or settings.EMBEDDING_MODEL
+            vector_size = vector_size or await collection_registry.dimension(model)
+        
+        if request.reduction:
+            config["reduction"] = new_reduction(
+                request.reduction.method, request.reduction.dimensions, vector_size, model
+            )
+            vector_size = request.reduction.dimensions
+        
+        await vector_service.create_collection(
+            request.name,
+            vector_size=vector_size,
+            distance=request.distance,
+            quantization=request.quantization,
+            vectors=vectors,
+            model=model,
+            config=config
+        )
+        
+        if request.reduction and request.reduction.method == "pca" and request.reduction.sample:
+            try:
+                sample = await OllamaService().generate_embeddings(request.reduction.sample, model)
+                await vector_service.fit_reduction(sample, request.name)
+            except Exception:
+                await vector_service.delete_collection(request.name)
+                raise
+        
+        return await vector_service.get_collection_info(request.name)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Collection creation failed: {str(e)}")
+    except Exception as e:
+        logger.error("Collection creation failed", collection=request.name, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Collection creation failed: {str(e)}")
+
+@embeddings_router.get("/collections")
+async def list_collections(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """List registered vector collections with their models and vector sizes"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    collections = collection_registry.list()
+    return {"collections": collections, "total": len(collections)}
+
+@embeddings_router.delete("/collections/{name}")
+async def delete_collection(
+    name: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Delete a vector collection and all its documents"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        await VectorStoreService().delete_collection(name)
+        return {"deleted": name}
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Collection deletion failed", collection=name, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Collection deletion failed: {str(e)}")
+
+@embeddings_router.get("/collections/{name}")
+async def get_collection(
+    name: str,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Get size and configuration of a vector collection"""
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        return await VectorStoreService().get_collection_info(name)
+    except Exception as e:
+        logger.error("Failed to get collection", collection=name, error=str(e))
+        raise HTTPException(status_code=404, detail=f"Collection not found: {str(e)}")
+
+@embeddings_router.post("/collections/{name}/reduction")
+async def fit_collection_reduction(
+    name: str,
+    request: ReductionFitRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Fit the PCA projection of a collection on sample texts
+    
+    The texts are embedded with the collection's model. Only empty
+    collections can be (re)fitted, since stored points keep their projection.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        vector_service = VectorStoreService()
+        spec = await collection_registry.lookup(vector_service.backend, name)
+        sample = await OllamaService().generate_embeddings(request.texts, spec.get("model"))
+        return {"collection": name, "reduction": await vector_service.fit_reduction(sample, name)}
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Fit failed: {str(e)}")
+    except Exception as e:
+        logger.error("Reduction fit failed", collection=name, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Fit failed: {str(e)}")
+
+@embeddings_router.get("/collections/{name}/export")
+async def export_collection(
+    name: str,
+    batch_size: Optional[int] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Stream a dump of a collection
+    
+    Vectors are exported as stored (raw float32 blocks) with their payloads
+    as NDJSON, page by page, so a backup never re-embeds anything. The final
+    frame of the dump reports the export throughput.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    vector_service = VectorStoreService()
+    try:
+        await collection_registry.lookup(vector_service.backend, name)
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return StreamingResponse(
+        CollectionDumpService(vector_service).export(name, batch_size),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{name}.laidump"'}
+    )
+
+@embeddings_router.post("/collections/{name}/import")
+async def import_collection(
+    name: str,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Load a collection dump sent as the raw request body
+    
+    The collection is created like the exported one if it does not exist;
+    otherwise its vector layout must match and points with the same IDs are
+    overwritten. The body is read and upserted batch by batch, without any
+    embedding calls.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        return await CollectionDumpService().import_dump(name, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Import failed: {str(e)}")
+    except Exception as e:
+        logger.error("Collection import failed", collection=name, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
 @embeddings_router.post("/search")
 async def semantic_search(
     query: str,
     collection: Optional[str] = None,
     limit: int = 10,
+    mode: Literal["vector", "lexical", "hybrid"] = "vector",
+    model: Optional[str] = None,
+    vector: Optional[str] = None,
+    collections: Optional[List[str]] = Query(
+        None, description="Search several collections (names or globs) at once"
+    ),
+    timeout_ms: Optional[float] = Query(
+        None, gt=0, description="Per-collection timeout of a federated search"
+    ),
+    filters: Optional[Dict[str, Any]] = Body(
+        None, embed=True, description="Payload conditions: equality, `in` lists or numeric ranges (gt, gte, lt, lte)"
+    ),
+    rerank: Optional[RerankOptions] = Body(
+        None, embed=True, description="Rerank a deeper candidate list with a scorer and/or MMR"
+    ),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """
@@ -89,41 +398,253 @@ async def semantic_search(
     
     Search for similar documents using vector similarity search.
     This enables RAG (Retrieval Augmented Generation) capabilities.
+    
+    Modes:
+    - `vector`: dense embedding similarity
+    - `lexical`: BM25 over the stored text, good for exact identifiers and
+      error codes; no embedding call is made
+    - `hybrid`: runs both concurrently and merges them with reciprocal rank fusion
+    
+    An optional JSON body `{"filters": {...}}` restricts hits by payload,
+    e.g. `{"tenant": "acme", "lang": ["en", "de"], "year": {"gte": 2020}}`.
+    Filters are applied inside the vector search; fields that are filtered
+    often get a payload index automatically.
+    
+    `collection` names a namespace; `model` picks the collection (or, in a
+    multi-vector collection, the named vector) holding that embedding model's
+    vectors, and `vector` picks a named vector explicitly.
+    
+    `{"rerank": {...}}` in the body reorders a deeper candidate list: a
+    `scorer` (LLM judge or local cross-encoder) grades relevance and
+    `mmr_lambda` removes near-duplicates with maximal marginal relevance.
+    The stage keeps to `budget_ms` and degrades rather than fails.
+    
+    Repeating `collections` (or a glob such as `collection=docs-*`) searches
+    all matching collections concurrently with one query embedding per
+    model and merges them into a global top `limit`; each hit names its
+    `collection`. A collection slower than `timeout_ms` is reported under
+    `collections` and left out instead of holding up the search.
     """
     
     # Verify authentication
     if credentials and not await verify_token(credentials.credentials):
         raise HTTPException(status_code=401, detail="Invalid API key")
     
+    try:
+        parse_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {str(e)}")
+    
+    targets = list(collections or [])
+    if collection and (targets or is_pattern(collection)):
+        targets.insert(0, collection)
+    if targets and rerank and rerank.mmr_lambda is not None:
+        raise HTTPException(status_code=400, detail="MMR reranking needs a single collection")
+    
     try:
         vector_service = VectorStoreService()
+        fetch_limit = RerankService.candidate_count(limit, rerank.candidates) if rerank else limit
         
-        # Generate query embedding
-        ollama_service = OllamaService()
-        query_embedding = await ollama_service.generate_embedding(query)
+        if targets:
+            response = await FederatedSearchService(vector_service=vector_service).search(
+                query,
+                targets,
+                limit=fetch_limit,
+                mode=mode,
+                model=model,
+                vector=vector,
+                filters=filters,
+                timeout_ms=timeout_ms
+            )
+            results = response.pop("results")
+            response = {"query": query, "mode": mode, **response}
+            if rerank:
+                results, response["rerank"] = await RerankService(vector_service=vector_service).rerank(
+                    query, results, limit, scorer=rerank.scorer, budget_ms=rerank.budget_ms
+                )
+            response["results"] = results
+            response["total"] = len(results)
+            return response
         
-        # Search for similar vectors
-        results = await vector_service.search(
-            query_embedding=query_embedding,
-            collection_name=collection,
-            limit=limit
+        collection_name, vector_name, embedding_model = await vector_service.query_target(
+            collection, model, vector
         )
         
-        return {
+        async def vector_results(vector_limit: int):
+            # Generate query embedding
+            ollama_service = OllamaService()
+            query_embedding = await ollama_service.generate_embedding(query, embedding_model)
+            
+            # Search for similar vectors
+            return await vector_service.search(
+                query_embedding=query_embedding,
+                collection_name=collection_name,
+                limit=vector_limit,
+                filters=filters,
+                vector_name=vector_name
+            )
+        
+        if mode == "lexical":
+            results = await vector_service.lexical_search(
+                query, collection_name=collection_name, limit=fetch_limit, filters=filters
+            )
+        elif mode == "hybrid":
+            # Fuse deeper candidate lists than the final limit
+            candidates = fetch_limit * HYBRID_CANDIDATE_FACTOR
+            dense, lexical = await asyncio.gather(
+                vector_results(candidates),
+                vector_service.lexical_search(
+                    query, collection_name=collection_name, limit=candidates, filters=filters
+                )
+            )
+            results = reciprocal_rank_fusion({"vector": dense, "lexical": lexical}, fetch_limit)
+        else:
+            results = await vector_results(fetch_limit)
+        
+        response = {
             "query": query,
-            "results": results,
-            "total": len(results)
+            "mode": mode,
+            "collection": collection_name
         }
+        if rerank:
+            results, response["rerank"] = await RerankService(vector_service=vector_service).rerank(
+                query,
+                results,
+                limit,
+                scorer=rerank.scorer,
+                mmr_lambda=rerank.mmr_lambda,
+                budget_ms=rerank.budget_ms,
+                collection=collection_name,
+                vector_name=vector_name,
+                embedding_model=embedding_model
+            )
+        response["results"] = results
+        response["total"] = len(results)
+        return response
         
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Search failed: {str(e)}")
     except Exception as e:
         logger.error("Semantic search failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@embeddings_router.post("/search/batch")
+async def batch_search(
+    request: BatchSearchRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Run many semantic searches in one call
+    
+    All queries are embedded in a single batch and sent to the vector store
+    as one batch search. Results are returned in input order. With
+    `deduplicate`, a hit appearing under several queries is kept only where
+    it scored highest (the earlier query wins ties).
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        ollama_service = OllamaService()
+        vector_service = VectorStoreService()
+        collection_name, vector_name, embedding_model = await vector_service.query_target(
+            request.collection, request.model, request.vector
+        )
+        
+        embeddings = await ollama_service.generate_embeddings(
+            [q.query for q in request.queries], embedding_model
+        )
+        
+        batch_results = await vector_service.search_batch(
+            [
+                {
+                    "query_embedding": embedding,
+                    "limit": q.limit,
+                    "score_threshold": q.score_threshold,
+                    "filters": q.filters,
+                    "vector_name": vector_name
+                }
+                for q, embedding in zip(request.queries, embeddings)
+            ],
+            collection_name=collection_name
+        )
+        
+        duplicates_removed = 0
+        if request.deduplicate:
+            best = {}
+            for i, hits in enumerate(batch_results):
+                for hit in hits:
+                    if hit["id"] not in best or hit["score"] > best[hit["id"]][1]:
+                        best[hit["id"]] = (i, hit["score"])
+            deduplicated = []
+            for i, hits in enumerate(batch_results):
+                kept = [hit for hit in hits if best[hit["id"]][0] == i]
+                duplicates_removed += len(hits) - len(kept)
+                deduplicated.append(kept)
+            batch_results = deduplicated
+        
+        return {
+            "results": [
+                {
+                    "query": q.query,
+                    "results": hits,
+                    "total": len(hits)
+                }
+                for q, hits in zip(request.queries, batch_results)
+            ],
+            "collection": collection_name,
+            "duplicates_removed": duplicates_removed
+        }
+        
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Batch search failed: {str(e)}")
+    except Exception as e:
+        logger.error("Batch search failed", error=str(e), queries=len(request.queries))
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+async def _vector_duplicate(
+    vector_service: VectorStoreService,
+    spec: Dict[str, Any],
+    embedding: Union[List[float], Dict[str, List[float]]],
+    replaced: Set[str]
+) -> Optional[Dict[str, Any]]:
+    """Nearest stored point at least DEDUP_VECTOR_THRESHOLD similar to an embedding
+    
+    Multi-vector collections are compared on their first vector. Euclidean
+    scores are distances rather than similarities, so those collections only
+    get the MinHash check.
+    """
+    vector_name = next(iter(spec["vectors"]), None) if spec.get("vectors") else None
+    distance = spec["vectors"][vector_name].get("distance") if vector_name else spec.get("distance")
+    if distance == "euclid":
+        return None
+    hits = await vector_service.search(
+        query_embedding=embedding[vector_name] if vector_name else embedding,
+        collection_name=spec["name"],
+        limit=len(replaced) + 1,
+        score_threshold=settings.DEDUP_VECTOR_THRESHOLD,
+        vector_name=vector_name
+    )
+    for hit in hits:
+        if str(hit["id"]) not in replaced:
+            return {"duplicate_of": hit["id"], "method": "vector", "similarity": round(hit["score"], 4)}
+    return None
+
 @embeddings_router.post("/store")
 async def store_embeddings(
     texts: List[str],
     metadata: Optional[List[dict]] = None,
     collection: Optional[str] = None,
+    source_id: Optional[str] = None,
+    model: Optional[str] = None,
+    dedup: Optional[Literal["skip", "merge"]] = None,
+    replace_source: bool = True,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """
@@ -131,6 +652,24 @@ async def store_embeddings(
     
     Store documents with their embeddings for later retrieval.
     Essential for building RAG systems.
+    
+    Ingestion is idempotent: unchanged chunks are skipped without an embedding
+    call. When a `source_id` is given (as a parameter or per-text in
+    `metadata`), the texts must be the full current set of chunks for that
+    source: previously stored chunks of the source that are not in this call
+    are deleted. To send a source over several calls, pass
+    `replace_source=false`, which keeps the chunks stored so far.
+    
+    `collection` names a namespace and `model` the embedding model; the
+    collection for the pair is created on first use with the model's vector
+    size. Multi-vector collections get an embedding from every vector's model.
+    
+    With `dedup`, new texts are first checked against the stored ones for
+    near-duplicates: by MinHash over word shingles (before any embedding
+    call), then by embedding similarity to the nearest stored point. A
+    duplicate is not stored; `skip` drops it and `merge` records its source
+    and extra metadata on the point it duplicates. Chunks being replaced by
+    this same call never count as the original.
     """
     
     # Verify authentication
@@ -140,31 +679,227 @@ async def store_embeddings(
     try:
         ollama_service = OllamaService()
         vector_service = VectorStoreService()
+        spec = await vector_service.ensure_collection(collection, model)
+        collection_name = spec["name"]
+        
+        chunks = []
+        for i, text in enumerate(texts):
+            doc_metadata = dict(metadata[i]) if metadata and i < len(metadata) else {}
+            doc_source = doc_metadata.get("source_id", source_id)
+            if doc_source is not None:
+                doc_metadata["source_id"] = str(doc_source)
+            doc_metadata["text"] = text
+            chunks.append(doc_metadata)
+        
+        # Skip chunks that are already stored and find chunks that disappeared
+        plan = await vector_service.plan_ingest(
+            chunks, collection_name=collection_name, replace_source=replace_source
+        )
         
         stored_ids = []
+        skipped = 0
+        embedded = 0
+        duplicates = []
+        dedup_seconds = 0.0
+        replaced = set(plan["stale_ids"])
         
-        for i, text in enumerate(texts):
-            # Generate embedding
-            embedding = await ollama_service.generate_embedding(text)
+        for i, (chunk, doc_id, exists) in enumerate(zip(chunks, plan["point_ids"], plan["existing"])):
+            if exists:
+                stored_ids.append(doc_id)
+                skipped += 1
+                continue
             
-            # Store in vector database
-            doc_metadata = metadata[i] if metadata and i < len(metadata) else {}
-            doc_metadata["text"] = text
+            duplicate = None
+            if dedup:
+                start = time.perf_counter()
+                matches = [
+                    match for match in await vector_service.near_duplicates(chunk["text"], collection_name=collection_name)
+                    if match[0] not in replaced
+                ]
+                if matches:
+                    duplicate = {"index": i, "duplicate_of": matches[0][0], "method": "minhash", "similarity": round(matches[0][1], 4)}
+                dedup_seconds += time.perf_counter() - start
+            
+            if duplicate is None:
+                # Generate embedding (one per named vector in multi-vector collections)
+                if spec.get("vectors"):
+                    embedding = {}
+                    for vector_name, config in spec["vectors"].items():
+                        if not config.get("model"):
+                            raise ValueError(f"No embedding model recorded for vector {vector_name}")
+                        embedding[vector_name] = await ollama_service.generate_embedding(chunk["text"], config["model"])
+                else:
+                    embedding = await ollama_service.generate_embedding(chunk["text"], spec.get("model") or model)
+                    # Checks the collection against a real embedding: an empty one of the wrong size is recreated
+                    spec = await vector_service.ensure_collection(collection, model, vector_size=len(embedding))
+                embedded += 1
+                
+                if dedup:
+                    start = time.perf_counter()
+                    match = await _vector_duplicate(vector_service, spec, embedding, replaced)
+                    if match:
+                        duplicate = {"index": i, **match}
+                    dedup_seconds += time.perf_counter() - start
             
+            if duplicate:
+                if dedup == "merge":
+                    await vector_service.merge_duplicate(duplicate["duplicate_of"], chunk, collection_name=collection_name)
+                duplicates.append(duplicate)
+                stored_ids.append(duplicate["duplicate_of"])
+                continue
+            
+            # Store in vector database
             doc_id = await vector_service.store(
                 embedding=embedding,
-                metadata=doc_metadata,
-                collection_name=collection
+                metadata=chunk,
+                collection_name=collection_name,
+                doc_id=doc_id
             )
             
             stored_ids.append(doc_id)
         
-        return {
+        if plan["stale_ids"]:
+            await vector_service.delete(plan["stale_ids"], collection_name=collection_name)
+        
+        response = {
             "stored_ids": stored_ids,
             "count": len(stored_ids),
-            "collection": collection or "default"
+            "embedded": embedded,
+            "skipped": skipped,
+            "deleted": len(plan["stale_ids"]),
+            "collection": collection_name
         }
+        if dedup:
+            # Duplicates are listed with the index of the text and the point it duplicates
+            response["dedup"] = {
+                "action": dedup,
+                "checked": len(chunks) - skipped,
+                "duplicates": len(duplicates),
+                "by_minhash": sum(1 for duplicate in duplicates if duplicate["method"] == "minhash"),
+                "by_vector": sum(1 for duplicate in duplicates if duplicate["method"] == "vector"),
+                "elapsed_ms": round(dedup_seconds * 1000, 2),
+                "matches": duplicates
+            }
+        return response
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Storage failed: {str(e)}")
     except Exception as e:
         logger.error("Embedding storage failed", error=str(e))
-        raise HTTPException(status_code=500, detail=f"Storage failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Storage failed: {str(e)}")
+
+@embeddings_router.post("/similarity/matrix")
+async def similarity_matrix(
+    request: SimilarityRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Cosine similarity matrix of texts and/or stored points
+    
+    Items are the `texts` followed by the `ids`, in order; row and column i
+    of the matrix belong to item i.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        similarity_service = SimilarityService()
+        items, vectors = await similarity_service.vectors(
+            request.texts, request.ids, request.collection, request.model, request.vector
+        )
+        matrix = await similarity_service.matrix(vectors)
+        return {
+            "items": items,
+            "matrix": matrix.round(6).tolist()
+        }
+        
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Similarity failed: {str(e)}")
+    except Exception as e:
+        logger.error("Similarity matrix failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Similarity failed: {str(e)}")
+
+@embeddings_router.post("/similarity/pairs")
+async def similar_pairs(
+    request: SimilarPairsRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    The most similar pairs among texts and/or stored points
+    
+    Computed block by block without materializing the full matrix, so it
+    also works for item counts a matrix could not be returned for.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        similarity_service = SimilarityService()
+        items, vectors = await similarity_service.vectors(
+            request.texts, request.ids, request.collection, request.model, request.vector
+        )
+        pairs = await similarity_service.pairs(vectors, request.top_k, request.min_score)
+        return {
+            "items": items,
+            "pairs": [{"a": i, "b": j, "score": round(score, 6)} for i, j, score in pairs]
+        }
+        
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Similarity failed: {str(e)}")
+    except Exception as e:
+        logger.error("Similar pairs failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Similarity failed: {str(e)}")
+
+@embeddings_router.post("/similarity/clusters")
+async def cluster_items(
+    request: ClusterRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Cluster texts and/or stored points by cosine similarity
+    
+    - `kmeans`: spherical k-means into `n_clusters`, scales to large inputs
+    - `agglomerative`: average linkage, merging until `n_clusters` remain or
+      no clusters are `threshold` similar; limited to SIMILARITY_MAX_MATRIX items
+    
+    Clusters list member item indexes, largest first, with the member
+    closest to the centroid as `representative`.
+    """
+    
+    # Verify authentication
+    if credentials and not await verify_token(credentials.credentials):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    
+    try:
+        similarity_service = SimilarityService()
+        items, vectors = await similarity_service.vectors(
+            request.texts, request.ids, request.collection, request.model, request.vector
+        )
+        clusters = await similarity_service.clusters(
+            vectors,
+            request.method,
+            n_clusters=request.n_clusters,
+            threshold=request.threshold,
+            max_iterations=request.max_iterations
+        )
+        return {
+            "items": items,
+            "method": request.method,
+            "clusters": clusters
+        }
+        
+    except CollectionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Clustering failed: {str(e)}")
+    except Exception as e:
+        logger.error("Clustering failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Clustering failed: {str(e)}")
@@ -5,17 +5,17 @@ Plugin system API for extensible tools
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
 import json
 import os
-import importlib.util
-import sys
+import tempfile
 from pathlib import Path
 import structlog
 
 from core.security import security, verify_token
 from core.config import settings
-from services.function_calling import FunctionCallingService
+from services.plugin_loader import plugin_modules
+from services.tool_registry import tool_registry, plugin_definition, PluginError
 
 logger = structlog.get_logger()
 plugins_router = APIRouter()
@@ -41,7 +41,8 @@ async def list_plugins(
     """
     List all installed plugins
     
-    Returns information about all currently installed and active plugins.
+    Returns information about all currently installed and active plugins,
+    as held by the tool registry.
     """
     
     # Verify authentication
@@ -50,21 +51,13 @@ async def list_plugins(
     
     try:
         plugins_dir = Path(settings.PLUGINS_DIRECTORY)
-        plugins = []
-        
-        if plugins_dir.exists():
-            for plugin_path in plugins_dir.glob("*.py"):
-                try:
-                    plugin_info = await _load_plugin_info(plugin_path)
-                    if plugin_info:
-                        plugins.append(plugin_info)
-                except Exception as e:
-                    logger.warning("Failed to load plugin", plugin=plugin_path.name, error=str(e))
+        plugins = tool_registry.plugins()
         
         return {
             "plugins": plugins,
             "count": len(plugins),
-            "plugins_directory": str(plugins_dir)
+            "plugins_directory": str(plugins_dir),
+            "module_cache": plugin_modules.stats()
         }
         
     except Exception as e:
@@ -96,6 +89,9 @@ async def register_plugin(
             "functions": plugin.functions
         }
         
+        # Register functions with the tool registry, which records the plugin
+        enabled = await tool_registry.register_plugin(plugin_def)
+        
         # Save plugin definition
         plugins_dir = Path(settings.PLUGINS_DIRECTORY)
         plugins_dir.mkdir(exist_ok=True)
@@ -104,24 +100,16 @@ async def register_plugin(
         with open(plugin_file, "w") as f:
             json.dump(plugin_def, f, indent=2)
         
-        # Register functions with function calling service
-        function_service = FunctionCallingService()
-        
-        for func_def in plugin.functions:
-            function_service.register_tool(
-                name=func_def["name"],
-                func=_create_plugin_function(plugin.name, func_def["name"]),
-                description=func_def["description"],
-                parameters=func_def["parameters"]
-            )
-        
         logger.info("Plugin registered successfully", plugin=plugin.name)
         
         return {
             "message": f"Plugin '{plugin.name}' registered successfully",
-            "plugin": plugin_def
+            "plugin": plugin_def,
+            "enabled": enabled
         }
         
+    except PluginError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error("Plugin registration failed", plugin=plugin.name, error=str(e))
         raise HTTPException(status_code=500, detail=f"Plugin registration failed: {str(e)}")
@@ -149,28 +137,38 @@ async def upload_plugin(
         plugins_dir = Path(settings.PLUGINS_DIRECTORY)
         plugins_dir.mkdir(exist_ok=True)
         
-        # Save uploaded file
         plugin_path = plugins_dir / file.filename
         content = await file.read()
         
-        with open(plugin_path, "wb") as f:
-            f.write(content)
-        
-        # Try to load and validate plugin
-        plugin_info = await _load_plugin_info(plugin_path)
-        
-        if not plugin_info:
-            # Clean up invalid plugin
-            plugin_path.unlink()
-            raise HTTPException(status_code=400, detail="Invalid plugin file")
+        # Load and validate the upload beside the plugins before it replaces
+        # anything, so a bad replacement leaves the old plugin and its tools
+        with tempfile.TemporaryDirectory(dir=plugins_dir) as staging:
+            staged_path = Path(staging) / file.filename
+            with open(staged_path, "wb") as f:
+                f.write(content)
+            
+            try:
+                plugin_info = plugin_definition(staged_path)
+                if not plugin_info:
+                    raise PluginError("Invalid plugin file")
+                enabled = await tool_registry.register_plugin(plugin_info)
+            finally:
+                plugin_modules.evict(str(staged_path))
+            
+            # A replaced file is imported afresh
+            os.replace(staged_path, plugin_path)
+            plugin_modules.evict(str(plugin_path))
         
         logger.info("Plugin uploaded successfully", plugin=file.filename)
         
         return {
             "message": f"Plugin '{file.filename}' uploaded successfully",
-            "plugin": plugin_info
+            "plugin": plugin_info,
+            "enabled": enabled
         }
         
+    except PluginError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error("Plugin upload failed", filename=file.filename, error=str(e))
         raise HTTPException(status_code=500, detail=f"Plugin upload failed: {str(e)}")
@@ -197,12 +195,15 @@ async def uninstall_plugin(
         plugin_py = plugins_dir / f"{plugin_name}.py"
         if plugin_py.exists():
             plugin_py.unlink()
+        plugin_modules.evict(str(plugin_py))
         
         # Remove JSON definition
         plugin_json = plugins_dir / f"{plugin_name}.json"
         if plugin_json.exists():
             plugin_json.unlink()
         
+        await tool_registry.unregister_plugin(plugin_name)
+        
         logger.info("Plugin uninstalled", plugin=plugin_name)
         
         return {
@@ -212,81 +213,3 @@ async def uninstall_plugin(
     except Exception as e:
         logger.error("Plugin uninstall failed", plugin=plugin_name, error=str(e))
         raise HTTPException(status_code=500, detail=f"Plugin uninstall failed: {str(e)}")
-
-async def _load_plugin_info(plugin_path: Path) -> Optional[Dict[str, Any]]:
-    """Load plugin information from file"""
-    try:
-        if plugin_path.suffix == ".json":
-            # JSON plugin definition
-            with open(plugin_path, "r") as f:
-                return json.load(f)
-        
-        elif plugin_path.suffix == ".py":
-            # Python plugin file
-            spec = importlib.util.spec_from_file_location(
-                plugin_path.stem, plugin_path
-            )
-            
-            if spec and spec.loader:
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # Look for plugin metadata
-                if hasattr(module, "PLUGIN_INFO"):
-                    return module.PLUGIN_INFO
-                else:
-                    # Generate basic info
-                    return {
-                        "name": plugin_path.stem,
-                        "version": "1.0.0",
-                        "description": getattr(module, "__doc__", "No description"),
-                        "author": "Unknown",
-                        "functions": []
-                    }
-        
-        return None
-        
-    except Exception as e:
-        logger.error("Failed to load plugin info", plugin=plugin_path.name, error=str(e))
-        return None
-
-def _create_plugin_function(plugin_name: str, function_name: str):
-    """Create a plugin function wrapper"""
-    
-    async def plugin_function(arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute plugin function"""
-        try:
-            # Load plugin module
-            plugins_dir = Path(settings.PLUGINS_DIRECTORY)
-            plugin_path = plugins_dir / f"{plugin_name}.py"
-            
-            if not plugin_path.exists():
-                return {"error": f"Plugin {plugin_name} not found", "success": False}
-            
-            spec = importlib.util.spec_from_file_location(plugin_name, plugin_path)
-            if spec and spec.loader:
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # Get function
-                if hasattr(module, function_name):
-                    func = getattr(module, function_name)
-                    
-                    # Execute function
-                    if asyncio.iscoroutinefunction(func):
-                        result = await func(arguments)
-                    else:
-                        result = func(arguments)
-                    
-                    return {"result": result, "success": True}
-                else:
-                    return {"error": f"Function {function_name} not found in plugin", "success": False}
-            
-            return {"error": "Failed to load plugin module", "success": False}
-            
-        except Exception as e:
-            logger.error("Plugin function execution failed", 
-                        plugin=plugin_name, function=function_name, error=str(e))
-            return {"error": str(e), "success": False}
-    
-    return plugin_function
\ No newline at end of file
@@ -5,12 +5,13 @@ Tools and function calling API
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-import json
+from typing import Dict, Any
 import structlog
 
 from core.security import security, verify_token
+from services.code_jobs import job_owner
 from services.function_calling import FunctionCallingService
+from services.tool_registry import tool_registry
 
 logger = structlog.get_logger()
 tools_router = APIRouter()
@@ -38,74 +39,12 @@ async def list_tools(
     if credentials and not await verify_token(credentials.credentials):
         raise HTTPException(status_code=401, detail="Invalid API key")
     
-    # Built-in tools
-    builtin_tools = [
-        {
-            "name": "calculator",
-            "description": "Perform mathematical calculations",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "expression": {
-                        "type": "string",
-                        "description": "Mathematical expression to evaluate (e.g., '2+2', '10*5', 'sqrt(16)')"
-                    }
-                },
-                "required": ["expression"]
-            }
-        },
-        {
-            "name": "weather",
-            "description": "Get weather information for a location",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                        "type": "string",
-                        "description": "Location to get weather for (e.g., 'New York', 'London')"
-                    }
-                },
-                "required": ["location"]
-            }
-        },
-        {
-            "name": "search",
-            "description": "Search for information on the web",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Search query"
-                    }
-                },
-                "required": ["query"]
-            }
-        },
-        {
-            "name": "code_interpreter",
-            "description": "Execute Python code in a secure sandbox",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "code": {
-                        "type": "string",
-                        "description": "Python code to execute"
-                    },
-                    "language": {
-                        "type": "string",
-                        "description": "Programming language (currently only 'python')",
-                        "default": "python"
-                    }
-                },
-                "required": ["code"]
-            }
-        }
-    ]
+    # Built-in and plugin tools, from the in-memory registry
+    tools = tool_registry.list()
     
     return {
-        "tools": builtin_tools,
-        "count": len(builtin_tools)
+        "tools": tools,
+        "count": len(tools)
     }
 
 @tools_router.post("/tools/execute")
@@ -124,7 +63,7 @@ async def execute_tool(
         raise HTTPException(status_code=401, detail="Invalid API key")
     
     try:
-        function_service = FunctionCallingService()
+        function_service = FunctionCallingService(job_owner(credentials.credentials if credentials else None))
         
         # Create tool definition (simplified for direct execution)
         tool_definition = {"name": request.tool_name}
@@ -158,100 +97,9 @@ async def get_tool_info(
     if credentials and not await verify_token(credentials.credentials):
         raise HTTPException(status_code=401, detail="Invalid API key")
     
-    # Tool definitions
-    tool_definitions = {
-        "calculator": {
-            "name": "calculator",
-            "description": "Perform mathematical calculations with support for basic arithmetic, functions, and constants",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "expression": {
-                        "type": "string",
-                        "description": "Mathematical expression to evaluate",
-                        "examples": ["2+2", "sqrt(16)", "sin(pi/2)", "10*5-3"]
-                    }
-                },
-                "required": ["expression"]
-            },
-            "examples": [
-                {"expression": "2+2", "result": 4},
-                {"expression": "sqrt(16)", "result": 4.0},
-                {"expression": "10*5", "result": 50}
-            ]
-        },
-        "weather": {
-            "name": "weather",
-            "description": "Get current weather information for any location worldwide",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                        "type": "string",
-                        "description": "Location name (city, country, etc.)",
-                        "examples": ["New York", "London", "Tokyo", "San Francisco"]
-                    }
-                },
-                "required": ["location"]
-            },
-            "examples": [
-                {"location": "New York", "result": "22°C, Partly cloudy"},
-                {"location": "London", "result": "15°C, Rainy"}
-            ]
-        },
-        "search": {
-            "name": "search",
-            "description": "Search for information across the web and return relevant results",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Search query or question",
-                        "examples": ["latest news about AI", "how to make coffee", "Python tutorials"]
-                    }
-                },
-                "required": ["query"]
-            },
-            "examples": [
-                {"query": "AI news", "result": "Latest articles about artificial intelligence"},
-                {"query": "Python tutorials", "result": "Programming resources and guides"}
-            ]
-        },
-        "code_interpreter": {
-            "name": "code_interpreter",
-            "description": "Execute Python code in a secure sandbox environment with safety controls",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "code": {
-                        "type": "string",
-                        "description": "Python code to execute",
-                        "examples": [
-                            "print('Hello, World!')",
-                            "import math; print(math.sqrt(16))",
-                            "x = [1,2,3,4]; print(sum(x))"
-                        ]
-                    },
-                    "language": {
-                        "type": "string",
-                        "description": "Programming language",
-                        "default": "python",
-                        "enum": ["python"]
-                    }
-                },
-                "required": ["code"]
-            },
-            "safety_features": [
-                "Resource limits (CPU, memory)",
-                "Execution timeout",
-                "File system isolation",
-                "Network access restriction"
-            ]
-        }
-    }
-    
-    if tool_name not in tool_definitions:
+    # Built-in and plugin tools
+    tool = tool_registry.get(tool_name)
+    if tool is None:
         raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
     
-    return tool_definitions[tool_name]
\ No newline at end of file
+    return tool_registry.describe(tool)
\ No newline at end of file
@@ -0,0 +1,101 @@
+"""
+Recall, memory and latency of dimensionality-reduced collections
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_dim_reduction --points 100000 --dim 768 --dims 128 256 384
+    python -m benchmarks.bench_dim_reduction --embeddings sample.npy --dims 256
+
+Recall is measured against exact search over the full-size vectors. The
+synthetic data has a decaying variance spectrum over its leading
+coordinates, like Matryoshka-trained embeddings; truncation results only
+transfer to a real model when run on its embeddings (``--embeddings``, an
+N x D float array, the last ``--queries`` rows are used as queries).
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.config import settings
+from benchmarks.bench_embedded_index import clustered_vectors, percentile_ms
+from services.dim_reduction import fit_pca, reduce_vectors
+from services.embedded_index import EmbeddedCollection
+
+def load_data(args):
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+        return vectors[:-args.queries], vectors[-args.queries:]
+    rng = np.random.default_rng(13)
+    spectrum = (1.0 + np.arange(args.dim, dtype=np.float32)) ** -0.5
+    centers = rng.standard_normal((256, args.dim)).astype(np.float32)
+    data = clustered_vectors(rng, centers, args.points) * spectrum
+    queries = clustered_vectors(rng, centers, args.queries) * spectrum
+    return data, queries
+
+def run(collection: EmbeddedCollection, data: np.ndarray, queries: np.ndarray, k: int):
+    for i in range(0, len(data), 5000):
+        collection.upsert([
+            {"id": str(j), "vector": data[j], "payload": {}}
+            for j in range(i, min(i + 5000, len(data)))
+        ])
+    ids, times = [], []
+    for query in queries:
+        t = time.perf_counter()
+        hits = collection.search(query, k, None)
+        times.append(time.perf_counter() - t)
+        ids.append({hit["id"] for hit in hits})
+    return ids, times, collection.info()["memory"]["vectors_bytes"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", type=int, nargs="+", default=[128, 256, 384])
+    parser.add_argument("--sample", type=int, default=5000, help="embeddings the PCA is fitted on")
+    parser.add_argument("--embeddings", help="real embeddings (.npy) instead of synthetic data")
+    args = parser.parse_args()
+
+    data, queries = load_data(args)
+    dim = data.shape[1]
+
+    # Exact scans, so only the vector size differs between runs
+    settings.EMBEDDED_HNSW_THRESHOLD = len(data) + 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        truth, times, memory = run(EmbeddedCollection(Path(tmp) / "full", dim), data, queries, args.k)
+        print(
+            f"{'full ' + str(dim):<14} vectors={memory / 2**20:8.1f}MiB "
+            f"p50={percentile_ms(times, 50):6.2f}ms p95={percentile_ms(times, 95):6.2f}ms "
+            f"recall@{args.k}=1.000"
+        )
+
+        for size in args.dims:
+            for method in ("truncate", "pca"):
+                reduction = {"method": method, "dimensions": size, "source_size": dim}
+                start = time.perf_counter()
+                if method == "pca":
+                    reduction = fit_pca(reduction, data[:args.sample])
+                fit_s = time.perf_counter() - start
+                name = f"{method}{size}"
+                ids, times, memory = run(
+                    EmbeddedCollection(Path(tmp) / name, size),
+                    reduce_vectors(name, reduction, data),
+                    reduce_vectors(name, reduction, queries),
+                    args.k
+                )
+                recall = np.mean([len(a & b) / args.k for a, b in zip(ids, truth)])
+                extra = f" fit={fit_s:.2f}s" if method == "pca" else ""
+                print(
+                    f"{method + ' ' + str(size):<14} vectors={memory / 2**20:8.1f}MiB "
+                    f"p50={percentile_ms(times, 50):6.2f}ms p95={percentile_ms(times, 95):6.2f}ms "
+                    f"recall@{args.k}={recall:.3f}{extra}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Recall and latency of the embedded HNSW index against exact search
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_embedded_index --points 50000 --dim 384
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.config import settings
+from services.embedded_index import EmbeddedCollection
+
+def clustered_vectors(rng: np.random.Generator, centers: np.ndarray, n: int) -> np.ndarray:
+    """Gaussian clusters, closer to real embedding distributions than uniform noise"""
+    clusters, dim = centers.shape
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+
+def percentile_ms(samples, pct):
+    return float(np.percentile(np.array(samples) * 1000, pct))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((64, args.dim)).astype(np.float32)
+    data = clustered_vectors(rng, centers, args.points)
+    queries = clustered_vectors(rng, centers, args.queries)
+
+    # Keep the collection on the exact path while loading, index explicitly below
+    settings.EMBEDDED_HNSW_THRESHOLD = args.points + 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        collection = EmbeddedCollection(Path(tmp) / "bench", vector_size=args.dim)
+
+        start = time.perf_counter()
+        for i in range(0, args.points, 1000):
+            collection.upsert([
+                {"id": str(j), "vector": data[j], "payload": {"n": j}}
+                for j in range(i, min(i + 1000, args.points))
+            ])
+        print(f"load: {args.points} points in {time.perf_counter() - start:.1f}s")
+
+        exact_ids, exact_times = [], []
+        for query in queries:
+            t = time.perf_counter()
+            hits = collection.search(query, args.k, None)
+            exact_times.append(time.perf_counter() - t)
+            exact_ids.append({hit["id"] for hit in hits})
+        print(f"exact: p50={percentile_ms(exact_times, 50):.2f}ms p95={percentile_ms(exact_times, 95):.2f}ms")
+
+        settings.EMBEDDED_HNSW_THRESHOLD = 0
+        start = time.perf_counter()
+        collection._maybe_index()
+        while collection._building:
+            time.sleep(0.1)
+        print(f"hnsw build: {time.perf_counter() - start:.1f}s (M={settings.EMBEDDED_HNSW_M})")
+
+        for ef in args.ef:
+            settings.EMBEDDED_HNSW_EF_SEARCH = ef
+            recall, times = 0.0, []
+            for query, truth in zip(queries, exact_ids):
+                t = time.perf_counter()
+                hits = collection.search(query, args.k, None)
+                times.append(time.perf_counter() - t)
+                recall += len(truth & {hit["id"] for hit in hits}) / args.k
+            print(
+                f"hnsw ef={ef}: recall@{args.k}={recall / len(queries):.3f} "
+                f"p50={percentile_ms(times, 50):.2f}ms p95={percentile_ms(times, 95):.2f}ms"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Plugin call overhead: import on every call vs. cached module
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_plugins --calls 2000
+
+The generated plugin imports a few standard modules and builds a lookup
+table of --table-size entries at import time, standing in for the setup a
+real plugin does (loading a client, a model, a config). "import per call"
+is what every plugin tool call did before the module cache; "cached" is
+the module cache's stat-and-reuse path, and "after edit" is the first call
+after the file changed, which pays for one import.
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+
+from benchmarks.bench_embedded_index import percentile_ms
+from services.plugin_loader import PluginModuleCache
+
+PLUGIN_SOURCE = '''
+import decimal
+import json
+import statistics
+
+TABLE = {{i: str(i * i) for i in range({size})}}
+
+def lookup(arguments):
+    return TABLE.get(int(arguments["key"]))
+'''
+
+def import_per_call(path: str, arguments):
+    spec = importlib.util.spec_from_file_location("bench_plugin", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.lookup(arguments)
+
+def measure(call, calls: int):
+    times = []
+    for i in range(calls):
+        start = time.perf_counter()
+        call({"key": i})
+        times.append(time.perf_counter() - start)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--table-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench_plugin.py")
+        with open(path, "w") as plugin:
+            plugin.write(PLUGIN_SOURCE.format(size=args.table_size))
+
+        cache = PluginModuleCache()
+        results = {
+            "import per call": measure(lambda arguments: import_per_call(path, arguments), args.calls),
+            "cached": measure(lambda arguments: cache.load(path).lookup(arguments), args.calls)
+        }
+
+        reloads = []
+        for i in range(min(args.calls, 50)):
+            with open(path, "a") as plugin:
+                plugin.write(f"# edit {i}\n")
+            start = time.perf_counter()
+            cache.load(path).lookup({"key": i})
+            reloads.append(time.perf_counter() - start)
+        results["after edit"] = reloads
+
+    for label, times in results.items():
+        print(
+            f"{label:<16} calls={len(times):6d} p50={percentile_ms(times, 50):8.3f}ms "
+            f"p95={percentile_ms(times, 95):8.3f}ms"
+        )
+    print(f"cache: {cache.stats()}")
+
+if __name__ == "__main__":
+    main()
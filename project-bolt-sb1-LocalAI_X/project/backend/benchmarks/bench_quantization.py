@@ -0,0 +1,73 @@
+"""
+Memory footprint, latency and recall of quantized vs. float32 collections
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_quantization --points 100000 --dim 768
+
+Uses the embedded backend so it needs no Qdrant server. "search RAM" is the
+size of the data a search scans: the whole float32 matrix for unquantized
+collections, the in-RAM codes (plus the few rescored rows) for quantized ones.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.config import settings
+from benchmarks.bench_embedded_index import clustered_vectors, percentile_ms
+from services.embedded_index import EmbeddedCollection
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[2.0, 4.0, 8.0])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    centers = rng.standard_normal((256, args.dim)).astype(np.float32)
+    data = clustered_vectors(rng, centers, args.points)
+    queries = clustered_vectors(rng, centers, args.queries)
+
+    # Compare against exact scans only
+    settings.EMBEDDED_HNSW_THRESHOLD = args.points + 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        truth = None
+        for mode in (None, "scalar", "binary"):
+            collection = EmbeddedCollection(Path(tmp) / (mode or "float32"), args.dim, "cosine", mode)
+            for i in range(0, args.points, 5000):
+                collection.upsert([
+                    {"id": str(j), "vector": data[j], "payload": {}}
+                    for j in range(i, min(i + 5000, args.points))
+                ])
+            memory = collection.info()["memory"]
+            search_bytes = memory["quantized_bytes"] or memory["vectors_bytes"]
+
+            for oversampling in (args.oversampling if mode else [1.0]):
+                ids, times = [], []
+                for query in queries:
+                    t = time.perf_counter()
+                    hits = collection.search(query, args.k, None, oversampling)
+                    times.append(time.perf_counter() - t)
+                    ids.append({hit["id"] for hit in hits})
+                if truth is None:
+                    truth = ids
+                recall = np.mean([len(a & b) / args.k for a, b in zip(ids, truth)])
+                label = mode or "float32"
+                if mode:
+                    label += f" x{oversampling:g}"
+                print(
+                    f"{label:<14} search RAM={search_bytes / 2**20:8.1f}MiB "
+                    f"p50={percentile_ms(times, 50):6.2f}ms p95={percentile_ms(times, 95):6.2f}ms "
+                    f"recall@{args.k}={recall:.3f}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Code interpreter latency: fresh interpreter per run vs. warm worker pool
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_sandbox --runs 30
+
+Cold runs start a new interpreter that imports what the snippet needs, as
+every execution did before the pool. Warm runs fork a child from a worker
+that already imported PYTHON_PACKAGES_WHITELIST (the packages that are
+installed).
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.bench_embedded_index import percentile_ms
+from services.sandbox import SandboxPool, execute_cold
+
+SNIPPETS = {
+    "print": "print(sum(range(1000)))",
+    "numpy": "import numpy as np\nprint(np.arange(1000).reshape(10, 100).sum(axis=0)[:3])",
+    "pandas": "import pandas as pd\nprint(pd.DataFrame({'a': range(100)}).describe().loc['mean', 'a'])"
+}
+
+async def measure(execute, code: str, runs: int):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await execute(code, timeout=30)
+        times.append(time.perf_counter() - start)
+        if not result["success"]:
+            return None, result["error"]
+    return times, None
+
+async def main_async(args):
+    pool = SandboxPool(size=1, max_jobs=args.runs * len(SNIPPETS) + 1)
+    start = time.perf_counter()
+    await pool.start()
+    print(f"pool start: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    try:
+        for name, code in SNIPPETS.items():
+            for label, execute in (("cold", execute_cold), ("warm", pool.execute)):
+                times, error = await measure(execute, code, args.runs)
+                if times is None:
+                    print(f"{name:<8} {label}: skipped ({error.splitlines()[0]})")
+                    break
+                print(
+                    f"{name:<8} {label}: p50={percentile_ms(times, 50):8.2f}ms "
+                    f"p95={percentile_ms(times, 95):8.2f}ms"
+                )
+    finally:
+        await pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -26,21 +26,100 @@ class Settings(BaseSettings):
     TEMPERATURE: float = 0.7
     
     # Vector Store Configuration
+    VECTOR_BACKEND: str = "qdrant"  # "qdrant" or "embedded"
     QDRANT_USE_HTTPS: bool = False
     QDRANT_HOST: str = "localhost"
     QDRANT_PORT: int = 6333
     QDRANT_API_KEY: Optional[str] = None
     VECTOR_COLLECTION_NAME: str = "localai_embeddings"
-    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MODEL: str = "nomic-embed-text"  # Ollama model used when a request names none
+    VECTOR_QUANTIZATION: Optional[str] = None  # None, "scalar" or "binary" for the default collection
+    VECTOR_QUANTIZATION_OVERSAMPLING: float = 3.0
+    
+    # Embedded Vector Backend Configuration
+    EMBEDDED_VECTOR_PATH: str = "data/vectors"
+    EMBEDDED_HNSW_THRESHOLD: int = 50000  # live points before a graph index is built
+    EMBEDDED_HNSW_M: int = 16
+    EMBEDDED_HNSW_EF_SEARCH: int = 64
+    
+    # Search Cache Configuration
+    SEARCH_CACHE_SIZE: int = 1024  # cached result lists, 0 disables
+    SEARCH_CACHE_TTL: int = 300  # seconds
+    EMBEDDING_CACHE_SIZE: int = 4096  # cached query embeddings, 0 disables
+    
+    # Dimensionality Reduction Configuration
+    MATRYOSHKA_MODELS: List[str] = [  # model name prefixes whose embeddings may be truncated
+        "nomic-embed-text", "mxbai-embed-large", "snowflake-arctic-embed2"
+    ]
+    
+    # Payload Filter Configuration
+    PAYLOAD_INDEX_AUTO_AFTER: int = 20  # filtered searches on a field before it is indexed, 0 disables
+    PAYLOAD_FILTER_SLOW_MS: float = 50.0  # average latency that flags an unindexed filter as slow
+    PAYLOAD_FILTER_SAMPLE_EVERY: int = 100  # filtered searches between selectivity measurements
+    
+    # Retrieval-Augmented Chat Configuration
+    RAG_CONTEXT_TOKENS: int = 2048  # default budget for retrieved context
+    
+    # Reranking Configuration
+    RERANK_CANDIDATES: int = 4  # candidates fetched per final hit when reranking
+    RERANK_BUDGET_MS: int = 2000  # latency budget of the rerank stage
+    RERANK_CONCURRENCY: int = 4  # pairwise scorer calls in flight across requests
+    RERANK_CACHE_SIZE: int = 8192  # cached (query, document) scores, 0 disables
+    RERANK_JUDGE_MODEL: Optional[str] = None  # Ollama model for the llm scorer, DEFAULT_MODEL if unset
+    RERANK_CROSS_ENCODER: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # sentence-transformers model
+    
+    # Collection Dump Configuration
+    DUMP_BATCH_SIZE: int = 1024  # points per scroll page and per dump frame
+    
+    # Federated Search Configuration
+    FEDERATED_SEARCH_TIMEOUT_MS: int = 2000  # per-collection timeout when searching several collections
+    FEDERATED_MAX_COLLECTIONS: int = 32  # collections a single search may fan out to
+    
+    # Near-Duplicate Detection Configuration
+    DEDUP_JACCARD_THRESHOLD: float = 0.8  # estimated shingle overlap that makes a text a near-duplicate
+    DEDUP_VECTOR_THRESHOLD: float = 0.97  # similarity to a stored point that makes an embedding a duplicate
+    DEDUP_MINHASH_PERMUTATIONS: int = 128  # MinHash signature length
+    DEDUP_LSH_BANDS: int = 32  # LSH bands; more bands find less similar candidates
+    
+    # Similarity and Clustering Configuration
+    SIMILARITY_MAX_ITEMS: int = 20000  # texts and points per similarity request
+    SIMILARITY_MAX_MATRIX: int = 2000  # items for a full matrix or agglomerative clustering
+    SIMILARITY_BLOCK_SIZE: int = 1024  # rows of the similarity space computed at a time
     
     # Code Interpreter Configuration
     CODE_TIMEOUT: int = 30  # seconds
     CODE_MEMORY_LIMIT: int = 128  # MB
+    CODE_MAX_OUTPUT_BYTES: int = 1048576  # output returned or streamed per run, the rest is spilled to a file
+    CODE_OUTPUT_DIR: str = "/tmp/localai-code-output"
+    CODE_OUTPUT_TTL_SECONDS: int = 3600  # spilled output is kept this long
     ENABLE_CODE_EXECUTION: bool = True
     PYTHON_PACKAGES_WHITELIST: List[str] = [
         "numpy", "pandas", "matplotlib", "scipy", "requests", 
         "json", "math", "random", "datetime", "os", "sys"
     ]
+    SANDBOX_POOL_SIZE: int = 2  # warm workers with the whitelisted packages imported, 0 starts a fresh interpreter per run; also caps CODE_JOB_WORKERS
+    SANDBOX_WORKER_MAX_JOBS: int = 100  # jobs before a worker is recycled
+    SANDBOX_START_TIMEOUT: int = 60  # seconds a worker may take to import its packages
+    SANDBOX_WORKDIR: str = "/tmp"
+    SANDBOX_MAX_SESSIONS: int = 16  # live stateful sessions, the least recently used idle one is evicted
+    SANDBOX_SESSION_IDLE_SECONDS: int = 600  # sessions unused this long are closed
+    SANDBOX_SESSION_MEMORY_MB: int = 512  # memory a session's variables may use in total
+    CODE_JOB_WORKERS: int = 0  # jobs run at once, 0 for one per CPU core; capped at SANDBOX_POOL_SIZE
+    CODE_JOB_QUEUE_SIZE: int = 256  # waiting jobs before submissions are refused
+    CODE_JOB_RESULT_TTL_SECONDS: int = 3600  # finished jobs can be polled this long
+    CODE_JOB_MAX_WAIT_SECONDS: int = 60  # longest long-poll
+    CODE_CACHE_SIZE: int = 512  # cached results of pure runs, 0 disables
+    CODE_CACHE_TTL: int = 3600  # seconds
+    CODE_CACHE_MAX_OUTPUT_BYTES: int = 65536  # runs with more output are not cached
+    CODE_TOOL_MAX_OUTPUT_CHARS: int = 8000  # output of the code_interpreter tool passed back to the model
+    CODE_ARTIFACT_DIR: str = "/tmp/localai-code-artifacts"  # per-run working directories
+    CODE_ARTIFACT_MAX_FILES: int = 32  # files kept per run
+    CODE_ARTIFACT_MAX_BYTES: int = 52428800  # bytes kept per run
+    CODE_ARTIFACT_TTL_SECONDS: int = 3600  # artifacts are deleted this long after the run
+    DATASET_DIR: str = "/dev/shm/localai-datasets"  # attachments for code runs, tmpfs keeps them in memory
+    DATASET_MAX_BYTES: int = 268435456  # per upload, including the array parsed from a CSV
+    DATASET_QUOTA_BYTES: int = 1073741824  # per API key
+    DATASET_TTL_SECONDS: int = 86400  # datasets are deleted this long after upload
     
     # Plugin Configuration
     PLUGINS_DIRECTORY: str = "plugins"
@@ -2,7 +2,7 @@
 Database configuration and initialization
 """
 
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Boolean, Integer
+from sqlalchemy import create_engine, Column, String, DateTime, Text, Boolean, Integer, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -52,6 +52,21 @@ class PluginRegistry(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class VectorCollection(Base):
+    __tablename__ = "vector_collections"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)
+    namespace = Column(String, index=True)
+    model = Column(String, nullable=True)  # embedding model, None if unknown or multi-vector
+    vector_size = Column(Integer, nullable=True)
+    distance = Column(String, default="cosine")
+    quantization = Column(String, nullable=True)
+    vectors = Column(JSON, nullable=True)  # named vectors: {name: {model, size, distance}}
+    config = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 async def init_db():
     """Initialize database tables"""
     try:
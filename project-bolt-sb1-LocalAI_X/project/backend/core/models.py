@@ -0,0 +1,35 @@
+"""
+Request models shared by several API routers
+"""
+
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, Optional
+
+from services.payload_filter import parse_filters
+from services.reranker import SCORERS
+
+class FilterOptions(BaseModel):
+    filters: Optional[Dict[str, Any]] = Field(
+        None, description="Payload conditions: equality, `in` lists or numeric ranges (gt, gte, lt, lte)"
+    )
+    
+    @field_validator("filters")
+    @classmethod
+    def check_filters(cls, filters):
+        parse_filters(filters)
+        return filters
+
+class RerankOptions(BaseModel):
+    scorer: Optional[str] = Field(None, description="Pairwise relevance scorer: llm or cross-encoder")
+    mmr_lambda: Optional[float] = Field(
+        None, ge=0, le=1, description="Diversify with MMR: 1 is pure relevance, lower values penalize redundancy"
+    )
+    candidates: Optional[int] = Field(None, gt=0, description="Hits to rerank, RERANK_CANDIDATES per result by default")
+    budget_ms: Optional[int] = Field(None, gt=0, description="Latency budget, the stage degrades when it runs out")
+    
+    @field_validator("scorer")
+    @classmethod
+    def check_scorer(cls, scorer):
+        if scorer is not None and scorer not in SCORERS:
+            raise ValueError(f"Unknown scorer {scorer}, expected one of {', '.join(sorted(SCORERS))}")
+        return scorer
@@ -23,8 +23,13 @@ from core.config import settings
 from core.database import init_db
 from core.security import verify_token
 from utils.logging import setup_logging
-from services.ollama_client import OllamaService
-from services.vector_store import VectorStoreService
+from services.ollama_client import OllamaService, embedding_cache_stats
+from services.vector_store import VectorStoreService, search_cache_stats
+from services.reranker import rerank_cache_stats
+from services.code_jobs import job_queue
+from services.code_sessions import session_manager
+from services.sandbox import sandbox_pool
+from services.tool_registry import tool_registry
 
 # Load environment variables
 load_dotenv()
@@ -39,15 +44,21 @@ async def lifespan(app: FastAPI):
     
     # Initialize database
     await init_db()
+    await tool_registry.load()
     
     # Initialize services
     await OllamaService().health_check()
     await VectorStoreService().initialize()
+    if settings.ENABLE_CODE_EXECUTION:
+        await sandbox_pool.start()
     
     logger.info("✅ LocalAI+ Platform started successfully")
     yield
     
     logger.info("🛑 Shutting down LocalAI+ Platform")
+    await job_queue.close()
+    await session_manager.close()
+    await sandbox_pool.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -130,6 +141,11 @@ async def health_check():
                 "ollama": "healthy" if ollama_healthy else "unhealthy",
                 "vector_store": "healthy" if vector_healthy else "unhealthy"
             },
+            "caches": {
+                "embeddings": embedding_cache_stats(),
+                "search": search_cache_stats(),
+                "rerank": rerank_cache_stats()
+            },
             "timestamp": "2024-01-01T00:00:00Z"
         }
     except Exception as e:
@@ -0,0 +1,116 @@
+"""
+Files produced by code interpreter runs
+
+Every run gets its own scratch directory under CODE_ARTIFACT_DIR, in a
+folder of the API key that started it (see `job_owner`), as its working
+directory. Whatever the code writes there, plus the matplotlib
+figures it leaves open (saved as PNG by the sandbox worker), is kept as
+artifacts of the run. Responses carry small references to them instead of
+the content, which only the same key can download. Runs may keep at most
+CODE_ARTIFACT_MAX_FILES files and CODE_ARTIFACT_MAX_BYTES in total, and
+artifacts are deleted after CODE_ARTIFACT_TTL_SECONDS.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import mimetypes
+import os
+import re
+import shutil
+import time
+import uuid
+import structlog
+
+from core.config import settings
+
+logger = structlog.get_logger()
+
+RUN_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class ArtifactNotFoundError(LookupError):
+    """Raised for an artifact that does not exist, has expired or belongs to another key"""
+
+def content_type(name: str) -> str:
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+class ArtifactStore:
+    """Run directories by owner under one root, shared across requests"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.CODE_ARTIFACT_DIR
+        self.counters = {"runs": 0, "artifacts": 0, "bytes": 0, "dropped": 0}
+
+    def _run_dir(self, owner: str, run_id: str) -> str:
+        return os.path.join(self.directory, owner, run_id)
+
+    def scratch(self, owner: str = "anonymous") -> Tuple[str, str]:
+        """(run id, path) of a new, empty working directory of an owner"""
+        self._sweep()
+        run_id = uuid.uuid4().hex
+        path = self._run_dir(owner, run_id)
+        os.makedirs(path, mode=0o700)
+        return run_id, path
+
+    def _sweep(self):
+        """Delete run directories older than CODE_ARTIFACT_TTL_SECONDS"""
+        cutoff = time.time() - settings.CODE_ARTIFACT_TTL_SECONDS
+        try:
+            with os.scandir(self.directory) as owners:
+                for owner in owners:
+                    if not owner.is_dir():
+                        continue
+                    with os.scandir(owner.path) as entries:
+                        for entry in entries:
+                            if RUN_ID.match(entry.name) and entry.stat().st_mtime < cutoff:
+                                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def collect(self, run_id: str, owner: str = "anonymous") -> List[Dict[str, Any]]:
+        """References to the files a run left, oldest first; the directory is removed if there are none"""
+        root = self._run_dir(owner, run_id)
+        files = []
+        for folder, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(folder, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    files.append((os.path.getmtime(path), os.path.relpath(path, root), path))
+        files.sort()
+
+        artifacts = []
+        total = 0
+        for _, name, path in files:
+            size = os.path.getsize(path)
+            if len(artifacts) >= settings.CODE_ARTIFACT_MAX_FILES or total + size > settings.CODE_ARTIFACT_MAX_BYTES:
+                os.unlink(path)
+                self.counters["dropped"] += 1
+                logger.warning("Dropped code artifact over the limit", run_id=run_id, name=name, bytes=size)
+                continue
+            total += size
+            artifacts.append({
+                "run_id": run_id,
+                "name": name,
+                "content_type": content_type(name),
+                "bytes": size,
+                "url": f"/v1/code/artifacts/{run_id}/{name}"
+            })
+
+        self.counters["runs"] += 1
+        self.counters["artifacts"] += len(artifacts)
+        self.counters["bytes"] += total
+        if not artifacts:
+            shutil.rmtree(root, ignore_errors=True)
+        return artifacts
+
+    def path(self, run_id: str, name: str, owner: str) -> str:
+        """Location of an artifact of an owner's run, refusing anything outside the run directory"""
+        root = os.path.realpath(self._run_dir(owner, run_id))
+        path = os.path.realpath(os.path.join(root, name))
+        if not RUN_ID.match(run_id) or not path.startswith(root + os.sep) or not os.path.isfile(path):
+            raise ArtifactNotFoundError(f"Artifact {run_id}/{name} not found")
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters)
+
+# Shared across requests
+artifact_store = ArtifactStore()
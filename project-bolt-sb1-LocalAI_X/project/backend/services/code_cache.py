@@ -0,0 +1,123 @@
+"""
+Result cache for deterministic code interpreter runs
+
+Tool loops often send byte-identical snippets again. A run whose result
+depends only on its code can be answered from this cache instead of the
+sandbox. The cache key covers the code, the requested packages, the
+attached datasets and the interpreter with the versions of the
+whitelisted packages. Runs are
+cached only when the caller asks for it. The caller can also declare the
+code pure; otherwise it is inferred from the code not touching
+randomness, the clock, IO or the process (see `is_pure`). Only
+successful runs with output under CODE_CACHE_MAX_OUTPUT_BYTES, no spilled
+output and no artifacts are stored: the cache is shared by all API keys,
+while spills and artifacts belong to the key of the run and expire.
+"""
+
+from importlib import metadata
+from typing import List, Dict, Any, Optional
+import ast
+import hashlib
+import json
+import sys
+import structlog
+
+from core.config import settings
+from utils.cache import LRUCache
+
+logger = structlog.get_logger()
+
+# Importing any of these (or a submodule) makes a run impure
+IMPURE_MODULES = {
+    "random", "secrets", "uuid", "time", "datetime", "calendar", "zoneinfo",
+    "os", "sys", "io", "pathlib", "shutil", "tempfile", "glob", "fileinput",
+    "socket", "ssl", "http", "urllib", "requests", "subprocess", "signal",
+    "threading", "multiprocessing", "concurrent", "asyncio", "sqlite3",
+    "pickle", "shelve", "platform", "getpass", "resource", "gc", "tracemalloc"
+}
+# Attribute or imported names reaching randomness or the clock through an
+# allowed module, e.g. numpy.random or pandas.Timestamp.now
+IMPURE_NAMES = {"random", "now", "today", "utcnow", "read_csv", "read_json", "load", "loadtxt", "fromfile"}
+IMPURE_BUILTINS = {"open", "input", "id", "hash", "breakpoint", "exec", "eval", "compile", "__import__"}
+
+def is_pure(code: str) -> bool:
+    """Whether code looks deterministic: False if unsure, including for code that does not parse"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] in IMPURE_MODULES or alias.name.split(".")[-1] in IMPURE_NAMES
+                   for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if (node.module or "").split(".")[0] in IMPURE_MODULES or (node.module or "").split(".")[-1] in IMPURE_NAMES:
+                return False
+            if any(alias.name in IMPURE_NAMES for alias in node.names):
+                return False
+        elif isinstance(node, ast.Attribute):
+            if node.attr in IMPURE_NAMES:
+                return False
+        elif isinstance(node, ast.Name):
+            if node.id in IMPURE_BUILTINS:
+                return False
+    return True
+
+def _package_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+class CodeResultCache:
+    """Results of pure runs by key, shared across requests"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self._cache = LRUCache(
+            settings.CODE_CACHE_SIZE if max_entries is None else max_entries,
+            settings.CODE_CACHE_TTL if ttl is None else ttl
+        )
+        self._environment: Optional[str] = None
+        self.counters = {"impure": 0, "stored": 0, "not_stored": 0}
+
+    def environment(self) -> str:
+        """Interpreter version and whitelisted package versions, as the sandbox runs the same interpreter"""
+        if self._environment is None:
+            versions = {name: _package_version(name) for name in sorted(settings.PYTHON_PACKAGES_WHITELIST)}
+            self._environment = json.dumps([sys.version, versions])
+        return self._environment
+
+    def key(self, code: str, packages: Optional[List[str]] = None, datasets: Optional[List[str]] = None) -> str:
+        data = json.dumps([code, sorted(packages or []), datasets or [], self.environment()])
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def cacheable(self, code: str, pure: Optional[bool] = None) -> bool:
+        """A caller's `pure` flag wins; without one, purity is inferred"""
+        if pure is None:
+            pure = is_pure(code)
+        if not pure:
+            self.counters["impure"] += 1
+        return pure
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self._cache.get(key)
+        return dict(result, cached=True) if result is not None else None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        output = result.get("output") or ""
+        if (not result["success"] or result.get("truncated") or result.get("artifacts")
+                or len(output.encode("utf-8")) > settings.CODE_CACHE_MAX_OUTPUT_BYTES):
+            self.counters["not_stored"] += 1
+            return
+        self._cache.set(key, dict(result))
+        self.counters["stored"] += 1
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), **self.counters, "ttl": self._cache.ttl}
+
+# Shared across requests
+result_cache = CodeResultCache()
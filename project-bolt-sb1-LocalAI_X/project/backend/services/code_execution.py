@@ -0,0 +1,113 @@
+"""
+Code execution shared by the code interpreter API and the code_interpreter tool
+
+Runs go to the warm sandbox pool, or to a session's worker, in process, so
+both callers share the same workers, limits and result cache. Each run
+works in its own scratch directory, whose files become its artifacts.
+"""
+
+from typing import Optional, Dict, Any, List
+import structlog
+
+from services.artifacts import artifact_store
+from services.code_cache import result_cache
+from services.code_sessions import SessionLimitError, session_manager
+from services.sandbox import OutputCallback, sandbox_pool
+
+logger = structlog.get_logger()
+
+def result_usage(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Resource usage of a run, None if it never reached the sandbox"""
+    if "exit_code" not in result:
+        return None
+    return {key: result[key] for key in ("exit_code", "cpu_seconds", "max_rss_kb", "wall_ms")}
+
+def is_code_safe(code: str) -> bool:
+    """Basic code safety checks"""
+    # List of potentially dangerous operations
+    dangerous_patterns = [
+        "import os",
+        "import sys", 
+        "import subprocess",
+        "import socket",
+        "import urllib",
+        "import requests",
+        "open(",
+        "exec(",
+        "eval(",
+        "__import__",
+        "compile(",
+        "globals(",
+        "locals(",
+        "vars(",
+        "dir(",
+        "getattr(",
+        "setattr(",
+        "delattr(",
+        "hasattr("
+    ]
+    
+    code_lower = code.lower()
+    for pattern in dangerous_patterns:
+        if pattern in code_lower:
+            logger.warning("Unsafe code pattern detected", pattern=pattern)
+            return False
+    
+    return True
+
+async def execute_python_code(
+    code: str,
+    timeout: int = 30,
+    packages: Optional[List[str]] = None,
+    session_id: Optional[str] = None,
+    owner: str = "anonymous",
+    on_output: Optional[OutputCallback] = None,
+    cache: bool = False,
+    pure: Optional[bool] = None,
+    datasets: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Execute Python code in a sandboxed environment
+    
+    The code runs in a child forked from a warm worker of the sandbox pool,
+    which has the whitelisted packages already imported, or in the worker
+    of a session. Sessions, spilled output and artifacts belong to `owner`
+    (see `job_owner`).
+    Session runs depend on earlier state and are never cached.
+    """
+    
+    try:
+        if session_id:
+            run_id, scratch = artifact_store.scratch(owner)
+            result = await session_manager.execute(
+                owner, session_id, code, timeout=timeout, on_output=on_output, datasets=datasets, cwd=scratch
+            )
+            result["artifacts"] = artifact_store.collect(run_id, owner)
+            return result
+        
+        key = None
+        if cache and result_cache.cacheable(code, pure):
+            # Dataset ids are never reused, so they stand for the data itself
+            key = result_cache.key(code, packages, sorted(spec["id"] for spec in (datasets or {}).values()))
+            result = result_cache.get(key)
+            if result is not None:
+                if on_output is not None and result["output"]:
+                    await on_output("stdout", result["output"])
+                return result
+        
+        run_id, scratch = artifact_store.scratch(owner)
+        result = await sandbox_pool.execute(
+            code, timeout=timeout, on_output=on_output, cwd=scratch, datasets=datasets, owner=owner
+        )
+        result["artifacts"] = artifact_store.collect(run_id, owner)
+        if key is not None:
+            result_cache.put(key, result)
+        return result
+    
+    except SessionLimitError:
+        raise
+    except Exception as e:
+        logger.error("Code execution subprocess failed", error=str(e))
+        return {
+            "success": False,
+            "error": f"Execution failed: {str(e)}"
+        }
@@ -0,0 +1,256 @@
+"""
+Asynchronous code interpreter jobs
+
+A submitted job waits in a bounded queue until one of a fixed number of
+job workers (CODE_JOB_WORKERS, by default one per CPU core, and never
+more than SANDBOX_POOL_SIZE) picks it up and runs it on the sandbox pool
+or in its session; more workers than warm sandboxes would only start
+job clocks while they wait for one. Every API key has its own queue and
+the workers take from them in turn, so one client submitting many jobs
+delays its own jobs rather than everyone else's.
+Finished jobs are kept for CODE_JOB_RESULT_TTL_SECONDS to be polled.
+"""
+
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Deque
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+import structlog
+
+from core.config import settings
+from services.code_execution import execute_python_code
+
+logger = structlog.get_logger()
+
+FINAL_STATES = ("succeeded", "failed", "cancelled")
+# Totals per API key
+EMPTY_USAGE = {"jobs": 0, "cpu_seconds": 0.0, "wall_ms": 0.0, "max_rss_kb": 0}
+
+class JobNotFoundError(LookupError):
+    """Raised for a job id that is unknown, expired or owned by another key"""
+
+class JobQueueFullError(RuntimeError):
+    """Raised when CODE_JOB_QUEUE_SIZE jobs are already waiting"""
+
+def job_owner(token: Optional[str]) -> str:
+    """Scheduling and visibility key of an API key, without keeping the key itself"""
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+class CodeJob:
+    def __init__(
+        self,
+        owner: str,
+        code: str,
+        timeout: float,
+        session_id: Optional[str] = None,
+        datasets: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.code = code
+        self.timeout = timeout
+        self.session_id = session_id
+        self.datasets = datasets
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def finish(self, status: str, result: Optional[Dict[str, Any]] = None):
+        self.status = status
+        self.result = result
+        self.finished = time.time()
+        self.done.set()
+
+    def describe(self) -> Dict[str, Any]:
+        description = {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "queue_ms": round(((self.started or time.time()) - self.submitted) * 1000, 2),
+            "session_id": self.session_id
+        }
+        if self.result is not None:
+            description["result"] = self.result
+        return description
+
+class CodeJobQueue:
+    """Jobs by id and the per-key queues they wait in, shared across requests"""
+
+    def __init__(self, workers: Optional[int] = None, max_queued: Optional[int] = None):
+        self.workers = workers or settings.CODE_JOB_WORKERS or os.cpu_count() or 1
+        if settings.SANDBOX_POOL_SIZE > 0:
+            self.workers = min(self.workers, settings.SANDBOX_POOL_SIZE)
+        self.max_queued = max_queued if max_queued is not None else settings.CODE_JOB_QUEUE_SIZE
+        self._jobs: "OrderedDict[str, CodeJob]" = OrderedDict()
+        self._queues: Dict[str, Deque[CodeJob]] = {}
+        # Owners with waiting jobs, in the order they are served
+        self._turns: Deque[str] = deque()
+        self._queued = 0
+        self._wakeup: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        self.usage: Dict[str, Dict[str, float]] = {}
+        self.counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def _start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info("Started code job workers", workers=self.workers)
+
+    def submit(
+        self,
+        owner: str,
+        code: str,
+        timeout: float,
+        session_id: Optional[str] = None,
+        datasets: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> CodeJob:
+        self._start()
+        self._expire()
+        if self._queued >= self.max_queued:
+            self.counters["rejected"] += 1
+            raise JobQueueFullError(f"{self._queued} code jobs are already waiting, try again later")
+
+        job = CodeJob(owner, code, timeout, session_id, datasets)
+        self._jobs[job.id] = job
+        if owner not in self._queues:
+            self._queues[owner] = deque()
+            self._turns.append(owner)
+        self._queues[owner].append(job)
+        self._queued += 1
+        self.counters["submitted"] += 1
+        self._wakeup.release()
+        return job
+
+    def _next(self) -> Optional[CodeJob]:
+        """Oldest job of the owner whose turn it is"""
+        if not self._turns:
+            return None
+        owner = self._turns.popleft()
+        queue = self._queues[owner]
+        job = queue.popleft()
+        if queue:
+            self._turns.append(owner)
+        else:
+            del self._queues[owner]
+        self._queued -= 1
+        return job
+
+    async def _work(self):
+        while True:
+            await self._wakeup.acquire()
+            job = self._next()
+            if job is None:
+                # Its job was cancelled while waiting
+                continue
+            job.status = "running"
+            job.started = time.time()
+            job.task = asyncio.create_task(self._run(job))
+            # asyncio.wait does not raise when the job task is cancelled
+            await asyncio.wait({job.task})
+            if job.task.cancelled():
+                job.finish("cancelled")
+            self.counters[job.status] += 1
+            job.task = None
+
+    async def _run(self, job: CodeJob):
+        try:
+            result = await execute_python_code(
+                job.code, timeout=job.timeout, session_id=job.session_id, owner=job.owner,
+                datasets=job.datasets
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Code job failed", job_id=job.id, error=str(e))
+            job.finish("failed", {"success": False, "error": f"Execution failed: {str(e)}"})
+            return
+
+        usage = self.usage.setdefault(job.owner, dict(EMPTY_USAGE))
+        usage["jobs"] += 1
+        usage["cpu_seconds"] += result.get("cpu_seconds", 0.0)
+        usage["wall_ms"] += result.get("wall_ms", 0.0)
+        usage["max_rss_kb"] = max(usage["max_rss_kb"], result.get("max_rss_kb", 0))
+        job.finish("succeeded" if result["success"] else "failed", result)
+
+    def get(self, job_id: str, owner: str) -> CodeJob:
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            raise JobNotFoundError(f"Code job {job_id} not found")
+        return job
+
+    async def wait(self, job_id: str, owner: str, timeout: float) -> CodeJob:
+        """The job once it has finished, or as it is after `timeout` seconds"""
+        job = self.get(job_id, owner)
+        if timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def cancel(self, job_id: str, owner: str) -> CodeJob:
+        """Drop a waiting job or stop a running one; finished jobs are left as they are"""
+        job = self.get(job_id, owner)
+        if job.status == "queued":
+            queue = self._queues[job.owner]
+            queue.remove(job)
+            if not queue:
+                del self._queues[job.owner]
+                self._turns.remove(job.owner)
+            self._queued -= 1
+            self.counters["cancelled"] += 1
+            job.finish("cancelled")
+        elif job.status == "running" and job.task is not None:
+            # The worker marks it cancelled; its sandbox worker is replaced
+            job.task.cancel()
+        return job
+
+    def list(self, owner: str) -> List[Dict[str, Any]]:
+        return [
+            {key: value for key, value in job.describe().items() if key != "result"}
+            for job in self._jobs.values() if job.owner == owner
+        ]
+
+    def _expire(self):
+        cutoff = time.time() - settings.CODE_JOB_RESULT_TTL_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job.status in FINAL_STATES and job.finished < cutoff:
+                del self._jobs[job_id]
+
+    def stats(self, owner: Optional[str] = None) -> Dict[str, Any]:
+        stats = {
+            "workers": self.workers,
+            "queued": self._queued,
+            "max_queued": self.max_queued,
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            **self.counters
+        }
+        if owner is not None:
+            usage = self.usage.get(owner, EMPTY_USAGE)
+            stats["usage"] = {key: round(value, 4) for key, value in usage.items()}
+        return stats
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for job in list(self._jobs.values()):
+            if job.task is not None:
+                job.task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+# Shared across requests, closed in the application lifespan
+job_queue = CodeJobQueue()
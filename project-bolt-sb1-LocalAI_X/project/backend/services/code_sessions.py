@@ -0,0 +1,198 @@
+"""
+Stateful code interpreter sessions
+
+A session owns one sandbox worker detached from the warm pool. Its code
+runs in a namespace that persists between calls, so loaded data and
+definitions survive from one step of an analysis to the next. Sessions
+are closed after SANDBOX_SESSION_IDLE_SECONDS without use, and the least
+recently used idle session makes room when SANDBOX_MAX_SESSIONS are live.
+Sessions belong to the API key that started them (see `job_owner`): the
+same session id under another key is a different session.
+"""
+
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import time
+import structlog
+
+from core.config import settings
+from services.sandbox import OutputCallback, SandboxError, SandboxWorker, sandbox_pool
+
+logger = structlog.get_logger()
+
+class SessionNotFoundError(LookupError):
+    """Raised for a session id that is not live or owned by another key"""
+
+class SessionLimitError(RuntimeError):
+    """Raised when every session slot is taken by a running session"""
+
+class CodeSession:
+    def __init__(self, owner: str, session_id: str, worker: SandboxWorker):
+        self.owner = owner
+        self.id = session_id
+        self.worker = worker
+        self.created = time.time()
+        self.last_used = time.monotonic()
+        self.executions = 0
+        # Wall time of the runs that built the current namespace, which a
+        # stateless client would have to replay
+        self.state_ms = 0.0
+        self.lock = asyncio.Lock()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "created": self.created,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            "executions": self.executions,
+            "busy": self.lock.locked(),
+            "alive": self.worker.alive
+        }
+
+class CodeSessionManager:
+    """Live sessions by owner and id, shared across requests"""
+
+    def __init__(self):
+        self._sessions: "OrderedDict[Tuple[str, str], CodeSession]" = OrderedDict()
+        self._lock: Optional[asyncio.Lock] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self.counters = {
+            "created": 0, "closed": 0, "expired": 0, "evicted": 0,
+            "executions": 0, "reused": 0, "time_saved_ms": 0.0
+        }
+
+    def _manager_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _acquire(self, owner: str, session_id: str) -> CodeSession:
+        """Live session of an owner for an id, started on first use"""
+        key = (owner, session_id)
+        async with self._manager_lock():
+            session = self._sessions.get(key)
+            if session is not None and session.worker.alive:
+                self._sessions.move_to_end(key)
+                return session
+            if session is not None:
+                await self._drop(key)
+
+            if len(self._sessions) >= settings.SANDBOX_MAX_SESSIONS:
+                idle = next((s for s in self._sessions.values() if not s.lock.locked()), None)
+                if idle is None:
+                    raise SessionLimitError(f"All {settings.SANDBOX_MAX_SESSIONS} code sessions are busy")
+                await self._drop((idle.owner, idle.id))
+                self.counters["evicted"] += 1
+                logger.info("Evicted code session", session_id=idle.id)
+
+            worker = await sandbox_pool.detach()
+            try:
+                await worker.enter_session(settings.SANDBOX_SESSION_MEMORY_MB)
+            except Exception:
+                await worker.close()
+                raise
+            session = CodeSession(owner, session_id, worker)
+            self._sessions[key] = session
+            self.counters["created"] += 1
+            if self._reaper is None or self._reaper.done():
+                self._reaper = asyncio.create_task(self._reap())
+            logger.info("Started code session", session_id=session_id)
+            return session
+
+    async def _drop(self, key: Tuple[str, str]):
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            await session.worker.close()
+
+    async def execute(
+        self,
+        owner: str,
+        session_id: str,
+        code: str,
+        timeout: float,
+        on_output: Optional[OutputCallback] = None,
+        datasets: Optional[Dict[str, Dict[str, Any]]] = None,
+        cwd: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run code in a session's namespace, starting the session if needed"""
+        session = await self._acquire(owner, session_id)
+        async with session.lock:
+            reused = session.executions > 0
+            try:
+                result = await session.worker.run(
+                    code, timeout, on_output=on_output, cwd=cwd, datasets=datasets, owner=owner
+                )
+            except Exception as e:
+                async with self._manager_lock():
+                    if self._sessions.get((owner, session_id)) is session:
+                        await self._drop((owner, session_id))
+                raise SandboxError(f"Code session {session_id} was terminated: {str(e) or type(e).__name__}")
+            finally:
+                session.last_used = time.monotonic()
+
+            self.counters["executions"] += 1
+            if reused:
+                self.counters["reused"] += 1
+                self.counters["time_saved_ms"] += session.state_ms + session.worker.startup_ms
+            session.executions += 1
+            if result["success"]:
+                session.state_ms += result["wall_ms"]
+
+        result["session"] = {"session_id": session_id, "executions": session.executions, "reused": reused}
+        return result
+
+    async def reset(self, owner: str, session_id: str):
+        """Empty a session's namespace, keeping its process"""
+        session = self._sessions.get((owner, session_id))
+        if session is None:
+            raise SessionNotFoundError(f"Code session {session_id} not found")
+        async with session.lock:
+            await session.worker.reset()
+            session.state_ms = 0.0
+            session.last_used = time.monotonic()
+
+    async def close_session(self, owner: str, session_id: str):
+        async with self._manager_lock():
+            if (owner, session_id) not in self._sessions:
+                raise SessionNotFoundError(f"Code session {session_id} not found")
+            await self._drop((owner, session_id))
+            self.counters["closed"] += 1
+
+    async def _reap(self):
+        """Close sessions that stayed idle too long, until none are left"""
+        interval = max(1.0, min(settings.SANDBOX_SESSION_IDLE_SECONDS / 4, 30.0))
+        while self._sessions:
+            await asyncio.sleep(interval)
+            cutoff = time.monotonic() - settings.SANDBOX_SESSION_IDLE_SECONDS
+            async with self._manager_lock():
+                for session in list(self._sessions.values()):
+                    if session.last_used < cutoff and not session.lock.locked():
+                        await self._drop((session.owner, session.id))
+                        self.counters["expired"] += 1
+                        logger.info("Expired idle code session", session_id=session.id)
+
+    def list(self, owner: str) -> List[Dict[str, Any]]:
+        return [session.describe() for session in self._sessions.values() if session.owner == owner]
+
+    def stats(self, owner: Optional[str] = None) -> Dict[str, Any]:
+        executions = self.counters["executions"]
+        stats = {
+            "live": len(self._sessions),
+            "max_sessions": settings.SANDBOX_MAX_SESSIONS,
+            **{key: value for key, value in self.counters.items() if key != "time_saved_ms"},
+            "reuse_rate": round(self.counters["reused"] / executions, 3) if executions else 0.0,
+            "time_saved_ms": round(self.counters["time_saved_ms"], 2)
+        }
+        if owner is not None:
+            stats["owned"] = sum(1 for session in self._sessions.values() if session.owner == owner)
+        return stats
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for key in list(self._sessions):
+            await self._drop(key)
+
+# Shared across requests, closed in the application lifespan
+session_manager = CodeSessionManager()
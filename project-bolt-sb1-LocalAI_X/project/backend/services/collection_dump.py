@@ -0,0 +1,287 @@
+"""
+Streaming export and bulk import of vector collections
+
+A dump is a byte stream of frames, so neither side ever holds more than one
+batch of points::
+
+    LAIDUMP1\\n
+    {header}\\n                      collection spec and vector layout
+    {"count": n, "vectors_bytes": v, "payload_bytes": p}\\n
+    <v bytes>                       float32 little-endian, n rows; named
+                                    vectors are concatenated in header order
+    <p bytes>                       n NDJSON lines {"id": ..., "payload": ...}
+    ... more batch frames ...
+    {"count": 0, "end": true, "points": total, ...}\\n
+
+Vectors are kept as they are stored, so importing a dump makes no embedding
+calls.
+"""
+
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import json
+import time
+import numpy as np
+import structlog
+
+from core.config import settings
+from services.collection_registry import CollectionNotFoundError, collection_registry
+from services.vector_store import VectorStoreService
+
+logger = structlog.get_logger()
+
+MAGIC = b"LAIDUMP1\n"
+FORMAT_VERSION = 1
+MAX_FRAME_POINTS = 65536  # refuses frames that would not fit the bounded-memory promise
+MAX_LINE_BYTES = 1 << 20
+
+class DumpFormatError(ValueError):
+    """Raised when an import stream is not a valid dump"""
+
+def _throughput(points: int, size: int, seconds: float) -> Dict[str, Any]:
+    return {
+        "points": points,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "points_per_second": round(points / seconds, 1) if seconds > 0 else None,
+        "mb_per_second": round(size / seconds / 1e6, 2) if seconds > 0 else None
+    }
+
+def _layout(spec: Dict[str, Any]) -> List[Tuple[Optional[str], int]]:
+    """(vector name, size) of each vector in a row, None for unnamed vectors"""
+    if spec.get("vectors"):
+        return [(name, config["size"]) for name, config in spec["vectors"].items()]
+    return [(None, spec["vector_size"])]
+
+class _StreamReader:
+    """Line and exact-size reads over an async iterator of byte chunks"""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks.__aiter__()
+        self.buffer = bytearray()
+        self.consumed = 0
+
+    async def _fill(self) -> bool:
+        try:
+            chunk = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            return False
+        self.buffer.extend(chunk)
+        return True
+
+    async def readexactly(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            if not await self._fill():
+                raise DumpFormatError("Dump ended in the middle of a batch")
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.consumed += size
+        return data
+
+    async def readline(self) -> bytes:
+        start = 0
+        while True:
+            end = self.buffer.find(b"\n", start)
+            if end >= 0:
+                return await self.readexactly(end + 1)
+            if len(self.buffer) > MAX_LINE_BYTES:
+                raise DumpFormatError("Dump header line is too long")
+            start = len(self.buffer)
+            if not await self._fill():
+                raise DumpFormatError("Dump ended before its end frame")
+
+class CollectionDumpService:
+    """Exports collections to dumps and loads dumps back"""
+
+    def __init__(self, vector_service: Optional[VectorStoreService] = None):
+        self.vector_service = vector_service or VectorStoreService()
+        self.backend = self.vector_service.backend
+
+    async def export(self, name: str, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Dump of a collection, one frame per scrolled page"""
+        spec = await collection_registry.lookup(self.backend, name)
+        batch_size = batch_size or settings.DUMP_BATCH_SIZE
+        layout = _layout(spec)
+        header = {
+            "format": FORMAT_VERSION,
+            "collection": name,
+            "spec": {key: spec.get(key) for key in (
+                "namespace", "model", "vector_size", "distance", "quantization", "vectors", "config"
+            )},
+            "layout": [{"name": vector_name, "size": size} for vector_name, size in layout],
+            "dtype": "<f4"
+        }
+
+        start = time.perf_counter()
+        points = 0
+        size = len(MAGIC)
+        yield MAGIC
+        line = (json.dumps(header) + "\n").encode()
+        size += len(line)
+        yield line
+
+        offset = None
+        while True:
+            records, offset = await self.backend.scroll(
+                name, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+            )
+            if records:
+                frame = self._encode_batch(records, layout)
+                size += sum(len(part) for part in frame)
+                points += len(records)
+                for part in frame:
+                    yield part
+            if offset is None:
+                break
+
+        stats = _throughput(points, size, time.perf_counter() - start)
+        logger.info("Exported collection", collection=name, **stats)
+        yield (json.dumps({"count": 0, "end": True, **stats}) + "\n").encode()
+
+    @staticmethod
+    def _encode_batch(records: List[Dict[str, Any]], layout: List[Tuple[Optional[str], int]]) -> List[bytes]:
+        blocks = []
+        for vector_name, vector_size in layout:
+            vectors = [
+                record["vector"][vector_name] if vector_name is not None else record["vector"]
+                for record in records
+            ]
+            block = np.asarray(vectors, dtype="<f4")
+            if block.shape != (len(records), vector_size):
+                raise ValueError(f"Stored vectors do not match the collection's {vector_size} dimensions")
+            blocks.append(block)
+        vectors_bytes = np.concatenate(blocks, axis=1).tobytes() if len(blocks) > 1 else blocks[0].tobytes()
+        payloads = b"".join(
+            (json.dumps({"id": record["id"], "payload": record["payload"]}) + "\n").encode()
+            for record in records
+        )
+        frame = {"count": len(records), "vectors_bytes": len(vectors_bytes), "payload_bytes": len(payloads)}
+        return [(json.dumps(frame) + "\n").encode(), vectors_bytes, payloads]
+
+    async def import_dump(self, name: str, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Load a dump into `name`, creating the collection from the dump's spec if needed
+
+        An existing collection must have the same vector layout; points with
+        the same IDs are overwritten. A collection created by a failed import
+        is dropped again. Returns throughput statistics.
+        """
+        start = time.perf_counter()
+        reader = _StreamReader(chunks)
+        try:
+            magic = await reader.readexactly(len(MAGIC))
+        except DumpFormatError:
+            magic = None
+        if magic != MAGIC:
+            raise DumpFormatError("Not a collection dump")
+        try:
+            header = json.loads(await reader.readline())
+        except json.JSONDecodeError:
+            raise DumpFormatError("Dump header is not valid JSON")
+        if header.get("format") != FORMAT_VERSION:
+            raise DumpFormatError(f"Unsupported dump format: {header.get('format')}")
+
+        layout = [(item["name"], item["size"]) for item in header["layout"]]
+        created = await self._prepare_target(name, header.get("collection"), header["spec"], layout)
+        try:
+            points, batches = await self._load(name, reader, layout)
+        except Exception:
+            if created:
+                await self.vector_service.delete_collection(name)
+            raise
+
+        # Cached results, content hashes and the lexical index predate the import
+        VectorStoreService._reset_collection_state(name)
+
+        stats = {
+            "collection": name,
+            "batches": batches,
+            **_throughput(points, reader.consumed, time.perf_counter() - start)
+        }
+        logger.info("Imported collection", **stats)
+        return stats
+
+    async def _load(
+        self,
+        name: str,
+        reader: _StreamReader,
+        layout: List[Tuple[Optional[str], int]]
+    ) -> Tuple[int, int]:
+        """Upsert the batch frames of a dump, returns (points, batches)"""
+        points = 0
+        batches = 0
+        row_bytes = 4 * sum(size for _, size in layout)
+        while True:
+            try:
+                frame = json.loads(await reader.readline())
+            except json.JSONDecodeError:
+                raise DumpFormatError("Dump batch header is not valid JSON")
+            if frame.get("end"):
+                break
+            count = frame.get("count")
+            if (
+                not isinstance(count, int) or not 0 < count <= MAX_FRAME_POINTS
+                or frame.get("vectors_bytes") != count * row_bytes
+                or not isinstance(frame.get("payload_bytes"), int)
+            ):
+                raise DumpFormatError(f"Dump batch {batches + 1} has an invalid size")
+
+            block = np.frombuffer(await reader.readexactly(frame["vectors_bytes"]), dtype="<f4")
+            block = block.reshape(count, row_bytes // 4)
+            lines = (await reader.readexactly(frame["payload_bytes"])).splitlines()
+            if len(lines) != count:
+                raise DumpFormatError(f"Dump batch {batches + 1} has {len(lines)} payloads for {count} vectors")
+
+            await self.backend.upsert(name, self._decode_batch(block, lines, layout))
+            points += count
+            batches += 1
+        return points, batches
+
+    @staticmethod
+    def _decode_batch(
+        block: np.ndarray,
+        lines: List[bytes],
+        layout: List[Tuple[Optional[str], int]]
+    ) -> List[Dict[str, Any]]:
+        columns = []
+        start = 0
+        for vector_name, size in layout:
+            columns.append((vector_name, block[:, start:start + size]))
+            start += size
+
+        points = []
+        for row, line in enumerate(lines):
+            record = json.loads(line)
+            if layout[0][0] is None:
+                vector = columns[0][1][row].tolist()
+            else:
+                vector = {vector_name: values[row].tolist() for vector_name, values in columns}
+            points.append({"id": record["id"], "vector": vector, "payload": record.get("payload") or {}})
+        return points
+
+    async def _prepare_target(
+        self,
+        name: str,
+        source_name: Optional[str],
+        source: Dict[str, Any],
+        layout: List[Tuple[Optional[str], int]]
+    ) -> bool:
+        """Create the target collection like the source or check that it matches, True if created"""
+        try:
+            spec = await collection_registry.lookup(self.backend, name)
+        except CollectionNotFoundError:
+            await self.vector_service.create_collection(
+                name,
+                vector_size=source.get("vector_size"),
+                distance=source.get("distance") or "cosine",
+                quantization=source.get("quantization"),
+                vectors=source.get("vectors"),
+                model=source.get("model"),
+                namespace=source.get("namespace") if name == source_name else name,
+                config=source.get("config")
+            )
+            return True
+
+        if _layout(spec) != layout:
+            raise ValueError(
+                f"Collection {name} has vectors {_layout(spec)}, the dump has {layout}"
+            )
+        return False
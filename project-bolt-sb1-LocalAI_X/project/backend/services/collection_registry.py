@@ -0,0 +1,217 @@
+"""
+Registry of vector collections and the embedding models that fill them
+"""
+
+from typing import List, Dict, Any, Optional
+import asyncio
+import re
+import structlog
+
+from core.config import settings
+from core.database import SessionLocal, VectorCollection
+from services.ollama_client import OllamaService
+from services.vector_backend import VectorBackend
+
+logger = structlog.get_logger()
+
+class CollectionNotFoundError(LookupError):
+    """Raised when a request names a collection that does not exist"""
+
+def embedding_size(spec: Dict[str, Any]) -> Optional[int]:
+    """Size of the embeddings a single-vector collection takes, before any reduction"""
+    # Reduced collections store fewer dimensions than the model produces
+    reduction = (spec.get("config") or {}).get("reduction") or {}
+    return reduction.get("source_size") or spec.get("vector_size")
+
+def model_slug(model: str) -> str:
+    """Collection-name-safe form of a model name, e.g. all-minilm:l6-v2 -> all-minilm-l6-v2"""
+    return re.sub(r"[^A-Za-z0-9_.\-]+", "-", model).strip("-").lower()
+
+class CollectionRegistry:
+    """In-memory view of the vector collections, persisted in ``vector_collections``
+
+    Loaded once at startup so request paths resolve and validate collection
+    names without a round trip to the vector backend. Each collection holds
+    vectors of one embedding model (or several named vectors) and belongs to
+    a namespace; ``resolve`` maps (namespace, model) to its collection name.
+
+    Collection specs are dicts with name, namespace, model, vector_size,
+    distance, quantization, vectors and config.
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, Any]] = {}
+        self._dimensions: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._dimension_lock = asyncio.Lock()
+        self.loaded = False
+
+    # -- persistence -----------------------------------------------------
+
+    @staticmethod
+    def _spec(row: VectorCollection) -> Dict[str, Any]:
+        return {
+            "name": row.name,
+            "namespace": row.namespace,
+            "model": row.model,
+            "vector_size": row.vector_size,
+            "distance": row.distance,
+            "quantization": row.quantization,
+            "vectors": row.vectors,
+            "config": row.config or {}
+        }
+
+    @classmethod
+    def _read_all(cls) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return [cls._spec(row) for row in db.query(VectorCollection).all()]
+        finally:
+            db.close()
+
+    @staticmethod
+    def _write(spec: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            row = db.query(VectorCollection).filter(VectorCollection.name == spec["name"]).first()
+            if row is None:
+                row = VectorCollection(name=spec["name"])
+                db.add(row)
+            for key in ("namespace", "model", "vector_size", "distance", "quantization", "vectors", "config"):
+                setattr(row, key, spec.get(key))
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _delete(names: List[str]):
+        db = SessionLocal()
+        try:
+            db.query(VectorCollection).filter(VectorCollection.name.in_(names)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    # -- loading ---------------------------------------------------------
+
+    async def load(self, backend: VectorBackend):
+        """Read the registry and reconcile it with the backend's collections"""
+        specs = await asyncio.to_thread(self._read_all)
+        existing = set(await backend.list_collections())
+
+        self._collections = {}
+        stale = []
+        for spec in specs:
+            if spec["name"] in existing:
+                self._remember(spec)
+            else:
+                stale.append(spec["name"])
+        if stale:
+            await asyncio.to_thread(self._delete, stale)
+
+        # Collections created outside the registry (or before it existed)
+        for name in sorted(existing - set(self._collections)):
+            await self.adopt(backend, name)
+
+        self.loaded = True
+        logger.info("Loaded collection registry", collections=len(self._collections), dropped=len(stale))
+
+    async def adopt(self, backend: VectorBackend, name: str) -> Dict[str, Any]:
+        """Register an existing backend collection from its configuration"""
+        info = await backend.collection_info(name)
+        config = info["config"]
+        spec = {
+            "name": name,
+            "namespace": name,
+            "model": settings.EMBEDDING_MODEL if name == settings.VECTOR_COLLECTION_NAME else None,
+            "vector_size": config.get("vector_size"),
+            "distance": config.get("distance") or "cosine",
+            "quantization": config.get("quantization"),
+            "vectors": {
+                vector_name: {"model": None, **params}
+                for vector_name, params in config["vectors"].items()
+            } if config.get("vectors") else None,
+            "config": {}
+        }
+        await self.register(spec)
+        return spec
+
+    def _remember(self, spec: Dict[str, Any]):
+        # Model dimensions are not taken from collections: an adopted or
+        # older collection may have been filled by a different model
+        self._collections[spec["name"]] = spec
+
+    # -- lookups ---------------------------------------------------------
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._collections.get(name)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return sorted(self._collections.values(), key=lambda spec: spec["name"])
+
+    async def lookup(self, backend: VectorBackend, name: str) -> Dict[str, Any]:
+        """Spec of a collection, raises CollectionNotFoundError
+
+        Only a miss reaches the backend, in case another process created
+        the collection after this one loaded the registry.
+        """
+        spec = self._collections.get(name)
+        if spec is not None:
+            return spec
+        if name in await backend.list_collections():
+            return await self.adopt(backend, name)
+        raise CollectionNotFoundError(f"Collection {name} not found")
+
+    def resolve(self, namespace: Optional[str] = None, model: Optional[str] = None) -> str:
+        """Collection name for a namespace and embedding model
+
+        The default model lives in the collection named after the namespace,
+        as does any model of a multi-vector collection; other models get
+        ``<namespace>__<model>``.
+        """
+        namespace = namespace or settings.VECTOR_COLLECTION_NAME
+        spec = self._collections.get(namespace)
+        if model is None or model == settings.EMBEDDING_MODEL:
+            return namespace
+        if spec is not None:
+            if spec.get("model") in (None, model) and not spec.get("vectors"):
+                return namespace
+            if any(config.get("model") == model for config in (spec.get("vectors") or {}).values()):
+                return namespace
+        return f"{namespace}__{model_slug(model)}"
+
+    def lock(self, name: str) -> asyncio.Lock:
+        """Serializes creation of a collection"""
+        return self._locks.setdefault(name, asyncio.Lock())
+
+    # -- embedding dimensions --------------------------------------------
+
+    def record_dimension(self, model: str, size: int):
+        """Size of an embedding the model actually returned"""
+        self._dimensions[model] = size
+
+    async def dimension(self, model: str) -> int:
+        """Embedding size of a model, detected with a probe embedding on first use"""
+        if model in self._dimensions:
+            return self._dimensions[model]
+        async with self._dimension_lock:
+            if model not in self._dimensions:
+                embedding = await OllamaService().generate_embedding("dimension probe", model)
+                if not embedding:
+                    raise ValueError(f"Model {model} returned an empty embedding")
+                self._dimensions[model] = len(embedding)
+                logger.info("Detected embedding dimension", model=model, dimension=len(embedding))
+        return self._dimensions[model]
+
+    # -- changes ---------------------------------------------------------
+
+    async def register(self, spec: Dict[str, Any]):
+        await asyncio.to_thread(self._write, spec)
+        self._remember(spec)
+
+    async def forget(self, name: str):
+        await asyncio.to_thread(self._delete, [name])
+        self._collections.pop(name, None)
+
+# Shared across VectorStoreService instances (one is created per request)
+collection_registry = CollectionRegistry()
@@ -0,0 +1,230 @@
+"""
+Dataset attachments for code interpreter runs
+
+A dataset is uploaded once and kept under DATASET_DIR, by default on the
+/dev/shm tmpfs so it stays in memory. Runs that attach it get read-only
+memory maps of the stored files, so every run shares the same pages
+instead of receiving the data inside its code and parsing it again. A CSV
+is parsed once at upload into a NumPy array stored as .npy next to the
+raw file, and runs open it with ``np.load(mmap_mode="r")``.
+
+Each API key may keep DATASET_QUOTA_BYTES of datasets, and a dataset
+expires DATASET_TTL_SECONDS after upload unless a shorter TTL is given.
+Metadata lives in a JSON file beside the data, so datasets outlive a
+restart until they expire.
+"""
+
+from typing import List, Dict, Any, Optional, BinaryIO
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+import numpy as np
+import structlog
+
+from core.config import settings
+
+logger = structlog.get_logger()
+
+CHUNK_SIZE = 1024 * 1024
+FORMATS = {".csv": "csv", ".json": "json", ".npy": "npy", ".txt": "text"}
+META_SUFFIX = ".meta.json"
+
+class DatasetNotFoundError(LookupError):
+    """Raised for a dataset id that is unknown, expired or owned by another key"""
+
+class DatasetQuotaError(RuntimeError):
+    """Raised when an upload is larger than DATASET_MAX_BYTES or the owner's quota"""
+
+def _csv_to_npy(raw_path: str, array_path: str) -> Dict[str, Any]:
+    """Parse a CSV with a header row into a (structured) array saved as .npy"""
+    array = np.genfromtxt(raw_path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+    np.save(array_path, array)
+    return {"shape": list(array.shape), "columns": list(array.dtype.names or [])}
+
+def _describe_npy(path: str) -> Dict[str, Any]:
+    array = np.load(path, mmap_mode="r")
+    return {"shape": list(array.shape), "dtype": str(array.dtype)}
+
+class DatasetStore:
+    """Uploaded datasets by id, shared across requests"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.DATASET_DIR
+        self._datasets: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Metadata of stored datasets, read from disk on first use"""
+        if self._datasets is None:
+            os.makedirs(self.directory, exist_ok=True)
+            datasets = {}
+            for entry in os.listdir(self.directory):
+                if entry.endswith(META_SUFFIX):
+                    try:
+                        with open(self._path(entry)) as meta:
+                            dataset = json.load(meta)
+                        datasets[dataset["id"]] = dataset
+                    except (OSError, ValueError, KeyError):
+                        continue
+            self._datasets = datasets
+        return self._datasets
+
+    def _current(self) -> Dict[str, Dict[str, Any]]:
+        """Stored datasets that have not expired"""
+        datasets = self._load()
+        self._expire()
+        return datasets
+
+    def _remove_files(self, dataset_id: str):
+        for entry in os.listdir(self.directory):
+            if entry.startswith(dataset_id):
+                try:
+                    os.unlink(self._path(entry))
+                except OSError:
+                    pass
+
+    def _expire(self):
+        now = time.time()
+        for dataset_id, dataset in list(self._datasets.items()):
+            if dataset["expires"] <= now:
+                del self._datasets[dataset_id]
+                self._remove_files(dataset_id)
+                logger.info("Expired dataset", dataset_id=dataset_id)
+
+    def used_bytes(self, owner: str) -> int:
+        return sum(d["bytes"] for d in self._current().values() if d["owner"] == owner)
+
+    def _write(self, source: BinaryIO, path: str, limit: int) -> int:
+        size = 0
+        with open(path, "wb") as target:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    return size
+                size += len(chunk)
+                if size > limit:
+                    raise DatasetQuotaError(f"Dataset is larger than {limit} bytes")
+                target.write(chunk)
+
+    def _store(self, owner: str, name: str, filename: str, source: BinaryIO, ttl: Optional[int]) -> Dict[str, Any]:
+        with self._lock:
+            datasets = self._current()
+            room = settings.DATASET_QUOTA_BYTES - self.used_bytes(owner)
+            if room <= 0:
+                raise DatasetQuotaError(f"The dataset quota of {settings.DATASET_QUOTA_BYTES} bytes is used up")
+            limit = min(settings.DATASET_MAX_BYTES, room)
+
+            dataset_id = uuid.uuid4().hex
+            extension = os.path.splitext(filename)[1].lower()
+            data_format = FORMATS.get(extension, "binary")
+            raw_path = self._path(f"{dataset_id}{extension if extension in FORMATS else '.bin'}")
+            try:
+                size = self._write(source, raw_path, limit)
+                details = {}
+                array_path = None
+                if data_format == "npy":
+                    details = _describe_npy(raw_path)
+                    array_path = raw_path
+                elif data_format == "csv":
+                    array_path = self._path(f"{dataset_id}.npy")
+                    try:
+                        details = _csv_to_npy(raw_path, array_path)
+                        size += os.path.getsize(array_path)
+                    except Exception as e:
+                        # Still attachable as raw text
+                        logger.warning("CSV dataset is not tabular", dataset_id=dataset_id, error=str(e))
+                        array_path = None
+                if size > limit:
+                    raise DatasetQuotaError(f"Dataset with its parsed array is larger than {limit} bytes")
+            except Exception:
+                self._remove_files(dataset_id)
+                raise
+
+            for path in (raw_path, array_path):
+                if path:
+                    os.chmod(path, 0o444)
+            now = time.time()
+            ttl = min(ttl or settings.DATASET_TTL_SECONDS, settings.DATASET_TTL_SECONDS)
+            dataset = {
+                "id": dataset_id,
+                "name": name,
+                "owner": owner,
+                "filename": filename,
+                "format": data_format,
+                "bytes": size,
+                "path": raw_path,
+                "array_path": array_path,
+                "created": now,
+                "expires": now + ttl,
+                **details
+            }
+            with open(self._path(f"{dataset_id}{META_SUFFIX}"), "w") as meta:
+                json.dump(dataset, meta)
+            datasets[dataset_id] = dataset
+            return dataset
+
+    async def create(
+        self,
+        owner: str,
+        name: str,
+        filename: str,
+        source: BinaryIO,
+        ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store an upload read from a file object, parsing CSV into an array"""
+        dataset = await asyncio.to_thread(self._store, owner, name, filename, source, ttl)
+        logger.info("Stored dataset", dataset_id=dataset["id"], bytes=dataset["bytes"], format=dataset["format"])
+        return self.describe(dataset)
+
+    def get(self, dataset_id: str, owner: str) -> Dict[str, Any]:
+        with self._lock:
+            dataset = self._current().get(dataset_id)
+        if dataset is None or dataset["owner"] != owner:
+            raise DatasetNotFoundError(f"Dataset {dataset_id} not found")
+        return dataset
+
+    def attach(self, dataset_ids: List[str], owner: str) -> Dict[str, Dict[str, Any]]:
+        """What a run needs to map the datasets, by the name they get in its namespace"""
+        attached = {}
+        for dataset_id in dataset_ids:
+            dataset = self.get(dataset_id, owner)
+            if dataset["name"] in attached:
+                raise ValueError(f"Two attached datasets are named {dataset['name']}")
+            attached[dataset["name"]] = {
+                "id": dataset["id"],
+                "format": dataset["format"],
+                "path": dataset["path"],
+                "array": dataset["array_path"]
+            }
+        return attached
+
+    def delete(self, dataset_id: str, owner: str):
+        self.get(dataset_id, owner)
+        with self._lock:
+            self._datasets.pop(dataset_id, None)
+            self._remove_files(dataset_id)
+
+    @staticmethod
+    def describe(dataset: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: value for key, value in dataset.items()
+            if key not in ("owner", "path", "array_path")
+        }
+
+    def list(self, owner: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self.describe(d) for d in self._current().values() if d["owner"] == owner]
+
+    def usage(self, owner: str) -> Dict[str, Any]:
+        with self._lock:
+            used = self.used_bytes(owner)
+        return {"used_bytes": used, "quota_bytes": settings.DATASET_QUOTA_BYTES}
+
+# Shared across requests
+dataset_store = DatasetStore()
@@ -0,0 +1,110 @@
+"""
+MinHash / LSH index for near-duplicate detection of stored text
+
+Each text is reduced to a MinHash signature over its word shingles, whose
+positions agree with probability equal to the Jaccard similarity of the
+shingle sets. Signatures are split into bands; texts sharing any band are
+candidates, and their similarity is estimated from the full signatures.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import threading
+import numpy as np
+
+from services.lexical_index import tokenize
+
+_PRIME = (1 << 31) - 1
+_SEED = 1042
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word n-grams of a text; shorter texts are a single shingle"""
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+class MinHashLSH:
+    """Incremental MinHash LSH index, safe to query from worker threads"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 3):
+        if num_perm % bands:
+            raise ValueError(f"{num_perm} permutations cannot be split into {bands} bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(_SEED)
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    @property
+    def threshold(self) -> float:
+        """Similarity at which a pair becomes a candidate with probability ~0.5"""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a text, None when it has no tokens"""
+        grams = shingles(text, self.shingle_size)
+        if not grams:
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+             for gram in grams),
+            dtype=np.uint64,
+            count=len(grams)
+        )
+        # (a * h + b) mod p stays below 2**63 for a, h, b < 2**31
+        permuted = (np.outer(hashes, self.a) + self.b) % _PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any previous version"""
+        signature = self.signature(text)
+        with self.lock:
+            self._remove(doc_id)
+            if signature is None:
+                return
+            self.signatures[doc_id] = signature
+            for band, key in zip(self.buckets, self._band_keys(signature)):
+                band.setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        signature = self.signatures.pop(doc_id, None)
+        if signature is None:
+            return
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            members = band.get(key)
+            if members is not None:
+                members.discard(doc_id)
+                if not members:
+                    del band[key]
+
+    def query(self, text: str, threshold: float) -> List[Tuple[str, float]]:
+        """Indexed documents whose estimated Jaccard similarity is at least `threshold`, best first"""
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        with self.lock:
+            candidates: Set[str] = set()
+            for band, key in zip(self.buckets, self._band_keys(signature)):
+                candidates.update(band.get(key, ()))
+            estimates = [
+                (doc_id, float(np.mean(self.signatures[doc_id] == signature)))
+                for doc_id in candidates
+            ]
+        matches = [(doc_id, similarity) for doc_id, similarity in estimates if similarity >= threshold]
+        return sorted(matches, key=lambda match: match[1], reverse=True)
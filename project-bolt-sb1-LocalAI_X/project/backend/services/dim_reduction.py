@@ -0,0 +1,130 @@
+"""
+Dimensionality reduction of embeddings before they are stored or searched
+
+A collection may carry a ``reduction`` in its spec config, applied to every
+embedding on the way in (documents and queries alike):
+
+- ``{"method": "truncate", "dimensions": d}`` keeps the first d components
+  and renormalizes. Only meaningful for Matryoshka-trained models, whose
+  leading components carry most of the signal.
+- ``{"method": "pca", "dimensions": d}`` projects onto the top d principal
+  components of a sample of the model's embeddings. The fitted mean and
+  components are stored in the reduction as base64 float32.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import base64
+import uuid
+import numpy as np
+import structlog
+
+from core.config import settings
+
+logger = structlog.get_logger()
+
+METHODS = ("truncate", "pca")
+
+# Decoded PCA matrices by collection, reused until the collection is refitted
+_projections: Dict[str, Tuple[str, np.ndarray, np.ndarray]] = {}
+
+def _encode_array(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array, dtype="<f4").tobytes()).decode("ascii")
+
+def _decode_array(data: str, shape: Tuple[int, ...]) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<f4").reshape(shape)
+
+def supports_truncation(model: Optional[str]) -> bool:
+    """Whether a model was trained Matryoshka-style, per MATRYOSHKA_MODELS"""
+    return bool(model) and any(model.startswith(prefix) for prefix in settings.MATRYOSHKA_MODELS)
+
+def new_reduction(method: str, dimensions: int, source_size: int, model: Optional[str]) -> Dict[str, Any]:
+    """Validated reduction for a collection, raises ValueError
+
+    PCA reductions start unfitted; see `fit_pca`.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown reduction method {method}, expected one of {', '.join(METHODS)}")
+    if not 0 < dimensions < source_size:
+        raise ValueError(f"Reduced size must be between 1 and {source_size - 1}, got {dimensions}")
+    if method == "truncate" and not supports_truncation(model):
+        raise ValueError(
+            f"Model {model} is not known to support Matryoshka truncation "
+            "(see MATRYOSHKA_MODELS); use PCA instead"
+        )
+    return {"method": method, "dimensions": dimensions, "source_size": source_size}
+
+def is_fitted(reduction: Dict[str, Any]) -> bool:
+    return reduction["method"] != "pca" or "components" in reduction
+
+def fit_pca(reduction: Dict[str, Any], sample: List[List[float]]) -> Dict[str, Any]:
+    """Reduction with PCA fitted on sample embeddings, raises ValueError"""
+    data = np.asarray(sample, dtype=np.float64)
+    dimensions = reduction["dimensions"]
+    if data.ndim != 2 or data.shape[1] != reduction["source_size"]:
+        raise ValueError(f"Sample embeddings must have {reduction['source_size']} dimensions")
+    if len(data) <= dimensions:
+        raise ValueError(f"Fitting {dimensions} components needs more than {dimensions} sample texts, got {len(data)}")
+
+    mean = data.mean(axis=0)
+    _, singular_values, components = np.linalg.svd(data - mean, full_matrices=False)
+    variance = singular_values ** 2
+    explained = float(variance[:dimensions].sum() / variance.sum()) if variance.sum() > 0 else 1.0
+
+    fitted = dict(reduction)
+    fitted.update({
+        "mean": _encode_array(mean),
+        "components": _encode_array(components[:dimensions]),
+        "explained_variance": round(explained, 4),
+        "sample_size": len(data),
+        "version": uuid.uuid4().hex
+    })
+    logger.info("Fitted PCA projection", dimensions=dimensions, explained_variance=fitted["explained_variance"])
+    return fitted
+
+def _projection(collection: str, reduction: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    cached = _projections.get(collection)
+    if cached is not None and cached[0] == reduction["version"]:
+        return cached[1], cached[2]
+    source_size = reduction["source_size"]
+    mean = _decode_array(reduction["mean"], (source_size,))
+    components = _decode_array(reduction["components"], (reduction["dimensions"], source_size))
+    _projections[collection] = (reduction["version"], mean, components)
+    return mean, components
+
+def reduce_vectors(
+    collection: str,
+    reduction: Dict[str, Any],
+    vectors: np.ndarray,
+    normalize: bool = True
+) -> np.ndarray:
+    """Apply a collection's reduction to a batch of embeddings, raises ValueError"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.shape[-1] != reduction["source_size"]:
+        raise ValueError(
+            f"Collection {collection} reduces {reduction['source_size']}-dim embeddings, got {vectors.shape[-1]}"
+        )
+    if reduction["method"] == "truncate":
+        reduced = vectors[..., :reduction["dimensions"]]
+        normalize = True
+    else:
+        if not is_fitted(reduction):
+            raise ValueError(
+                f"The PCA projection of collection {collection} is not fitted yet, "
+                f"fit it with sample texts first"
+            )
+        mean, components = _projection(collection, reduction)
+        reduced = (vectors - mean) @ components.T
+    if normalize:
+        reduced = reduced / np.maximum(np.linalg.norm(reduced, axis=-1, keepdims=True), 1e-12)
+    return reduced.astype(np.float32)
+
+def forget_projection(collection: str):
+    _projections.pop(collection, None)
+
+def describe_reduction(reduction: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Reduction without its (large) fitted matrices, for API responses"""
+    if not reduction:
+        return None
+    summary = {key: value for key, value in reduction.items() if key not in ("mean", "components", "version")}
+    summary["fitted"] = is_fitted(reduction)
+    return summary
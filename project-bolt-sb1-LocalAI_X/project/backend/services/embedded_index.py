@@ -0,0 +1,885 @@
+"""
+Embedded in-process vector store backend
+
+Each collection is a directory holding a memory-mapped float32 matrix
+(``vectors.f32``) and a SQLite database mapping matrix rows to point IDs
+and JSON payloads. Small collections are searched exactly with NumPy; once a
+collection grows past EMBEDDED_HNSW_THRESHOLD live points an HNSW graph is
+built in the background and rows not yet in the graph are still searched
+exactly, so results never lag behind writes.
+
+Collections with several named vectors per point keep one such store per
+vector name under ``vectors/``.
+
+Collections created with scalar (int8) or binary quantization keep only the
+compact codes in RAM. Searches scan the codes, take ``limit * oversampling``
+candidates and rescore them against the memory-mapped originals, so only
+those few rows of the float32 file are paged in. Quantized collections skip
+the graph index, whose traversal would touch the full-precision vectors.
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import re
+import shutil
+import sqlite3
+import threading
+import structlog
+
+import numpy as np
+
+from core.config import settings
+from services.hnsw import HNSWIndex
+from services.payload_filter import parse_filters, validate_field
+from services.vector_backend import VectorBackend
+
+logger = structlog.get_logger()
+
+_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_.\-]+$")
+
+# Set bits per byte value, for Hamming distances on numpy < 2.0 (no bitwise_count)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+def _hamming(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance between packed bit codes (rows padded to 8 bytes) and a query"""
+    xor = np.bitwise_xor(codes, query_code)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor.view(np.uint64)).sum(axis=1, dtype=np.float32)
+    return _POPCOUNT[xor].sum(axis=1).astype(np.float32)
+
+QUANTIZATION_MODES = ("scalar", "binary")
+
+_RANGE_SQL = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+class EmbeddedCollection:
+    """A single collection: float32 memmap of vectors plus SQLite payload table"""
+
+    INDEX_CHUNK = 128  # rows inserted into the graph per lock acquisition
+    SQL_BATCH = 500  # max ids per IN (...) clause
+    SCAN_BLOCK = 8192  # rows decoded at a time when scanning quantized codes (stays in cache)
+
+    def __init__(
+        self,
+        path: Path,
+        vector_size: Optional[int] = None,
+        distance: str = "cosine",
+        quantization: Optional[str] = None
+    ):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = path / "vectors.f32"
+        self.lock = threading.RLock()
+
+        self.db = sqlite3.connect(str(path / "points.sqlite"), check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS points (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, payload TEXT NOT NULL)"
+        )
+        meta = dict(self.db.execute("SELECT key, value FROM meta").fetchall())
+        if "vector_size" not in meta:
+            if vector_size is None:
+                raise ValueError(f"Collection {path.name} not found")
+            meta = {
+                "vector_size": str(vector_size),
+                "distance": distance,
+                "quantization": quantization or "none",
+                "rows": "0"
+            }
+            self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", meta.items())
+            self.db.commit()
+
+        self.dim = int(meta["vector_size"])
+        self.distance = meta["distance"]
+        self.rows = int(meta["rows"])
+        self.quantization = meta.get("quantization", "none")
+        if self.quantization == "none":
+            self.quantization = None
+        self.scale = float(meta["scale"]) if "scale" in meta else None
+
+        self._vectors: Optional[np.memmap] = None
+        self.capacity = 0
+        if self.vectors_path.exists():
+            self.capacity = self.vectors_path.stat().st_size // (4 * self.dim)
+            self._open_vectors()
+
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        live_rows = np.fromiter((row for (row,) in self.db.execute("SELECT row FROM points")), dtype=np.int64)
+        self.alive[live_rows] = True
+
+        self.codes: Optional[np.ndarray] = None
+        if self.quantization:
+            self.codes = np.zeros((self.capacity, self._code_width()), dtype=self._code_dtype())
+            for start in range(0, self.rows, self.SCAN_BLOCK):
+                end = min(start + self.SCAN_BLOCK, self.rows)
+                self.codes[start:end] = self._encode(self._vectors[start:end])
+
+        self.index: Optional[HNSWIndex] = None
+        self.indexed_upto = 0
+        self._building = False
+        self.closed = False
+        self._maybe_index()
+
+    def close(self):
+        """Release the vector file and database, stopping any background build"""
+        with self.lock:
+            self.closed = True
+            self._vectors = None
+            self.db.close()
+
+    # -- storage ---------------------------------------------------------
+
+    def _open_vectors(self):
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    def vectors(self) -> np.ndarray:
+        return self._vectors
+
+    def _grow(self, needed: int):
+        """Make room for at least `needed` rows, doubling the file"""
+        if needed <= self.capacity:
+            return
+        new_capacity = max(needed, self.capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self.capacity = new_capacity
+        self._open_vectors()
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+        if self.codes is not None:
+            codes = np.zeros((new_capacity, self.codes.shape[1]), dtype=self.codes.dtype)
+            codes[:len(self.codes)] = self.codes
+            self.codes = codes
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        """Normalize vectors for cosine distance"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.distance == "cosine":
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _code_width(self) -> int:
+        # Binary rows are padded to whole 64-bit words for fast popcounts
+        return (self.dim + 63) // 64 * 8 if self.quantization == "binary" else self.dim
+
+    def _code_dtype(self):
+        return np.uint8 if self.quantization == "binary" else np.int8
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantize full-precision rows"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.quantization == "binary":
+            bits = np.packbits(vectors > 0, axis=-1)
+            pad = self._code_width() - bits.shape[-1]
+            return np.pad(bits, [(0, 0)] * (bits.ndim - 1) + [(0, pad)]) if pad else bits
+        if self.scale is None:
+            # Calibrate the int8 range on the first batch, clipping outliers
+            self.scale = float(np.quantile(np.abs(vectors), 0.99)) or 1.0
+            self._set_meta("scale", self.scale)
+        return np.clip(np.rint(vectors / self.scale * 127), -127, 127).astype(np.int8)
+
+    def _set_meta(self, key: str, value: Any):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def _rows_for_ids(self, ids: List[str]) -> List[Tuple[int, str, str]]:
+        found = []
+        for i in range(0, len(ids), self.SQL_BATCH):
+            batch = ids[i:i + self.SQL_BATCH]
+            found.extend(self.db.execute(
+                f"SELECT row, id, payload FROM points WHERE id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return found
+
+    def _payloads_for_rows(self, rows: List[int]) -> Dict[int, Tuple[str, str]]:
+        found = {}
+        for i in range(0, len(rows), self.SQL_BATCH):
+            batch = rows[i:i + self.SQL_BATCH]
+            for row, point_id, payload in self.db.execute(
+                f"SELECT row, id, payload FROM points WHERE row IN ({','.join('?' * len(batch))})", batch
+            ):
+                found[row] = (point_id, payload)
+        return found
+
+    def upsert(self, points: List[Dict[str, Any]]):
+        """Append points, overwritten IDs get a fresh row and the old one is retired"""
+        # Last write wins for repeated IDs within one batch
+        points = list({str(point["id"]): point for point in points}.values())
+        if not points:
+            return
+
+        with self.lock:
+            vectors = self._prepare([point["vector"] for point in points])
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of size {self.dim}, got {vectors.shape[1]}")
+
+            ids = [str(point["id"]) for point in points]
+            old_rows = [row for row, _, _ in self._rows_for_ids(ids)]
+
+            start = self.rows
+            self._grow(start + len(points))
+            self._vectors[start:start + len(points)] = vectors
+            self._vectors.flush()
+            if self.codes is not None:
+                self.codes[start:start + len(points)] = self._encode(vectors)
+
+            self.db.executemany(
+                "INSERT OR REPLACE INTO points (row, id, payload) VALUES (?, ?, ?)",
+                [(start + i, point_id, json.dumps(point.get("payload") or {}))
+                 for i, (point_id, point) in enumerate(zip(ids, points))]
+            )
+            self.rows = start + len(points)
+            self._set_meta("rows", self.rows)
+            self.db.commit()
+
+            self.alive[old_rows] = False
+            self.alive[start:self.rows] = True
+
+            live = int(self.alive.sum())
+            if self.rows - live > max(1024, live):
+                self._compact()
+
+        self._maybe_index()
+
+    def delete(self, ids: List[str]):
+        with self.lock:
+            rows = [row for row, _, _ in self._rows_for_ids([str(i) for i in ids])]
+            for i in range(0, len(rows), self.SQL_BATCH):
+                batch = rows[i:i + self.SQL_BATCH]
+                self.db.execute(f"DELETE FROM points WHERE row IN ({','.join('?' * len(batch))})", batch)
+            self.db.commit()
+            self.alive[rows] = False
+
+    def _compact(self):
+        """Rewrite the vector file without retired rows (caller holds the lock)"""
+        live_rows = np.flatnonzero(self.alive[:self.rows])
+        compact_path = self.path / "vectors.f32.compact"
+        compacted = np.memmap(compact_path, dtype=np.float32, mode="w+", shape=(max(len(live_rows), 1), self.dim))
+        for i in range(0, len(live_rows), 8192):
+            compacted[i:i + 8192] = self._vectors[live_rows[i:i + 8192]]
+        compacted.flush()
+        del compacted
+
+        self.db.execute("CREATE TEMP TABLE row_map (old INTEGER PRIMARY KEY, new INTEGER)")
+        self.db.executemany("INSERT INTO row_map VALUES (?, ?)", ((int(old), new) for new, old in enumerate(live_rows)))
+        self.db.execute("UPDATE points SET row = -1 - (SELECT new FROM row_map WHERE old = points.row)")
+        self.db.execute("UPDATE points SET row = -1 - row")
+        self.db.execute("DROP TABLE row_map")
+
+        self._vectors = None
+        compact_path.replace(self.vectors_path)
+        self.capacity = max(len(live_rows), 1)
+        self._open_vectors()
+        self.rows = len(live_rows)
+        self._set_meta("rows", self.rows)
+        self.db.commit()
+
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.alive[:self.rows] = True
+        if self.codes is not None:
+            self.codes = self.codes[live_rows].copy() if len(live_rows) else self.codes[:1].copy()
+        self.index = None
+        self.indexed_upto = 0
+        logger.info("Compacted embedded collection", collection=self.path.name, points=self.rows)
+
+    # -- graph index -----------------------------------------------------
+
+    def _maybe_index(self):
+        """Start a background graph build once the collection is large enough"""
+        with self.lock:
+            if self.closed or self._building or self.quantization or self.rows - self.indexed_upto == 0:
+                return
+            if int(self.alive.sum()) < settings.EMBEDDED_HNSW_THRESHOLD:
+                return
+            self._building = True
+        threading.Thread(target=self._build_index, daemon=True).start()
+
+    def _build_index(self):
+        try:
+            while True:
+                with self.lock:
+                    if self.closed:
+                        self._building = False
+                        return
+                    if self.index is None:
+                        self.index = HNSWIndex(self.vectors, self.distance, m=settings.EMBEDDED_HNSW_M)
+                        self.indexed_upto = 0
+                    start = self.indexed_upto
+                    end = min(self.rows, start + self.INDEX_CHUNK)
+                    if start >= end:
+                        self._building = False
+                        return
+                    for row in range(start, end):
+                        if self.alive[row]:
+                            self.index.add(row)
+                    self.indexed_upto = end
+        except Exception as e:
+            logger.error("Embedded graph index build failed", collection=self.path.name, error=str(e))
+            with self.lock:
+                self.index = None
+                self.indexed_upto = 0
+                self._building = False
+
+    # -- queries ---------------------------------------------------------
+
+    def _exact(self, query: np.ndarray, start: int, end: int, k: int) -> List[Tuple[float, int]]:
+        """Brute-force (distance, row) pairs over rows [start, end)"""
+        if end <= start:
+            return []
+        dists = self._distances(query, self._vectors[start:end])
+        dists = np.where(self.alive[start:end], dists, np.inf)
+        k = min(k, len(dists))
+        top = np.argpartition(dists, k - 1)[:k]
+        return [(float(dists[i]), start + int(i)) for i in top if np.isfinite(dists[i])]
+
+    def _distances(self, query: np.ndarray, block: np.ndarray) -> np.ndarray:
+        if self.distance == "euclid":
+            diff = block - query
+            return np.einsum("ij,ij->i", diff, diff)
+        return -(block @ query)
+
+    def _exact_rows(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """Brute-force (distance, row) pairs over a subset of live rows"""
+        best: List[Tuple[float, int]] = []
+        for i in range(0, len(rows), self.SCAN_BLOCK):
+            block_rows = rows[i:i + self.SCAN_BLOCK]
+            dists = self._distances(query, self._vectors[block_rows])
+            top = np.argpartition(dists, min(k, len(dists)) - 1)[:k]
+            best = sorted(best + [(float(dists[j]), int(block_rows[j])) for j in top])[:k]
+        return best
+
+    def _quantized(self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        """Approximate nearest rows from the in-RAM codes, optionally within a row subset"""
+        total = self.rows if rows is None else len(rows)
+        if total == 0:
+            return []
+        if self.quantization == "binary":
+            query_code = self._encode(query)
+        best_dists = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, total, self.SCAN_BLOCK):
+            end = min(start + self.SCAN_BLOCK, total)
+            if rows is None:
+                block_rows = np.arange(start, end)
+                codes = self.codes[start:end]
+            else:
+                block_rows = rows[start:end]
+                codes = self.codes[block_rows]
+            if self.quantization == "binary":
+                dists = _hamming(codes, query_code)
+            elif self.distance == "euclid":
+                diff = codes.astype(np.float32) * (self.scale / 127) - query
+                dists = np.einsum("ij,ij->i", diff, diff)
+            else:
+                dists = -(codes.astype(np.float32) @ query)
+            dists = np.where(self.alive[block_rows], dists, np.inf)
+            best_dists = np.concatenate([best_dists, dists])
+            best_rows = np.concatenate([best_rows, block_rows])
+            if len(best_dists) > k:
+                keep = np.argpartition(best_dists, k - 1)[:k]
+                best_dists, best_rows = best_dists[keep], best_rows[keep]
+        return [(float(d), int(r)) for d, r in zip(best_dists, best_rows) if np.isfinite(d)]
+
+    def _rescore(self, query: np.ndarray, rows: List[int]) -> List[Tuple[float, int]]:
+        """Exact distances for a few rows, read from the memory-mapped originals"""
+        if not rows:
+            return []
+        rows = sorted(rows)
+        dists = self._distances(query, self._vectors[rows])
+        return list(zip(dists.tolist(), rows))
+
+    @staticmethod
+    def _field_expr(field: str) -> str:
+        """SQL expression for a payload field
+        
+        The JSON path is inlined rather than bound so that it matches the
+        expression of a payload index on the same field; field names are
+        validated by parse_filters and cannot contain quotes.
+        """
+        path = "$" + "".join(f'."{part}"' for part in field.split("."))
+        return f"json_extract(payload, '{path}')"
+
+    @classmethod
+    def _filter_clause(cls, filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """SQL conditions on the JSON payload"""
+        sql = ""
+        params: List[Any] = []
+        for condition in parse_filters(filters):
+            expr = cls._field_expr(condition.field)
+            if condition.op == "eq":
+                sql += f" AND {expr} = ?"
+                params.append(int(condition.value) if isinstance(condition.value, bool) else condition.value)
+            elif condition.op == "in":
+                if not condition.value:
+                    sql += " AND 0"
+                    continue
+                sql += f" AND {expr} IN ({', '.join('?' * len(condition.value))})"
+                params.extend(int(value) if isinstance(value, bool) else value for value in condition.value)
+            else:
+                # SQLite orders text after numbers, keep ranges to numeric values
+                sql += f" AND typeof({expr}) IN ('integer', 'real')"
+                for op, value in condition.value.items():
+                    sql += f" AND {expr} {_RANGE_SQL[op]} ?"
+                    params.append(value)
+        return sql, params
+
+    def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        sql, params = self._filter_clause(filters)
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM points WHERE 1 = 1" + sql, params).fetchone()[0]
+
+    def create_payload_index(self, field: str, field_type: str):
+        """SQLite expression index on a payload field (one index serves every type)"""
+        validate_field(field)
+        name = "payload_" + hashlib.sha1(field.encode("utf-8")).hexdigest()[:16]
+        with self.lock:
+            self.db.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON points ({self._field_expr(field)})')
+            self._set_meta(f"payload_index:{field}", field_type)
+            self.db.commit()
+
+    def payload_indexes(self) -> Dict[str, str]:
+        rows = self.db.execute("SELECT key, value FROM meta WHERE key LIKE 'payload_index:%'").fetchall()
+        return {key.split(":", 1)[1]: value for key, value in rows}
+
+    def _matching_rows(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Live rows whose payload matches the filters"""
+        sql, params = self._filter_clause(filters)
+        cursor = self.db.execute("SELECT row FROM points WHERE 1 = 1" + sql + " ORDER BY row", params)
+        return np.fromiter((row for (row,) in cursor), dtype=np.int64)
+
+    def search(
+        self,
+        vector: List[float],
+        limit: int,
+        score_threshold: Optional[float],
+        oversampling: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if vector_name:
+            raise ValueError(f"Collection {self.path.name} has no named vectors")
+        with self.lock:
+            return self._search(vector, limit, score_threshold, oversampling, filters)
+
+    def search_batch(self, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Run several searches in one call, under one lock acquisition"""
+        if any(request.get("vector_name") for request in requests):
+            raise ValueError(f"Collection {self.path.name} has no named vectors")
+        with self.lock:
+            return [
+                self._search(
+                    request["vector"],
+                    request.get("limit", 10),
+                    request.get("score_threshold"),
+                    request.get("oversampling"),
+                    request.get("filters")
+                )
+                for request in requests
+            ]
+
+    def _search(
+        self,
+        vector: List[float],
+        limit: int,
+        score_threshold: Optional[float],
+        oversampling: Optional[float],
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Search with the collection lock held"""
+        query = self._prepare(vector)
+        # Filtered searches pre-select matching rows and scan only those
+        rows = self._matching_rows(filters) if filters else None
+        if self.quantization:
+            oversampling = oversampling or settings.VECTOR_QUANTIZATION_OVERSAMPLING
+            candidates = self._quantized(query, max(limit, int(limit * oversampling)), rows)
+            candidates = self._rescore(query, [row for _, row in candidates])
+        elif rows is not None:
+            candidates = self._exact_rows(query, rows, limit)
+        elif self.index is not None and self.index.count:
+            ef = max(settings.EMBEDDED_HNSW_EF_SEARCH, limit * 2)
+            candidates = [
+                (dist, row) for dist, row in self.index.search(query, ef, ef)
+                if self.alive[row]
+            ]
+            candidates += self._exact(query, self.indexed_upto, self.rows, limit)
+        else:
+            candidates = self._exact(query, 0, self.rows, limit)
+
+        candidates = sorted(candidates)[:limit]
+        payloads = self._payloads_for_rows([row for _, row in candidates])
+
+        results = []
+        for dist, row in candidates:
+            score = float(np.sqrt(dist)) if self.distance == "euclid" else -dist
+            if score_threshold is not None:
+                if self.distance == "euclid" and score > score_threshold:
+                    continue
+                if self.distance != "euclid" and score < score_threshold:
+                    continue
+            point_id, payload = payloads[row]
+            results.append({"id": point_id, "score": score, "metadata": json.loads(payload)})
+        return results
+
+    def retrieve(
+        self,
+        ids: List[str],
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if vector_name:
+            raise ValueError(f"Collection {self.path.name} has no named vectors")
+        with self.lock:
+            found = self._rows_for_ids([str(i) for i in ids])
+            vectors = self._vectors[[row for row, _, _ in found]].tolist() if with_vectors and found else []
+        points = [
+            {"id": point_id, "payload": json.loads(payload) if with_payload else None}
+            for _, point_id, payload in found
+        ]
+        for point, vector in zip(points, vectors):
+            point["vector"] = vector
+        return points
+
+    def scroll(
+        self,
+        filters: Optional[Dict[str, Any]],
+        limit: int,
+        offset: Optional[int],
+        with_payload: Any,
+        with_vectors: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        filter_sql, filter_params = self._filter_clause(filters)
+        sql = "SELECT row, id, payload FROM points WHERE row >= ?" + filter_sql + " ORDER BY row LIMIT ?"
+        params = [offset or 0] + filter_params + [limit + 1]
+
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+            page = rows[:limit]
+            vectors = self._vectors[[row for row, _, _ in page]].tolist() if with_vectors and page else []
+
+        next_offset = rows[limit][0] if len(rows) > limit else None
+        points = []
+        for _, point_id, payload in page:
+            data = json.loads(payload)
+            if with_payload is False:
+                data = None
+            elif isinstance(with_payload, (list, tuple)):
+                data = {key: data[key] for key in with_payload if key in data}
+            points.append({"id": point_id, "payload": data})
+        for point, vector in zip(points, vectors):
+            point["vector"] = vector
+        return points, next_offset
+
+    def info(self) -> Dict[str, Any]:
+        with self.lock:
+            live = int(self.alive.sum())
+            quantized_bytes = self.codes[:self.rows].nbytes if self.codes is not None else 0
+            return {
+                "name": self.path.name,
+                "vectors_count": live,
+                "indexed_vectors_count": self.index.count if self.index else 0,
+                "points_count": live,
+                "config": {
+                    "vector_size": self.dim,
+                    "distance": self.distance,
+                    "vectors": None,
+                    "quantization": self.quantization
+                },
+                "memory": {
+                    "vectors_bytes": self.rows * self.dim * 4,
+                    "quantized_bytes": quantized_bytes
+                },
+                "payload_indexes": self.payload_indexes()
+            }
+
+class EmbeddedNamedCollection:
+    """Collection with several named vectors per point
+
+    Each vector name has its own EmbeddedCollection under ``vectors/``. Every
+    point must carry all the named vectors, so the parts hold the same IDs
+    and payloads and payload-only operations are answered by the first part.
+    """
+
+    SPEC_FILE = "named_vectors.json"
+
+    def __init__(
+        self,
+        path: Path,
+        vectors: Optional[Dict[str, Dict[str, Any]]] = None,
+        quantization: Optional[str] = None
+    ):
+        self.path = path
+        spec_path = path / self.SPEC_FILE
+        if vectors is None:
+            if not spec_path.exists():
+                raise ValueError(f"Collection {path.name} not found")
+            vectors = json.loads(spec_path.read_text())
+            quantization = None  # stored by the parts themselves
+        else:
+            for name in vectors:
+                if not _COLLECTION_NAME.match(name):
+                    raise ValueError(f"Invalid vector name: {name}")
+        self.lock = threading.Lock()
+        self.parts = {
+            name: EmbeddedCollection(
+                path / "vectors" / name,
+                config.get("size"),
+                config.get("distance", "cosine"),
+                quantization
+            )
+            for name, config in vectors.items()
+        }
+        if not spec_path.exists():
+            spec_path.write_text(json.dumps(vectors))
+        self.primary = next(iter(self.parts.values()))
+
+    def _part(self, vector_name: Optional[str]) -> EmbeddedCollection:
+        if vector_name is None:
+            return self.primary
+        if vector_name not in self.parts:
+            raise ValueError(f"Collection {self.path.name} has no vector named {vector_name}")
+        return self.parts[vector_name]
+
+    def close(self):
+        for part in self.parts.values():
+            part.close()
+
+    def upsert(self, points: List[Dict[str, Any]]):
+        for point in points:
+            if not isinstance(point["vector"], dict) or set(point["vector"]) != set(self.parts):
+                raise ValueError(f"Points in {self.path.name} need vectors named {', '.join(self.parts)}")
+        with self.lock:
+            for name, part in self.parts.items():
+                part.upsert([
+                    {"id": point["id"], "vector": point["vector"][name], "payload": point.get("payload")}
+                    for point in points
+                ])
+
+    def delete(self, ids: List[str]):
+        with self.lock:
+            for part in self.parts.values():
+                part.delete(ids)
+
+    def search(
+        self,
+        vector: List[float],
+        limit: int,
+        score_threshold: Optional[float],
+        oversampling: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return self._part(vector_name).search(vector, limit, score_threshold, oversampling, filters)
+
+    def search_batch(self, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        return [
+            self._part(request.get("vector_name")).search(
+                request["vector"],
+                request.get("limit", 10),
+                request.get("score_threshold"),
+                request.get("oversampling"),
+                request.get("filters")
+            )
+            for request in requests
+        ]
+
+    def retrieve(
+        self,
+        ids: List[str],
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return self._part(vector_name).retrieve(ids, with_payload, with_vectors)
+
+    def scroll(
+        self,
+        filters: Optional[Dict[str, Any]],
+        limit: int,
+        offset: Optional[int],
+        with_payload: Any,
+        with_vectors: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        if not with_vectors:
+            return self.primary.scroll(filters, limit, offset, with_payload)
+        # Under the lock so no upsert lands between reading the parts
+        with self.lock:
+            points, next_offset = self.primary.scroll(filters, limit, offset, with_payload)
+            ids = [point["id"] for point in points]
+            vectors = {point_id: {} for point_id in ids}
+            for name, part in self.parts.items():
+                for record in part.retrieve(ids, with_payload=False, with_vectors=True):
+                    vectors[record["id"]][name] = record["vector"]
+        for point in points:
+            point["vector"] = vectors[point["id"]]
+        return points, next_offset
+
+    def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        return self.primary.count(filters)
+
+    def create_payload_index(self, field: str, field_type: str):
+        for part in self.parts.values():
+            part.create_payload_index(field, field_type)
+
+    def info(self) -> Dict[str, Any]:
+        parts = {name: part.info() for name, part in self.parts.items()}
+        primary = parts[next(iter(parts))]
+        return {
+            "name": self.path.name,
+            "vectors_count": sum(info["vectors_count"] for info in parts.values()),
+            "indexed_vectors_count": sum(info["indexed_vectors_count"] for info in parts.values()),
+            "points_count": primary["points_count"],
+            "config": {
+                "vector_size": None,
+                "distance": None,
+                "vectors": {
+                    name: {"size": info["config"]["vector_size"], "distance": info["config"]["distance"]}
+                    for name, info in parts.items()
+                },
+                "quantization": primary["config"]["quantization"]
+            },
+            "memory": {
+                key: sum(info["memory"][key] for info in parts.values())
+                for key in primary["memory"]
+            },
+            "payload_indexes": primary["payload_indexes"]
+        }
+
+class EmbeddedBackend(VectorBackend):
+    """In-process backend storing collections under a local directory"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._collections: Dict[str, EmbeddedCollection] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> Path:
+        if not _COLLECTION_NAME.match(name):
+            raise ValueError(f"Invalid collection name: {name}")
+        return self.root / name
+
+    @staticmethod
+    def _exists(path: Path) -> bool:
+        return (path / "points.sqlite").exists() or (path / EmbeddedNamedCollection.SPEC_FILE).exists()
+
+    def _get(self, name: str):
+        with self._lock:
+            if name not in self._collections:
+                path = self._path(name)
+                if (path / EmbeddedNamedCollection.SPEC_FILE).exists():
+                    self._collections[name] = EmbeddedNamedCollection(path)
+                elif (path / "points.sqlite").exists():
+                    self._collections[name] = EmbeddedCollection(path)
+                else:
+                    raise ValueError(f"Collection {name} not found")
+            return self._collections[name]
+
+    async def health_check(self) -> bool:
+        return self.root.is_dir()
+
+    async def list_collections(self) -> List[str]:
+        return sorted(path.name for path in self.root.iterdir() if self._exists(path))
+
+    async def create_collection(
+        self,
+        name: str,
+        vector_size: Optional[int],
+        distance: str = "cosine",
+        quantization: Optional[str] = None,
+        vectors: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        for metric in [config.get("distance", "cosine") for config in vectors.values()] if vectors else [distance]:
+            if metric not in ("cosine", "dot", "euclid"):
+                raise ValueError(f"Unsupported distance: {metric}")
+        if quantization and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        path = self._path(name)
+
+        def create():
+            with self._lock:
+                if name in self._collections or self._exists(path):
+                    raise ValueError(f"Collection {name} already exists")
+                if vectors:
+                    self._collections[name] = EmbeddedNamedCollection(path, vectors, quantization)
+                else:
+                    self._collections[name] = EmbeddedCollection(path, vector_size, distance, quantization)
+
+        await asyncio.to_thread(create)
+
+    async def delete_collection(self, name: str):
+        path = self._path(name)
+
+        def delete():
+            with self._lock:
+                collection = self._collections.pop(name, None)
+                if collection is None and not self._exists(path):
+                    raise ValueError(f"Collection {name} not found")
+                if collection is not None:
+                    collection.close()
+                shutil.rmtree(path, ignore_errors=True)
+
+        await asyncio.to_thread(delete)
+
+    async def upsert(self, collection: str, points: List[Dict[str, Any]]):
+        await asyncio.to_thread(self._get(collection).upsert, points)
+
+    async def search(
+        self,
+        collection: str,
+        vector: List[float],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        oversampling: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._get(collection).search, vector, limit, score_threshold, oversampling, filters, vector_name
+        )
+
+    async def search_batch(self, collection: str, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        return await asyncio.to_thread(self._get(collection).search_batch, requests)
+
+    async def retrieve(
+        self,
+        collection: str,
+        ids: List[str],
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._get(collection).retrieve, ids, with_payload, with_vectors, vector_name
+        )
+
+    async def scroll(
+        self,
+        collection: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 256,
+        offset: Optional[Any] = None,
+        with_payload: Any = True,
+        with_vectors: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[Any]]:
+        return await asyncio.to_thread(
+            self._get(collection).scroll, filters, limit, offset, with_payload, with_vectors
+        )
+
+    async def count(self, collection: str, filters: Optional[Dict[str, Any]] = None) -> int:
+        return await asyncio.to_thread(self._get(collection).count, filters)
+
+    async def create_payload_index(self, collection: str, field: str, field_type: str):
+        await asyncio.to_thread(self._get(collection).create_payload_index, field, field_type)
+
+    async def delete(self, collection: str, ids: List[str]):
+        await asyncio.to_thread(self._get(collection).delete, ids)
+
+    async def collection_info(self, collection: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._get(collection).info)
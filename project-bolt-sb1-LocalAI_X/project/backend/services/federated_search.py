@@ -0,0 +1,211 @@
+"""
+Federated search: one query fanned out over several collections
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import fnmatch
+import time
+import structlog
+
+from core.config import settings
+from services.collection_registry import CollectionNotFoundError, collection_registry
+from services.ollama_client import OllamaService
+from services.vector_store import VectorStoreService, reciprocal_rank_fusion
+
+logger = structlog.get_logger()
+
+HYBRID_CANDIDATE_FACTOR = 3
+
+def is_pattern(name: str) -> bool:
+    return any(char in name for char in "*?[")
+
+def expand_collections(patterns: List[str]) -> List[str]:
+    """Namespaces named or matched (as globs) by `patterns`, in registry order
+
+    Raises CollectionNotFoundError for a plain name that is not registered
+    or a glob that matches nothing.
+    """
+    namespaces = list(dict.fromkeys(spec["namespace"] for spec in collection_registry.list()))
+    selected = []
+    for pattern in patterns:
+        if is_pattern(pattern):
+            matched = fnmatch.filter(namespaces, pattern)
+            if not matched:
+                raise CollectionNotFoundError(f"No collection matches {pattern}")
+        elif pattern in namespaces or collection_registry.get(pattern):
+            matched = [pattern]
+        else:
+            raise CollectionNotFoundError(f"Collection {pattern} not found")
+        selected.extend(matched)
+    return list(dict.fromkeys(selected))
+
+def normalize_scores(hits: List[Dict[str, Any]]) -> List[float]:
+    """Min-max scale a shard's scores to [0, 1] (all 1.0 when they are equal)"""
+    if not hits:
+        return []
+    scores = [hit["score"] for hit in hits]
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(score - low) / (high - low) for score in scores]
+
+class FederatedSearchService:
+    """Searches several collections concurrently and merges a global top-k
+
+    The query is embedded once per embedding model involved, not once per
+    collection. Each collection gets its own timeout; a slow or failing
+    collection is reported and left out instead of failing the search.
+    Scores are merged as they are when every collection shares the model,
+    distance and vector size, and min-max normalized per collection
+    otherwise, since their scales are not comparable.
+    """
+
+    def __init__(
+        self,
+        ollama_service: Optional[OllamaService] = None,
+        vector_service: Optional[VectorStoreService] = None
+    ):
+        self.ollama_service = ollama_service or OllamaService()
+        self.vector_service = vector_service or VectorStoreService()
+
+    async def search(
+        self,
+        query: str,
+        collections: List[str],
+        limit: int = 10,
+        mode: str = "vector",
+        model: Optional[str] = None,
+        vector: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        timeout_ms: Optional[float] = None
+    ) -> Dict[str, Any]:
+        namespaces = expand_collections(collections)
+        if len(namespaces) > settings.FEDERATED_MAX_COLLECTIONS:
+            raise ValueError(
+                f"{len(namespaces)} collections selected, at most {settings.FEDERATED_MAX_COLLECTIONS} are searched at once"
+            )
+        targets = []
+        for namespace in namespaces:
+            targets.append(await self.vector_service.query_target(namespace, model, vector))
+        targets = list(dict.fromkeys(targets))
+
+        start = time.perf_counter()
+        embeddings: Dict[str, List[float]] = {}
+        if mode != "lexical":
+            models = list(dict.fromkeys(embedding_model for _, _, embedding_model in targets))
+            vectors = await asyncio.gather(
+                *(self.ollama_service.generate_embedding(query, embedding_model) for embedding_model in models)
+            )
+            embeddings = dict(zip(models, vectors))
+        embedding_ms = (time.perf_counter() - start) * 1000
+
+        timeout = (timeout_ms if timeout_ms is not None else settings.FEDERATED_SEARCH_TIMEOUT_MS) / 1000
+        outcomes = await asyncio.gather(*(
+            self._search_shard(
+                query, name, vector_name, embeddings.get(embedding_model), limit, mode, filters, timeout
+            )
+            for name, vector_name, embedding_model in targets
+        ))
+
+        normalized = not self._comparable([name for name, _, _ in targets]) or mode == "hybrid"
+        merged = []
+        shards = {}
+        for (name, _, _), (hits, report) in zip(targets, outcomes):
+            shards[name] = report
+            scores = normalize_scores(hits) if normalized else [hit["score"] for hit in hits]
+            for hit, score in zip(hits, scores):
+                merged.append({**hit, "collection": name, "raw_score": hit["score"], "score": score})
+        merged.sort(key=lambda hit: hit["score"], reverse=True)
+
+        return {
+            "results": merged[:limit],
+            "collections": shards,
+            "normalization": "minmax" if normalized else "none",
+            "embedding_ms": round(embedding_ms, 2)
+        }
+
+    @staticmethod
+    def _comparable(names: List[str]) -> bool:
+        """Whether raw scores of these collections are on one scale"""
+        signatures = set()
+        for name in names:
+            spec = collection_registry.get(name) or {}
+            reduction = (spec.get("config") or {}).get("reduction") or {}
+            signatures.add((
+                spec.get("model"),
+                spec.get("distance"),
+                spec.get("vector_size"),
+                reduction.get("method"),
+                reduction.get("version")
+            ))
+        return len(signatures) <= 1
+
+    async def _search_shard(
+        self,
+        query: str,
+        collection: str,
+        vector_name: Optional[str],
+        embedding: Optional[List[float]],
+        limit: int,
+        mode: str,
+        filters: Optional[Dict[str, Any]],
+        timeout: float
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Hits of one collection within the timeout, with a status report"""
+        start = time.perf_counter()
+        try:
+            hits = await asyncio.wait_for(
+                self._shard_hits(query, collection, vector_name, embedding, limit, mode, filters),
+                timeout
+            )
+            status = "ok"
+        except asyncio.TimeoutError:
+            hits, status = [], "timeout"
+            logger.warning("Federated search shard timed out", collection=collection, timeout_ms=timeout * 1000)
+        except Exception as e:
+            hits, status = [], "error"
+            logger.error("Federated search shard failed", collection=collection, error=str(e))
+        report = {
+            "status": status,
+            "hits": len(hits),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+        return hits, report
+
+    async def _shard_hits(
+        self,
+        query: str,
+        collection: str,
+        vector_name: Optional[str],
+        embedding: Optional[List[float]],
+        limit: int,
+        mode: str,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if mode == "lexical":
+            return await self.vector_service.lexical_search(
+                query, collection_name=collection, limit=limit, filters=filters
+            )
+        if mode == "hybrid":
+            candidates = limit * HYBRID_CANDIDATE_FACTOR
+            dense, lexical = await asyncio.gather(
+                self.vector_service.search(
+                    query_embedding=embedding,
+                    collection_name=collection,
+                    limit=candidates,
+                    filters=filters,
+                    vector_name=vector_name
+                ),
+                self.vector_service.lexical_search(
+                    query, collection_name=collection, limit=candidates, filters=filters
+                )
+            )
+            return reciprocal_rank_fusion({"vector": dense, "lexical": lexical}, limit)
+        return await self.vector_service.search(
+            query_embedding=embedding,
+            collection_name=collection,
+            limit=limit,
+            filters=filters,
+            vector_name=vector_name
+        )
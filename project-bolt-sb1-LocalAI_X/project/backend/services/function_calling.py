@@ -4,22 +4,29 @@ Function calling service for tool execution
 
 import json
 import re
-import asyncio
 from typing import Dict, List, Any, Optional
-import importlib.util
-import sys
-from pathlib import Path
 import structlog
 
 from core.config import settings
+from services.code_execution import execute_python_code, is_code_safe, result_usage
+from services.sandbox import OutputCallback
+from services.tool_registry import tool_registry
 
 logger = structlog.get_logger()
 
 class FunctionCallingService:
     """Service for handling function calls and tool execution"""
     
-    def __init__(self):
-        self.tools = {}
+    def __init__(self, owner: str = "anonymous"):
+        # API key the calls are made for (see `job_owner`), which owns their artifacts
+        self.owner = owner
+        # Built-in tools by name; their specs live in the tool registry
+        self._builtins = {
+            "calculator": self._execute_calculator,
+            "weather": self._execute_weather,
+            "search": self._execute_search,
+            "code_interpreter": self._execute_code_interpreter
+        }
         self.max_execution_time = settings.MAX_TOOL_EXECUTION_TIME
     
     def generate_tool_prompt(self, available_tools: Dict[str, Any]) -> str:
@@ -50,18 +57,17 @@ Only use tools when necessary to answer the user's question. Always explain what
     def extract_function_calls(self, text: str) -> List[Dict[str, Any]]:
         """Extract function calls from model response"""
         function_calls = []
+        decoder = json.JSONDecoder()
         
-        # Look for TOOL_CALL: patterns
-        pattern = r'TOOL_CALL:\s*(\{[^}]+\})'
-        matches = re.findall(pattern, text, re.MULTILINE | re.DOTALL)
-        
-        for match in matches:
+        # Look for TOOL_CALL: patterns; the JSON after each is decoded as a
+        # whole, since the arguments object nests braces
+        for match in re.finditer(r'TOOL_CALL:\s*', text):
             try:
-                call_data = json.loads(match)
-                if "name" in call_data and "arguments" in call_data:
+                call_data, _ = decoder.raw_decode(text, match.end())
+                if isinstance(call_data, dict) and "name" in call_data and "arguments" in call_data:
                     function_calls.append(call_data)
             except json.JSONDecodeError:
-                logger.warning("Failed to parse function call", match=match)
+                logger.warning("Failed to parse function call", match=text[match.end():match.end() + 200])
         
         return function_calls
     
@@ -69,29 +75,30 @@ Only use tools when necessary to answer the user's question. Always explain what
         self,
         function_name: str,
         arguments: Dict[str, Any],
-        tool_definition: Dict[str, Any]
+        tool_definition: Dict[str, Any],
+        on_output: Optional[OutputCallback] = None
     ) -> Dict[str, Any]:
-        """Execute a function call"""
+        """Execute a function call
+        
+        `on_output` receives the stdout/stderr of code_interpreter runs as
+        they are produced.
+        """
         try:
-            # Built-in tools
-            if function_name == "calculator":
-                return await self._execute_calculator(arguments)
-            elif function_name == "weather":
-                return await self._execute_weather(arguments)
-            elif function_name == "search":
-                return await self._execute_search(arguments)
-            elif function_name == "code_interpreter":
-                return await self._execute_code_interpreter(arguments)
-            
-            # Plugin tools (if any)
-            elif function_name in self.tools:
-                return await self._execute_plugin_tool(function_name, arguments)
-            
-            else:
+            tool = tool_registry.get(function_name)
+            if tool is None:
                 return {
                     "error": f"Unknown function: {function_name}",
                     "success": False
                 }
+            
+            # Plugin tools
+            if tool["plugin"] is not None:
+                return await tool["handler"](arguments)
+            
+            # Built-in tools
+            if tool.get("streams_output"):
+                return await self._builtins[function_name](arguments, on_output)
+            return await self._builtins[function_name](arguments)
                 
         except Exception as e:
             logger.error("Function execution failed", function=function_name, error=str(e))
@@ -156,34 +163,48 @@ Only use tools when necessary to answer the user's question. Always explain what
         
         return mock_results
     
-    async def _execute_code_interpreter(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute code interpreter function"""
-        # This would integrate with the code interpreter service
+    async def _execute_code_interpreter(
+        self,
+        arguments: Dict[str, Any],
+        on_output: Optional[OutputCallback] = None
+    ) -> Dict[str, Any]:
+        """Execute code interpreter function
+        
+        Runs in process on the same sandbox pool, limits and result cache as
+        /v1/code/execute. The output handed back to the model is cut to
+        CODE_TOOL_MAX_OUTPUT_CHARS.
+        """
         code = arguments.get("code", "")
         language = arguments.get("language", "python")
         
+        if not settings.ENABLE_CODE_EXECUTION:
+            return {"error": "Code execution is disabled", "success": False}
         if language != "python":
             return {"error": "Only Python code execution is supported", "success": False}
+        if not code:
+            return {"error": "No code provided", "success": False}
+        if not is_code_safe(code):
+            return {"error": "Code contains potentially unsafe operations", "success": False}
         
-        # Mock code execution (integrate with actual code interpreter)
+        result = await execute_python_code(
+            code,
+            timeout=min(settings.CODE_TIMEOUT, self.max_execution_time),
+            owner=self.owner,
+            on_output=on_output,
+            cache=True
+        )
+        output = result.get("output") or ""
+        truncated = result.get("truncated", False)
+        if len(output) > settings.CODE_TOOL_MAX_OUTPUT_CHARS:
+            output = output[:settings.CODE_TOOL_MAX_OUTPUT_CHARS]
+            truncated = True
         return {
             "code": code,
-            "output": f"# Mock execution of:\n{code}\n# Result: Code executed successfully",
-            "success": True
+            "output": output,
+            "error": result.get("error"),
+            "truncated": truncated,
+            "usage": result_usage(result),
+            "artifacts": result.get("artifacts") or [],
+            "cached": result.get("cached", False),
+            "success": result["success"]
         }
-    
-    async def _execute_plugin_tool(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute plugin tool"""
-        if function_name in self.tools:
-            tool_func = self.tools[function_name]
-            return await tool_func(arguments)
-        
-        return {"error": f"Plugin tool {function_name} not found", "success": False}
-    
-    def register_tool(self, name: str, func: callable, description: str, parameters: Dict[str, Any]):
-        """Register a new tool"""
-        self.tools[name] = {
-            "function": func,
-            "description": description,
-            "parameters": parameters
-        }
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Approximate nearest neighbour graph index (HNSW) for the embedded vector store
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+import math
+import random
+
+import numpy as np
+
+class HNSWIndex:
+    """Hierarchical navigable small world graph over rows of a vector matrix
+
+    Nodes are row numbers of the matrix returned by ``get_vectors``; the
+    vectors themselves are never copied. Distances are ``-dot`` for the
+    cosine/dot metrics (vectors are expected to be normalized for cosine)
+    and squared L2 for euclid, so smaller is always closer.
+    """
+
+    def __init__(
+        self,
+        get_vectors: Callable[[], np.ndarray],
+        metric: str = "cosine",
+        m: int = 16,
+        ef_construction: int = 100,
+        seed: int = 42
+    ):
+        self.get_vectors = get_vectors
+        self.metric = metric
+        self.m = m
+        self.m0 = m * 2
+        self.ef_construction = ef_construction
+        self.level_mult = 1 / math.log(m)
+        self.rng = random.Random(seed)
+
+        # One adjacency dict per level: node -> neighbour rows
+        self.levels: List[Dict[int, List[int]]] = []
+        self.entry_point: Optional[int] = None
+        self.count = 0
+
+    def _distances(self, query: np.ndarray, nodes: List[int]) -> np.ndarray:
+        """Distances from query to a list of nodes"""
+        vectors = self.get_vectors()[nodes]
+        if self.metric == "euclid":
+            diff = vectors - query
+            return np.einsum("ij,ij->i", diff, diff)
+        return -(vectors @ query)
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[Tuple[float, int]],
+        ef: int,
+        level: int
+    ) -> List[Tuple[float, int]]:
+        """Best-first search of one level, returns up to ef (distance, node) pairs"""
+        graph = self.levels[level]
+        visited = {node for _, node in entry_points}
+        candidates = list(entry_points)
+        heapq.heapify(candidates)
+        # Max-heap of the current best results (negated distances)
+        best = [(-dist, node) for dist, node in entry_points]
+        heapq.heapify(best)
+
+        while candidates:
+            dist, node = heapq.heappop(candidates)
+            if dist > -best[0][0] and len(best) >= ef:
+                break
+
+            unvisited = [n for n in graph.get(node, ()) if n not in visited]
+            if not unvisited:
+                continue
+            visited.update(unvisited)
+
+            for n_dist, n in zip(self._distances(query, unvisited).tolist(), unvisited):
+                if len(best) < ef or n_dist < -best[0][0]:
+                    heapq.heappush(candidates, (n_dist, n))
+                    heapq.heappush(best, (-n_dist, n))
+                    if len(best) > ef:
+                        heapq.heappop(best)
+
+        return sorted((-neg_dist, node) for neg_dist, node in best)
+
+    def _select(self, base: int, candidates: List[Tuple[float, int]], max_links: int) -> List[int]:
+        """Neighbour selection heuristic from the HNSW paper
+
+        A candidate is kept only if it is closer to ``base`` than to every
+        neighbour kept so far, which preserves links between clusters instead
+        of spending them all inside the nearest one.
+        """
+        candidates = sorted(c for c in candidates if c[1] != base)
+        if not candidates:
+            return []
+        nodes = [node for _, node in candidates]
+        vectors = self.get_vectors()[nodes]
+        if self.metric == "euclid":
+            sq = np.einsum("ij,ij->i", vectors, vectors)
+            pairwise = sq[:, None] + sq[None, :] - 2 * (vectors @ vectors.T)
+        else:
+            pairwise = -(vectors @ vectors.T)
+
+        selected: List[int] = []
+        for i, (dist, node) in enumerate(candidates):
+            if selected and pairwise[i, selected].min() < dist:
+                continue
+            selected.append(i)
+            if len(selected) >= max_links:
+                break
+        return [nodes[i] for i in selected]
+
+    def _shrink(self, node: int, neighbours: List[int], max_links: int) -> List[int]:
+        """Re-select the links of a node that has too many"""
+        if len(neighbours) <= max_links:
+            return neighbours
+        dists = self._distances(self.get_vectors()[node], neighbours).tolist()
+        return self._select(node, list(zip(dists, neighbours)), max_links)
+
+    def add(self, node: int):
+        """Insert a row of the vector matrix into the graph"""
+        query = self.get_vectors()[node]
+        level = int(-math.log(1.0 - self.rng.random()) * self.level_mult)
+        top = len(self.levels) - 1
+
+        # Register the node on its levels before linking it from anywhere
+        while len(self.levels) <= level:
+            self.levels.append({})
+        for lvl in range(level + 1):
+            self.levels[lvl][node] = []
+
+        if self.entry_point is None:
+            self.entry_point = node
+            self.count += 1
+            return
+
+        entry_dist = float(self._distances(query, [self.entry_point])[0])
+        entry = [(entry_dist, self.entry_point)]
+
+        # Greedy descent through the levels above the new node
+        for lvl in range(top, level, -1):
+            entry = self._search_layer(query, entry, 1, lvl)[:1]
+
+        for lvl in range(min(level, top), -1, -1):
+            found = self._search_layer(query, entry, self.ef_construction, lvl)
+            max_links = self.m0 if lvl == 0 else self.m
+            neighbours = self._select(node, found, self.m)
+            self.levels[lvl][node] = neighbours
+            for n in neighbours:
+                self.levels[lvl][n] = self._shrink(n, self.levels[lvl][n] + [node], max_links)
+            entry = found
+
+        # The entry point always lives on the top level
+        if level > top:
+            self.entry_point = node
+        self.count += 1
+
+    def search(self, query: np.ndarray, k: int, ef: int = 64) -> List[Tuple[float, int]]:
+        """Approximate k nearest neighbours as (distance, node) pairs"""
+        if self.entry_point is None:
+            return []
+
+        entry_dist = float(self._distances(query, [self.entry_point])[0])
+        entry = [(entry_dist, self.entry_point)]
+        for lvl in range(len(self.levels) - 1, 0, -1):
+            entry = self._search_layer(query, entry, 1, lvl)[:1]
+
+        return self._search_layer(query, entry, max(ef, k), 0)[:k]
@@ -0,0 +1,83 @@
+"""
+BM25 lexical index over the ``text`` payload of stored points
+"""
+
+from collections import Counter
+from typing import Dict, List, Tuple
+import heapq
+import math
+import re
+import threading
+
+# Words plus compound identifiers such as "E-1042", "v2.3.1" or "ERR_CONN_RESET"
+_TOKEN = re.compile(r"\w+(?:[-./:]\w+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens; compound identifiers are kept whole and also split"""
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-./:_]", token) if part)
+    return tokens
+
+class BM25Index:
+    """Incremental Okapi BM25 index, safe to query from worker threads"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_length: Dict[str, int] = {}
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any previous version"""
+        terms = Counter(tokenize(text))
+        with self.lock:
+            self._remove(doc_id)
+            self.doc_terms[doc_id] = terms
+            self.doc_length[doc_id] = sum(terms.values())
+            self.total_length += self.doc_length[doc_id]
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_length.pop(doc_id)
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Top documents as (doc_id, score), best first"""
+        with self.lock:
+            n_docs = len(self.doc_terms)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_length[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
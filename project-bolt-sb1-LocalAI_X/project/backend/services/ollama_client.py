@@ -5,13 +5,27 @@ Ollama client service for LLM interactions
 import httpx
 import json
 import asyncio
+import math
 from typing import List, Dict, Any, AsyncGenerator, Optional
 import structlog
 
 from core.config import settings
+from utils.cache import LRUCache
 
 logger = structlog.get_logger()
 
+# Embeddings are deterministic per (model, text), so repeated queries reuse them
+_embedding_cache = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the embedding cache"""
+    return _embedding_cache.stats()
+
+def _unit(embedding: List[float]) -> List[float]:
+    """L2-normalized copy of an embedding, as the batch /api/embed endpoint returns them"""
+    norm = math.sqrt(sum(value * value for value in embedding))
+    return [value / norm for value in embedding] if norm else list(embedding)
+
 class OllamaService:
     """Service for interacting with Ollama API"""
     
@@ -119,8 +133,15 @@ class OllamaService:
             logger.error("Streaming chat failed", error=str(e))
             raise
     
-    async def generate_embedding(self, text: str, model: str = "nomic-embed-text") -> List[float]:
-        """Generate embedding for text"""
+    async def generate_embedding(self, text: str, model: Optional[str] = None) -> List[float]:
+        """Generate embedding for text (EMBEDDING_MODEL unless a model is given)
+        
+        Embeddings are unit length, whichever endpoint produced them.
+        """
+        model = model or settings.EMBEDDING_MODEL
+        cached = _embedding_cache.get((model, text))
+        if cached is not None:
+            return list(cached)
         try:
             payload = {
                 "model": model,
@@ -134,12 +155,56 @@ class OllamaService:
             response.raise_for_status()
             
             data = response.json()
-            return data.get("embedding", [])
+            # /api/embeddings returns raw vectors, /api/embed normalized ones
+            embedding = _unit(data.get("embedding", []))
+            if embedding:
+                _embedding_cache.set((model, text), tuple(embedding))
+            return embedding
             
         except Exception as e:
             logger.error("Embedding generation failed", error=str(e))
             raise
     
+    async def generate_embeddings(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """Generate embeddings for several texts in one request
+        
+        Uses Ollama's batch /api/embed endpoint and falls back to concurrent
+        /api/embeddings calls on servers that predate it. Only texts missing
+        from the embedding cache are sent.
+        """
+        model = model or settings.EMBEDDING_MODEL
+        embeddings = {}
+        for text in texts:
+            cached = _embedding_cache.get((model, text))
+            if cached is not None:
+                embeddings[text] = list(cached)
+        missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+        if not missing:
+            return [list(embeddings[text]) for text in texts]
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/api/embed",
+                json={"model": model, "input": missing}
+            )
+            if response.status_code == 404:
+                fetched = await asyncio.gather(
+                    *(self.generate_embedding(text, model) for text in missing)
+                )
+            else:
+                response.raise_for_status()
+                fetched = response.json().get("embeddings", [])
+                if len(fetched) != len(missing):
+                    raise RuntimeError(f"Ollama returned {len(fetched)} embeddings for {len(missing)} texts")
+                for text, embedding in zip(missing, fetched):
+                    _embedding_cache.set((model, text), tuple(embedding))
+            
+            embeddings.update(zip(missing, fetched))
+            return [list(embeddings[text]) for text in texts]
+            
+        except Exception as e:
+            logger.error("Batch embedding generation failed", error=str(e), count=len(texts))
+            raise
+    
     def _format_messages_for_ollama(self, messages: List[Dict[str, str]]) -> str:
         """Format chat messages for Ollama"""
         formatted_parts = []
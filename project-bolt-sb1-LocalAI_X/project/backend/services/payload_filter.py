@@ -0,0 +1,189 @@
+"""
+Structured payload filters and filter usage statistics
+
+Filters map payload fields (dotted for nested keys) to a condition:
+
+- a scalar for equality: ``{"tenant": "acme"}``
+- a list or ``{"in": [...]}`` for any-of: ``{"lang": ["en", "de"]}``
+- bounds for a numeric range: ``{"year": {"gte": 2020, "lt": 2024}}``
+
+All conditions must hold. Backends translate the parsed conditions into
+their own query language so filtering happens inside the search, not after it.
+"""
+
+from typing import List, Dict, Any, NamedTuple, Optional
+import re
+import threading
+
+_FIELD = re.compile(r"^[A-Za-z0-9_\-]+(\.[A-Za-z0-9_\-]+)*$")
+
+RANGE_OPS = ("gt", "gte", "lt", "lte")
+
+class FilterCondition(NamedTuple):
+    field: str
+    op: str  # "eq", "in" or "range"
+    value: Any  # scalar, list of scalars, or dict of range bounds
+
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool))
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def validate_field(field: Any) -> str:
+    """Check a payload field name, raises ValueError"""
+    if not isinstance(field, str) or not _FIELD.match(field):
+        raise ValueError(f"Invalid filter field: {field!r}")
+    return field
+
+def parse_filters(filters: Optional[Dict[str, Any]]) -> List[FilterCondition]:
+    """Validate a filter dict and turn it into conditions, raises ValueError"""
+    if not filters:
+        return []
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must be an object mapping payload fields to conditions")
+
+    conditions = []
+    for field, spec in filters.items():
+        validate_field(field)
+
+        if isinstance(spec, dict) and set(spec) == {"in"}:
+            spec = spec["in"]
+        if isinstance(spec, dict) and set(spec) == {"eq"}:
+            spec = spec["eq"]
+
+        if isinstance(spec, list):
+            if not all(_is_scalar(value) for value in spec):
+                raise ValueError(f"Filter on {field}: 'in' values must be strings, numbers or booleans")
+            conditions.append(FilterCondition(field, "in", list(spec)))
+        elif isinstance(spec, dict):
+            if not spec or not set(spec) <= set(RANGE_OPS):
+                raise ValueError(
+                    f"Filter on {field}: expected 'in', 'eq' or range bounds {', '.join(RANGE_OPS)}"
+                )
+            if not all(_is_number(value) for value in spec.values()):
+                raise ValueError(f"Filter on {field}: range bounds must be numbers")
+            conditions.append(FilterCondition(field, "range", dict(spec)))
+        elif _is_scalar(spec):
+            conditions.append(FilterCondition(field, "eq", spec))
+        else:
+            raise ValueError(f"Filter on {field}: unsupported value {spec!r}")
+    return conditions
+
+def field_value(payload: Optional[Dict[str, Any]], field: str) -> Any:
+    """Value of a possibly nested payload field, None if missing"""
+    value: Any = payload
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def matches(payload: Optional[Dict[str, Any]], conditions: List[FilterCondition]) -> bool:
+    """Evaluate conditions against a payload in Python"""
+    for condition in conditions:
+        value = field_value(payload, condition.field)
+        if condition.op == "eq":
+            if value != condition.value or isinstance(value, bool) != isinstance(condition.value, bool):
+                return False
+        elif condition.op == "in":
+            if value is None or value not in condition.value:
+                return False
+        else:
+            if not _is_number(value):
+                return False
+            bounds = condition.value
+            if "gt" in bounds and not value > bounds["gt"]:
+                return False
+            if "gte" in bounds and not value >= bounds["gte"]:
+                return False
+            if "lt" in bounds and not value < bounds["lt"]:
+                return False
+            if "lte" in bounds and not value <= bounds["lte"]:
+                return False
+    return True
+
+def index_type(condition: FilterCondition) -> str:
+    """Payload index type suited to a condition: keyword, integer, float or bool"""
+    if condition.op == "range":
+        values = list(condition.value.values())
+    elif condition.op == "in":
+        values = condition.value
+    else:
+        values = [condition.value]
+    if values and all(isinstance(value, bool) for value in values):
+        return "bool"
+    if values and all(_is_number(value) for value in values):
+        return "integer" if all(isinstance(value, int) for value in values) else "float"
+    return "keyword"
+
+class FilterStats:
+    """Usage, latency and selectivity of filtered searches, per collection field
+
+    Latency is that of the whole filtered search, attributed to every field
+    in the filter. Selectivity is the fraction of points a field's condition
+    matched the last time it was sampled.
+    """
+
+    def __init__(self):
+        self._fields: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, collection: str, field: str) -> Dict[str, Any]:
+        return self._fields.setdefault(collection, {}).setdefault(field, {
+            "uses": 0,
+            "total_ms": 0.0,
+            "selectivity": None,
+            "indexed": False,
+            "slow": False
+        })
+
+    def record(self, collection: str, field: str, elapsed_ms: float) -> Dict[str, Any]:
+        """Count a filtered search on a field, returns its updated entry"""
+        with self._lock:
+            entry = self._entry(collection, field)
+            entry["uses"] += 1
+            entry["total_ms"] += elapsed_ms
+            return entry
+
+    def set_selectivity(self, collection: str, field: str, selectivity: float):
+        with self._lock:
+            self._entry(collection, field)["selectivity"] = selectivity
+
+    def mark_indexed(self, collection: str, field: str, indexed: bool = True):
+        with self._lock:
+            entry = self._entry(collection, field)
+            entry["indexed"] = indexed
+            if indexed:
+                entry["slow"] = False
+
+    def flag_slow(self, collection: str, field: str):
+        with self._lock:
+            self._entry(collection, field)["slow"] = True
+
+    def is_indexed(self, collection: str, field: str) -> bool:
+        return self._fields.get(collection, {}).get(field, {}).get("indexed", False)
+
+    def forget(self, collection: str):
+        with self._lock:
+            self._fields.pop(collection, None)
+
+    def report(self, collection: str) -> List[Dict[str, Any]]:
+        """Per-field statistics, most used first"""
+        with self._lock:
+            fields = dict(self._fields.get(collection, {}))
+        return sorted(
+            (
+                {
+                    "field": field,
+                    "uses": entry["uses"],
+                    "avg_ms": round(entry["total_ms"] / entry["uses"], 2) if entry["uses"] else None,
+                    "selectivity": entry["selectivity"],
+                    "indexed": entry["indexed"],
+                    "slow": entry["slow"]
+                }
+                for field, entry in fields.items()
+            ),
+            key=lambda item: item["uses"],
+            reverse=True
+        )
@@ -0,0 +1,73 @@
+"""
+Cached loading of plugin modules
+
+A plugin file is imported once per version instead of on every tool
+call. Each call only stats the file: a changed mtime or size triggers a
+content hash, and only a changed hash triggers a fresh import (hot
+reload). An upload or uninstall evicts the module explicitly.
+"""
+
+from types import ModuleType
+from typing import Dict, Any, Optional
+import hashlib
+import importlib.util
+import os
+import structlog
+
+logger = structlog.get_logger()
+
+class _CachedModule:
+    def __init__(self, module: ModuleType, mtime_ns: int, size: int, digest: str):
+        self.module = module
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+class PluginModuleCache:
+    """Imported plugin modules by file path, shared across requests"""
+
+    def __init__(self):
+        self._modules: Dict[str, _CachedModule] = {}
+        self.counters = {"hits": 0, "imports": 0, "reloads": 0, "evictions": 0}
+
+    def load(self, path: str, name: Optional[str] = None) -> ModuleType:
+        """The module of a plugin file, imported again only if its content changed"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = self._modules.get(path)
+        if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            self.counters["hits"] += 1
+            return cached.module
+
+        with open(path, "rb") as source:
+            content = source.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if cached is not None and cached.digest == digest:
+            # Touched but not changed
+            cached.mtime_ns, cached.size = stat.st_mtime_ns, stat.st_size
+            self.counters["hits"] += 1
+            return cached.module
+
+        spec = importlib.util.spec_from_file_location(name or os.path.splitext(os.path.basename(path))[0], path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot load plugin module from {path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        self._modules[path] = _CachedModule(module, stat.st_mtime_ns, stat.st_size, digest)
+        self.counters["reloads" if cached is not None else "imports"] += 1
+        if cached is not None:
+            logger.info("Reloaded changed plugin", path=path)
+        return module
+
+    def evict(self, path: str) -> bool:
+        if self._modules.pop(os.path.abspath(path), None) is None:
+            return False
+        self.counters["evictions"] += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"modules": len(self._modules), **self.counters}
+
+# Shared across requests
+plugin_modules = PluginModuleCache()
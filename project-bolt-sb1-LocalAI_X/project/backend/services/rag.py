@@ -0,0 +1,159 @@
+"""
+Retrieval-augmented generation: retrieve, pack context and cite sources
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import time
+import structlog
+
+from services.ollama_client import OllamaService
+from services.reranker import RerankService
+from services.vector_store import VectorStoreService, reciprocal_rank_fusion
+
+logger = structlog.get_logger()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+class RAGService:
+    """Retrieves chunks for a question and turns them into cited context"""
+
+    def __init__(
+        self,
+        ollama_service: Optional[OllamaService] = None,
+        vector_service: Optional[VectorStoreService] = None
+    ):
+        self.ollama_service = ollama_service or OllamaService()
+        self.vector_service = vector_service or VectorStoreService()
+
+    async def retrieve(
+        self,
+        question: str,
+        collection: Optional[str] = None,
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        mode: str = "vector",
+        filters: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None,
+        vector_name: Optional[str] = None,
+        rerank: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """Hits for a question, with embedding, search and rerank timings in ms
+
+        `rerank` holds RerankService options (scorer, mmr_lambda, candidates,
+        budget_ms); a deeper candidate list is retrieved and reranked to `limit`.
+        """
+        start = time.perf_counter()
+        try:
+            collection, vector_name, embedding_model = await self.vector_service.query_target(
+                collection, model, vector_name
+            )
+            query_embedding = await self.ollama_service.generate_embedding(question, embedding_model)
+            embedded = time.perf_counter()
+
+            fetch_limit = RerankService.candidate_count(limit, rerank.get("candidates")) if rerank else limit
+            if mode == "hybrid":
+                candidates = fetch_limit * 3
+                dense, lexical = await asyncio.gather(
+                    self.vector_service.search(
+                        query_embedding=query_embedding,
+                        collection_name=collection,
+                        limit=candidates,
+                        score_threshold=score_threshold,
+                        filters=filters,
+                        vector_name=vector_name
+                    ),
+                    self.vector_service.lexical_search(
+                        question, collection_name=collection, limit=candidates, filters=filters
+                    )
+                )
+                hits = reciprocal_rank_fusion({"vector": dense, "lexical": lexical}, fetch_limit)
+            else:
+                hits = await self.vector_service.search(
+                    query_embedding=query_embedding,
+                    collection_name=collection,
+                    limit=fetch_limit,
+                    score_threshold=score_threshold,
+                    filters=filters,
+                    vector_name=vector_name
+                )
+
+            searched = time.perf_counter()
+            if rerank:
+                hits, _ = await RerankService(self.ollama_service, self.vector_service).rerank(
+                    question,
+                    hits,
+                    limit,
+                    scorer=rerank.get("scorer"),
+                    mmr_lambda=rerank.get("mmr_lambda"),
+                    budget_ms=rerank.get("budget_ms"),
+                    collection=collection,
+                    vector_name=vector_name,
+                    embedding_model=embedding_model
+                )
+
+            done = time.perf_counter()
+            timings = {
+                "embedding_ms": round((embedded - start) * 1000, 2),
+                "search_ms": round((searched - embedded) * 1000, 2),
+                "retrieval_ms": round((done - start) * 1000, 2)
+            }
+            if rerank:
+                timings["rerank_ms"] = round((done - searched) * 1000, 2)
+            return hits, timings
+
+        except Exception as e:
+            logger.error("RAG retrieval failed", error=str(e))
+            raise
+
+    @staticmethod
+    def pack_context(hits: List[Dict[str, Any]], max_tokens: int) -> Tuple[str, List[Dict[str, Any]]]:
+        """Number chunks in rank order until the token budget is spent
+
+        Chunks that would overflow the budget are skipped so a smaller
+        lower-ranked chunk can still fit. Returns the context block and
+        the citations it refers to.
+        """
+        sections = []
+        citations = []
+        seen = set()
+        used = 0
+        for hit in hits:
+            metadata = hit.get("metadata") or {}
+            text = metadata.get("text")
+            if not text or text in seen:
+                continue
+            cost = estimate_tokens(text)
+            if used + cost > max_tokens:
+                continue
+            seen.add(text)
+            used += cost
+            index = len(citations) + 1
+            sections.append(f"[{index}] {text}")
+            citations.append({
+                "index": index,
+                "id": hit["id"],
+                "score": hit["score"],
+                "source_id": metadata.get("source_id"),
+                "text": text
+            })
+        return "\n\n".join(sections), citations
+
+    @staticmethod
+    def context_message(context: str) -> Dict[str, str]:
+        """System message carrying the retrieved context"""
+        if not context:
+            content = (
+                "No relevant documents were found for this question. "
+                "Say so if you cannot answer from your own knowledge."
+            )
+        else:
+            content = (
+                "Answer using the numbered context below. Cite the passages you use "
+                "with their numbers in square brackets, e.g. [1]. If the context does "
+                "not contain the answer, say so.\n\n"
+                f"Context:\n{context}"
+            )
+        return {"role": "system", "content": content}
@@ -0,0 +1,338 @@
+"""
+Reranking of search hits: MMR diversity and pairwise relevance scorers
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import asyncio
+import hashlib
+import re
+import time
+import numpy as np
+import structlog
+
+from core.config import settings
+from services.ollama_client import OllamaService
+from services.vector_store import VectorStoreService
+from utils.cache import LRUCache
+
+logger = structlog.get_logger()
+
+# Scores are deterministic per (scorer, query, document), so they outlive requests
+_score_cache = LRUCache(settings.RERANK_CACHE_SIZE)
+
+# Bounds scorer calls across concurrent requests so reranking cannot pile onto Ollama
+_scorer_slots: Optional[asyncio.Semaphore] = None
+
+def rerank_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the rerank score cache"""
+    return _score_cache.stats()
+
+def _slots() -> asyncio.Semaphore:
+    global _scorer_slots
+    if _scorer_slots is None:
+        _scorer_slots = asyncio.Semaphore(max(1, settings.RERANK_CONCURRENCY))
+    return _scorer_slots
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+def mmr(
+    query_vector: List[float],
+    vectors: List[List[float]],
+    k: int,
+    diversity_lambda: float = 0.5,
+    relevance: Optional[List[float]] = None
+) -> List[int]:
+    """Maximal marginal relevance order of the first k of `vectors`
+
+    Each step picks the candidate maximizing
+    ``lambda * relevance - (1 - lambda) * max similarity to the picks so far``.
+    Relevance defaults to cosine similarity with the query; scorer scores
+    passed as `relevance` are min-max scaled to [0, 1] first. The pairwise
+    similarity matrix is computed once, so each step is a vector update.
+    """
+    if not vectors:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    else:
+        scores = np.asarray(relevance, dtype=np.float32)
+        spread = float(scores.max() - scores.min())
+        scores = (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+
+    similarity = matrix @ matrix.T
+    redundancy = np.zeros(len(matrix), dtype=np.float32)
+    available = np.ones(len(matrix), dtype=bool)
+    order = []
+    for step in range(min(k, len(matrix))):
+        objective = diversity_lambda * scores - (1 - diversity_lambda) * redundancy
+        objective[~available] = -np.inf
+        pick = int(np.argmax(objective))
+        order.append(pick)
+        available[pick] = False
+        redundancy = similarity[pick] if step == 0 else np.maximum(redundancy, similarity[pick])
+    return order
+
+class PairwiseScorer(ABC):
+    """Relevance of a document to a query, higher is better
+
+    Subclasses implement `score_batch`, with None for a document they could
+    not score (which is left unscored and not cached); `cache_key` must
+    change whenever the scores would (e.g. a different model), since scores
+    are cached by it.
+    """
+
+    name = "base"
+
+    @property
+    def cache_key(self) -> str:
+        return self.name
+
+    @abstractmethod
+    async def score_batch(self, query: str, documents: List[str]) -> List[Optional[float]]:
+        """One score per document, in order"""
+
+class LLMJudgeScorer(PairwiseScorer):
+    """Asks an Ollama model to grade relevance from 0 to 10"""
+
+    name = "llm"
+    PROMPT = (
+        "Rate how relevant the passage is to the query on a scale from 0 (unrelated) "
+        "to 10 (answers it fully). Reply with the number only.\n\n"
+        "Query: {query}\n\nPassage: {document}"
+    )
+
+    def __init__(self, model: Optional[str] = None, ollama_service: Optional[OllamaService] = None):
+        self.model = model or settings.RERANK_JUDGE_MODEL or settings.DEFAULT_MODEL
+        self.ollama_service = ollama_service or OllamaService()
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    async def _grade(self, query: str, document: str) -> Optional[float]:
+        """Grade of one passage, None if the reply holds no number"""
+        async with _slots():
+            reply = await self.ollama_service.chat_completion(
+                self.model,
+                [{"role": "user", "content": self.PROMPT.format(query=query, document=document)}],
+                temperature=0.0,
+                max_tokens=4
+            )
+        match = re.search(r"\d+(\.\d+)?", reply)
+        return min(float(match.group()), 10.0) if match else None
+
+    async def score_batch(self, query: str, documents: List[str]) -> List[Optional[float]]:
+        return list(await asyncio.gather(*(self._grade(query, document) for document in documents)))
+
+class CrossEncoderScorer(PairwiseScorer):
+    """Local sentence-transformers cross-encoder, loaded on first use"""
+
+    name = "cross-encoder"
+    _models: Dict[str, Any] = {}
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or settings.RERANK_CROSS_ENCODER
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    def _predict(self, query: str, documents: List[str]) -> List[float]:
+        if self.model not in self._models:
+            from sentence_transformers import CrossEncoder
+            self._models[self.model] = CrossEncoder(self.model)
+        scores = self._models[self.model].predict([(query, document) for document in documents])
+        return [float(score) for score in scores]
+
+    async def score_batch(self, query: str, documents: List[str]) -> List[float]:
+        async with _slots():
+            return await asyncio.to_thread(self._predict, query, documents)
+
+SCORERS: Dict[str, Callable[[], PairwiseScorer]] = {
+    LLMJudgeScorer.name: LLMJudgeScorer,
+    CrossEncoderScorer.name: CrossEncoderScorer
+}
+
+def register_scorer(name: str, factory: Callable[[], PairwiseScorer]):
+    """Make a scorer available to rerank requests under `name`"""
+    SCORERS[name] = factory
+
+def get_scorer(name: str) -> PairwiseScorer:
+    if name not in SCORERS:
+        raise ValueError(f"Unknown rerank scorer: {name} (available: {', '.join(sorted(SCORERS))})")
+    return SCORERS[name]()
+
+class RerankService:
+    """Reorders candidate hits within a latency budget
+
+    Stages, each optional: a pairwise scorer reorders candidates by relevance,
+    then MMR trades relevance for diversity using the stored vectors. When the
+    budget runs out the stage degrades instead of failing: unscored
+    candidates keep their retrieval order after the scored ones, and MMR is
+    skipped if the vectors did not arrive in time. A scorer that fails
+    leaves the retrieval order as it was, and a failing MMR stage is skipped.
+    """
+
+    SCORER_CHUNK = 8  # documents per scorer call, so partial progress survives a timeout
+
+    def __init__(
+        self,
+        ollama_service: Optional[OllamaService] = None,
+        vector_service: Optional[VectorStoreService] = None
+    ):
+        self.ollama_service = ollama_service or OllamaService()
+        self.vector_service = vector_service or VectorStoreService()
+
+    @staticmethod
+    def candidate_count(limit: int, candidates: Optional[int] = None) -> int:
+        """Hits to retrieve so reranking has something to choose from"""
+        return max(limit, candidates or limit * settings.RERANK_CANDIDATES)
+
+    async def rerank(
+        self,
+        query: str,
+        hits: List[Dict[str, Any]],
+        limit: int,
+        scorer: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        budget_ms: Optional[float] = None,
+        collection: Optional[str] = None,
+        vector_name: Optional[str] = None,
+        embedding_model: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Top `limit` hits after reranking, with a report of what ran"""
+        start = time.perf_counter()
+        budget = (budget_ms if budget_ms is not None else settings.RERANK_BUDGET_MS) / 1000
+        deadline = start + budget
+        report: Dict[str, Any] = {"candidates": len(hits), "degraded": False}
+
+        if scorer:
+            scorer_instance = get_scorer(scorer)
+            try:
+                hits, scored, cached = await self._score(scorer_instance, query, hits, deadline)
+            except Exception as e:
+                logger.warning("Rerank scorer failed, keeping retrieval order", scorer=scorer, error=str(e))
+                scored, cached = 0, 0
+                report["error"] = str(e)
+            report.update({"scorer": scorer, "scored": scored, "cached": cached})
+            if scored < len(hits):
+                report["degraded"] = True
+
+        if mmr_lambda is not None and len(hits) > 1:
+            order = await self._mmr_order(
+                query, hits, limit, mmr_lambda, scorer is not None, deadline,
+                collection, vector_name, embedding_model
+            )
+            if order is None:
+                report["degraded"] = True
+            else:
+                hits = [hits[i] for i in order]
+                report["mmr_lambda"] = mmr_lambda
+
+        report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        if report["degraded"]:
+            logger.warning("Rerank degraded", budget_ms=budget * 1000, **report)
+        return hits[:limit], report
+
+    async def _score(
+        self,
+        scorer: PairwiseScorer,
+        query: str,
+        hits: List[Dict[str, Any]],
+        deadline: float
+    ) -> Tuple[List[Dict[str, Any]], int, int]:
+        """Hits reordered by scorer score; returns (hits, scored, from cache)"""
+        texts = [(hit.get("metadata") or {}).get("text") or "" for hit in hits]
+        scores: Dict[int, float] = {}
+        for i, text in enumerate(texts):
+            cached = _score_cache.get((scorer.cache_key, query, _text_key(text)))
+            if cached is not None:
+                scores[i] = cached
+        cached_count = len(scores)
+
+        # Score in retrieval order, so a timeout leaves the best candidates scored
+        pending = [i for i in range(len(hits)) if i not in scores]
+        for offset in range(0, len(pending), self.SCORER_CHUNK):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            chunk = pending[offset:offset + self.SCORER_CHUNK]
+            try:
+                chunk_scores = await asyncio.wait_for(
+                    scorer.score_batch(query, [texts[i] for i in chunk]), remaining
+                )
+            except asyncio.TimeoutError:
+                break
+            if len(chunk_scores) != len(chunk):
+                raise ValueError(f"Scorer {scorer.name} returned {len(chunk_scores)} scores for {len(chunk)} documents")
+            for i, score in zip(chunk, chunk_scores):
+                if score is None:
+                    # Retried on the next request instead of ranking the document last for good
+                    continue
+                scores[i] = score
+                _score_cache.set((scorer.cache_key, query, _text_key(texts[i])), score)
+
+        ranked = sorted(scores, key=lambda i: scores[i], reverse=True)
+        ranked += [i for i in range(len(hits)) if i not in scores]
+        reordered = []
+        for i in ranked:
+            hit = dict(hits[i])
+            if i in scores:
+                hit["rerank_score"] = scores[i]
+            reordered.append(hit)
+        return reordered, len(scores), cached_count
+
+    async def _mmr_order(
+        self,
+        query: str,
+        hits: List[Dict[str, Any]],
+        limit: int,
+        mmr_lambda: float,
+        use_rerank_scores: bool,
+        deadline: float,
+        collection: Optional[str],
+        vector_name: Optional[str],
+        embedding_model: Optional[str]
+    ) -> Optional[List[int]]:
+        """MMR order of the hits, None if the inputs did not arrive in time"""
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None
+        try:
+            query_vector, vectors = await asyncio.wait_for(
+                asyncio.gather(
+                    self.ollama_service.generate_embedding(query, embedding_model),
+                    self.vector_service.get_vectors(
+                        [hit["id"] for hit in hits], collection_name=collection, vector_name=vector_name
+                    )
+                ),
+                remaining
+            )
+        except asyncio.TimeoutError:
+            return None
+        except Exception as e:
+            logger.warning("MMR inputs failed, skipping diversification", error=str(e))
+            return None
+        query_vector = await self.vector_service.reduce_vector(query_vector, collection)
+
+        # Hits without a stored vector (deleted meanwhile) keep their place at the end
+        present = [i for i, hit in enumerate(hits) if hit["id"] in vectors]
+        relevance = None
+        if use_rerank_scores:
+            relevance = [hits[i].get("rerank_score", 0.0) for i in present]
+        picked = mmr(
+            query_vector,
+            [vectors[hits[i]["id"]] for i in present],
+            limit,
+            mmr_lambda,
+            relevance
+        )
+        order = [present[i] for i in picked]
+        chosen = set(order)
+        return order + [i for i in range(len(hits)) if i not in chosen]
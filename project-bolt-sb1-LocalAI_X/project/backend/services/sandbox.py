@@ -0,0 +1,428 @@
+"""
+Pool of warm sandbox workers for the code interpreter
+
+Each worker is a long-lived interpreter (services/sandbox_worker.py) with
+the whitelisted packages already imported. A job is sent to an idle worker
+over its stdin, runs in a child forked from it and reports output and
+resource usage back as frames, so a run costs a fork instead of an
+interpreter start plus imports. Workers are recycled after
+SANDBOX_WORKER_MAX_JOBS jobs and replaced when they die. A worker can
+also be detached from the pool to back a stateful session
+(services/code_sessions.py).
+"""
+
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+import asyncio
+import itertools
+import json
+import os
+import signal
+import struct
+import sys
+import time
+import uuid
+import structlog
+
+from core.config import settings
+
+logger = structlog.get_logger()
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+_HEADER = struct.Struct(">I")
+
+# Forking a process with live BLAS thread pools is unsafe, keep them single-threaded
+WORKER_ENV = {
+    "OPENBLAS_NUM_THREADS": "1",
+    "OMP_NUM_THREADS": "1",
+    "MKL_NUM_THREADS": "1",
+    "MPLBACKEND": "Agg",
+    "PYTHONDONTWRITEBYTECODE": "1"
+}
+
+# Seconds a worker may take past a job's timeout before it is presumed stuck
+GRACE_SECONDS = 5
+
+OutputCallback = Callable[[str, str], Awaitable[None]]
+
+class SandboxError(RuntimeError):
+    """Raised when a sandbox worker fails (not when user code fails)"""
+
+def format_error(error: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not error:
+        return None
+    return f"Error: {error['message']}\nType: {error['type']}"
+
+def spill_path(output_id: str, owner: str = "anonymous") -> str:
+    """Spill file of a run, in the folder of the API key that started it (see `job_owner`)"""
+    return os.path.join(settings.CODE_OUTPUT_DIR, owner, f"{output_id}.txt")
+
+def _sweep_spills():
+    """Delete spill files older than CODE_OUTPUT_TTL_SECONDS"""
+    cutoff = time.time() - settings.CODE_OUTPUT_TTL_SECONDS
+    try:
+        with os.scandir(settings.CODE_OUTPUT_DIR) as owners:
+            for owner in owners:
+                if not owner.is_dir():
+                    continue
+                with os.scandir(owner.path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".txt") and entry.stat().st_mtime < cutoff:
+                            os.unlink(entry.path)
+    except OSError:
+        pass
+
+class OutputBuffer:
+    """Output of a run: the first `limit` bytes in memory, the rest in a spill file"""
+
+    def __init__(self, limit: Optional[int] = None, owner: str = "anonymous"):
+        self.limit = limit if limit is not None else settings.CODE_MAX_OUTPUT_BYTES
+        self.owner = owner
+        self.size = 0
+        self.chunks: List[str] = []
+        self.spill_id: Optional[str] = None
+        self.spilled = 0
+        self._spill = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.spill_id is not None
+
+    def add(self, text: str) -> str:
+        """Keep what fits, spill the rest; returns the kept part"""
+        if self._spill is None:
+            data = text.encode("utf-8")
+            if self.size + len(data) <= self.limit:
+                self.size += len(data)
+                self.chunks.append(text)
+                return text
+            room = self.limit - self.size
+            kept = data[:room].decode("utf-8", errors="ignore")
+            self.size += len(kept.encode("utf-8"))
+            self.chunks.append(kept)
+            self._open_spill()
+            self._write(data[len(kept.encode("utf-8")):])
+            return kept
+        self._write(text.encode("utf-8"))
+        return ""
+
+    def _open_spill(self):
+        os.makedirs(os.path.join(settings.CODE_OUTPUT_DIR, self.owner), exist_ok=True)
+        _sweep_spills()
+        self.spill_id = uuid.uuid4().hex
+        self._spill = open(spill_path(self.spill_id, self.owner), "wb")
+
+    def _write(self, data: bytes):
+        self._spill.write(data)
+        self.spilled += len(data)
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def describe(self) -> Optional[Dict[str, Any]]:
+        """Reference to the spilled rest of the output, None if nothing was spilled"""
+        if not self.truncated:
+            return None
+        return {"output_id": self.spill_id, "bytes": self.spilled, "kept_bytes": self.size}
+
+class SandboxWorker:
+    """One warm worker process, running a single job at a time"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, preload: Optional[List[str]] = None):
+        self.preload = preload if preload is not None else list(settings.PYTHON_PACKAGES_WHITELIST)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.jobs = 0
+        self.preloaded: List[str] = []
+        self.startup_ms = 0.0
+        self.broken = False
+        # Process group of the forked child running the current job
+        self.child_pid: Optional[int] = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT, json.dumps(self.preload),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            cwd=settings.SANDBOX_WORKDIR,
+            env={**os.environ, **WORKER_ENV}
+        )
+        try:
+            ready = await asyncio.wait_for(self._receive(), settings.SANDBOX_START_TIMEOUT)
+        except Exception:
+            await self.close()
+            raise
+        if ready.get("type") != "ready":
+            await self.close()
+            raise SandboxError(f"Sandbox worker sent {ready.get('type')} instead of ready")
+        self.preloaded = ready["preloaded"]
+        self.startup_ms = ready["startup_ms"]
+        logger.info("Started sandbox worker", pid=ready["pid"], preloaded=self.preloaded, startup_ms=self.startup_ms)
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None and not self.broken
+
+    async def _send(self, message: Dict[str, Any]):
+        data = json.dumps(message).encode("utf-8")
+        self.process.stdin.write(_HEADER.pack(len(data)) + data)
+        await self.process.stdin.drain()
+
+    async def _receive(self) -> Dict[str, Any]:
+        try:
+            header = await self.process.stdout.readexactly(_HEADER.size)
+            (size,) = _HEADER.unpack(header)
+            return json.loads(await self.process.stdout.readexactly(size))
+        except asyncio.IncompleteReadError:
+            raise SandboxError("Sandbox worker exited unexpectedly")
+
+    async def run(
+        self,
+        code: str,
+        timeout: float,
+        memory_mb: Optional[int] = None,
+        on_output: Optional[OutputCallback] = None,
+        cwd: Optional[str] = None,
+        datasets: Optional[Dict[str, Dict[str, Any]]] = None,
+        owner: str = "anonymous"
+    ) -> Dict[str, Any]:
+        """Run code on the worker
+        
+        Output up to CODE_MAX_OUTPUT_BYTES is collected and, if given, passed
+        to `on_output` as it arrives (awaiting it pauses the run); the rest
+        is spilled to a file of `owner`. A "truncated" notice is passed when that starts.
+        `datasets` are attachments as returned by DatasetStore.attach.
+        """
+        job_id = next(self._ids)
+        self.jobs += 1
+        output = OutputBuffer(owner=owner)
+        try:
+            await self._send({
+                "type": "run",
+                "id": job_id,
+                "code": code,
+                "timeout": timeout,
+                "memory_mb": memory_mb or settings.CODE_MEMORY_LIMIT,
+                "cwd": cwd,
+                "datasets": datasets
+            })
+            deadline = time.monotonic() + timeout + GRACE_SECONDS
+            while True:
+                message = await asyncio.wait_for(self._receive(), max(deadline - time.monotonic(), 0.1))
+                if message.get("id") != job_id:
+                    continue
+                if message["type"] == "started":
+                    self.child_pid = message["pid"]
+                elif message["type"] == "output":
+                    was_truncated = output.truncated
+                    kept = output.add(message["data"])
+                    if on_output is not None:
+                        if kept:
+                            await on_output(message["stream"], kept)
+                        if output.truncated and not was_truncated:
+                            await on_output(
+                                "truncated",
+                                f"Output exceeded {output.limit} bytes, the rest is saved as output {output.spill_id}"
+                            )
+                elif message["type"] == "exit":
+                    self.child_pid = None
+                    break
+        except BaseException:
+            # A worker in an unknown state cannot take further jobs
+            self.broken = True
+            raise
+        finally:
+            output.close()
+
+        result = {key: message[key] for key in ("exit_code", "timed_out", "cpu_seconds", "max_rss_kb", "wall_ms")}
+        result["success"] = message["exit_code"] == 0 and not message["timed_out"]
+        result["output"] = output.text()
+        result["truncated"] = output.truncated
+        result["spill"] = output.describe()
+        result["error"] = "Code execution timed out" if message["timed_out"] else format_error(message["error"])
+        return result
+
+    async def _request(self, message: Dict[str, Any]):
+        """Send a control message and wait for its acknowledgement"""
+        try:
+            await self._send(message)
+            reply = await asyncio.wait_for(self._receive(), settings.SANDBOX_START_TIMEOUT)
+        except BaseException:
+            self.broken = True
+            raise
+        if reply.get("type") != message["type"]:
+            self.broken = True
+            raise SandboxError(f"Sandbox worker answered {message['type']} with {reply.get('type')}")
+
+    async def enter_session(self, memory_mb: int):
+        """Keep state between jobs from now on, within `memory_mb` for the session"""
+        await self._request({"type": "session", "memory_mb": memory_mb})
+
+    async def reset(self):
+        """Empty the namespace of a session worker"""
+        await self._request({"type": "reset"})
+
+    def _kill_child(self):
+        """Kill the process group of an abandoned job, which outlives the worker otherwise"""
+        if self.child_pid is None:
+            return
+        try:
+            os.killpg(self.child_pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.child_pid = None
+
+    async def close(self):
+        self._kill_child()
+        if self.process is None or self.process.returncode is not None:
+            return
+        try:
+            await self._send({"type": "stop"})
+            await asyncio.wait_for(self.process.wait(), 2)
+        except Exception:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+
+class SandboxPool:
+    """Fixed-size pool of warm workers shared by all requests"""
+
+    def __init__(self, size: Optional[int] = None, max_jobs: Optional[int] = None):
+        self.size = size if size is not None else settings.SANDBOX_POOL_SIZE
+        self.max_jobs = max_jobs if max_jobs is not None else settings.SANDBOX_WORKER_MAX_JOBS
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._replacements = set()
+        self.started = False
+        self.counters = {"jobs": 0, "spawned": 0, "recycled": 0, "replaced": 0, "detached": 0, "queue_wait_ms": 0.0}
+
+    async def start(self):
+        """Start the workers; called at startup, or lazily by the first job"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.started:
+                return
+            self._idle = asyncio.Queue()
+            workers = await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+            for worker in workers:
+                self._idle.put_nowait(worker)
+            self.started = True
+
+    async def _spawn(self) -> SandboxWorker:
+        worker = SandboxWorker()
+        await worker.start()
+        self.counters["spawned"] += 1
+        return worker
+
+    async def _replace(self, worker: SandboxWorker):
+        await worker.close()
+        await self._refill()
+
+    def _release(self, worker: SandboxWorker):
+        if worker.alive and worker.jobs < self.max_jobs:
+            self._idle.put_nowait(worker)
+            return
+        self.counters["recycled" if worker.alive else "replaced"] += 1
+        # Replaced in the background so the finished job returns immediately
+        task = asyncio.create_task(self._replace(worker))
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
+
+    async def execute(
+        self,
+        code: str,
+        timeout: float,
+        memory_mb: Optional[int] = None,
+        on_output: Optional[OutputCallback] = None,
+        cwd: Optional[str] = None,
+        datasets: Optional[Dict[str, Dict[str, Any]]] = None,
+        owner: str = "anonymous"
+    ) -> Dict[str, Any]:
+        """Run code on a warm worker, waiting for one to become idle"""
+        if self.size <= 0:
+            return await execute_cold(code, timeout, memory_mb, on_output, cwd, datasets, owner)
+        if not self.started:
+            await self.start()
+        wait_start = time.perf_counter()
+        worker = await self._idle.get()
+        self.counters["queue_wait_ms"] += (time.perf_counter() - wait_start) * 1000
+        if not worker.alive:
+            # Died while idle
+            await worker.close()
+            worker = await self._spawn()
+            self.counters["replaced"] += 1
+        try:
+            self.counters["jobs"] += 1
+            return await worker.run(code, timeout, memory_mb, on_output, cwd, datasets, owner)
+        finally:
+            self._release(worker)
+
+    async def detach(self) -> SandboxWorker:
+        """Take a warm worker out of the pool for good; a replacement is started in the background"""
+        if self.size <= 0:
+            worker = SandboxWorker()
+            await worker.start()
+            return worker
+        if not self.started:
+            await self.start()
+        worker = await self._idle.get()
+        if not worker.alive:
+            await worker.close()
+            worker = await self._spawn()
+        self.counters["detached"] += 1
+        task = asyncio.create_task(self._refill())
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
+        return worker
+
+    async def _refill(self):
+        try:
+            self._idle.put_nowait(await self._spawn())
+        except Exception as e:
+            logger.error("Failed to replace sandbox worker", error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        jobs = self.counters["jobs"]
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "max_jobs_per_worker": self.max_jobs,
+            **{key: value for key, value in self.counters.items() if key != "queue_wait_ms"},
+            "avg_queue_wait_ms": round(self.counters["queue_wait_ms"] / jobs, 2) if jobs else 0.0
+        }
+
+    async def close(self):
+        if not self.started:
+            return
+        for task in list(self._replacements):
+            await task
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+        self.started = False
+
+async def execute_cold(
+    code: str,
+    timeout: float,
+    memory_mb: Optional[int] = None,
+    on_output: Optional[OutputCallback] = None,
+    cwd: Optional[str] = None,
+    datasets: Optional[Dict[str, Dict[str, Any]]] = None,
+    owner: str = "anonymous"
+) -> Dict[str, Any]:
+    """Run code in a fresh interpreter with nothing preloaded, the pre-pool behaviour"""
+    worker = SandboxWorker(preload=[])
+    await worker.start()
+    try:
+        return await worker.run(code, timeout, memory_mb, on_output, cwd, datasets, owner)
+    finally:
+        await worker.close()
+
+# Shared across requests, started in the application lifespan
+sandbox_pool = SandboxPool()
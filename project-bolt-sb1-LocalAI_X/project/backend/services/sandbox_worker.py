@@ -0,0 +1,393 @@
+"""
+Warm sandbox worker, run as a standalone interpreter by services.sandbox
+
+The worker imports the whitelisted packages once, then serves jobs read
+from stdin. Every job runs in a freshly forked child with resource limits,
+so jobs share the warm imports but no state. Messages in both directions
+are frames of a 4-byte big-endian length followed by a JSON object:
+
+    -> {"type": "run", "id": ..., "code": ..., "timeout": s, "memory_mb": n, "datasets": {...}}
+    <- {"type": "ready", "pid": ..., "preloaded": [...], "startup_ms": ...}
+    <- {"type": "output", "id": ..., "stream": "stdout"|"stderr", "data": ...}
+    <- {"type": "exit", "id": ..., "exit_code": ..., "timed_out": ..., ...}
+
+A worker can instead be turned into a session with {"type": "session"}:
+from then on jobs run in the worker itself, in one namespace that persists
+between jobs ({"type": "reset"} empties it), under a memory cap for the
+whole session. A session worker is never returned to the pool.
+
+Attached datasets are memory-mapped read-only and handed to the code as
+`datasets[name]`, see `Dataset`. Matplotlib figures left open by a job are
+saved as PNG files in its working directory and closed.
+
+This module must not import anything from the application.
+"""
+
+import codecs
+import importlib
+import json
+import mmap
+import os
+import resource
+import selectors
+import signal
+import struct
+import sys
+import threading
+import time
+import traceback
+
+_HEADER = struct.Struct(">I")
+_READ_SIZE = 65536
+_send_lock = threading.Lock()
+# Datasets a session has mapped, by path; they stay mapped for its lifetime
+_session_datasets = {}
+
+class _SessionTimeout(BaseException):
+    """Raised in session code by SIGALRM; not an Exception so user code cannot swallow it"""
+
+def _send(channel, message):
+    data = json.dumps(message).encode("utf-8")
+    with _send_lock:
+        channel.write(_HEADER.pack(len(data)) + data)
+        channel.flush()
+
+def _receive(source):
+    header = source.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    (size,) = _HEADER.unpack(header)
+    return json.loads(source.read(size))
+
+def _address_space():
+    """Current virtual memory size in bytes, None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+class Dataset:
+    """Read-only view of an attached dataset
+
+    `bytes` is a memoryview of the stored file and `array` (tabular data
+    only) a NumPy memmap; neither copies the data, and every run shares the
+    same pages.
+    """
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.format = spec["format"]
+        self.path = spec["path"]
+        with open(self.path, "rb") as source:
+            size = os.fstat(source.fileno()).st_size
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.bytes = memoryview(self._map)
+        self.array = None
+        if spec.get("array"):
+            import numpy
+            self.array = numpy.load(spec["array"], mmap_mode="r")
+
+    def text(self):
+        return str(self.bytes, "utf-8")
+
+    def json(self):
+        return json.loads(self.text())
+
+    def frame(self):
+        """The array as a pandas DataFrame (a copy)"""
+        import pandas
+        return pandas.DataFrame(self.array if self.array is not None else self.json())
+
+    def __repr__(self):
+        shape = f", shape={self.array.shape}" if self.array is not None else ""
+        return f"<Dataset {self.name!r} {self.format}, {len(self.bytes)} bytes{shape}>"
+
+def _attach(job, cache=None):
+    datasets = {}
+    for name, spec in (job.get("datasets") or {}).items():
+        if cache is not None and spec["path"] in cache:
+            datasets[name] = cache[spec["path"]]
+            continue
+        datasets[name] = Dataset(name, spec)
+        if cache is not None:
+            cache[spec["path"]] = datasets[name]
+    return datasets
+
+def _save_figures():
+    """Save the figures a job left open into its working directory, then close them"""
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    if pyplot is None:
+        return
+    try:
+        for number in pyplot.get_fignums():
+            name = f"figure_{number}.png"
+            suffix = 1
+            while os.path.exists(name):
+                suffix += 1
+                name = f"figure_{number}_{suffix}.png"
+            pyplot.figure(number).savefig(name, format="png")
+        pyplot.close("all")
+    except Exception:
+        traceback.print_exc()
+
+def _run_child(job, out_w, err_w, status_w):
+    """Body of the forked child; never returns"""
+    exit_code = 0
+    try:
+        os.setsid()
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.stderr.reconfigure(line_buffering=True)
+
+        timeout = max(1, int(job["timeout"]))
+        resource.setrlimit(resource.RLIMIT_CPU, (timeout, timeout + 1))
+        # Mapped before the limit is taken, so datasets do not count against it
+        datasets = _attach(job)
+        memory = job["memory_mb"] * 1024 * 1024
+        # The warm imports already occupy address space, the limit is on top of them
+        baseline = _address_space()
+        if baseline is not None:
+            memory += baseline
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        if job.get("cwd"):
+            os.chdir(job["cwd"])
+
+        namespace = {"__name__": "__main__", "__builtins__": __builtins__, "datasets": datasets}
+        exec(compile(job["code"], "<sandbox>", "exec"), namespace)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException as e:
+        exit_code = 1
+        try:
+            # Without the worker's own frame
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+            os.write(status_w, json.dumps({"type": type(e).__name__, "message": str(e)}).encode("utf-8"))
+        except BaseException:
+            pass
+    finally:
+        _save_figures()
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except BaseException:
+            pass
+        os._exit(exit_code)
+
+def run_job(job, channel, source):
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    status_r, status_w = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        os.close(status_r)
+        os.close(channel.fileno())
+        os.close(source.fileno())
+        _run_child(job, out_w, err_w, status_w)
+    os.close(out_w)
+    os.close(err_w)
+    os.close(status_w)
+    # The child leads its own process group, which the parent kills if it abandons the job
+    _send(channel, {"type": "started", "id": job["id"], "pid": pid})
+
+    deadline = start + job["timeout"]
+    decoders = {
+        out_r: ("stdout", codecs.getincrementaldecoder("utf-8")("replace")),
+        err_r: ("stderr", codecs.getincrementaldecoder("utf-8")("replace"))
+    }
+    timed_out = False
+    with selectors.DefaultSelector() as selector:
+        for fd in decoders:
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                timed_out = True
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                break
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, _READ_SIZE)
+                stream, decoder = decoders[key.fd]
+                if not data:
+                    selector.unregister(key.fd)
+                    text = decoder.decode(b"", final=True)
+                else:
+                    text = decoder.decode(data)
+                if text:
+                    _send(channel, {"type": "output", "id": job["id"], "stream": stream, "data": text})
+
+    _, wait_status, usage = os.wait4(pid, 0)
+    # Grandchildren may still hold the pipes open
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    with os.fdopen(status_r, "rb") as status_file:
+        status = status_file.read()
+    os.close(out_r)
+    os.close(err_r)
+
+    exit_code = os.waitstatus_to_exitcode(wait_status)
+    error = json.loads(status) if status else None
+    if error is None and exit_code < 0:
+        name = signal.Signals(-exit_code).name
+        if name == "SIGXCPU":
+            error = {"type": "TimeoutError", "message": "CPU time limit exceeded"}
+        else:
+            error = {"type": "Killed", "message": f"Terminated by {name}"}
+    _send(channel, {
+        "type": "exit",
+        "id": job["id"],
+        "exit_code": exit_code,
+        "timed_out": timed_out,
+        "error": error,
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 4),
+        "max_rss_kb": usage.ru_maxrss,
+        "wall_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+def _forward(fd, stream, job_id, channel):
+    """Send everything written to a pipe as output frames until it is closed"""
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    with os.fdopen(fd, "rb", buffering=0) as pipe:
+        while True:
+            data = pipe.read(_READ_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                _send(channel, {"type": "output", "id": job_id, "stream": stream, "data": text})
+            if not data:
+                return
+
+def _raise_timeout(signum, frame):
+    raise _SessionTimeout()
+
+def start_session(message):
+    """Cap the memory of this worker for the rest of its life as a session"""
+    memory = message["memory_mb"] * 1024 * 1024
+    baseline = _address_space()
+    if baseline is not None:
+        memory += baseline
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    return {"__name__": "__main__", "__builtins__": __builtins__}
+
+def run_in_session(job, channel, namespace):
+    """Run a job in the session namespace, with output piped to forwarding threads"""
+    start = time.perf_counter()
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = (os.dup(1), os.dup(2))
+    readers = []
+    for target, stream in ((1, "stdout"), (2, "stderr")):
+        read_fd, write_fd = os.pipe()
+        os.dup2(write_fd, target)
+        os.close(write_fd)
+        reader = threading.Thread(target=_forward, args=(read_fd, stream, job["id"], channel), daemon=True)
+        reader.start()
+        readers.append(reader)
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+
+    exit_code = 0
+    timed_out = False
+    error = None
+    if job.get("cwd"):
+        os.chdir(job["cwd"])
+    # CPU time is cumulative for the process, so the soft limit moves with every job
+    used = before.ru_utime + before.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (int(used + job["timeout"]) + 1, hard))
+    signal.setitimer(signal.ITIMER_REAL, job["timeout"])
+    try:
+        # Mappings of a session count against its memory cap
+        namespace["datasets"] = _attach(job, _session_datasets)
+        exec(compile(job["code"], "<sandbox>", "exec"), namespace)
+    except _SessionTimeout:
+        exit_code = 1
+        timed_out = True
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException as e:
+        exit_code = 1
+        error = {"type": type(e).__name__, "message": str(e)}
+        try:
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        except BaseException:
+            pass
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _save_figures()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Restoring the descriptors closes the pipes, which ends the readers
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(saved[0])
+        os.close(saved[1])
+        for reader in readers:
+            reader.join()
+
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    _send(channel, {
+        "type": "exit",
+        "id": job["id"],
+        "exit_code": exit_code,
+        "timed_out": timed_out,
+        "error": error,
+        "cpu_seconds": round(after.ru_utime + after.ru_stime - used, 4),
+        "max_rss_kb": after.ru_maxrss,
+        "wall_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+def main():
+    start = time.perf_counter()
+    # Frames go over a private copy of stdout; stray prints land on stderr
+    channel = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    source = os.fdopen(os.dup(0), "rb")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+    preloaded = []
+    for name in json.loads(sys.argv[1]) if len(sys.argv) > 1 else []:
+        try:
+            importlib.import_module(name)
+            preloaded.append(name)
+        except Exception:
+            pass
+    _send(channel, {
+        "type": "ready",
+        "pid": os.getpid(),
+        "preloaded": preloaded,
+        "startup_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+    namespace = None
+    while True:
+        message = _receive(source)
+        if message is None or message.get("type") == "stop":
+            break
+        if message.get("type") == "session":
+            namespace = start_session(message)
+            _send(channel, {"type": "session"})
+        elif message.get("type") == "reset" and namespace is not None:
+            namespace.clear()
+            namespace.update({"__name__": "__main__", "__builtins__": __builtins__})
+            _send(channel, {"type": "reset"})
+        elif message.get("type") == "run":
+            if namespace is not None:
+                run_in_session(message, channel, namespace)
+            else:
+                run_job(message, channel, source)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Cosine similarity matrices, nearest pairs and clustering of embeddings
+
+All kernels work on L2-normalized float32 rows and walk the N x N
+similarity space in row blocks of ``block_size``, so apart from the full
+matrix itself (and agglomerative clustering, which needs it) memory stays
+at O(block_size * N).
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import numpy as np
+import structlog
+
+from core.config import settings
+from services.ollama_client import OllamaService
+from services.vector_store import VectorStoreService
+
+logger = structlog.get_logger()
+
+def normalize(vectors: Any) -> np.ndarray:
+    """Rows scaled to unit length (zero rows stay zero)"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        raise ValueError("Expected a list of equally sized vectors")
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def similarity_matrix(vectors: np.ndarray, block_size: int = 1024) -> np.ndarray:
+    """Full N x N cosine similarity matrix"""
+    matrix = np.empty((len(vectors), len(vectors)), dtype=np.float32)
+    for start in range(0, len(vectors), block_size):
+        matrix[start:start + block_size] = vectors[start:start + block_size] @ vectors.T
+    return matrix
+
+def top_pairs(
+    vectors: np.ndarray,
+    k: int,
+    min_score: Optional[float] = None,
+    block_size: int = 1024
+) -> List[Tuple[int, int, float]]:
+    """The k most similar (i, j) pairs with i < j, best first"""
+    n = len(vectors)
+    best_scores = np.empty(0, dtype=np.float32)
+    best_pairs = np.empty((0, 2), dtype=np.int64)
+    for start in range(0, n, block_size):
+        # Only the upper triangle: columns from `start` on, self-pairs masked
+        block = vectors[start:start + block_size] @ vectors[start:].T
+        rows = len(block)
+        width = block.shape[1]
+        block[np.tril_indices(rows, 0, width)] = -np.inf
+        flat = block.ravel()
+        take = min(k, flat.size)
+        if take == 0:
+            continue
+        candidates = np.argpartition(flat, -take)[-take:]
+        candidates = candidates[np.isfinite(flat[candidates])]
+        best_scores = np.concatenate([best_scores, flat[candidates]])
+        best_pairs = np.concatenate([
+            best_pairs,
+            np.stack([start + candidates // width, start + candidates % width], axis=1)
+        ])
+        if len(best_scores) > k:
+            keep = np.argpartition(best_scores, -k)[-k:]
+            best_scores, best_pairs = best_scores[keep], best_pairs[keep]
+
+    order = np.argsort(-best_scores, kind="stable")
+    pairs = [(int(i), int(j), float(score)) for (i, j), score in zip(best_pairs[order], best_scores[order])]
+    if min_score is not None:
+        pairs = [pair for pair in pairs if pair[2] >= min_score]
+    return pairs
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest centroid of every row and its similarity"""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_size):
+        similarity = vectors[start:start + block_size] @ centroids.T
+        labels[start:start + block_size] = similarity.argmax(axis=1)
+        scores[start:start + block_size] = similarity.max(axis=1)
+    return labels, scores
+
+def kmeans(
+    vectors: np.ndarray,
+    k: int,
+    max_iterations: int = 50,
+    seed: int = 0,
+    block_size: int = 1024
+) -> np.ndarray:
+    """Spherical k-means (cosine) with k-means++ seeding, returns a label per row"""
+    n = len(vectors)
+    if not 0 < k <= n:
+        raise ValueError(f"Cannot form {k} clusters from {n} items")
+    rng = np.random.default_rng(seed)
+
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.integers(n)]
+    distance = 1 - vectors @ centroids[0]
+    for c in range(1, k):
+        weights = np.maximum(distance, 0)
+        total = weights.sum()
+        index = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids[c] = vectors[index]
+        distance = np.minimum(distance, 1 - vectors @ centroids[c])
+
+    labels = None
+    for _ in range(max_iterations):
+        new_labels, scores = _assign(vectors, centroids, block_size)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.flatnonzero(np.bincount(labels, minlength=k) == 0)
+        # Empty clusters restart at the points that fit their cluster worst
+        for c, index in zip(empty, np.argsort(scores)[:len(empty)]):
+            sums[c] = vectors[index]
+        centroids = normalize(sums)
+    return labels
+
+def agglomerative(
+    vectors: np.ndarray,
+    n_clusters: Optional[int] = None,
+    threshold: Optional[float] = None,
+    block_size: int = 1024
+) -> np.ndarray:
+    """Average-linkage clustering, returns a label per row
+
+    Merges the two most similar clusters until `n_clusters` remain or no
+    pair is at least `threshold` similar. Needs the full similarity matrix.
+    """
+    n = len(vectors)
+    if n_clusters is None and threshold is None:
+        raise ValueError("Agglomerative clustering needs n_clusters or a threshold")
+    if n_clusters is not None and not 0 < n_clusters <= n:
+        raise ValueError(f"Cannot form {n_clusters} clusters from {n} items")
+    target = n_clusters or 1
+    floor = threshold if threshold is not None else -np.inf
+
+    similarity = similarity_matrix(vectors, block_size).astype(np.float64)
+    np.fill_diagonal(similarity, -np.inf)
+    sizes = np.ones(n)
+    parent = np.arange(n)
+    active = np.ones(n, dtype=bool)
+    row_best = similarity.argmax(axis=1)
+
+    clusters = n
+    while clusters > target:
+        row_scores = similarity[np.arange(n), row_best]
+        row_scores[~active] = -np.inf
+        i = int(row_scores.argmax())
+        j = int(row_best[i])
+        if row_scores[i] < floor or not np.isfinite(row_scores[i]):
+            break
+        # Lance-Williams update for average linkage, j is merged into i
+        merged = (sizes[i] * similarity[i] + sizes[j] * similarity[j]) / (sizes[i] + sizes[j])
+        merged[i] = -np.inf
+        merged[~active] = -np.inf
+        similarity[i] = merged
+        similarity[:, i] = merged
+        similarity[j] = -np.inf
+        similarity[:, j] = -np.inf
+        sizes[i] += sizes[j]
+        active[j] = False
+        parent[parent == j] = i
+        clusters -= 1
+
+        stale = active & ((row_best == i) | (row_best == j))
+        stale[i] = True
+        for row in np.flatnonzero(stale):
+            row_best[row] = similarity[row].argmax()
+        improved = active & (merged > similarity[np.arange(n), row_best])
+        row_best[improved] = i
+
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels
+
+def describe_clusters(vectors: np.ndarray, labels: np.ndarray) -> List[Dict[str, Any]]:
+    """Members of each cluster, largest first, with the member closest to its centroid"""
+    clusters = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        centroid = normalize(vectors[members].sum(axis=0, keepdims=True))[0]
+        cohesion = vectors[members] @ centroid
+        clusters.append({
+            "members": members.tolist(),
+            "size": len(members),
+            "representative": int(members[cohesion.argmax()]),
+            "cohesion": round(float(cohesion.mean()), 4)
+        })
+    clusters.sort(key=lambda cluster: cluster["size"], reverse=True)
+    for index, cluster in enumerate(clusters):
+        cluster["label"] = index
+    return clusters
+
+class SimilarityService:
+    """Embeds or fetches the items of a similarity request and runs the kernels off the event loop"""
+
+    def __init__(
+        self,
+        ollama_service: Optional[OllamaService] = None,
+        vector_service: Optional[VectorStoreService] = None
+    ):
+        self.ollama_service = ollama_service or OllamaService()
+        self.vector_service = vector_service or VectorStoreService()
+
+    async def vectors(
+        self,
+        texts: Optional[List[str]] = None,
+        ids: Optional[List[str]] = None,
+        collection: Optional[str] = None,
+        model: Optional[str] = None,
+        vector: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """(items, normalized vectors) for texts followed by stored points
+
+        Texts are embedded through the embedding cache. With stored points
+        (or an explicit collection) texts use the collection's model and
+        reduction, so both kinds are comparable.
+        """
+        texts = texts or []
+        ids = ids or []
+        if not texts and not ids:
+            raise ValueError("Give texts, stored point ids, or both")
+        if len(texts) + len(ids) > settings.SIMILARITY_MAX_ITEMS:
+            raise ValueError(f"At most {settings.SIMILARITY_MAX_ITEMS} items can be compared at once")
+
+        collection_name = vector_name = None
+        embedding_model = model or settings.EMBEDDING_MODEL
+        if ids or collection:
+            collection_name, vector_name, embedding_model = await self.vector_service.query_target(
+                collection, model, vector
+            )
+
+        rows = []
+        if texts:
+            embeddings = await self.ollama_service.generate_embeddings(texts, embedding_model)
+            if collection_name:
+                embeddings = [
+                    await self.vector_service.reduce_vector(embedding, collection_name) for embedding in embeddings
+                ]
+            rows.extend(embeddings)
+        if ids:
+            stored = await self.vector_service.get_vectors(ids, collection_name=collection_name, vector_name=vector_name)
+            stored = {str(doc_id): values for doc_id, values in stored.items()}
+            missing = [doc_id for doc_id in ids if str(doc_id) not in stored]
+            if missing:
+                raise ValueError(f"Points not found in {collection_name}: {', '.join(map(str, missing[:10]))}")
+            rows.extend(stored[str(doc_id)] for doc_id in ids)
+
+        items = [{"index": i, "text": text} for i, text in enumerate(texts)]
+        items.extend({"index": len(texts) + i, "id": doc_id} for i, doc_id in enumerate(ids))
+        return items, normalize(rows)
+
+    @staticmethod
+    async def matrix(vectors: np.ndarray) -> np.ndarray:
+        if len(vectors) > settings.SIMILARITY_MAX_MATRIX:
+            raise ValueError(
+                f"A full matrix is limited to {settings.SIMILARITY_MAX_MATRIX} items, use nearest pairs or clusters"
+            )
+        return await asyncio.to_thread(similarity_matrix, vectors, settings.SIMILARITY_BLOCK_SIZE)
+
+    @staticmethod
+    async def pairs(vectors: np.ndarray, k: int, min_score: Optional[float] = None) -> List[Tuple[int, int, float]]:
+        return await asyncio.to_thread(top_pairs, vectors, k, min_score, settings.SIMILARITY_BLOCK_SIZE)
+
+    @staticmethod
+    async def clusters(
+        vectors: np.ndarray,
+        method: str,
+        n_clusters: Optional[int] = None,
+        threshold: Optional[float] = None,
+        max_iterations: int = 50
+    ) -> List[Dict[str, Any]]:
+        if method == "kmeans":
+            if n_clusters is None:
+                raise ValueError("k-means needs n_clusters")
+            labels = await asyncio.to_thread(
+                kmeans, vectors, n_clusters, max_iterations, 0, settings.SIMILARITY_BLOCK_SIZE
+            )
+        else:
+            if len(vectors) > settings.SIMILARITY_MAX_MATRIX:
+                raise ValueError(
+                    f"Agglomerative clustering is limited to {settings.SIMILARITY_MAX_MATRIX} items, use kmeans"
+                )
+            labels = await asyncio.to_thread(
+                agglomerative, vectors, n_clusters, threshold, settings.SIMILARITY_BLOCK_SIZE
+            )
+        return await asyncio.to_thread(describe_clusters, vectors, labels)
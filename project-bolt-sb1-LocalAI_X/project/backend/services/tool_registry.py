@@ -0,0 +1,320 @@
+"""
+Process-wide registry of the tools models can call
+
+Holds the built-in tools and every function of the installed plugins by
+name, so a tool call is one dict lookup. Loaded at startup from the
+``plugin_registry`` table and PLUGINS_DIRECTORY: a plugin is a ``.json``
+definition or a ``.py`` file with ``PLUGIN_INFO``, and plugins disabled in
+the table are skipped. Changes build a new mapping and swap it in whole,
+so concurrent requests always see either the old or the new set of tools.
+"""
+
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+import asyncio
+import json
+import structlog
+
+from core.config import settings
+from core.database import PluginRegistry, SessionLocal
+from services.plugin_loader import plugin_modules
+
+logger = structlog.get_logger()
+
+PluginHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+# Executed by FunctionCallingService; "streams_output" tools accept an on_output callback
+BUILTIN_TOOLS = [
+    {
+        "name": "calculator",
+        "description": "Perform mathematical calculations",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "expression": {
+                    "type": "string",
+                    "description": "Mathematical expression to evaluate (e.g., '2+2', '10*5', 'sqrt(16)')"
+                }
+            },
+            "required": ["expression"]
+        }
+    },
+    {
+        "name": "weather",
+        "description": "Get weather information for a location",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "location": {
+                    "type": "string",
+                    "description": "Location to get weather for (e.g., 'New York', 'London')"
+                }
+            },
+            "required": ["location"]
+        }
+    },
+    {
+        "name": "search",
+        "description": "Search for information on the web",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Search query"
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "code_interpreter",
+        "description": "Execute Python code in a secure sandbox",
+        "streams_output": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "code": {
+                    "type": "string",
+                    "description": "Python code to execute"
+                },
+                "language": {
+                    "type": "string",
+                    "description": "Programming language (currently only 'python')",
+                    "default": "python"
+                }
+            },
+            "required": ["code"]
+        }
+    }
+]
+
+class PluginError(ValueError):
+    """Raised for a plugin definition that cannot be registered"""
+
+def plugin_definition(plugin_path: Path) -> Optional[Dict[str, Any]]:
+    """Load plugin information from file"""
+    try:
+        if plugin_path.suffix == ".json":
+            # JSON plugin definition
+            with open(plugin_path, "r") as f:
+                return json.load(f)
+        
+        elif plugin_path.suffix == ".py":
+            # Python plugin file, imported once per version
+            module = plugin_modules.load(str(plugin_path), plugin_path.stem)
+            
+            # Look for plugin metadata
+            if hasattr(module, "PLUGIN_INFO"):
+                return module.PLUGIN_INFO
+            else:
+                # Generate basic info
+                return {
+                    "name": plugin_path.stem,
+                    "version": "1.0.0",
+                    "description": getattr(module, "__doc__", "No description"),
+                    "author": "Unknown",
+                    "functions": []
+                }
+        
+        return None
+        
+    except Exception as e:
+        logger.error("Failed to load plugin info", plugin=plugin_path.name, error=str(e))
+        return None
+
+def plugin_function(plugin_name: str, function_name: str) -> PluginHandler:
+    """Create a plugin function wrapper"""
+    
+    async def run_plugin_function(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute plugin function"""
+        try:
+            # Load plugin module
+            plugins_dir = Path(settings.PLUGINS_DIRECTORY)
+            plugin_path = plugins_dir / f"{plugin_name}.py"
+            
+            if not plugin_path.exists():
+                plugin_modules.evict(str(plugin_path))
+                return {"error": f"Plugin {plugin_name} not found", "success": False}
+            
+            # Imported on first use and again only when the file changes
+            module = plugin_modules.load(str(plugin_path), plugin_name)
+            
+            # Get function
+            if hasattr(module, function_name):
+                func = getattr(module, function_name)
+                
+                # Execute function
+                if asyncio.iscoroutinefunction(func):
+                    result = await func(arguments)
+                else:
+                    result = func(arguments)
+                
+                return {"result": result, "success": True}
+            else:
+                return {"error": f"Function {function_name} not found in plugin", "success": False}
+            
+        except Exception as e:
+            logger.error("Plugin function execution failed", 
+                        plugin=plugin_name, function=function_name, error=str(e))
+            return {"error": str(e), "success": False}
+    
+    return run_plugin_function
+
+class ToolRegistry:
+    """Tools by name, shared across requests
+
+    Tool specs are dicts with name, description, parameters and plugin
+    (None for built-in tools); plugin tools also carry their handler.
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, Dict[str, Any]] = {
+            tool["name"]: {**tool, "plugin": None} for tool in BUILTIN_TOOLS
+        }
+        self._plugins: Dict[str, Dict[str, Any]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self.loaded = False
+
+    def _update_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    # -- persistence -----------------------------------------------------
+
+    @staticmethod
+    def _read_rows() -> Dict[str, bool]:
+        """Enabled flag of every plugin in the table"""
+        db = SessionLocal()
+        try:
+            return {row.name: row.enabled for row in db.query(PluginRegistry).all()}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _write_row(plugin: Dict[str, Any]) -> bool:
+        """Record a plugin, keeping the enabled flag of an existing row, and return that flag"""
+        db = SessionLocal()
+        try:
+            row = db.query(PluginRegistry).filter(PluginRegistry.name == plugin["name"]).first()
+            if row is None:
+                row = PluginRegistry(name=plugin["name"], enabled=True)
+                db.add(row)
+            row.version = plugin.get("version")
+            row.description = plugin.get("description")
+            row.author = plugin.get("author")
+            db.commit()
+            return bool(row.enabled)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _delete_row(name: str):
+        db = SessionLocal()
+        try:
+            db.query(PluginRegistry).filter(PluginRegistry.name == name).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _scan_directory() -> List[Dict[str, Any]]:
+        plugins_dir = Path(settings.PLUGINS_DIRECTORY)
+        if not plugins_dir.exists():
+            return []
+        definitions = {}
+        # A .py plugin wins over a .json definition of the same name
+        for plugin_path in sorted(plugins_dir.glob("*.json")) + sorted(plugins_dir.glob("*.py")):
+            definition = plugin_definition(plugin_path)
+            if definition and definition.get("name"):
+                definitions[definition["name"]] = definition
+        return list(definitions.values())
+
+    # -- registration ----------------------------------------------------
+
+    def _with_plugin(self, tools: Dict[str, Dict[str, Any]], plugin: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """`tools` with the functions of `plugin` replacing any it registered before"""
+        tools = {name: tool for name, tool in tools.items() if tool["plugin"] != plugin["name"]}
+        for function in plugin.get("functions") or []:
+            name = function.get("name")
+            if not name:
+                raise PluginError(f"A function of plugin {plugin['name']} has no name")
+            if name in tools:
+                owner = tools[name]["plugin"] or "the built-in tools"
+                raise PluginError(f"Tool {name} of plugin {plugin['name']} is already provided by {owner}")
+            tools[name] = {
+                "name": name,
+                "description": function.get("description", ""),
+                "parameters": function.get("parameters", {"type": "object", "properties": {}}),
+                "plugin": plugin["name"],
+                "handler": plugin_function(plugin["name"], name)
+            }
+        return tools
+
+    async def load(self):
+        """Register the plugins found in PLUGINS_DIRECTORY unless disabled in the table"""
+        async with self._update_lock():
+            enabled = await asyncio.to_thread(self._read_rows)
+            definitions = await asyncio.to_thread(self._scan_directory)
+            tools = {name: tool for name, tool in self._tools.items() if tool["plugin"] is None}
+            plugins = {}
+            for plugin in definitions:
+                if not enabled.get(plugin["name"], True):
+                    continue
+                try:
+                    tools = self._with_plugin(tools, plugin)
+                except PluginError as e:
+                    logger.warning("Skipped plugin", plugin=plugin["name"], error=str(e))
+                    continue
+                plugins[plugin["name"]] = plugin
+                if plugin["name"] not in enabled:
+                    await asyncio.to_thread(self._write_row, plugin)
+            self._tools, self._plugins = tools, plugins
+            self.loaded = True
+        logger.info("Loaded tool registry", tools=len(self._tools), plugins=len(self._plugins))
+
+    async def register_plugin(self, plugin: Dict[str, Any]) -> bool:
+        """Add or replace a plugin and its tools, and record it in the table
+
+        A plugin disabled in the table is recorded but its tools are not
+        registered. Returns whether the plugin is enabled.
+        """
+        async with self._update_lock():
+            tools = self._with_plugin(self._tools, plugin)
+            enabled = await asyncio.to_thread(self._write_row, plugin)
+            if not enabled:
+                self._tools = {key: tool for key, tool in self._tools.items() if tool["plugin"] != plugin["name"]}
+                self._plugins = {key: known for key, known in self._plugins.items() if key != plugin["name"]}
+                logger.info("Plugin is disabled, tools not registered", plugin=plugin["name"])
+                return False
+            self._tools = tools
+            self._plugins = {**self._plugins, plugin["name"]: plugin}
+            return True
+
+    async def unregister_plugin(self, name: str) -> bool:
+        """Remove a plugin's tools and its table row; False if it was not registered"""
+        async with self._update_lock():
+            known = name in self._plugins
+            await asyncio.to_thread(self._delete_row, name)
+            self._tools = {key: tool for key, tool in self._tools.items() if tool["plugin"] != name}
+            self._plugins = {key: plugin for key, plugin in self._plugins.items() if key != name}
+            return known
+
+    # -- lookup ----------------------------------------------------------
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._tools.get(name)
+
+    @staticmethod
+    def describe(tool: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in tool.items() if key != "handler"}
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [self.describe(tool) for tool in self._tools.values()]
+
+    def plugins(self) -> List[Dict[str, Any]]:
+        return list(self._plugins.values())
+
+# Shared across requests, loaded in the application lifespan
+tool_registry = ToolRegistry()
@@ -0,0 +1,431 @@
+"""
+Pluggable storage backends for the vector store
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple
+import structlog
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from core.config import settings
+from services.payload_filter import parse_filters
+
+logger = structlog.get_logger()
+
+class VectorBackend(ABC):
+    """Storage and similarity search primitives used by VectorStoreService
+
+    Points are plain dicts: ``{"id": str, "vector": List[float], "payload": dict}``.
+    Search hits are ``{"id": str, "score": float, "metadata": dict}``.
+    Collections created with named ``vectors`` take ``{name: List[float]}``
+    as the point vector and are searched by ``vector_name``.
+    ``filters`` arguments use the format parsed by
+    ``services.payload_filter.parse_filters`` (equality, ``in`` lists and
+    numeric ranges) and are applied inside the search.
+
+    Collections may be created with ``quantization`` set to ``"scalar"``
+    (int8) or ``"binary"``: searches then scan the compact codes, take
+    ``limit * oversampling`` candidates and rescore them with the
+    full-precision vectors, which stay on disk.
+    """
+
+    @abstractmethod
+    async def health_check(self) -> bool:
+        """Check if the backend is reachable"""
+
+    @abstractmethod
+    async def list_collections(self) -> List[str]:
+        """Names of existing collections"""
+
+    @abstractmethod
+    async def create_collection(
+        self,
+        name: str,
+        vector_size: Optional[int],
+        distance: str = "cosine",
+        quantization: Optional[str] = None,
+        vectors: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        """Create a collection (distance is cosine, dot or euclid)
+
+        ``vectors`` maps vector names to ``{"size": int, "distance": str}`` for
+        collections holding several embeddings per point; ``vector_size`` and
+        ``distance`` are then ignored.
+        """
+
+    @abstractmethod
+    async def delete_collection(self, name: str):
+        """Drop a collection and all its points"""
+
+    @abstractmethod
+    async def upsert(self, collection: str, points: List[Dict[str, Any]]):
+        """Insert or overwrite points"""
+
+    @abstractmethod
+    async def search(
+        self,
+        collection: str,
+        vector: List[float],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        oversampling: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Nearest neighbours of a vector"""
+
+    @abstractmethod
+    async def search_batch(self, collection: str, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Several searches in one round trip
+
+        Each request is a dict with ``vector`` and optional ``limit``,
+        ``score_threshold``, ``oversampling``, ``filters`` and
+        ``vector_name``; results are returned in request order.
+        """
+
+    @abstractmethod
+    async def retrieve(
+        self,
+        collection: str,
+        ids: List[str],
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch points by ID, missing IDs are left out
+
+        With ``with_vectors`` each point also carries its ``vector`` (the
+        named vector ``vector_name`` in multi-vector collections).
+        """
+
+    @abstractmethod
+    async def scroll(
+        self,
+        collection: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 256,
+        offset: Optional[Any] = None,
+        with_payload: Any = True,
+        with_vectors: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[Any]]:
+        """Page through points, returns (points, next offset or None)
+
+        With ``with_vectors`` each point carries its ``vector``: a list, or a
+        dict by vector name in multi-vector collections.
+        """
+
+    @abstractmethod
+    async def count(self, collection: str, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Number of points, optionally only those matching filters"""
+
+    @abstractmethod
+    async def create_payload_index(self, collection: str, field: str, field_type: str):
+        """Index a payload field (keyword, integer, float or bool) to speed up filters on it"""
+
+    @abstractmethod
+    async def delete(self, collection: str, ids: List[str]):
+        """Delete points by ID"""
+
+    @abstractmethod
+    async def collection_info(self, collection: str) -> Dict[str, Any]:
+        """Size and configuration of a collection, including ``payload_indexes``"""
+
+class QdrantBackend(VectorBackend):
+    """Backend talking to a Qdrant server"""
+
+    DISTANCES = {
+        "cosine": models.Distance.COSINE,
+        "dot": models.Distance.DOT,
+        "euclid": models.Distance.EUCLID
+    }
+
+    QUANTIZATION = {
+        "scalar": models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        ),
+        "binary": models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    }
+
+    PAYLOAD_SCHEMAS = {
+        "keyword": models.PayloadSchemaType.KEYWORD,
+        "integer": models.PayloadSchemaType.INTEGER,
+        "float": models.PayloadSchemaType.FLOAT,
+        "bool": models.PayloadSchemaType.BOOL
+    }
+
+    def __init__(self, client: Optional[AsyncQdrantClient] = None):
+        self.client = client or AsyncQdrantClient(
+            host=settings.QDRANT_HOST,
+            port=settings.QDRANT_PORT,
+            api_key=settings.QDRANT_API_KEY,
+            https=settings.QDRANT_USE_HTTPS
+        )
+
+    @staticmethod
+    def _filter(filters: Optional[Dict[str, Any]]) -> Optional[models.Filter]:
+        conditions = parse_filters(filters)
+        if not conditions:
+            return None
+        must = []
+        for condition in conditions:
+            if condition.op == "range":
+                must.append(models.FieldCondition(key=condition.field, range=models.Range(**condition.value)))
+            elif condition.op == "in":
+                if all(isinstance(value, str) for value in condition.value) or all(
+                    isinstance(value, int) and not isinstance(value, bool) for value in condition.value
+                ):
+                    must.append(models.FieldCondition(key=condition.field, match=models.MatchAny(any=condition.value)))
+                else:
+                    # MatchAny takes only strings or only integers
+                    must.append(models.Filter(should=[
+                        QdrantBackend._equals(condition.field, value) for value in condition.value
+                    ]))
+            else:
+                must.append(QdrantBackend._equals(condition.field, condition.value))
+        return models.Filter(must=must)
+
+    @staticmethod
+    def _equals(field: str, value: Any) -> models.FieldCondition:
+        if isinstance(value, float):
+            # MatchValue has no float variant, a closed range is exact equality
+            return models.FieldCondition(key=field, range=models.Range(gte=value, lte=value))
+        return models.FieldCondition(key=field, match=models.MatchValue(value=value))
+
+    async def health_check(self) -> bool:
+        await self.client.get_collections()
+        return True
+
+    async def list_collections(self) -> List[str]:
+        collections = await self.client.get_collections()
+        return [col.name for col in collections.collections]
+
+    async def create_collection(
+        self,
+        name: str,
+        vector_size: Optional[int],
+        distance: str = "cosine",
+        quantization: Optional[str] = None,
+        vectors: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        def params(size: int, metric: str) -> models.VectorParams:
+            return models.VectorParams(
+                size=size,
+                distance=self.DISTANCES[metric],
+                # Quantized codes stay in RAM, originals are only read to rescore
+                on_disk=True if quantization else None
+            )
+
+        await self.client.create_collection(
+            collection_name=name,
+            vectors_config=(
+                {
+                    vector_name: params(config["size"], config.get("distance", "cosine"))
+                    for vector_name, config in vectors.items()
+                }
+                if vectors else params(vector_size, distance)
+            ),
+            quantization_config=self.QUANTIZATION[quantization] if quantization else None
+        )
+
+    async def delete_collection(self, name: str):
+        await self.client.delete_collection(collection_name=name)
+
+    async def upsert(self, collection: str, points: List[Dict[str, Any]]):
+        await self.client.upsert(
+            collection_name=collection,
+            points=[
+                models.PointStruct(
+                    id=point["id"],
+                    vector=point["vector"],
+                    payload=point["payload"]
+                )
+                for point in points
+            ]
+        )
+
+    async def search(
+        self,
+        collection: str,
+        vector: List[float],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        oversampling: Optional[float] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        search_result = await self.client.search(
+            collection_name=collection,
+            query_vector=self._query_vector(vector, vector_name),
+            query_filter=self._filter(filters),
+            limit=limit,
+            score_threshold=score_threshold,
+            search_params=self._search_params(oversampling)
+        )
+        return self._hits(search_result)
+
+    async def search_batch(self, collection: str, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        batch_result = await self.client.search_batch(
+            collection_name=collection,
+            requests=[
+                models.SearchRequest(
+                    vector=self._query_vector(request["vector"], request.get("vector_name")),
+                    filter=self._filter(request.get("filters")),
+                    limit=request.get("limit", 10),
+                    score_threshold=request.get("score_threshold"),
+                    params=self._search_params(request.get("oversampling")),
+                    with_payload=True
+                )
+                for request in requests
+            ]
+        )
+        return [self._hits(search_result) for search_result in batch_result]
+
+    @staticmethod
+    def _query_vector(vector: List[float], vector_name: Optional[str]):
+        return models.NamedVector(name=vector_name, vector=vector) if vector_name else vector
+
+    @staticmethod
+    def _search_params(oversampling: Optional[float]) -> models.SearchParams:
+        # Ignored by Qdrant for collections without quantization
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                rescore=True,
+                oversampling=oversampling or settings.VECTOR_QUANTIZATION_OVERSAMPLING
+            )
+        )
+
+    @staticmethod
+    def _hits(search_result) -> List[Dict[str, Any]]:
+        return [
+            {"id": str(hit.id), "score": hit.score, "metadata": hit.payload}
+            for hit in search_result
+        ]
+
+    async def retrieve(
+        self,
+        collection: str,
+        ids: List[str],
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        vector_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        records = await self.client.retrieve(
+            collection_name=collection,
+            ids=ids,
+            with_payload=with_payload,
+            with_vectors=([vector_name] if vector_name else True) if with_vectors else False
+        )
+        points = []
+        for record in records:
+            point = {"id": str(record.id), "payload": record.payload}
+            if with_vectors:
+                vector = record.vector
+                if isinstance(vector, dict):
+                    vector = vector.get(vector_name) if vector_name else next(iter(vector.values()), None)
+                point["vector"] = vector
+            points.append(point)
+        return points
+
+    async def scroll(
+        self,
+        collection: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 256,
+        offset: Optional[Any] = None,
+        with_payload: Any = True,
+        with_vectors: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[Any]]:
+        records, next_offset = await self.client.scroll(
+            collection_name=collection,
+            scroll_filter=self._filter(filters),
+            limit=limit,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=with_vectors
+        )
+        points = []
+        for record in records:
+            point = {"id": str(record.id), "payload": record.payload}
+            if with_vectors:
+                point["vector"] = record.vector
+            points.append(point)
+        return points, next_offset
+
+    async def count(self, collection: str, filters: Optional[Dict[str, Any]] = None) -> int:
+        result = await self.client.count(
+            collection_name=collection,
+            count_filter=self._filter(filters),
+            exact=True
+        )
+        return result.count
+
+    async def create_payload_index(self, collection: str, field: str, field_type: str):
+        await self.client.create_payload_index(
+            collection_name=collection,
+            field_name=field,
+            field_schema=self.PAYLOAD_SCHEMAS[field_type]
+        )
+
+    async def delete(self, collection: str, ids: List[str]):
+        await self.client.delete(
+            collection_name=collection,
+            points_selector=models.PointIdsList(points=ids)
+        )
+
+    async def collection_info(self, collection: str) -> Dict[str, Any]:
+        info = await self.client.get_collection(collection_name=collection)
+        quantization = info.config.quantization_config
+        if isinstance(quantization, models.ScalarQuantization):
+            quantization = "scalar"
+        elif isinstance(quantization, models.BinaryQuantization):
+            quantization = "binary"
+        elif quantization is not None:
+            quantization = "product"
+        vectors = info.config.params.vectors
+        if isinstance(vectors, dict):
+            config = {
+                "vector_size": None,
+                "distance": None,
+                "vectors": {
+                    vector_name: {"size": params.size, "distance": params.distance.value.lower()}
+                    for vector_name, params in vectors.items()
+                }
+            }
+        else:
+            config = {"vector_size": vectors.size, "distance": vectors.distance.value.lower(), "vectors": None}
+        config["quantization"] = quantization
+        return {
+            "name": collection,
+            "vectors_count": info.vectors_count,
+            "indexed_vectors_count": info.indexed_vectors_count,
+            "points_count": info.points_count,
+            "config": config,
+            "payload_indexes": {
+                field: schema.data_type.value
+                for field, schema in (info.payload_schema or {}).items()
+            }
+        }
+
+_backend: Optional[VectorBackend] = None
+
+def get_vector_backend() -> VectorBackend:
+    """Process-wide backend selected by VECTOR_BACKEND"""
+    global _backend
+    if _backend is None:
+        if settings.VECTOR_BACKEND == "embedded":
+            from services.embedded_index import EmbeddedBackend
+            _backend = EmbeddedBackend(settings.EMBEDDED_VECTOR_PATH)
+        elif settings.VECTOR_BACKEND == "qdrant":
+            _backend = QdrantBackend()
+        else:
+            raise ValueError(f"Unknown vector backend: {settings.VECTOR_BACKEND}")
+        logger.info("Vector backend ready", backend=settings.VECTOR_BACKEND)
+    return _backend
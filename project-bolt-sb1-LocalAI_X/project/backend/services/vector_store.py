@@ -1,83 +1,531 @@
 """
-Vector store service using Qdrant
+Vector store service (Qdrant or embedded backend)
 """
 
-from qdrant_client import AsyncQdrantClient
-from qdrant_client.http import models
-from typing import List, Dict, Any, Optional
+from array import array
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
+import asyncio
+import hashlib
+import json
+import time
 import uuid
 import structlog
 
 from core.config import settings
+from services.collection_registry import CollectionNotFoundError, collection_registry, embedding_size
+from services.dedup import MinHashLSH
+from services.dim_reduction import describe_reduction, fit_pca, forget_projection, reduce_vectors
+from services.lexical_index import BM25Index
+from services.payload_filter import FilterCondition, FilterStats, index_type, matches, parse_filters
+from services.vector_backend import VectorBackend, get_vector_backend
+from utils.cache import LRUCache
 
 logger = structlog.get_logger()
 
-class VectorStoreService:
-    """Service for vector storage and similarity search using Qdrant"""
+# Fixed namespace so point IDs derived from content are stable across restarts
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2a3e-8b47-4d2f-9a51-3c0e7d9b5f14")
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def point_id_for(collection: str, source_id: Optional[str], chunk_hash: str) -> str:
+    """Deterministic point ID for a chunk of a source in a collection"""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{collection}\x1f{source_id or ''}\x1f{chunk_hash}"))
+
+class ContentHashIndex:
+    """In-memory index of which chunks are already stored, per collection
+    
+    Sources are loaded lazily from the vector store the first time they are
+    seen, so the index survives restarts without a separate persistence layer.
+    """
     
     def __init__(self):
-        self.client = AsyncQdrantClient(
-            host=settings.QDRANT_HOST,
-            port=settings.QDRANT_PORT,
-            api_key=settings.QDRANT_API_KEY,
-            https=settings.QDRANT_USE_HTTPS
-        )
+        # collection -> point_id -> (source_id, content_hash)
+        self._points: Dict[str, Dict[str, Tuple[Optional[str], str]]] = {}
+        # collection -> source_id -> point_ids
+        self._sources: Dict[str, Dict[str, Set[str]]] = {}
+        # collection -> sources whose full chunk set has been loaded
+        self._loaded: Dict[str, Set[str]] = {}
+    
+    def has_point(self, collection: str, point_id: str) -> bool:
+        return point_id in self._points.get(collection, {})
+    
+    def is_loaded(self, collection: str, source_id: str) -> bool:
+        return source_id in self._loaded.get(collection, set())
+    
+    def mark_loaded(self, collection: str, source_id: str):
+        self._loaded.setdefault(collection, set()).add(source_id)
+    
+    def source_points(self, collection: str, source_id: str) -> Set[str]:
+        return set(self._sources.get(collection, {}).get(source_id, set()))
+    
+    def add(self, collection: str, point_id: str, source_id: Optional[str], chunk_hash: str):
+        self._points.setdefault(collection, {})[point_id] = (source_id, chunk_hash)
+        if source_id is not None:
+            self._sources.setdefault(collection, {}).setdefault(source_id, set()).add(point_id)
+    
+    def forget(self, collection: str):
+        self._points.pop(collection, None)
+        self._sources.pop(collection, None)
+        self._loaded.pop(collection, None)
+    
+    def discard(self, collection: str, point_ids: List[str]):
+        points = self._points.get(collection, {})
+        sources = self._sources.get(collection, {})
+        for point_id in point_ids:
+            entry = points.pop(str(point_id), None)
+            if entry and entry[0] is not None:
+                sources.get(entry[0], set()).discard(str(point_id))
+
+# Shared across VectorStoreService instances (one is created per request)
+_hash_index = ContentHashIndex()
+
+# BM25 indexes per collection, built from stored text on first lexical query
+# and kept up to date by store/delete afterwards
+_lexical_indexes: Dict[str, BM25Index] = {}
+_lexical_loaded: Set[str] = set()
+_lexical_locks: Dict[str, asyncio.Lock] = {}
+
+# MinHash LSH indexes per collection for near-duplicate checks on ingest,
+# built and maintained the same way
+_dedup_indexes: Dict[str, MinHashLSH] = {}
+_dedup_loaded: Set[str] = set()
+_dedup_locks: Dict[str, asyncio.Lock] = {}
+
+# Search results keyed on the collection's write generation: every store or
+# delete bumps it, so entries from before the write can no longer be hit and
+# simply age out of the LRU
+_search_cache = LRUCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL)
+_generations: Dict[str, int] = {}
+
+def _bump_generation(collection: str):
+    _generations[collection] = _generations.get(collection, 0) + 1
+
+def _search_key(collection: str, query: Dict[str, Any]) -> Tuple:
+    vector_hash = hashlib.blake2b(array("d", query["vector"]).tobytes(), digest_size=16).digest()
+    filters = query.get("filters")
+    return (
+        collection,
+        _generations.get(collection, 0),
+        query.get("vector_name"),
+        vector_hash,
+        query.get("limit", 10),
+        query.get("score_threshold"),
+        json.dumps(filters, sort_keys=True, default=str) if filters else None
+    )
+
+def search_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the search result cache"""
+    return _search_cache.stats()
+
+# Filtered-search statistics, used to index often-filtered payload fields
+_filter_stats = FilterStats()
+_filter_stats_loaded: Set[str] = set()
+_index_failed: Set[Tuple[str, str]] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+# BM25 cannot filter while ranking, so filtered lexical searches over-fetch
+LEXICAL_FILTER_OVERFETCH = 5
+
+RRF_K = 60
+
+def reciprocal_rank_fusion(ranked_lists: Dict[str, List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """Merge ranked hit lists by summing 1 / (RRF_K + rank)
+    
+    Each fused hit keeps the original per-list scores under ``scores``.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for name, hits in ranked_lists.items():
+        for rank, hit in enumerate(hits):
+            entry = fused.setdefault(str(hit["id"]), {
+                "id": hit["id"],
+                "score": 0.0,
+                "metadata": hit["metadata"],
+                "scores": {}
+            })
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+            entry["scores"][name] = hit["score"]
+    return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)[:limit]
+
+class VectorStoreService:
+    """Service for vector storage and similarity search
+    
+    Storage is delegated to a VectorBackend (Qdrant server or the embedded
+    in-process index), selected with VECTOR_BACKEND. Collection names are
+    checked against the collection registry, which also creates collections
+    per (namespace, embedding model) on first use.
+    """
+    
+    def __init__(self, backend: Optional[VectorBackend] = None):
+        self.backend = backend or get_vector_backend()
         self.collection_name = settings.VECTOR_COLLECTION_NAME
     
     async def initialize(self):
-        """Initialize vector store and create collections"""
+        """Load the collection registry
+        
+        Collections, including the default one, are created on first use
+        with the vector size of the embedding model that fills them.
+        """
         try:
-            # Check if collection exists
-            collections = await self.client.get_collections()
-            collection_names = [col.name for col in collections.collections]
-            
-            if self.collection_name not in collection_names:
-                # Create collection
-                await self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=models.VectorParams(
-                        size=384,  # Dimension for sentence-transformers/all-MiniLM-L6-v2
-                        distance=models.Distance.COSINE
-                    )
-                )
-                logger.info("Created vector collection", collection=self.collection_name)
+            await collection_registry.load(self.backend)
             
         except Exception as e:
             logger.error("Failed to initialize vector store", error=str(e))
             raise
     
+    async def create_collection(
+        self,
+        name: str,
+        vector_size: Optional[int],
+        distance: str = "cosine",
+        quantization: Optional[str] = None,
+        vectors: Optional[Dict[str, Dict[str, Any]]] = None,
+        model: Optional[str] = None,
+        namespace: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Create and register a collection
+        
+        Optionally with scalar or binary quantization, or with several named
+        ``vectors`` (``{name: {"model", "size", "distance"}}``) per point.
+        A ``reduction`` in ``config`` (see services.dim_reduction) shrinks
+        embeddings to ``vector_size`` before they are stored or searched.
+        """
+        try:
+            await self.backend.create_collection(
+                name,
+                vector_size=vector_size,
+                distance=distance,
+                quantization=quantization,
+                vectors={
+                    vector_name: {"size": config["size"], "distance": config.get("distance", "cosine")}
+                    for vector_name, config in vectors.items()
+                } if vectors else None
+            )
+            self._reset_collection_state(name)
+            
+            spec = {
+                "name": name,
+                "namespace": namespace or name,
+                "model": None if vectors else model,
+                "vector_size": None if vectors else vector_size,
+                "distance": distance,
+                "quantization": quantization,
+                "vectors": vectors,
+                "config": config or {}
+            }
+            try:
+                await collection_registry.register(spec)
+            except Exception:
+                # An unregistered collection would later be adopted without its models
+                await self.backend.delete_collection(name)
+                self._reset_collection_state(name)
+                raise
+            logger.info("Created vector collection", collection=name, model=model, quantization=quantization)
+            return spec
+            
+        except Exception as e:
+            logger.error("Failed to create collection", collection=name, error=str(e))
+            raise
+    
+    async def delete_collection(self, name: str):
+        """Drop a collection and everything cached about it"""
+        try:
+            await collection_registry.lookup(self.backend, name)
+            await self.backend.delete_collection(name)
+            await collection_registry.forget(name)
+            self._reset_collection_state(name)
+            logger.info("Deleted vector collection", collection=name)
+            
+        except Exception as e:
+            logger.error("Failed to delete collection", collection=name, error=str(e))
+            raise
+    
+    @staticmethod
+    def _reset_collection_state(name: str):
+        _bump_generation(name)
+        _filter_stats.forget(name)
+        _filter_stats_loaded.discard(name)
+        _hash_index.forget(name)
+        _lexical_indexes.pop(name, None)
+        _lexical_loaded.discard(name)
+        _dedup_indexes.pop(name, None)
+        _dedup_loaded.discard(name)
+        forget_projection(name)
+    
+    def resolve_collection(self, namespace: Optional[str] = None, model: Optional[str] = None) -> str:
+        """Collection holding a namespace's vectors for an embedding model"""
+        return collection_registry.resolve(namespace or self.collection_name, model)
+    
+    async def ensure_collection(
+        self,
+        namespace: Optional[str] = None,
+        model: Optional[str] = None,
+        vector_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Spec of the collection for (namespace, model), created on first use
+        
+        The vector size is taken from ``vector_size`` when an embedding is
+        already at hand, otherwise detected from the model. An existing empty
+        collection of the wrong size is recreated.
+        """
+        model = model or settings.EMBEDDING_MODEL
+        name = self.resolve_collection(namespace, model)
+        
+        try:
+            spec = await collection_registry.lookup(self.backend, name)
+            if vector_size is None or spec.get("vectors") or embedding_size(spec) == vector_size:
+                return spec
+        except CollectionNotFoundError:
+            spec = None
+        
+        async with collection_registry.lock(name):
+            spec = collection_registry.get(name)
+            if spec is not None:
+                if vector_size is None or spec.get("vectors") or embedding_size(spec) == vector_size:
+                    return spec
+                if await self.backend.count(name):
+                    raise ValueError(
+                        f"Collection {name} holds {embedding_size(spec)}-dim vectors, "
+                        f"model {model} produces {vector_size}-dim embeddings"
+                    )
+                logger.warning(
+                    "Recreating empty collection with the model's vector size",
+                    collection=name,
+                    old_size=embedding_size(spec),
+                    new_size=vector_size
+                )
+                await self.backend.delete_collection(name)
+                await collection_registry.forget(name)
+            
+            if vector_size is None:
+                vector_size = await collection_registry.dimension(model)
+            else:
+                collection_registry.record_dimension(model, vector_size)
+            
+            return await self.create_collection(
+                name,
+                vector_size=vector_size,
+                quantization=settings.VECTOR_QUANTIZATION or None,
+                model=model,
+                namespace=namespace or self.collection_name
+            )
+    
+    async def query_target(
+        self,
+        namespace: Optional[str] = None,
+        model: Optional[str] = None,
+        vector_name: Optional[str] = None
+    ) -> Tuple[str, Optional[str], str]:
+        """(collection, vector name, embedding model) to search for a request
+        
+        In multi-vector collections the vector is picked by name, or by the
+        model that produced it, defaulting to the first one.
+        """
+        name = self.resolve_collection(namespace, model)
+        spec = await collection_registry.lookup(self.backend, name)
+        vectors = spec.get("vectors")
+        
+        if vectors:
+            if vector_name is None:
+                vector_name = next(
+                    (key for key, config in vectors.items() if model and config.get("model") == model),
+                    next(iter(vectors))
+                )
+            if vector_name not in vectors:
+                raise ValueError(f"Collection {name} has no vector named {vector_name}")
+            return name, vector_name, vectors[vector_name].get("model") or model or settings.EMBEDDING_MODEL
+        
+        if vector_name:
+            raise ValueError(f"Collection {name} has no named vectors")
+        return name, None, spec.get("model") or model or settings.EMBEDDING_MODEL
+    
+    @staticmethod
+    def _reduce(spec: Dict[str, Any], vector: Any) -> Any:
+        """Apply the collection's dimensionality reduction to a model embedding"""
+        reduction = (spec.get("config") or {}).get("reduction")
+        if not reduction or isinstance(vector, dict):
+            return vector
+        normalize = spec.get("distance") != "euclid"
+        return reduce_vectors(spec["name"], reduction, vector, normalize).tolist()
+    
+    async def reduce_vector(self, vector: List[float], collection_name: Optional[str] = None) -> List[float]:
+        """A model embedding as stored in the collection (reduced if it has a reduction)"""
+        spec = await collection_registry.lookup(self.backend, collection_name or self.collection_name)
+        return self._reduce(spec, vector)
+    
+    async def fit_reduction(self, sample: List[List[float]], collection_name: Optional[str] = None) -> Dict[str, Any]:
+        """Fit the PCA projection of an empty collection on sample embeddings"""
+        collection = collection_name or self.collection_name
+        async with collection_registry.lock(collection):
+            spec = await collection_registry.lookup(self.backend, collection)
+            reduction = (spec.get("config") or {}).get("reduction")
+            if not reduction or reduction["method"] != "pca":
+                raise ValueError(f"Collection {collection} has no PCA reduction to fit")
+            if await self.backend.count(collection):
+                raise ValueError(f"Collection {collection} already holds points projected with the current fit")
+            
+            spec = dict(spec, config=dict(spec.get("config") or {}, reduction=fit_pca(reduction, sample)))
+            await collection_registry.register(spec)
+            self._reset_collection_state(collection)
+            return describe_reduction(spec["config"]["reduction"])
+    
+    @staticmethod
+    def _check_vector(spec: Dict[str, Any], vector: Any, vector_name: Optional[str] = None):
+        """Reject vectors that do not fit the collection before they reach the backend"""
+        vectors = spec.get("vectors")
+        if vectors:
+            if isinstance(vector, dict):
+                if set(vector) != set(vectors):
+                    raise ValueError(f"Collection {spec['name']} needs vectors named {', '.join(vectors)}")
+                sizes = {key: len(value) for key, value in vector.items()}
+            else:
+                sizes = {vector_name or next(iter(vectors)): len(vector)}
+            for key, size in sizes.items():
+                if vectors[key].get("size") and vectors[key]["size"] != size:
+                    raise ValueError(
+                        f"Vector {key} of collection {spec['name']} has size {vectors[key]['size']}, got {size}"
+                    )
+        elif isinstance(vector, dict):
+            raise ValueError(f"Collection {spec['name']} has no named vectors")
+        elif spec.get("vector_size") and spec["vector_size"] != len(vector):
+            raise ValueError(
+                f"Collection {spec['name']} holds {spec['vector_size']}-dim vectors, got {len(vector)}"
+            )
+    
     async def health_check(self) -> bool:
         """Check if vector store is healthy"""
         try:
-            collections = await self.client.get_collections()
-            return True
+            return await self.backend.health_check()
         except Exception as e:
             logger.error("Vector store health check failed", error=str(e))
             return False
     
+    async def plan_ingest(
+        self,
+        chunks: List[Dict[str, Any]],
+        collection_name: Optional[str] = None,
+        replace_source: bool = True
+    ) -> Dict[str, Any]:
+        """Work out which chunks are already stored and which are stale
+        
+        Each chunk is a metadata dict with ``text`` and an optional
+        ``source_id``. With ``replace_source``, chunks sharing a ``source_id``
+        are treated as the full, current set of chunks for that source, so
+        stored chunks of the source that are not in the list are reported as
+        stale. Without it nothing is stale, for sources sent in several parts.
+        """
+        collection = collection_name or self.collection_name
+        
+        point_ids = []
+        for chunk in chunks:
+            chunk_hash = content_hash(chunk["text"])
+            point_ids.append(point_id_for(collection, chunk.get("source_id"), chunk_hash))
+        
+        # Load the chunk sets of sources we have not seen yet
+        source_ids = {chunk["source_id"] for chunk in chunks if chunk.get("source_id") is not None}
+        for source_id in source_ids:
+            if not _hash_index.is_loaded(collection, source_id):
+                await self._load_source(collection, source_id)
+        
+        # Loose chunks (no source) only need an existence check
+        unknown = [
+            point_id for chunk, point_id in zip(chunks, point_ids)
+            if chunk.get("source_id") is None and not _hash_index.has_point(collection, point_id)
+        ]
+        if unknown:
+            records = await self.backend.retrieve(
+                collection,
+                list(dict.fromkeys(unknown)),
+                with_payload=False
+            )
+            for record in records:
+                _hash_index.add(collection, record["id"], None, "")
+        
+        existing = []
+        seen = set()
+        for point_id in point_ids:
+            existing.append(point_id in seen or _hash_index.has_point(collection, point_id))
+            seen.add(point_id)
+        
+        stale_ids = []
+        for source_id in source_ids if replace_source else ():
+            stale_ids.extend(_hash_index.source_points(collection, source_id) - seen)
+        
+        return {
+            "point_ids": point_ids,
+            "existing": existing,
+            "stale_ids": stale_ids
+        }
+    
+    async def _load_source(self, collection: str, source_id: str):
+        """Load the stored chunk hashes of a source into the hash index"""
+        offset = None
+        while True:
+            records, offset = await self.backend.scroll(
+                collection,
+                filters={"source_id": source_id},
+                limit=256,
+                offset=offset,
+                with_payload=["content_hash"]
+            )
+            for record in records:
+                chunk_hash = (record["payload"] or {}).get("content_hash", "")
+                _hash_index.add(collection, record["id"], source_id, chunk_hash)
+            if offset is None:
+                break
+        _hash_index.mark_loaded(collection, source_id)
+    
     async def store(
         self,
-        embedding: List[float],
+        embedding: Union[List[float], Dict[str, List[float]]],
         metadata: Dict[str, Any],
-        collection_name: Optional[str] = None
+        collection_name: Optional[str] = None,
+        doc_id: Optional[str] = None
     ) -> str:
-        """Store embedding with metadata"""
+        """Store embedding with metadata
+        
+        Points with a ``text`` payload get a deterministic ID derived from
+        (collection, source_id, content hash), so re-storing the same chunk
+        overwrites it instead of duplicating it. Multi-vector collections take
+        a dict of named embeddings.
+        """
         try:
             collection = collection_name or self.collection_name
-            doc_id = str(uuid.uuid4())
+            spec = await collection_registry.lookup(self.backend, collection)
+            embedding = self._reduce(spec, embedding)
+            self._check_vector(spec, embedding)
+            source_id = metadata.get("source_id")
+            chunk_hash = None
+            payload = metadata
+            if "text" in metadata:
+                chunk_hash = content_hash(metadata["text"])
+                # A copy: callers may reuse their metadata dict
+                payload = {**metadata, "content_hash": chunk_hash}
+            
+            if doc_id is None:
+                doc_id = point_id_for(collection, source_id, chunk_hash) if chunk_hash else str(uuid.uuid4())
             
             # Upsert point
-            await self.client.upsert(
-                collection_name=collection,
-                points=[
-                    models.PointStruct(
-                        id=doc_id,
-                        vector=embedding,
-                        payload=metadata
-                    )
-                ]
+            await self.backend.upsert(
+                collection,
+                [{"id": doc_id, "vector": embedding, "payload": payload}]
             )
             
+            _bump_generation(collection)
+            
+            if chunk_hash:
+                _hash_index.add(collection, doc_id, source_id, chunk_hash)
+            
+            lexical_index = _lexical_indexes.get(collection)
+            if lexical_index is not None and "text" in metadata:
+                lexical_index.add(doc_id, metadata["text"])
+            
+            dedup_index = _dedup_indexes.get(collection)
+            if dedup_index is not None and "text" in metadata:
+                await asyncio.to_thread(dedup_index.add, doc_id, metadata["text"])
+            
             return doc_id
             
         except Exception as e:
@@ -89,44 +537,340 @@ class VectorStoreService:
         query_embedding: List[float],
         collection_name: Optional[str] = None,
         limit: int = 10,
-        score_threshold: float = 0.7
+        score_threshold: float = 0.7,
+        filters: Optional[Dict[str, Any]] = None,
+        vector_name: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Search for similar vectors"""
+        """Search for similar vectors, optionally restricted by payload filters
+        
+        Results are served from the search cache until the collection is
+        next written to. ``vector_name`` selects the vector to search in
+        multi-vector collections.
+        """
         try:
             collection = collection_name or self.collection_name
+            results = await self._cached_search(collection, [{
+                "vector": query_embedding,
+                "limit": limit,
+                "score_threshold": score_threshold,
+                "filters": filters,
+                "vector_name": vector_name
+            }])
+            return results[0]
             
-            search_result = await self.client.search(
-                collection_name=collection,
-                query_vector=query_embedding,
-                limit=limit,
-                score_threshold=score_threshold
-            )
+        except Exception as e:
+            logger.error("Vector search failed", error=str(e))
+            raise
+    
+    async def search_batch(
+        self,
+        queries: List[Dict[str, Any]],
+        collection_name: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Run many searches in a single backend round trip
+        
+        Each query is a dict with ``query_embedding`` and optional ``limit``,
+        ``score_threshold``, ``filters`` and ``vector_name``. Results come
+        back in input order.
+        """
+        try:
+            collection = collection_name or self.collection_name
+            
+            return await self._cached_search(collection, [
+                {
+                    "vector": query["query_embedding"],
+                    "limit": query.get("limit", 10),
+                    "score_threshold": query.get("score_threshold", 0.7),
+                    "filters": query.get("filters"),
+                    "vector_name": query.get("vector_name")
+                }
+                for query in queries
+            ])
             
-            results = []
-            for hit in search_result:
-                results.append({
-                    "id": hit.id,
-                    "score": hit.score,
-                    "metadata": hit.payload
-                })
+        except Exception as e:
+            logger.error("Batch vector search failed", error=str(e))
+            raise
+    
+    async def _cached_search(self, collection: str, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Serve requests from the search cache, sending only misses to the backend"""
+        spec = await collection_registry.lookup(self.backend, collection)
+        for request in requests:
+            request["vector"] = self._reduce(spec, request["vector"])
+            self._check_vector(spec, request["vector"], request["vector_name"])
+            parse_filters(request["filters"])
+        
+        # Keys are taken before the backend call: a write landing meanwhile
+        # bumps the generation, so a possibly stale result is never served
+        keys = [_search_key(collection, request) for request in requests]
+        results = [_search_cache.get(key) for key in keys]
+        missing = [i for i, hits in enumerate(results) if hits is None]
+        
+        start = time.perf_counter()
+        if len(missing) == 1:
+            request = requests[missing[0]]
+            fetched = [await self.backend.search(
+                collection,
+                request["vector"],
+                limit=request["limit"],
+                score_threshold=request["score_threshold"],
+                filters=request["filters"],
+                vector_name=request["vector_name"]
+            )]
+        elif missing:
+            fetched = await self.backend.search_batch(collection, [requests[i] for i in missing])
+        else:
+            fetched = []
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000 / max(len(missing), 1)
+        
+        for i, hits in zip(missing, fetched):
+            _search_cache.set(keys[i], hits)
+            results[i] = hits
+            if requests[i]["filters"]:
+                await self._track_filters(collection, requests[i]["filters"], elapsed_ms)
+        
+        # Callers may annotate hits, keep the cached copies pristine
+        return [[dict(hit) for hit in hits] for hits in results]
+    
+    async def _track_filters(self, collection: str, filters: Dict[str, Any], elapsed_ms: float):
+        """Update filter statistics, flag slow unindexed fields and index often-filtered ones"""
+        if collection not in _filter_stats_loaded:
+            _filter_stats_loaded.add(collection)
+            try:
+                info = await self.backend.collection_info(collection)
+                for field in info.get("payload_indexes") or {}:
+                    _filter_stats.mark_indexed(collection, field)
+            except Exception as e:
+                logger.error("Failed to load payload indexes", collection=collection, error=str(e))
+        
+        for condition in parse_filters(filters):
+            entry = _filter_stats.record(collection, condition.field, elapsed_ms)
+            
+            if entry["uses"] == 1 or entry["uses"] % max(settings.PAYLOAD_FILTER_SAMPLE_EVERY, 1) == 0:
+                self._in_background(self._sample_selectivity(collection, condition.field, filters[condition.field]))
             
-            return results
+            if entry["indexed"]:
+                continue
             
+            avg_ms = entry["total_ms"] / entry["uses"]
+            if not entry["slow"] and avg_ms > settings.PAYLOAD_FILTER_SLOW_MS:
+                _filter_stats.flag_slow(collection, condition.field)
+                logger.warning(
+                    "Slow unindexed payload filter",
+                    collection=collection,
+                    field=condition.field,
+                    avg_ms=round(avg_ms, 2),
+                    uses=entry["uses"]
+                )
+            
+            if (
+                0 < settings.PAYLOAD_INDEX_AUTO_AFTER <= entry["uses"]
+                and (collection, condition.field) not in _index_failed
+            ):
+                # Claimed before the index exists so it is only created once
+                _filter_stats.mark_indexed(collection, condition.field)
+                self._in_background(self._create_payload_index(collection, condition))
+    
+    async def _create_payload_index(self, collection: str, condition: FilterCondition):
+        field_type = index_type(condition)
+        try:
+            await self.backend.create_payload_index(collection, condition.field, field_type)
+            logger.info("Created payload index", collection=collection, field=condition.field, type=field_type)
         except Exception as e:
-            logger.error("Vector search failed", error=str(e))
+            _filter_stats.mark_indexed(collection, condition.field, False)
+            _index_failed.add((collection, condition.field))
+            logger.error("Failed to create payload index", collection=collection, field=condition.field, error=str(e))
+    
+    async def _sample_selectivity(self, collection: str, field: str, spec: Any):
+        try:
+            total = await self.backend.count(collection)
+            if total:
+                matching = await self.backend.count(collection, {field: spec})
+                _filter_stats.set_selectivity(collection, field, round(matching / total, 4))
+        except Exception as e:
+            logger.error("Failed to sample filter selectivity", collection=collection, field=field, error=str(e))
+    
+    @staticmethod
+    def _in_background(coro):
+        task = asyncio.create_task(coro)
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    
+    async def lexical_search(
+        self,
+        query: str,
+        collection_name: Optional[str] = None,
+        limit: int = 10,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """BM25 search over the stored text, no embedding needed
+        
+        Filters are applied to the ranked candidates, which are over-fetched
+        by LEXICAL_FILTER_OVERFETCH to make up for the ones filtered out.
+        """
+        try:
+            collection = collection_name or self.collection_name
+            conditions = parse_filters(filters)
+            await collection_registry.lookup(self.backend, collection)
+            index = await self._lexical_index(collection)
+            
+            candidates = limit * LEXICAL_FILTER_OVERFETCH if conditions else limit
+            hits = await asyncio.to_thread(index.search, query, candidates)
+            if not hits:
+                return []
+            
+            records = await self.backend.retrieve(collection, [doc_id for doc_id, _ in hits])
+            payloads = {record["id"]: record["payload"] for record in records}
+            
+            return [
+                {"id": doc_id, "score": score, "metadata": payloads[doc_id]}
+                for doc_id, score in hits
+                if doc_id in payloads and matches(payloads[doc_id], conditions)
+            ][:limit]
+            
+        except Exception as e:
+            logger.error("Lexical search failed", error=str(e))
             raise
     
+    async def _lexical_index(self, collection: str) -> BM25Index:
+        """BM25 index of a collection, built from stored text on first use"""
+        if collection in _lexical_loaded:
+            return _lexical_indexes[collection]
+        
+        async with _lexical_locks.setdefault(collection, asyncio.Lock()):
+            if collection not in _lexical_loaded:
+                # Registered before loading so concurrent writes are not missed
+                index = _lexical_indexes.setdefault(collection, BM25Index())
+                async for doc_id, text in self._stored_texts(collection):
+                    index.add(doc_id, text)
+                _lexical_loaded.add(collection)
+                logger.info("Built lexical index", collection=collection, documents=len(index))
+        
+        return _lexical_indexes[collection]
+    
+    async def _dedup_index(self, collection: str) -> MinHashLSH:
+        """MinHash LSH index of a collection, built from stored text on first use"""
+        if collection in _dedup_loaded:
+            return _dedup_indexes[collection]
+        
+        async with _dedup_locks.setdefault(collection, asyncio.Lock()):
+            if collection not in _dedup_loaded:
+                index = _dedup_indexes.setdefault(collection, MinHashLSH(
+                    num_perm=settings.DEDUP_MINHASH_PERMUTATIONS,
+                    bands=settings.DEDUP_LSH_BANDS
+                ))
+                async for doc_id, text in self._stored_texts(collection):
+                    await asyncio.to_thread(index.add, doc_id, text)
+                _dedup_loaded.add(collection)
+                logger.info("Built near-duplicate index", collection=collection, documents=len(index))
+        
+        return _dedup_indexes[collection]
+    
+    async def _stored_texts(self, collection: str):
+        """(point ID, text) of every stored point with a text payload"""
+        offset = None
+        while True:
+            records, offset = await self.backend.scroll(
+                collection,
+                limit=512,
+                offset=offset,
+                with_payload=["text"]
+            )
+            for record in records:
+                text = (record["payload"] or {}).get("text")
+                if text:
+                    yield record["id"], text
+            if offset is None:
+                break
+    
+    async def near_duplicates(
+        self,
+        text: str,
+        collection_name: Optional[str] = None,
+        threshold: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """Stored points whose text is a near-duplicate of `text`, with estimated Jaccard similarity"""
+        collection = collection_name or self.collection_name
+        index = await self._dedup_index(collection)
+        threshold = threshold if threshold is not None else settings.DEDUP_JACCARD_THRESHOLD
+        return await asyncio.to_thread(index.query, text, threshold)
+    
+    async def merge_duplicate(
+        self,
+        doc_id: str,
+        metadata: Dict[str, Any],
+        collection_name: Optional[str] = None
+    ):
+        """Fold a duplicate chunk's metadata into the stored point it duplicates
+        
+        Keys the stored point lacks are copied over, and the duplicate's
+        source and content hash are listed under ``duplicates``. The stored
+        text and vector are left as they are.
+        """
+        collection = collection_name or self.collection_name
+        records = await self.backend.retrieve(collection, [doc_id], with_payload=True, with_vectors=True)
+        if not records:
+            raise CollectionNotFoundError(f"Point {doc_id} not found in collection {collection}")
+        record = records[0]
+        payload = dict(record["payload"] or {})
+        
+        entry = {
+            "source_id": metadata.get("source_id"),
+            "content_hash": content_hash(metadata["text"]) if "text" in metadata else None
+        }
+        duplicates = list(payload.get("duplicates") or [])
+        if entry in duplicates:
+            return
+        duplicates.append(entry)
+        for key, value in metadata.items():
+            if key not in ("text", "content_hash", "source_id"):
+                payload.setdefault(key, value)
+        payload["duplicates"] = duplicates
+        
+        await self.backend.upsert(collection, [{"id": record["id"], "vector": record["vector"], "payload": payload}])
+        _bump_generation(collection)
+    
+    async def get_vectors(
+        self,
+        doc_ids: List[str],
+        collection_name: Optional[str] = None,
+        vector_name: Optional[str] = None
+    ) -> Dict[str, List[float]]:
+        """Stored vectors of documents by ID, missing IDs are left out"""
+        try:
+            collection = collection_name or self.collection_name
+            records = await self.backend.retrieve(
+                collection,
+                list(dict.fromkeys(doc_ids)),
+                with_payload=False,
+                with_vectors=True,
+                vector_name=vector_name
+            )
+            return {record["id"]: record["vector"] for record in records if record.get("vector")}
+
+        except Exception as e:
+            logger.error("Failed to fetch vectors", error=str(e))
+            raise
+
     async def delete(self, doc_ids: List[str], collection_name: Optional[str] = None):
         """Delete documents by IDs"""
         try:
             collection = collection_name or self.collection_name
             
-            await self.client.delete(
-                collection_name=collection,
-                points_selector=models.PointIdsList(
-                    points=doc_ids
-                )
-            )
+            await self.backend.delete(collection, doc_ids)
+            _bump_generation(collection)
+            
+            _hash_index.discard(collection, doc_ids)
+            
+            lexical_index = _lexical_indexes.get(collection)
+            if lexical_index is not None:
+                for doc_id in doc_ids:
+                    lexical_index.remove(str(doc_id))
+            
+            dedup_index = _dedup_indexes.get(collection)
+            if dedup_index is not None:
+                for doc_id in doc_ids:
+                    dedup_index.remove(str(doc_id))
             
         except Exception as e:
             logger.error("Failed to delete embeddings", error=str(e))
@@ -136,18 +880,15 @@ class VectorStoreService:
         """Get collection information"""
         try:
             collection = collection_name or self.collection_name
-            info = await self.client.get_collection(collection_name=collection)
-            
-            return {
-                "name": collection,
-                "vectors_count": info.vectors_count,
-                "indexed_vectors_count": info.indexed_vectors_count,
-                "points_count": info.points_count,
-                "config": {
-                    "vector_size": info.config.params.vector_size,
-                    "distance": info.config.params.distance.value
-                }
-            }
+            spec = await collection_registry.lookup(self.backend, collection)
+            info = await self.backend.collection_info(collection)
+            info["namespace"] = spec["namespace"]
+            info["model"] = spec["model"]
+            if spec.get("vectors"):
+                info["config"]["vectors"] = spec["vectors"]
+            info["config"]["reduction"] = describe_reduction((spec.get("config") or {}).get("reduction"))
+            info["payload_filters"] = _filter_stats.report(collection)
+            return info
             
         except Exception as e:
             logger.error("Failed to get collection info", error=str(e))
@@ -0,0 +1,117 @@
+"""
+Shared test setup
+
+Everything runs against the embedded vector backend, a SQLite database and
+a sandbox pool of one worker, all under a temporary directory. Ollama is the
+only service replaced: a fake server answers its HTTP API with deterministic
+bag-of-words embeddings and configurable completions.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import math
+import os
+import sys
+import tempfile
+from typing import Callable, List
+
+_ROOT = tempfile.mkdtemp(prefix="localai-tests-")
+
+# Settings are read on import, so the environment is set up first
+os.environ.update({
+    "VECTOR_BACKEND": "embedded",
+    "EMBEDDED_VECTOR_PATH": os.path.join(_ROOT, "vectors"),
+    "DATABASE_URL": f"sqlite:///{os.path.join(_ROOT, 'localai.db')}",
+    "PLUGINS_DIRECTORY": os.path.join(_ROOT, "plugins"),
+    "CODE_OUTPUT_DIR": os.path.join(_ROOT, "code-output"),
+    "CODE_ARTIFACT_DIR": os.path.join(_ROOT, "code-artifacts"),
+    "DATASET_DIR": os.path.join(_ROOT, "datasets"),
+    "SANDBOX_WORKDIR": _ROOT,
+    "SANDBOX_POOL_SIZE": "1",
+    "API_KEYS": json.dumps(["test-key-12345", "other-key"])
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+
+from core.database import init_db
+
+EMBEDDING_DIMENSIONS = 32
+# Fake embedding models of other sizes, for per-model collections and named vectors
+MODEL_DIMENSIONS = {"mini-embed": 16}
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Word counts hashed into `dimensions` buckets, unnormalized like /api/embeddings"""
+    vector = [0.01] * dimensions
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dimensions] += 1.0
+    return vector
+
+def unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
+
+class FakeOllama:
+    """Answers the Ollama endpoints the services call"""
+
+    def __init__(self):
+        self.calls = {"embeddings": 0, "embed": 0, "generate": 0}
+        self.reply: Callable[[str], str] = lambda prompt: "ok"
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content or b"{}")
+        path = request.url.path
+        if path == "/api/embeddings":
+            self.calls["embeddings"] += 1
+            dimensions = MODEL_DIMENSIONS.get(body["model"], EMBEDDING_DIMENSIONS)
+            return httpx.Response(200, json={"embedding": fake_embedding(body["prompt"], dimensions)})
+        if path == "/api/embed":
+            self.calls["embed"] += 1
+            dimensions = MODEL_DIMENSIONS.get(body["model"], EMBEDDING_DIMENSIONS)
+            return httpx.Response(200, json={
+                "embeddings": [unit(fake_embedding(text, dimensions)) for text in body["input"]]
+            })
+        if path == "/api/generate":
+            self.calls["generate"] += 1
+            return httpx.Response(200, json={"response": self.reply(body["prompt"]), "done": True})
+        if path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:latest"}]})
+        return httpx.Response(404, json={"error": f"unknown endpoint {path}"})
+
+@pytest.fixture(scope="session", autouse=True)
+def ollama():
+    """The fake Ollama server, in place for the whole session"""
+    fake = FakeOllama()
+    patch = pytest.MonkeyPatch()
+    # Looked up per request so tests can monkeypatch the handler
+    transport = httpx.MockTransport(lambda request: fake.handle(request))
+    patch.setattr(httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=transport))
+    asyncio.run(init_db())
+    yield fake
+    patch.undo()
+
+@pytest.fixture(scope="session")
+def client(ollama):
+    """Application client; the lifespan starts the sandbox pool and loads the registries"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def auth():
+    return {"Authorization": "Bearer test-key-12345"}
+
+@pytest.fixture
+def other_auth():
+    """A second API key, for ownership checks"""
+    return {"Authorization": "Bearer other-key"}
+
+@pytest.fixture
+def collection(request):
+    """A collection name of the test's own"""
+    return "test_" + hashlib.md5(request.node.nodeid.encode("utf-8")).hexdigest()[:12]
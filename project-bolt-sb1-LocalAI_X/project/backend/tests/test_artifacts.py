@@ -0,0 +1,86 @@
+"""
+Files left by code runs, kept as artifacts of the API key that ran them
+"""
+
+import io
+import os
+
+import numpy as np
+import pytest
+
+from core.config import settings
+from services.artifacts import ArtifactNotFoundError, ArtifactStore
+
+def test_collect_keeps_files_within_the_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CODE_ARTIFACT_MAX_FILES", 2)
+    store = ArtifactStore(str(tmp_path))
+    run_id, path = store.scratch("owner")
+    for i, name in enumerate(["a.txt", "b.csv", "c.txt"]):
+        with open(os.path.join(path, name), "w") as target:
+            target.write("x" * (i + 1))
+        os.utime(os.path.join(path, name), (i, i))
+
+    artifacts = store.collect(run_id, "owner")
+
+    assert [(a["name"], a["bytes"], a["content_type"]) for a in artifacts] == [("a.txt", 1, "text/plain"), ("b.csv", 2, "text/csv")]
+    assert sorted(os.listdir(path)) == ["a.txt", "b.csv"]
+    assert store.stats()["dropped"] == 1
+
+def test_runs_without_files_leave_nothing(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    run_id, path = store.scratch("owner")
+
+    assert store.collect(run_id, "owner") == []
+    assert not os.path.exists(path)
+
+def test_paths_stay_inside_the_owners_run(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    run_id, path = store.scratch("owner")
+    with open(os.path.join(path, "result.txt"), "w") as target:
+        target.write("ok")
+
+    assert store.path(run_id, "result.txt", "owner") == os.path.realpath(os.path.join(path, "result.txt"))
+    for args in [(run_id, "result.txt", "other"), (run_id, "../../owner", "owner"), ("not-a-run", "result.txt", "owner")]:
+        with pytest.raises(ArtifactNotFoundError):
+            store.path(*args)
+
+def run_with_artifact(client, auth):
+    response = client.post(
+        "/v1/code/execute", json={"code": "import numpy\nnumpy.save('values.npy', numpy.arange(5))"}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    (artifact,) = response.json()["artifacts"]
+    return artifact
+
+def test_artifacts_are_downloaded_by_their_owner(client, auth, other_auth):
+    artifact = run_with_artifact(client, auth)
+    assert artifact["name"] == "values.npy"
+
+    response = client.get(artifact["url"], headers=auth)
+    assert response.status_code == 200
+    assert int(response.headers["content-length"]) == artifact["bytes"]
+    assert np.load(io.BytesIO(response.content)).tolist() == [0, 1, 2, 3, 4]
+
+    assert client.get(artifact["url"], headers=other_auth).status_code == 404
+    assert client.get(f"/v1/code/artifacts/{artifact['run_id']}/missing.txt", headers=auth).status_code == 404
+
+def test_byte_ranges(client, auth):
+    artifact = run_with_artifact(client, auth)
+    content = client.get(artifact["url"], headers=auth).content
+
+    head = client.get(artifact["url"], headers={**auth, "Range": "bytes=0-5"})
+    assert (head.status_code, head.content) == (206, content[:6])
+    assert head.headers["content-range"] == f"bytes 0-5/{len(content)}"
+    tail = client.get(artifact["url"], headers={**auth, "Range": "bytes=-4"})
+    assert tail.content == content[-4:]
+    assert client.get(artifact["url"], headers={**auth, "Range": f"bytes={len(content)}-"}).status_code == 416
+
+def test_open_figures_become_png_artifacts(client, auth):
+    pytest.importorskip("matplotlib")
+    response = client.post(
+        "/v1/code/execute", json={"code": "import matplotlib.pyplot as plt\nplt.plot([1, 2, 3])"}, headers=auth
+    )
+
+    (artifact,) = response.json()["artifacts"]
+    assert (artifact["name"], artifact["content_type"]) == ("figure_1.png", "image/png")
+    assert client.get(artifact["url"], headers=auth).content.startswith(b"\x89PNG")
@@ -0,0 +1,65 @@
+"""
+Batch search: one embedding call and one backend round trip for many queries
+"""
+
+import asyncio
+import math
+
+import httpx
+import pytest
+
+from services.ollama_client import OllamaService
+
+TEXTS = ["apples and pears", "trains and buses", "violins and cellos"]
+
+@pytest.fixture
+def filled(client, auth, collection):
+    response = client.post("/v1/store", params={"collection": collection}, json={"texts": TEXTS}, headers=auth)
+    assert response.status_code == 200, response.text
+    return collection
+
+def test_results_come_back_in_query_order(client, auth, filled, ollama):
+    queries = ["cellos violins", "apples pears", "buses trains"]
+    embed_calls = ollama.calls["embed"]
+
+    response = client.post(
+        "/v1/search/batch",
+        json={"collection": filled, "queries": [{"query": query, "limit": 1, "score_threshold": 0} for query in queries]},
+        headers=auth
+    )
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["query"] for result in results] == queries
+    assert [result["results"][0]["metadata"]["text"] for result in results] == [TEXTS[2], TEXTS[0], TEXTS[1]]
+    assert ollama.calls["embed"] == embed_calls + 1
+
+def test_deduplicate_keeps_each_hit_under_its_best_query(client, auth, filled):
+    response = client.post(
+        "/v1/search/batch",
+        json={
+            "collection": filled,
+            "deduplicate": True,
+            "queries": [
+                {"query": "apples", "limit": 3, "score_threshold": -1},
+                {"query": "apples and pears", "limit": 3, "score_threshold": -1}
+            ]
+        },
+        headers=auth
+    )
+
+    body = response.json()
+    assert body["duplicates_removed"] == 3
+    ids = [hit["id"] for result in body["results"] for hit in result["results"]]
+    assert len(ids) == len(set(ids)) == 3
+    assert body["results"][1]["results"][0]["metadata"]["text"] == "apples and pears"
+
+def test_single_embeddings_are_unit_length():
+    embedding = asyncio.run(OllamaService().generate_embedding("raw vectors from the old endpoint"))
+    assert math.sqrt(sum(value * value for value in embedding)) == pytest.approx(1.0)
+
+def test_batch_with_missing_embeddings_fails(ollama, monkeypatch):
+    monkeypatch.setattr(ollama, "handle", lambda request: httpx.Response(200, json={"embeddings": [[1.0]]}))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(OllamaService().generate_embeddings(["one new text", "another new text"]))
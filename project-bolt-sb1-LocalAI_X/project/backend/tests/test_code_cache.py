@@ -0,0 +1,77 @@
+"""
+Result cache for pure code interpreter runs
+"""
+
+import pytest
+
+from core.config import settings
+from services.code_cache import CodeResultCache, is_pure
+from services.sandbox import sandbox_pool
+
+@pytest.mark.parametrize("code, pure", [
+    ("print(sum(range(10)))", True),
+    ("import numpy as np\nprint(np.arange(3).sum())", True),
+    ("import random\nprint(random.random())", False),
+    ("from datetime import datetime", False),
+    ("import numpy as np\nprint(np.random.rand())", False),
+    ("import pandas as pd\nprint(pd.Timestamp.now())", False),
+    ("from numpy.random import rand", False),
+    ("print(open('x').read())", False),
+    ("print(id(object()))", False),
+    ("def broken(:", False)
+])
+def test_purity_is_inferred_from_the_code(code, pure):
+    assert is_pure(code) is pure
+
+def test_key_covers_code_packages_and_datasets():
+    cache = CodeResultCache(max_entries=8)
+
+    assert cache.key("x", ["b", "a"]) == cache.key("x", ["a", "b"])
+    assert len({cache.key("x"), cache.key("y"), cache.key("x", ["numpy"]), cache.key("x", datasets=["d1"])}) == 4
+
+def test_only_clean_results_are_stored(monkeypatch):
+    monkeypatch.setattr(settings, "CODE_CACHE_MAX_OUTPUT_BYTES", 10)
+    cache = CodeResultCache(max_entries=8)
+    results = {
+        "ok": {"success": True, "output": "fine"},
+        "failed": {"success": False, "output": ""},
+        "truncated": {"success": True, "output": "", "truncated": True},
+        "artifacts": {"success": True, "output": "", "artifacts": [{"name": "plot.png"}]},
+        "large": {"success": True, "output": "x" * 11}
+    }
+    for key, result in results.items():
+        cache.put(key, result)
+
+    assert cache.get("ok") == {"success": True, "output": "fine", "cached": True}
+    assert [key for key in results if cache.get(key) is not None] == ["ok"]
+    assert (cache.counters["stored"], cache.counters["not_stored"]) == (1, 4)
+
+def execute(client, auth, code, **options):
+    response = client.post("/v1/code/execute", json={"code": code, **options}, headers=auth)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_repeated_pure_run_skips_the_sandbox(client, auth):
+    code = "print(sum(i * i for i in range(1000)))"
+    first = execute(client, auth, code, cache=True)
+    jobs = sandbox_pool.counters["jobs"]
+
+    second = execute(client, auth, code, cache=True)
+
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["output"] == first["output"] == "332833500\n"
+    assert sandbox_pool.counters["jobs"] == jobs
+    # Without the flag the code runs again
+    assert execute(client, auth, code)["cached"] is False
+    assert sandbox_pool.counters["jobs"] == jobs + 1
+
+def test_impure_and_session_runs_are_not_cached(client, auth):
+    impure = "import random\nprint(random.random())"
+    assert [execute(client, auth, impure, cache=True)["cached"] for _ in range(2)] == [False, False]
+
+    # A caller's declaration wins over the inference
+    assert [execute(client, auth, impure, cache=True, pure=True)["cached"] for _ in range(2)] == [False, True]
+
+    session_code = "print('in a session')"
+    assert [execute(client, auth, session_code, cache=True, session_id="cached")["cached"] for _ in range(2)] == [False, False]
+    client.delete("/v1/code/sessions/cached", headers=auth)
@@ -0,0 +1,99 @@
+"""
+The code_interpreter tool, run in the sandbox from tool calls and chat
+"""
+
+import json
+
+from core.config import settings
+from services.function_calling import FunctionCallingService
+
+CODE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "code_interpreter",
+        "description": "Run Python code",
+        "parameters": {"type": "object", "properties": {"code": {"type": "string"}}}
+    }
+}
+TOOL_CALL = 'Let me compute it.\nTOOL_CALL: {"name": "code_interpreter", "arguments": {"code": "print(6 * 7)"}}'
+
+def execute_tool(client, auth, code):
+    response = client.post(
+        "/v1/tools/execute", json={"tool_name": "code_interpreter", "arguments": {"code": code}}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["result"]
+
+def test_calls_with_nested_arguments_are_extracted():
+    text = TOOL_CALL + '\nTOOL_CALL: {"name": "calculator", "arguments": {"expression": "1+1"}}\nTOOL_CALL: {broken'
+
+    calls = FunctionCallingService().extract_function_calls(text)
+
+    assert calls == [
+        {"name": "code_interpreter", "arguments": {"code": "print(6 * 7)"}},
+        {"name": "calculator", "arguments": {"expression": "1+1"}}
+    ]
+
+def test_tool_runs_the_code(client, auth):
+    result = execute_tool(client, auth, "print(sum(range(10)))")
+
+    assert (result["success"], result["output"], result["truncated"]) == (True, "45\n", False)
+    assert result["usage"]["wall_ms"] >= 0
+
+def test_tool_checks_and_caps_the_code(client, auth, monkeypatch):
+    assert execute_tool(client, auth, "import subprocess")["error"] == "Code contains potentially unsafe operations"
+    assert "ZeroDivisionError" in execute_tool(client, auth, "1 / 0")["error"]
+
+    monkeypatch.setattr(settings, "CODE_TOOL_MAX_OUTPUT_CHARS", 10)
+    result = execute_tool(client, auth, "print('y' * 100)")
+    assert (result["output"], result["truncated"]) == ("y" * 10, True)
+
+def test_chat_runs_the_tool_and_answers_with_its_result(client, auth, ollama, monkeypatch):
+    prompts = []
+
+    def reply(prompt):
+        prompts.append(prompt)
+        return TOOL_CALL if len(prompts) == 1 else "The answer is 42."
+    monkeypatch.setattr(ollama, "reply", reply)
+
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "mistral:latest", "messages": [{"role": "user", "content": "What is 6 times 7?"}], "tools": [CODE_TOOL]},
+        headers=auth
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["choices"][0]["message"]["content"] == "The answer is 42."
+    assert '"output": "42\\n"' in prompts[1]
+
+def test_streamed_chat_streams_the_tool_output(client, auth, ollama, monkeypatch):
+    prompts = []
+
+    def reply(prompt):
+        prompts.append(prompt)
+        return TOOL_CALL if len(prompts) == 1 else "The answer is 42."
+    monkeypatch.setattr(ollama, "reply", reply)
+
+    response = client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "mistral:latest",
+            "messages": [{"role": "user", "content": "What is 6 times 7?"}],
+            "tools": [CODE_TOOL],
+            "stream": True
+        },
+        headers=auth
+    )
+
+    chunks = [json.loads(line[len("data: "):]) for line in response.text.splitlines()
+              if line.startswith("data: ") and line != "data: [DONE]"]
+    tool_output = [chunk["tool_output"] for chunk in chunks if "tool_output" in chunk]
+    tool_result = [chunk["tool_result"] for chunk in chunks if "tool_result" in chunk]
+    content = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+    assert "".join(event["data"] for event in tool_output if event["stream"] == "stdout") == "42\n"
+    assert tool_result[0]["result"]["output"] == "42\n"
+    assert content.endswith("The answer is 42.")
+    # The tool events come before the follow-up answer
+    result_index = next(i for i, chunk in enumerate(chunks) if "tool_result" in chunk)
+    answer_index = next(i for i, chunk in enumerate(chunks) if "answer" in chunk["choices"][0]["delta"].get("content", ""))
+    assert result_index < answer_index
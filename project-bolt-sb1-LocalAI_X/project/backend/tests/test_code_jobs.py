@@ -0,0 +1,86 @@
+"""
+Queued code jobs: turns between API keys, ownership and cancellation
+"""
+
+import os
+import time
+
+from services.code_jobs import job_queue
+
+def submit(client, headers, code, timeout=30):
+    response = client.post("/v1/code/jobs", json={"code": code, "timeout": timeout}, headers=headers)
+    assert response.status_code == 202, response.text
+    return response.json()["job_id"]
+
+def wait_for(client, headers, job_id, status):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = client.get(f"/v1/code/jobs/{job_id}", headers=headers).json()
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} is {job['status']}, not {status}")
+
+def test_one_worker_per_warm_sandbox():
+    assert job_queue.workers == 1
+
+def test_api_keys_take_turns(client, auth, other_auth):
+    first = submit(client, auth, "import time\ntime.sleep(1)")
+    wait_for(client, auth, first, "running")
+    queued = [submit(client, auth, f"print({i})") for i in range(2, 5)]
+    other = submit(client, other_auth, "print('b')")
+
+    jobs = [client.get(f"/v1/code/jobs/{job_id}", params={"wait": 10}, headers=auth).json() for job_id in [first] + queued]
+    jobs.append(client.get(f"/v1/code/jobs/{other}", params={"wait": 10}, headers=other_auth).json())
+
+    assert {job["status"] for job in jobs} == {"succeeded"}
+    started = [job["job_id"] for job in sorted(jobs, key=lambda job: job["started"])]
+    # The other key's job runs after one more of the first key's, not after all of them
+    assert started == [first, queued[0], other, queued[1], queued[2]]
+    assert jobs[1]["result"]["output"] == "2\n"
+
+def test_jobs_are_private_to_their_api_key(client, auth, other_auth):
+    job_id = submit(client, auth, "print('private')")
+
+    assert client.get(f"/v1/code/jobs/{job_id}", headers=other_auth).status_code == 404
+    assert client.delete(f"/v1/code/jobs/{job_id}", headers=other_auth).status_code == 404
+    assert job_id not in [job["job_id"] for job in client.get("/v1/code/jobs", headers=other_auth).json()["jobs"]]
+    assert client.get(f"/v1/code/jobs/{job_id}", params={"wait": 10}, headers=auth).json()["status"] == "succeeded"
+
+def test_cancelling_a_running_job_kills_its_process(client, auth, tmp_path):
+    pid_file = tmp_path / "pid"
+    job_id = submit(
+        client, auth,
+        f"import multiprocessing, pathlib, time\n"
+        f"pathlib.Path({str(pid_file)!r}).write_text(str(multiprocessing.current_process().pid))\n"
+        f"time.sleep(60)"
+    )
+    deadline = time.monotonic() + 10
+    while not pid_file.exists() or not pid_file.read_text():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    pid = int(pid_file.read_text())
+
+    client.delete(f"/v1/code/jobs/{job_id}", headers=auth)
+
+    assert "result" not in wait_for(client, auth, job_id, "cancelled")
+    deadline = time.monotonic() + 5
+    while os.path.exists(f"/proc/{pid}") and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not os.path.exists(f"/proc/{pid}")
+    # The sandbox is replaced and the queue keeps going
+    follow_up = submit(client, auth, "print('next')")
+    assert client.get(f"/v1/code/jobs/{follow_up}", params={"wait": 10}, headers=auth).json()["status"] == "succeeded"
+
+def test_waiting_jobs_are_cancelled_without_running(client, auth):
+    blocker = submit(client, auth, "import time\ntime.sleep(0.5)")
+    waiting = submit(client, auth, "print('never')")
+
+    assert client.delete(f"/v1/code/jobs/{waiting}", headers=auth).json()["status"] == "cancelled"
+    assert client.get(f"/v1/code/jobs/{blocker}", params={"wait": 10}, headers=auth).json()["status"] == "succeeded"
+    assert client.get(f"/v1/code/jobs/{waiting}", headers=auth).json()["started"] is None
+
+def test_full_queue_is_429(client, auth, monkeypatch):
+    monkeypatch.setattr(job_queue, "max_queued", 0)
+    response = client.post("/v1/code/jobs", json={"code": "print(1)"}, headers=auth)
+    assert response.status_code == 429
@@ -0,0 +1,74 @@
+"""
+Streamed code output and output spilled past CODE_MAX_OUTPUT_BYTES
+"""
+
+import json
+import os
+
+from core.config import settings
+from services.sandbox import OutputBuffer, spill_path
+
+def events(response):
+    lines = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert lines[-1] == "[DONE]"
+    return [json.loads(line) for line in lines[:-1]]
+
+def test_buffer_keeps_the_head_and_spills_the_rest():
+    buffer = OutputBuffer(limit=8, owner="buffer-test")
+
+    kept = [buffer.add("héllo"), buffer.add(" wörld"), buffer.add("!")]
+    buffer.close()
+
+    # The limit never splits a character
+    assert kept == ["héllo", " w", ""]
+    assert buffer.text() == "héllo w"
+    with open(spill_path(buffer.spill_id, "buffer-test"), encoding="utf-8") as spill:
+        assert spill.read() == "örld!"
+    assert buffer.describe() == {"output_id": buffer.spill_id, "bytes": len("örld!".encode("utf-8")), "kept_bytes": 8}
+
+def test_output_is_streamed_as_events(client, auth):
+    response = client.post(
+        "/v1/code/execute",
+        json={"code": "import warnings\nprint('one')\nwarnings.warn('two')\nprint('three')", "stream": True},
+        headers=auth
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/event-stream")
+    streamed = events(response)
+    assert "".join(event["data"] for event in streamed if event["type"] == "stdout") == "one\nthree\n"
+    assert "UserWarning: two" in "".join(event["data"] for event in streamed if event["type"] == "stderr")
+    assert streamed[-1]["type"] == "exit"
+    assert streamed[-1]["success"] is True
+
+def test_long_output_is_spilled_for_its_owner(client, auth, other_auth, monkeypatch):
+    monkeypatch.setattr(settings, "CODE_MAX_OUTPUT_BYTES", 100)
+
+    response = client.post("/v1/code/execute", json={"code": "print('x' * 500)", "stream": True}, headers=auth)
+
+    streamed = events(response)
+    assert "".join(event["data"] for event in streamed if event["type"] == "stdout") == "x" * 100
+    assert [event["type"] for event in streamed].count("truncated") == 1
+    exit_event = streamed[-1]
+    assert exit_event["truncated"] is True
+    output_id = exit_event["spill"]["output_id"]
+
+    rest = client.get(f"/v1/code/outputs/{output_id}", headers=auth)
+    assert rest.status_code == 200
+    assert rest.text == "x" * 400 + "\n"
+    assert client.get(f"/v1/code/outputs/{output_id}", headers=other_auth).status_code == 404
+    assert client.get("/v1/code/outputs/..%2Fsecret", headers=auth).status_code == 404
+
+def test_old_spills_are_swept(monkeypatch):
+    old = OutputBuffer(limit=0, owner="sweep-test")
+    old.add("stale")
+    old.close()
+    path = spill_path(old.spill_id, "sweep-test")
+    os.utime(path, (0, 0))
+
+    fresh = OutputBuffer(limit=0, owner="sweep-test")
+    fresh.add("new")
+    fresh.close()
+
+    assert not os.path.exists(path)
+    assert os.path.exists(spill_path(fresh.spill_id, "sweep-test"))
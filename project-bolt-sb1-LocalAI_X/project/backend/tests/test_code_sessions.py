@@ -0,0 +1,59 @@
+"""
+Stateful code sessions, scoped to the API key that started them
+"""
+
+from core.config import settings
+
+def run(client, headers, code, session_id, timeout=10):
+    response = client.post(
+        "/v1/code/execute", json={"code": code, "session_id": session_id, "timeout": timeout}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_state_persists_between_calls(client, auth):
+    run(client, auth, "total = 40", "persist")
+    result = run(client, auth, "total += 2\nprint(total)", "persist")
+
+    assert result["output"] == "42\n"
+    assert (result["session"]["executions"], result["session"]["reused"]) == (2, True)
+
+    client.post("/v1/code/sessions/persist/reset", headers=auth)
+    assert "NameError" in run(client, auth, "print(total)", "persist")["error"]
+    assert client.delete("/v1/code/sessions/persist", headers=auth).status_code == 200
+
+def test_sessions_belong_to_their_api_key(client, auth, other_auth):
+    run(client, auth, "secret = 'mine'", "shared-name")
+
+    # The same id under another key is another session
+    assert "NameError" in run(client, other_auth, "print(secret)", "shared-name")["error"]
+    assert [session["session_id"] for session in client.get("/v1/code/sessions", headers=other_auth).json()["sessions"]] == [
+        "shared-name"
+    ]
+    assert client.delete("/v1/code/sessions/shared-name", headers=other_auth).status_code == 200
+    assert client.delete("/v1/code/sessions/shared-name", headers=other_auth).status_code == 404
+    assert client.post("/v1/code/sessions/shared-name/reset", headers=other_auth).status_code == 404
+
+    assert run(client, auth, "print(secret)", "shared-name")["output"] == "mine\n"
+    assert client.delete("/v1/code/sessions/shared-name", headers=auth).status_code == 200
+
+def test_timeout_keeps_the_session(client, auth):
+    run(client, auth, "kept = 1", "slow")
+
+    result = run(client, auth, "import time\ntime.sleep(30)", "slow", timeout=1)
+
+    assert result["success"] is False
+    assert result["error"] == "Code execution timed out"
+    assert run(client, auth, "print(kept)", "slow")["output"] == "1\n"
+    client.delete("/v1/code/sessions/slow", headers=auth)
+
+def test_least_recently_used_idle_session_is_evicted(client, auth, monkeypatch):
+    monkeypatch.setattr(settings, "SANDBOX_MAX_SESSIONS", 1)
+    run(client, auth, "value = 'first'", "first")
+
+    run(client, auth, "value = 'second'", "second")
+
+    sessions = client.get("/v1/code/sessions", headers=auth).json()["sessions"]
+    assert [session["session_id"] for session in sessions] == ["second"]
+    assert "NameError" in run(client, auth, "print(value)", "first")["error"]
+    client.delete("/v1/code/sessions/first", headers=auth)
@@ -0,0 +1,92 @@
+"""
+Collection dumps: streamed export and import without re-embedding
+"""
+
+from services.collection_dump import MAGIC
+
+TEXTS = ["dump point one", "dump point two", "dump point three", "dump point four", "dump point five"]
+
+def store(client, auth, collection, texts=TEXTS):
+    response = client.post(
+        "/v1/store",
+        params={"collection": collection},
+        json={"texts": texts, "metadata": [{"n": i} for i in range(len(texts))]},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+
+def export(client, auth, collection, **params):
+    response = client.get(f"/v1/collections/{collection}/export", params=params, headers=auth)
+    assert response.status_code == 200, response.text
+    return response.content
+
+def test_round_trip_makes_no_embedding_calls(client, auth, collection, ollama):
+    store(client, auth, collection)
+    dump = export(client, auth, collection, batch_size=2)
+    assert dump.startswith(MAGIC)
+
+    embeddings = dict(ollama.calls)
+    target = collection + "_copy"
+    response = client.post(f"/v1/collections/{target}/import", content=dump, headers=auth)
+
+    assert response.status_code == 200, response.text
+    assert (response.json()["points"], response.json()["batches"]) == (5, 3)
+    assert ollama.calls["embeddings"] == embeddings["embeddings"]
+    assert ollama.calls["embed"] == embeddings["embed"]
+
+    info = client.get(f"/v1/collections/{target}", headers=auth).json()
+    assert (info["points_count"], info["config"]["vector_size"]) == (5, 32)
+    results = client.post("/v1/search", params={"query": TEXTS[3], "collection": target}, headers=auth).json()["results"]
+    assert (results[0]["metadata"]["text"], results[0]["metadata"]["n"]) == (TEXTS[3], 3)
+
+def test_import_overwrites_points_with_the_same_ids(client, auth, collection):
+    store(client, auth, collection)
+    dump = export(client, auth, collection)
+
+    response = client.post(f"/v1/collections/{collection}/import", content=dump, headers=auth)
+
+    assert response.status_code == 200, response.text
+    assert client.get(f"/v1/collections/{collection}", headers=auth).json()["points_count"] == 5
+
+def test_named_vectors_round_trip(client, auth, collection):
+    client.post(
+        "/v1/collections",
+        json={"name": collection, "vectors": {"full": {"model": "nomic-embed-text"}, "mini": {"model": "mini-embed"}}},
+        headers=auth
+    )
+    store(client, auth, collection, TEXTS[:2])
+    target = collection + "_copy"
+
+    response = client.post(f"/v1/collections/{target}/import", content=export(client, auth, collection), headers=auth)
+
+    assert response.status_code == 200, response.text
+    vectors = client.get(f"/v1/collections/{target}", headers=auth).json()["config"]["vectors"]
+    assert (vectors["full"]["size"], vectors["mini"]["size"]) == (32, 16)
+    results = client.post(
+        "/v1/search", params={"query": TEXTS[1], "collection": target, "vector": "mini"}, headers=auth
+    ).json()["results"]
+    assert results[0]["metadata"]["text"] == TEXTS[1]
+
+def test_invalid_dumps_are_rejected(client, auth, collection):
+    store(client, auth, collection)
+    dump = export(client, auth, collection)
+    target = collection + "_copy"
+
+    for body in [b"not a dump", dump[:len(dump) // 2]]:
+        response = client.post(f"/v1/collections/{target}/import", content=body, headers=auth)
+        assert response.status_code == 400, response.text
+    # A collection created by a failed import is dropped again
+    assert client.get(f"/v1/collections/{target}", headers=auth).status_code == 404
+
+def test_layout_must_match_an_existing_collection(client, auth, collection):
+    store(client, auth, collection)
+    target = collection + "_small"
+    client.post("/v1/collections", json={"name": target, "vector_size": 8}, headers=auth)
+
+    response = client.post(f"/v1/collections/{target}/import", content=export(client, auth, collection), headers=auth)
+
+    assert response.status_code == 400
+    assert "the dump has" in response.json()["detail"]
+
+def test_export_of_an_unknown_collection_is_404(client, auth):
+    assert client.get("/v1/collections/no_such_collection/export", headers=auth).status_code == 404
@@ -0,0 +1,78 @@
+"""
+Collection registry: per-model collections, detected dimensions and named vectors
+"""
+
+import asyncio
+
+import pytest
+
+from services.collection_registry import CollectionRegistry, collection_registry, model_slug
+from services.vector_store import VectorStoreService
+
+def test_model_slug():
+    assert model_slug("all-minilm:l6-v2") == "all-minilm-l6-v2"
+    assert model_slug("Org/Model Name") == "org-model-name"
+
+def test_each_model_gets_its_own_collection(client, auth, collection):
+    default = client.post("/v1/store", params={"collection": collection}, json={"texts": ["default model"]}, headers=auth)
+    mini = client.post(
+        "/v1/store", params={"collection": collection, "model": "mini-embed"}, json={"texts": ["small model"]}, headers=auth
+    )
+
+    assert default.json()["collection"] == collection
+    assert mini.json()["collection"] == f"{collection}__mini-embed"
+    info = client.get(f"/v1/collections/{collection}__mini-embed", headers=auth).json()
+    assert (info["config"]["vector_size"], info["namespace"], info["model"]) == (16, collection, "mini-embed")
+
+def test_empty_collection_of_the_wrong_size_is_recreated(client, auth, collection):
+    response = client.post("/v1/collections", json={"name": collection, "vector_size": 8}, headers=auth)
+    assert response.status_code == 200, response.text
+
+    stored = client.post("/v1/store", params={"collection": collection}, json={"texts": ["thirty-two dims"]}, headers=auth)
+
+    assert stored.status_code == 200, stored.text
+    assert client.get(f"/v1/collections/{collection}", headers=auth).json()["config"]["vector_size"] == 32
+
+def test_named_vectors_are_stored_and_searched_by_name(client, auth, collection):
+    response = client.post(
+        "/v1/collections",
+        json={"name": collection, "vectors": {"full": {"model": "nomic-embed-text"}, "mini": {"model": "mini-embed"}}},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["config"]["vectors"]["mini"]["size"] == 16
+
+    texts = ["named vectors per point", "one embedding per model"]
+    stored = client.post("/v1/store", params={"collection": collection}, json={"texts": texts}, headers=auth)
+    assert stored.status_code == 200, stored.text
+    assert stored.json()["embedded"] == 2
+
+    for vector in ("full", "mini"):
+        response = client.post(
+            "/v1/search", params={"query": texts[1], "collection": collection, "vector": vector}, headers=auth
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()["results"][0]["metadata"]["text"] == texts[1]
+
+    # The model picks its vector when no name is given
+    response = client.post(
+        "/v1/search", params={"query": texts[0], "collection": collection, "model": "mini-embed"}, headers=auth
+    )
+    assert response.json()["results"][0]["metadata"]["text"] == texts[0]
+
+    response = client.post(
+        "/v1/search", params={"query": texts[0], "collection": collection, "vector": "missing"}, headers=auth
+    )
+    assert response.status_code == 400
+
+def test_failed_registration_removes_the_backend_collection(collection, monkeypatch):
+    def fail(spec):
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(CollectionRegistry, "_write", staticmethod(fail))
+    service = VectorStoreService()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.create_collection(collection, vector_size=4))
+
+    assert collection not in asyncio.run(service.backend.list_collections())
+    assert collection_registry.get(collection) is None
@@ -0,0 +1,92 @@
+"""
+Datasets uploaded once and memory-mapped into code runs
+"""
+
+import asyncio
+import io
+import os
+
+import numpy as np
+import pytest
+
+from core.config import settings
+from services.datasets import DatasetNotFoundError, DatasetQuotaError, DatasetStore
+
+CSV = b"region,units,price\nnorth,3,1.5\nsouth,5,2.0\n"
+
+def test_csv_is_parsed_once_and_stored_read_only(tmp_path):
+    store = DatasetStore(str(tmp_path))
+
+    dataset = asyncio.run(store.create("owner", "sales", "sales.csv", io.BytesIO(CSV)))
+
+    assert (dataset["format"], dataset["shape"], dataset["columns"]) == ("csv", [2], ["region", "units", "price"])
+    stored = store.get(dataset["id"], "owner")
+    assert np.load(stored["array_path"])["units"].tolist() == [3, 5]
+    assert oct(os.stat(stored["path"]).st_mode & 0o777) == "0o444"
+    # Metadata is on disk, so a new store finds the dataset
+    assert [d["id"] for d in DatasetStore(str(tmp_path)).list("owner")] == [dataset["id"]]
+
+def test_datasets_belong_to_their_owner_and_expire(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    dataset = asyncio.run(store.create("owner", "notes", "notes.txt", io.BytesIO(b"hello")))
+
+    with pytest.raises(DatasetNotFoundError):
+        store.get(dataset["id"], "someone else")
+    assert store.usage("owner")["used_bytes"] == 5
+
+    store._datasets[dataset["id"]]["expires"] = 0
+    assert store.list("owner") == []
+    assert os.listdir(tmp_path) == []
+
+def test_quota_rejects_uploads_without_leftovers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATASET_QUOTA_BYTES", 8)
+    store = DatasetStore(str(tmp_path))
+
+    with pytest.raises(DatasetQuotaError):
+        asyncio.run(store.create("owner", "big", "big.bin", io.BytesIO(b"x" * 9)))
+    assert os.listdir(tmp_path) == []
+
+def upload(client, headers, filename, data, **params):
+    response = client.post("/v1/code/datasets", params=params, files={"file": (filename, data)}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def execute(client, headers, code, datasets):
+    return client.post("/v1/code/execute", json={"code": code, "datasets": datasets}, headers=headers)
+
+def test_runs_read_attached_datasets(client, auth):
+    sales = upload(client, auth, "sales.csv", CSV)
+    matrix = io.BytesIO()
+    np.save(matrix, np.arange(6, dtype=np.int64).reshape(2, 3))
+    grid = upload(client, auth, "grid.npy", matrix.getvalue())
+    notes = upload(client, auth, "my notes.txt", b"plain text", name="notes")
+
+    response = execute(
+        client, auth,
+        "sales = datasets['sales']\n"
+        "print(float((sales.array['units'] * sales.array['price']).sum()))\n"
+        "print(datasets['grid'].array.sum(axis=0).tolist())\n"
+        "print(datasets['notes'].text())\n"
+        "print(datasets['grid'].array.flags.writeable)",
+        [sales, grid, notes]
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["output"] == "14.5\n[3, 5, 7]\nplain text\nFalse\n"
+    assert {d["name"] for d in client.get("/v1/code/datasets", headers=auth).json()["datasets"]} >= {"sales", "grid", "notes"}
+
+def test_other_keys_cannot_see_or_attach_a_dataset(client, auth, other_auth):
+    dataset_id = upload(client, auth, "private.txt", b"secret")
+
+    assert client.get(f"/v1/code/datasets/{dataset_id}", headers=other_auth).status_code == 404
+    assert execute(client, other_auth, "print(1)", [dataset_id]).status_code == 404
+    assert client.delete(f"/v1/code/datasets/{dataset_id}", headers=other_auth).status_code == 404
+
+    assert client.delete(f"/v1/code/datasets/{dataset_id}", headers=auth).status_code == 200
+    assert client.get(f"/v1/code/datasets/{dataset_id}", headers=auth).status_code == 404
+
+def test_attached_names_must_be_unique(client, auth):
+    first = upload(client, auth, "a.txt", b"one", name="same")
+    second = upload(client, auth, "b.txt", b"two", name="same")
+
+    assert execute(client, auth, "print(1)", [first, second]).status_code == 400
@@ -0,0 +1,102 @@
+"""
+Near-duplicate detection on ingest: MinHash over shingles, then embeddings
+"""
+
+import pytest
+
+from services.dedup import MinHashLSH, shingles
+
+WORDS = ("the quarterly report shows revenue growing in every region while costs stayed flat "
+         "and the board approved a new budget for hiring engineers next year").split()
+ORIGINAL = " ".join(WORDS)
+EDITED = " ".join(WORDS[:-1] + ["quarter"])
+
+def jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+def test_shingles():
+    assert shingles("one two three four") == {"one two three", "two three four"}
+    assert shingles("one two") == {"one two"}
+    assert shingles("") == set()
+
+def test_estimates_follow_jaccard_similarity():
+    index = MinHashLSH(num_perm=128, bands=32)
+    index.add("original", ORIGINAL)
+    index.add("other", "a completely unrelated sentence about gardening tools and tomato plants")
+
+    matches = index.query(EDITED, threshold=0.5)
+
+    assert [doc_id for doc_id, _ in matches] == ["original"]
+    assert matches[0][1] == pytest.approx(jaccard(ORIGINAL, EDITED), abs=0.1)
+    assert index.query("", threshold=0.0) == []
+
+def test_replacing_and_removing_documents():
+    index = MinHashLSH(num_perm=64, bands=16)
+    index.add("doc", ORIGINAL)
+    index.add("doc", "now about something else entirely with other words")
+    assert index.query(ORIGINAL, threshold=0.5) == []
+    assert len(index) == 1
+
+    index.remove("doc")
+    assert len(index) == 0
+    assert all(not band for band in index.buckets)
+
+    with pytest.raises(ValueError):
+        MinHashLSH(num_perm=100, bands=16)
+
+def store(client, auth, collection, texts, **params):
+    response = client.post(
+        "/v1/store",
+        params={"collection": collection, **params},
+        json={"texts": texts},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_minhash_duplicates_are_skipped_before_embedding(client, auth, collection, ollama):
+    first = store(client, auth, collection, [ORIGINAL])
+    embeddings = ollama.calls["embeddings"]
+
+    body = store(client, auth, collection, [EDITED], dedup="skip")
+
+    assert ollama.calls["embeddings"] == embeddings
+    assert body["stored_ids"] == first["stored_ids"]
+    assert (body["embedded"], body["dedup"]["duplicates"], body["dedup"]["by_minhash"]) == (0, 1, 1)
+    assert client.get(f"/v1/collections/{collection}", headers=auth).json()["points_count"] == 1
+
+def test_vector_duplicates_are_caught_after_embedding(client, auth, collection):
+    store(client, auth, collection, ["alpha beta gamma delta epsilon"])
+
+    # Same words in another order: no shared shingles, the same bag-of-words embedding
+    body = store(client, auth, collection, ["epsilon delta gamma beta alpha"], dedup="skip")
+
+    assert (body["embedded"], body["dedup"]["by_vector"]) == (1, 1)
+    assert body["dedup"]["matches"][0]["method"] == "vector"
+
+def test_merge_records_the_duplicate_on_the_original(client, auth, collection):
+    client.post("/v1/store", params={"collection": collection, "source_id": "a"}, json={"texts": [ORIGINAL]}, headers=auth)
+
+    response = client.post(
+        "/v1/store",
+        params={"collection": collection, "source_id": "b", "dedup": "merge"},
+        json={"texts": [EDITED], "metadata": [{"lang": "en"}]},
+        headers=auth
+    )
+
+    assert response.json()["dedup"]["duplicates"] == 1
+    hit = client.post("/v1/search", params={"query": ORIGINAL, "collection": collection}, headers=auth).json()["results"][0]
+    assert hit["metadata"]["source_id"] == "a"
+    assert hit["metadata"]["lang"] == "en"
+    assert [entry["source_id"] for entry in hit["metadata"]["duplicates"]] == ["b"]
+
+def test_chunks_being_replaced_are_not_originals(client, auth, collection):
+    client.post("/v1/store", params={"collection": collection, "source_id": "doc"}, json={"texts": [ORIGINAL]}, headers=auth)
+
+    response = client.post(
+        "/v1/store", params={"collection": collection, "source_id": "doc", "dedup": "skip"}, json={"texts": [EDITED]}, headers=auth
+    )
+
+    body = response.json()
+    assert (body["embedded"], body["deleted"], body["dedup"]["duplicates"]) == (1, 1, 0)
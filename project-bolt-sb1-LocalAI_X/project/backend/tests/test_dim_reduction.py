@@ -0,0 +1,87 @@
+"""
+Dimensionality reduction: Matryoshka truncation and fitted PCA projections
+"""
+
+import numpy as np
+import pytest
+
+from services.dim_reduction import fit_pca, is_fitted, new_reduction, reduce_vectors
+
+SAMPLE = [f"sample text number {word} about {topic}" for word in ["one", "two", "three", "four"]
+          for topic in ["cats", "dogs", "birds"]]
+
+def test_new_reduction_validates():
+    assert new_reduction("truncate", 8, 32, "nomic-embed-text:latest")["dimensions"] == 8
+    for method, dimensions, model in [("svd", 8, None), ("pca", 32, None), ("pca", 0, None), ("truncate", 8, "all-minilm")]:
+        with pytest.raises(ValueError):
+            new_reduction(method, dimensions, 32, model)
+
+def test_truncation_keeps_leading_components_normalized():
+    reduction = new_reduction("truncate", 2, 4, "nomic-embed-text")
+
+    reduced = reduce_vectors("c", reduction, np.array([[3.0, 4.0, 9.0, 9.0]]))
+
+    assert reduced.tolist() == [[pytest.approx(0.6), pytest.approx(0.8)]]
+    with pytest.raises(ValueError):
+        reduce_vectors("c", reduction, np.ones((1, 8)))
+
+def test_pca_preserves_a_low_rank_geometry():
+    rng = np.random.default_rng(0)
+    basis = rng.normal(size=(3, 16))
+    data = rng.normal(size=(200, 3)) @ basis + 5.0
+    reduction = new_reduction("pca", 3, 16, None)
+    assert not is_fitted(reduction)
+    with pytest.raises(ValueError):
+        reduce_vectors("pca_collection", reduction, data)
+
+    fitted = fit_pca(reduction, data.tolist())
+    reduced = reduce_vectors("pca_collection", fitted, data, normalize=False)
+
+    assert fitted["explained_variance"] == pytest.approx(1.0)
+    # Distances survive the projection when the data lies in the kept subspace
+    original = np.linalg.norm(data[:20, None] - data[None, :20], axis=-1)
+    projected = np.linalg.norm(reduced[:20, None] - reduced[None, :20], axis=-1)
+    assert projected == pytest.approx(original, rel=1e-3, abs=1e-3)
+
+def test_pca_needs_more_samples_than_dimensions():
+    with pytest.raises(ValueError):
+        fit_pca(new_reduction("pca", 4, 8, None), np.ones((4, 8)).tolist())
+
+def test_truncated_collection(client, auth, collection):
+    response = client.post(
+        "/v1/collections",
+        json={"name": collection, "model": "nomic-embed-text", "reduction": {"method": "truncate", "dimensions": 8}},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+    client.post("/v1/store", params={"collection": collection}, json={"texts": ["short vectors"]}, headers=auth)
+
+    info = client.get(f"/v1/collections/{collection}", headers=auth).json()
+    assert info["config"]["vector_size"] == 8
+    assert info["config"]["reduction"]["source_size"] == 32
+    results = client.post("/v1/search", params={"query": "short vectors", "collection": collection}, headers=auth).json()
+    assert results["results"][0]["metadata"]["text"] == "short vectors"
+
+def test_pca_collection_is_fitted_before_it_stores(client, auth, collection):
+    response = client.post(
+        "/v1/collections",
+        json={"name": collection, "reduction": {"method": "pca", "dimensions": 8}},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["config"]["reduction"]["fitted"] is False
+    unfitted = client.post("/v1/store", params={"collection": collection}, json={"texts": [SAMPLE[0]]}, headers=auth)
+    assert unfitted.status_code == 400
+
+    response = client.post(f"/v1/collections/{collection}/reduction", json={"texts": SAMPLE}, headers=auth)
+    assert response.status_code == 200, response.text
+    assert response.json()["reduction"]["fitted"] is True
+
+    stored = client.post("/v1/store", params={"collection": collection}, json={"texts": SAMPLE[:3]}, headers=auth)
+    assert stored.status_code == 200, stored.text
+    results = client.post("/v1/search", params={"query": SAMPLE[1], "collection": collection}, headers=auth).json()
+    assert results["results"][0]["metadata"]["text"] == SAMPLE[1]
+
+    # Stored points keep their projection, so the fit is frozen
+    refit = client.post(f"/v1/collections/{collection}/reduction", json={"texts": SAMPLE}, headers=auth)
+    assert refit.status_code == 400
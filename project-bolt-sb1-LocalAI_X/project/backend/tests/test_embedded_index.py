@@ -0,0 +1,100 @@
+"""
+Embedded in-process vector index: exact search, persistence, the HNSW graph
+and compaction of retired rows
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from core.config import settings
+from services.embedded_index import EmbeddedCollection
+from services.hnsw import HNSWIndex
+
+def random_points(count, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return [{"id": f"p{i}", "vector": vector.tolist(), "payload": {"n": i}} for i, vector in enumerate(vectors)]
+
+def exact_top(points, query, k):
+    vectors = np.array([point["vector"] for point in points])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    return [points[i]["id"] for i in np.argsort(-scores)[:k]]
+
+def test_exact_search_ranks_by_cosine(tmp_path):
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=16)
+    points = random_points(200)
+    collection.upsert(points)
+
+    query = np.array(points[7]["vector"])
+    hits = collection.search(query.tolist(), limit=5, score_threshold=None)
+
+    assert [hit["id"] for hit in hits] == exact_top(points, query, 5)
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert hits[0]["metadata"] == {"n": 7}
+
+def test_overwrite_and_delete(tmp_path):
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=4)
+    collection.upsert([{"id": "a", "vector": [1, 0, 0, 0], "payload": {"v": 1}}])
+    collection.upsert([{"id": "a", "vector": [0, 1, 0, 0], "payload": {"v": 2}}])
+
+    hits = collection.search([0, 1, 0, 0], limit=10, score_threshold=None)
+    assert [(hit["id"], hit["metadata"]) for hit in hits] == [("a", {"v": 2})]
+
+    collection.delete(["a"])
+    assert collection.search([0, 1, 0, 0], limit=10, score_threshold=None) == []
+    assert collection.count() == 0
+
+def test_collection_survives_reopening(tmp_path):
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=16)
+    points = random_points(50)
+    collection.upsert(points)
+    collection.delete(["p3"])
+    collection.close()
+
+    reopened = EmbeddedCollection(tmp_path / "c")
+    assert reopened.count() == 49
+    hits = reopened.search(points[3]["vector"], limit=1, score_threshold=None)
+    assert hits[0]["id"] != "p3"
+
+def test_hnsw_recall_against_exact_search():
+    vectors = np.random.default_rng(1).normal(size=(1000, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = HNSWIndex(lambda: vectors, "cosine", m=16)
+    for row in range(len(vectors)):
+        index.add(row)
+
+    found = 0
+    for query in vectors[:50]:
+        exact = set(np.argsort(-(vectors @ query))[:10].tolist())
+        found += len(exact & {row for _, row in index.search(query, 10, ef=64)})
+    assert found / 500 >= 0.9
+
+def test_graph_index_is_built_and_kept_in_step(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDED_HNSW_THRESHOLD", 100)
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=16)
+    points = random_points(300)
+    collection.upsert(points)
+
+    deadline = time.monotonic() + 30
+    while collection._building and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert collection.index is not None and collection.index.count == 300
+
+    # Rows written after the build are searched exactly until indexed
+    extra = {"id": "late", "vector": [1.0] + [0.0] * 15, "payload": {}}
+    collection.upsert([extra])
+    assert collection.search(extra["vector"], limit=1, score_threshold=None)[0]["id"] == "late"
+
+def test_retired_rows_are_compacted(tmp_path):
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=8)
+    points = random_points(20, dim=8)
+    for _ in range(60):
+        collection.upsert(points)
+
+    # 1180 retired rows against 20 live ones triggers a rewrite
+    assert collection.rows < 1200
+    assert collection.count() == 20
+    hits = collection.search(points[5]["vector"], limit=1, score_threshold=None)
+    assert (hits[0]["id"], hits[0]["metadata"]) == ("p5", {"n": 5})
@@ -0,0 +1,89 @@
+"""
+Federated search over several collections
+"""
+
+import asyncio
+
+import pytest
+
+from services.collection_registry import CollectionNotFoundError
+from services.federated_search import FederatedSearchService, expand_collections, normalize_scores
+from services.vector_store import VectorStoreService
+
+QUERY = "federated search text"
+
+def store(client, auth, collection, text, **params):
+    response = client.post(
+        "/v1/store", params={"collection": collection, **params}, json={"texts": [text]}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+
+def test_normalize_scores():
+    assert normalize_scores([{"score": 0.5}, {"score": 0.9}, {"score": 0.7}]) == [0.0, 1.0, pytest.approx(0.5)]
+    assert normalize_scores([{"score": 0.3}, {"score": 0.3}]) == [1.0, 1.0]
+    assert normalize_scores([]) == []
+
+def test_expand_names_and_globs(client, auth, collection):
+    store(client, auth, f"{collection}_a", QUERY)
+    store(client, auth, f"{collection}_b", QUERY)
+
+    assert expand_collections([f"{collection}_*"]) == [f"{collection}_a", f"{collection}_b"]
+    assert expand_collections([f"{collection}_b", f"{collection}_?"]) == [f"{collection}_b", f"{collection}_a"]
+    for patterns in [[f"{collection}_missing"], [f"{collection}_x*"]]:
+        with pytest.raises(CollectionNotFoundError):
+            expand_collections(patterns)
+
+def test_merges_one_top_k_and_embeds_once(client, auth, collection, ollama):
+    store(client, auth, f"{collection}_a", "merge one top k")
+    store(client, auth, f"{collection}_b", "merge one top k list")
+    embeddings = ollama.calls["embeddings"]
+
+    # A query not embedded before, so the embedding cache does not hide the calls
+    response = client.post(
+        "/v1/search", params={"query": "merge one top k please", "collection": f"{collection}_*", "limit": 5}, headers=auth
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert ollama.calls["embeddings"] == embeddings + 1
+    assert body["normalization"] == "none"
+    assert [hit["collection"] for hit in body["results"]] == [f"{collection}_a", f"{collection}_b"]
+    assert body["results"][0]["score"] > body["results"][1]["score"]
+    assert {report["status"] for report in body["collections"].values()} == {"ok"}
+
+def test_scores_of_different_models_are_normalized(client, auth, collection):
+    store(client, auth, f"{collection}_a", QUERY)
+    store(client, auth, f"{collection}_b", QUERY, model="mini-embed")
+
+    response = client.post(
+        "/v1/search",
+        params={"query": QUERY, "collections": [f"{collection}_a", f"{collection}_b__mini-embed"]},
+        headers=auth
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["normalization"] == "minmax"
+    assert len(response.json()["results"]) == 2
+
+def test_slow_and_failing_collections_are_left_out(client, auth, collection, monkeypatch):
+    for suffix in "abc":
+        store(client, auth, f"{collection}_{suffix}", QUERY)
+    search = VectorStoreService.search
+
+    async def uneven_search(self, *args, collection_name=None, **kwargs):
+        if collection_name.endswith("_b"):
+            await asyncio.sleep(1)
+        if collection_name.endswith("_c"):
+            raise RuntimeError("shard unavailable")
+        return await search(self, *args, collection_name=collection_name, **kwargs)
+    monkeypatch.setattr(VectorStoreService, "search", uneven_search)
+
+    response = asyncio.run(FederatedSearchService().search(QUERY, [f"{collection}_*"], timeout_ms=200))
+
+    statuses = {name: report["status"] for name, report in response["collections"].items()}
+    assert statuses == {f"{collection}_a": "ok", f"{collection}_b": "timeout", f"{collection}_c": "error"}
+    assert [hit["collection"] for hit in response["results"]] == [f"{collection}_a"]
+
+def test_unknown_collection_is_404(client, auth):
+    response = client.post("/v1/search", params={"query": QUERY, "collection": "no_such_*"}, headers=auth)
+    assert response.status_code == 404
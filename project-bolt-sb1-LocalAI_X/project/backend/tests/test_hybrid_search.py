@@ -0,0 +1,56 @@
+"""
+Lexical (BM25) and hybrid search merged with reciprocal rank fusion
+"""
+
+import pytest
+
+from services.lexical_index import BM25Index, tokenize
+from services.vector_store import RRF_K, reciprocal_rank_fusion
+
+def hit(doc_id, score):
+    return {"id": doc_id, "score": score, "metadata": {"text": doc_id}}
+
+def test_rrf_sums_reciprocal_ranks():
+    fused = reciprocal_rank_fusion({
+        "vector": [hit("a", 0.9), hit("b", 0.8), hit("c", 0.7)],
+        "lexical": [hit("c", 12.0), hit("a", 3.0)]
+    }, limit=10)
+
+    assert [entry["id"] for entry in fused] == ["a", "c", "b"]
+    assert fused[0]["score"] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 2))
+    assert fused[0]["scores"] == {"vector": 0.9, "lexical": 3.0}
+    assert fused[2]["scores"] == {"vector": 0.8}
+
+def test_rrf_keeps_the_limit():
+    fused = reciprocal_rank_fusion({"vector": [hit(str(i), 1.0) for i in range(10)]}, limit=3)
+    assert [entry["id"] for entry in fused] == ["0", "1", "2"]
+
+def test_identifiers_are_kept_whole_and_split():
+    assert tokenize("Got ERR_CONN_RESET in v2.3.1") == [
+        "got", "err_conn_reset", "err", "conn", "reset", "in", "v2.3.1", "v2", "3", "1"
+    ]
+
+def test_bm25_prefers_rare_terms_and_forgets_removed_documents():
+    index = BM25Index()
+    index.add("a", "the server returned error E-1042")
+    index.add("b", "the server is fine")
+    index.add("c", "the weather is fine")
+
+    assert index.search("E-1042 server")[0][0] == "a"
+    index.remove("a")
+    assert [doc_id for doc_id, _ in index.search("E-1042")] == []
+
+def test_hybrid_search_through_the_api(client, auth, collection):
+    texts = ["restart the router after error E-1042", "routers need a restart sometimes", "cooking pasta at home"]
+    client.post("/v1/store", params={"collection": collection}, json={"texts": texts}, headers=auth)
+
+    lexical = client.post(
+        "/v1/search", params={"query": "E-1042", "collection": collection, "mode": "lexical"}, headers=auth
+    ).json()
+    assert [result["metadata"]["text"] for result in lexical["results"]] == [texts[0]]
+
+    hybrid = client.post(
+        "/v1/search", params={"query": "E-1042 restart", "collection": collection, "mode": "hybrid"}, headers=auth
+    ).json()
+    assert hybrid["results"][0]["metadata"]["text"] == texts[0]
+    assert "lexical" in hybrid["results"][0]["scores"]
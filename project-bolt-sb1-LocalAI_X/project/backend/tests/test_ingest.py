@@ -0,0 +1,70 @@
+"""
+Idempotent ingestion: content-hash point IDs, skipped unchanged chunks and
+deletion of a source's stale chunks
+"""
+
+import asyncio
+
+from services.vector_store import VectorStoreService, content_hash, point_id_for
+
+def store(client, auth, collection, texts, **params):
+    response = client.post(
+        "/v1/store",
+        params={"collection": collection, **params},
+        json={"texts": texts},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def points(client, auth, collection):
+    response = client.get(f"/v1/collections/{collection}", headers=auth)
+    assert response.status_code == 200, response.text
+    return response.json()["points_count"]
+
+def test_point_ids_depend_on_collection_source_and_content():
+    chunk_hash = content_hash("alpha")
+    assert point_id_for("docs", "a", chunk_hash) == point_id_for("docs", "a", chunk_hash)
+    assert point_id_for("docs", "a", chunk_hash) != point_id_for("docs", "b", chunk_hash)
+    assert point_id_for("docs", "a", chunk_hash) != point_id_for("other", "a", chunk_hash)
+
+def test_unchanged_chunks_are_skipped(client, auth, collection):
+    texts = ["the first chunk", "the second chunk", "the third chunk"]
+    first = store(client, auth, collection, texts, source_id="manual")
+    assert (first["embedded"], first["skipped"], first["deleted"]) == (3, 0, 0)
+
+    again = store(client, auth, collection, texts, source_id="manual")
+    assert (again["embedded"], again["skipped"], again["deleted"]) == (0, 3, 0)
+    assert again["stored_ids"] == first["stored_ids"]
+    assert points(client, auth, collection) == 3
+
+def test_stale_chunks_of_a_source_are_deleted(client, auth, collection):
+    store(client, auth, collection, ["intro text", "old middle", "old ending"], source_id="manual")
+    store(client, auth, collection, ["unrelated note"], source_id="notes")
+
+    update = store(client, auth, collection, ["intro text", "new middle"], source_id="manual")
+
+    assert (update["embedded"], update["skipped"], update["deleted"]) == (1, 1, 2)
+    assert points(client, auth, collection) == 3
+
+def test_replace_source_false_keeps_earlier_parts(client, auth, collection):
+    store(client, auth, collection, ["part one"], source_id="book", replace_source=False)
+    second = store(client, auth, collection, ["part two"], source_id="book", replace_source=False)
+
+    assert second["deleted"] == 0
+    assert points(client, auth, collection) == 2
+
+def test_loose_chunks_are_not_duplicated(client, auth, collection):
+    store(client, auth, collection, ["no source here"])
+    again = store(client, auth, collection, ["no source here"])
+
+    assert again["skipped"] == 1
+    assert points(client, auth, collection) == 1
+
+def test_store_leaves_the_callers_metadata_alone(client, auth, collection):
+    store(client, auth, collection, ["creates the collection"])
+    metadata = {"text": "caller owned", "source_id": "x"}
+
+    asyncio.run(VectorStoreService().store([1.0] * 32, metadata, collection_name=collection))
+
+    assert metadata == {"text": "caller owned", "source_id": "x"}
@@ -0,0 +1,117 @@
+"""
+Payload filters: parsing, translation to SQL and Qdrant, and automatic indexes
+"""
+
+import random
+import time
+
+import pytest
+from qdrant_client.http import models
+
+from core.config import settings
+from services.embedded_index import EmbeddedCollection
+from services.payload_filter import FilterCondition, index_type, matches, parse_filters
+from services.vector_backend import QdrantBackend
+
+def test_parse_normalizes_every_form():
+    assert parse_filters({
+        "tenant": "acme",
+        "lang": ["en", "de"],
+        "kind": {"in": ["a"]},
+        "flag": {"eq": True},
+        "meta.year": {"gte": 2020, "lt": 2024}
+    }) == [
+        FilterCondition("tenant", "eq", "acme"),
+        FilterCondition("lang", "in", ["en", "de"]),
+        FilterCondition("kind", "in", ["a"]),
+        FilterCondition("flag", "eq", True),
+        FilterCondition("meta.year", "range", {"gte": 2020, "lt": 2024})
+    ]
+
+@pytest.mark.parametrize("filters", [
+    {"year": {"about": 2020}},
+    {"year": {"gte": "2020"}},
+    {"tags": [["nested"]]},
+    {"bad'field": 1},
+    {"tenant": None}
+])
+def test_parse_rejects_invalid_filters(filters):
+    with pytest.raises(ValueError):
+        parse_filters(filters)
+
+def test_index_types():
+    assert index_type(FilterCondition("a", "eq", "x")) == "keyword"
+    assert index_type(FilterCondition("a", "in", [1, 2])) == "integer"
+    assert index_type(FilterCondition("a", "range", {"gte": 0.5})) == "float"
+    assert index_type(FilterCondition("a", "eq", True)) == "bool"
+
+def test_embedded_sql_agrees_with_python_matching(tmp_path):
+    rng = random.Random(3)
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=4)
+    payloads = [
+        {"tenant": rng.choice(["acme", "globex", "initech"]), "year": rng.randint(2015, 2025),
+         "score": rng.random(), "public": rng.random() < 0.5, "meta": {"lang": rng.choice(["en", "de", "fr"])}}
+        for _ in range(300)
+    ]
+    collection.upsert([
+        {"id": f"p{i}", "vector": [rng.random() for _ in range(4)], "payload": payload}
+        for i, payload in enumerate(payloads)
+    ])
+
+    for filters in [
+        {"tenant": "acme"},
+        {"tenant": ["acme", "initech"], "public": True},
+        {"year": {"gte": 2018, "lt": 2021}},
+        {"score": {"gt": 0.25, "lte": 0.75}, "meta.lang": "de"},
+        {"tenant": []}
+    ]:
+        conditions = parse_filters(filters)
+        expected = {f"p{i}" for i, payload in enumerate(payloads) if matches(payload, conditions)}
+        hits = collection.search([1, 1, 1, 1], limit=300, score_threshold=None, filters=filters)
+        assert {hit["id"] for hit in hits} == expected, filters
+        assert collection.count(filters) == len(expected)
+
+def test_qdrant_translation():
+    translated = QdrantBackend._filter({
+        "tenant": "acme",
+        "lang": ["en", "de"],
+        "mixed": ["a", 1],
+        "ratio": 0.5,
+        "year": {"gte": 2020}
+    })
+
+    tenant, lang, mixed, ratio, year = translated.must
+    assert tenant == models.FieldCondition(key="tenant", match=models.MatchValue(value="acme"))
+    assert lang == models.FieldCondition(key="lang", match=models.MatchAny(any=["en", "de"]))
+    assert [condition.match.value for condition in mixed.should] == ["a", 1]
+    assert ratio == models.FieldCondition(key="ratio", range=models.Range(gte=0.5, lte=0.5))
+    assert year == models.FieldCondition(key="year", range=models.Range(gte=2020))
+    assert QdrantBackend._filter(None) is None
+
+def test_often_filtered_fields_get_an_index(client, auth, collection, monkeypatch):
+    monkeypatch.setattr(settings, "PAYLOAD_INDEX_AUTO_AFTER", 2)
+    client.post(
+        "/v1/store",
+        params={"collection": collection},
+        json={"texts": ["filtered a", "filtered b"], "metadata": [{"tenant": "acme"}, {"tenant": "globex"}]},
+        headers=auth
+    )
+
+    for query in ["filtered a", "filtered a a"]:
+        response = client.post(
+            "/v1/search",
+            params={"query": query, "collection": collection},
+            json={"filters": {"tenant": "acme"}},
+            headers=auth
+        )
+        assert [hit["metadata"]["tenant"] for hit in response.json()["results"]] == ["acme"]
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        info = client.get(f"/v1/collections/{collection}", headers=auth).json()
+        if "tenant" in info["payload_indexes"]:
+            break
+        time.sleep(0.05)
+    assert info["payload_indexes"] == {"tenant": "keyword"}
+    assert info["payload_filters"][0]["field"] == "tenant"
+    assert info["payload_filters"][0]["indexed"] is True
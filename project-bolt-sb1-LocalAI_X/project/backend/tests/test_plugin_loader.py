@@ -0,0 +1,84 @@
+"""
+Plugin modules imported once per version, hot reloaded when they change
+"""
+
+import os
+from pathlib import Path
+
+from core.config import settings
+from services.plugin_loader import PluginModuleCache
+
+PLUGIN = '''
+PLUGIN_INFO = {{
+    "name": "{name}",
+    "version": "1.0.0",
+    "description": "Test plugin",
+    "functions": [{{"name": "{name}_answer", "description": "Returns a fixed answer", "parameters": {{}}}}]
+}}
+
+def {name}_answer(arguments):
+    return {answer!r}
+'''
+
+def write(path, source):
+    """Write a file and move its mtime forward, as an edit a while later would"""
+    stat = path.stat() if path.exists() else None
+    path.write_text(source)
+    if stat is not None:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_modules_are_imported_once_per_version(tmp_path):
+    cache = PluginModuleCache()
+    path = tmp_path / "counter.py"
+    write(path, "VALUE = 1\n")
+
+    first = cache.load(str(path))
+    assert cache.load(str(path)) is first
+
+    # A touched but unchanged file is not imported again
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000_000))
+    assert cache.load(str(path)) is first
+
+    write(path, "VALUE = 2\n")
+    assert cache.load(str(path)).VALUE == 2
+
+    assert cache.evict(str(path)) is True
+    assert cache.evict(str(path)) is False
+    cache.load(str(path))
+    assert cache.stats() == {"modules": 1, "hits": 2, "imports": 2, "reloads": 1, "evictions": 1}
+
+def upload(client, auth, name, source):
+    return client.post("/v1/plugins/upload", files={"file": (f"{name}.py", source.encode("utf-8"))}, headers=auth)
+
+def call(client, auth, tool):
+    response = client.post("/v1/tools/execute", json={"tool_name": tool, "arguments": {}}, headers=auth)
+    assert response.status_code == 200, response.text
+    return response.json()["result"]
+
+def test_uploads_and_edits_take_effect_on_the_next_call(client, auth):
+    response = upload(client, auth, "hotplug", PLUGIN.format(name="hotplug", answer="first"))
+    assert response.status_code == 200, response.text
+    assert call(client, auth, "hotplug_answer") == {"result": "first", "success": True}
+
+    upload(client, auth, "hotplug", PLUGIN.format(name="hotplug", answer="uploaded"))
+    assert call(client, auth, "hotplug_answer")["result"] == "uploaded"
+
+    write(Path(settings.PLUGINS_DIRECTORY) / "hotplug.py", PLUGIN.format(name="hotplug", answer="edited on disk"))
+    assert call(client, auth, "hotplug_answer")["result"] == "edited on disk"
+
+    assert client.delete("/v1/plugins/hotplug", headers=auth).status_code == 200
+    assert call(client, auth, "hotplug_answer")["success"] is False
+
+def test_a_bad_upload_keeps_the_installed_plugin(client, auth):
+    source = PLUGIN.format(name="steady", answer="still working")
+    assert upload(client, auth, "steady", source).status_code == 200
+
+    assert upload(client, auth, "steady", "def broken(:\n").status_code == 400
+    # A replacement whose tool clashes with a built-in is refused as well
+    clash = source.replace('"steady_answer"', '"calculator"')
+    assert upload(client, auth, "steady", clash).status_code == 400
+
+    assert (Path(settings.PLUGINS_DIRECTORY) / "steady.py").read_text() == source
+    assert call(client, auth, "steady_answer")["result"] == "still working"
+    assert not [entry for entry in os.listdir(settings.PLUGINS_DIRECTORY) if entry.startswith("tmp")]
+    client.delete("/v1/plugins/steady", headers=auth)
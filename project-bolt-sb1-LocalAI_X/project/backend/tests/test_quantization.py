@@ -0,0 +1,66 @@
+"""
+Quantized collections: compact codes in RAM, full-precision rescoring
+"""
+
+import numpy as np
+import pytest
+
+from services.embedded_index import EmbeddedCollection
+
+def clustered_points(count=400, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return [{"id": f"p{i}", "vector": vector.tolist(), "payload": {"n": i}} for i, vector in enumerate(vectors)]
+
+@pytest.mark.parametrize("quantization", ["scalar", "binary"])
+def test_rescored_search_matches_exact_scores(tmp_path, quantization):
+    exact = EmbeddedCollection(tmp_path / "exact", vector_size=64)
+    quantized = EmbeddedCollection(tmp_path / quantization, vector_size=64, quantization=quantization)
+    points = clustered_points()
+    exact.upsert(points)
+    quantized.upsert(points)
+
+    for point in points[:20]:
+        expected = exact.search(point["vector"], limit=1, score_threshold=None)[0]
+        found = quantized.search(point["vector"], limit=1, score_threshold=None, oversampling=4)[0]
+        assert found["id"] == expected["id"] == point["id"]
+        # Scores come from the float32 originals, not the codes
+        assert found["score"] == pytest.approx(expected["score"], abs=1e-5)
+
+@pytest.mark.parametrize("quantization, ratio", [("scalar", 4), ("binary", 32)])
+def test_codes_are_smaller_than_the_vectors(tmp_path, quantization, ratio):
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=64, quantization=quantization)
+    collection.upsert(clustered_points())
+
+    memory = collection.info()["memory"]
+    assert memory["vectors_bytes"] == memory["quantized_bytes"] * ratio
+
+def test_codes_are_rebuilt_on_reopening(tmp_path):
+    collection = EmbeddedCollection(tmp_path / "c", vector_size=64, quantization="scalar")
+    points = clustered_points()
+    collection.upsert(points)
+    scale = collection.scale
+    collection.close()
+
+    reopened = EmbeddedCollection(tmp_path / "c")
+    assert reopened.quantization == "scalar"
+    assert reopened.scale == pytest.approx(scale)
+    assert reopened.search(points[9]["vector"], limit=1, score_threshold=None)[0]["id"] == "p9"
+
+def test_quantized_collection_through_the_api(client, auth, collection):
+    response = client.post(
+        "/v1/collections",
+        json={"name": collection, "vector_size": 32, "quantization": "binary"},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["config"]["quantization"] == "binary"
+
+    client.post("/v1/store", params={"collection": collection}, json={"texts": ["binary codes in memory"]}, headers=auth)
+    response = client.post(
+        "/v1/search",
+        params={"query": "binary codes in memory", "collection": collection},
+        headers=auth
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["results"][0]["metadata"]["text"] == "binary codes in memory"
@@ -0,0 +1,75 @@
+"""
+Retrieval-augmented chat: retrieval, context packing and citations
+"""
+
+from services.rag import RAGService, estimate_tokens
+
+def hit(doc_id, text, score=0.9):
+    return {"id": doc_id, "score": score, "metadata": {"text": text, "source_id": "s"}}
+
+def test_context_keeps_rank_order_within_the_budget():
+    long_text = "x" * 400
+    context, citations = RAGService.pack_context(
+        [hit("a", "first chunk"), hit("b", long_text), hit("c", "first chunk"), hit("d", "small one")],
+        max_tokens=estimate_tokens("first chunk") + estimate_tokens("small one")
+    )
+
+    # The oversized chunk and the repeated text are skipped, numbering stays dense
+    assert context == "[1] first chunk\n\n[2] small one"
+    assert [(citation["index"], citation["id"]) for citation in citations] == [(1, "a"), (2, "d")]
+
+def test_empty_context_says_nothing_was_found():
+    assert "No relevant documents" in RAGService.context_message("")["content"]
+
+def test_chat_answers_from_retrieved_chunks(client, auth, collection, ollama, monkeypatch):
+    client.post(
+        "/v1/store",
+        params={"collection": collection, "source_id": "handbook"},
+        json={"texts": ["the office opens at nine", "parking is behind the building"]},
+        headers=auth
+    )
+    prompts = []
+    monkeypatch.setattr(ollama, "reply", lambda prompt: prompts.append(prompt) or "At nine [1].")
+
+    response = client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "mistral:latest",
+            "messages": [{"role": "user", "content": "office opens at what time"}],
+            "rag": {"collection": collection, "limit": 1, "score_threshold": 0}
+        },
+        headers=auth
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["choices"][0]["message"]["content"] == "At nine [1]."
+    assert [(citation["text"], citation["source_id"]) for citation in body["citations"]] == [
+        ("the office opens at nine", "handbook")
+    ]
+    assert {"embedding_ms", "search_ms", "retrieval_ms"} <= set(body["timings"])
+    assert "[1] the office opens at nine" in prompts[0]
+
+def test_unknown_collection_is_404(client, auth):
+    response = client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "mistral:latest",
+            "messages": [{"role": "user", "content": "anything"}],
+            "rag": {"collection": "no_such_collection"}
+        },
+        headers=auth
+    )
+    assert response.status_code == 404
+
+def test_invalid_filters_are_rejected(client, auth, collection):
+    response = client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "mistral:latest",
+            "messages": [{"role": "user", "content": "anything"}],
+            "rag": {"collection": collection, "filters": {"year": {"about": 2020}}}
+        },
+        headers=auth
+    )
+    assert response.status_code == 422
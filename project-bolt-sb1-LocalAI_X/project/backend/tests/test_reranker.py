@@ -0,0 +1,119 @@
+"""
+Reranking: pairwise scorers, MMR and degradation within the budget
+"""
+
+import asyncio
+
+from services.reranker import SCORERS, PairwiseScorer, RerankService, mmr
+
+def hits(*texts):
+    return [{"id": f"h{i}", "score": 1.0 - i / 10, "metadata": {"text": text}} for i, text in enumerate(texts)]
+
+class FixedScorer(PairwiseScorer):
+    name = "fixed"
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = 0
+
+    async def score_batch(self, query, documents):
+        self.calls += 1
+        return [self.scores.get(document) for document in documents]
+
+class FailingScorer(PairwiseScorer):
+    name = "failing"
+
+    async def score_batch(self, query, documents):
+        raise RuntimeError("scorer unavailable")
+
+def test_mmr_skips_near_duplicates():
+    query = [1.0, 0.0, 0.0]
+    vectors = [[1.0, 0.1, 0.0], [1.0, 0.11, 0.0], [0.7, 0.0, 0.7]]
+
+    assert mmr(query, vectors, 2, diversity_lambda=1.0) == [0, 1]
+    assert mmr(query, vectors, 2, diversity_lambda=0.5) == [0, 2]
+    assert mmr(query, [], 2) == []
+
+def test_scorer_reorders_and_caches(monkeypatch):
+    scorer = FixedScorer({"low": 1.0, "high": 9.0, "mid": 5.0})
+    monkeypatch.setitem(SCORERS, "fixed", lambda: scorer)
+    service = RerankService()
+
+    async def scenario():
+        first, report = await service.rerank("cached query", hits("low", "high", "mid"), 2, scorer="fixed")
+        assert [hit["metadata"]["text"] for hit in first] == ["high", "mid"]
+        assert first[0]["rerank_score"] == 9.0
+        assert (report["scored"], report["cached"], report["degraded"]) == (3, 0, False)
+
+        _, report = await service.rerank("cached query", hits("low", "high", "mid"), 2, scorer="fixed")
+        assert (report["scored"], report["cached"]) == (3, 3)
+        assert scorer.calls == 1
+
+    asyncio.run(scenario())
+
+def test_unscored_documents_are_not_cached(monkeypatch):
+    scorer = FixedScorer({"known": 2.0})
+    monkeypatch.setitem(SCORERS, "fixed", lambda: scorer)
+    service = RerankService()
+
+    async def scenario():
+        ranked, report = await service.rerank("partial query", hits("unknown", "known"), 2, scorer="fixed")
+        # Scored documents first, the rest keep their retrieval order
+        assert [hit["metadata"]["text"] for hit in ranked] == ["known", "unknown"]
+        assert (report["scored"], report["degraded"]) == (1, True)
+
+        scorer.scores["unknown"] = 5.0
+        ranked, report = await service.rerank("partial query", hits("unknown", "known"), 2, scorer="fixed")
+        assert [hit["metadata"]["text"] for hit in ranked] == ["unknown", "known"]
+        assert (report["scored"], report["cached"]) == (2, 1)
+
+    asyncio.run(scenario())
+
+def test_failing_scorer_keeps_retrieval_order(monkeypatch):
+    monkeypatch.setitem(SCORERS, "failing", FailingScorer)
+
+    ranked, report = asyncio.run(RerankService().rerank("q", hits("a", "b", "c"), 3, scorer="failing"))
+
+    assert [hit["id"] for hit in ranked] == ["h0", "h1", "h2"]
+    assert report["degraded"] is True
+    assert report["error"] == "scorer unavailable"
+
+def test_llm_judge_replies_without_a_number(ollama, monkeypatch):
+    monkeypatch.setattr(ollama, "reply", lambda prompt: "9" if "Passage: relevant" in prompt else "no idea")
+
+    ranked, report = asyncio.run(RerankService().rerank("judge query", hits("other", "relevant"), 2, scorer="llm"))
+
+    assert [hit["metadata"]["text"] for hit in ranked] == ["relevant", "other"]
+    assert "rerank_score" not in ranked[1]
+    assert (report["scored"], report["degraded"]) == (1, True)
+
+def test_rerank_through_search(client, auth, collection, ollama, monkeypatch):
+    client.post(
+        "/v1/store",
+        params={"collection": collection},
+        json={"texts": ["apple pie", "apple tart", "apple crumble with oats"]},
+        headers=auth
+    )
+    monkeypatch.setattr(ollama, "reply", lambda prompt: "9" if "crumble" in prompt else "2")
+
+    response = client.post(
+        "/v1/search",
+        params={"query": "apple", "collection": collection, "mode": "lexical", "limit": 2},
+        json={"rerank": {"scorer": "llm", "mmr_lambda": 0.7}},
+        headers=auth
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["results"][0]["metadata"]["text"] == "apple crumble with oats"
+    assert len(body["results"]) == 2
+    assert (body["rerank"]["scored"], body["rerank"]["mmr_lambda"]) == (3, 0.7)
+
+def test_unknown_scorer_is_rejected(client, auth, collection):
+    response = client.post(
+        "/v1/search",
+        params={"query": "apple", "collection": collection},
+        json={"rerank": {"scorer": "no-such-scorer"}},
+        headers=auth
+    )
+    assert response.status_code == 422
@@ -0,0 +1,147 @@
+"""
+Warm sandbox workers: the framed protocol, limits and the pool
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from services.sandbox import WORKER_SCRIPT, SandboxPool, SandboxWorker, _HEADER
+
+def send(process, message):
+    data = json.dumps(message).encode("utf-8")
+    process.stdin.write(_HEADER.pack(len(data)) + data)
+    process.stdin.flush()
+
+def receive(process):
+    (size,) = _HEADER.unpack(process.stdout.read(_HEADER.size))
+    return json.loads(process.stdout.read(size))
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+def test_worker_speaks_length_prefixed_frames(tmp_path):
+    process = subprocess.Popen(
+        [sys.executable, WORKER_SCRIPT, json.dumps(["json", "no_such_module"])],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=tmp_path
+    )
+    try:
+        ready = receive(process)
+        assert (ready["type"], ready["pid"], ready["preloaded"]) == ("ready", process.pid, ["json"])
+
+        send(process, {"type": "run", "id": 7, "code": "print('hello')\nraise ValueError('bad')", "timeout": 5, "memory_mb": 256})
+        frames = []
+        while not frames or frames[-1]["type"] != "exit":
+            frames.append(receive(process))
+
+        assert frames[0]["type"] == "started" and frames[0]["pid"] != process.pid
+        assert all(frame["id"] == 7 for frame in frames)
+        stdout = "".join(frame["data"] for frame in frames if frame.get("stream") == "stdout")
+        stderr = "".join(frame["data"] for frame in frames if frame.get("stream") == "stderr")
+        assert stdout == "hello\n"
+        assert "ValueError: bad" in stderr
+        assert (frames[-1]["exit_code"], frames[-1]["error"]) == (1, {"type": "ValueError", "message": "bad"})
+
+        send(process, {"type": "stop"})
+        assert process.wait(5) == 0
+    finally:
+        process.kill()
+
+def test_run_streams_output_and_reports_usage():
+    async def scenario():
+        worker = SandboxWorker(preload=[])
+        await worker.start()
+        streamed = []
+
+        async def on_output(stream, text):
+            streamed.append((stream, text))
+        try:
+            result = await worker.run("print('a')\nprint('b')", timeout=5, on_output=on_output)
+        finally:
+            await worker.close()
+        return result, streamed
+
+    result, streamed = asyncio.run(scenario())
+
+    assert result["success"] is True
+    assert result["output"] == "a\nb\n"
+    assert "".join(text for stream, text in streamed if stream == "stdout") == "a\nb\n"
+    assert {"cpu_seconds", "max_rss_kb", "wall_ms"} <= set(result)
+
+def test_timeouts_and_memory_limits_only_end_the_job():
+    async def scenario():
+        worker = SandboxWorker(preload=[])
+        await worker.start()
+        try:
+            slept = await worker.run("import time\ntime.sleep(30)", timeout=1)
+            grown = await worker.run("data = bytearray(2 * 1024 ** 3)", timeout=5, memory_mb=64)
+            after = await worker.run("print('still here')", timeout=5)
+            return slept, grown, after, worker.alive
+        finally:
+            await worker.close()
+
+    slept, grown, after, alive = asyncio.run(scenario())
+
+    assert (slept["timed_out"], slept["success"], slept["error"]) == (True, False, "Code execution timed out")
+    assert "MemoryError" in grown["error"]
+    assert after["output"] == "still here\n"
+    assert alive
+
+def test_abandoned_job_is_killed():
+    async def scenario():
+        worker = SandboxWorker(preload=[])
+        await worker.start()
+        run = asyncio.create_task(worker.run("import time\ntime.sleep(60)", timeout=60))
+        while worker.child_pid is None:
+            await asyncio.sleep(0.02)
+        child = worker.child_pid
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+        broken = worker.broken
+        await worker.close()
+        return child, broken
+
+    child, broken = asyncio.run(scenario())
+
+    # The worker is in an unknown state, and the child must not outlive it
+    assert broken
+    assert not process_exists(child)
+
+def test_pool_recycles_and_replaces_workers():
+    async def scenario():
+        pool = SandboxPool(size=1, max_jobs=2)
+        await pool.start()
+        try:
+            outputs = []
+            for i in range(3):
+                result = await pool.execute(f"print({i})", timeout=5)
+                outputs.append(result["output"])
+            # A worker that dies while idle is replaced on the next job
+            worker = await pool._idle.get()
+            worker.process.kill()
+            await worker.process.wait()
+            pool._idle.put_nowait(worker)
+            result = await pool.execute("print('replaced')", timeout=5)
+            return outputs, result, pool.stats()
+        finally:
+            await pool.close()
+
+    outputs, result, stats = asyncio.run(scenario())
+
+    assert outputs == ["0\n", "1\n", "2\n"]
+    assert result["output"] == "replaced\n"
+    assert (stats["size"], stats["jobs"], stats["recycled"], stats["replaced"]) == (1, 4, 1, 1)
+    assert stats["spawned"] == 3
+
+def test_cold_execution_without_a_pool():
+    result = asyncio.run(SandboxPool(size=0).execute("print(sum(range(4)))", timeout=5))
+    assert result["output"] == "6\n"
@@ -0,0 +1,57 @@
+"""
+Search result cache invalidated by per-collection write generations
+"""
+
+import asyncio
+import time
+
+from services.vector_store import VectorStoreService, search_cache_stats
+from utils.cache import LRUCache
+
+def test_lru_evicts_the_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+def test_entries_expire_and_size_zero_disables():
+    cache = LRUCache(4, ttl=0.05)
+    cache.set("a", 1)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+    disabled = LRUCache(0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+def test_writes_invalidate_cached_results(client, auth, collection):
+    client.post("/v1/store", params={"collection": collection}, json={"texts": ["seed"]}, headers=auth)
+    query = [1.0] * 32
+
+    async def scenario():
+        service = VectorStoreService()
+        first = await service.search(query, collection_name=collection, score_threshold=-1)
+        hits = search_cache_stats()["hits"]
+        again = await service.search(query, collection_name=collection, score_threshold=-1)
+        assert search_cache_stats()["hits"] == hits + 1
+        assert again == first
+
+        # Callers may annotate hits without touching the cached copy
+        again[0]["annotated"] = True
+        assert "annotated" not in (await service.search(query, collection_name=collection, score_threshold=-1))[0]
+
+        await service.store([1.0] * 32, {"text": "written later"}, collection_name=collection)
+        hits = search_cache_stats()["hits"]
+        fresh = await service.search(query, collection_name=collection, score_threshold=-1)
+        assert search_cache_stats()["hits"] == hits
+        assert fresh[0]["metadata"]["text"] == "written later"
+
+        await service.delete([fresh[0]["id"]], collection_name=collection)
+        after_delete = await service.search(query, collection_name=collection, score_threshold=-1)
+        assert [hit["metadata"]["text"] for hit in after_delete] == ["seed"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,91 @@
+"""
+Similarity matrices, nearest pairs and clustering
+"""
+
+import numpy as np
+import pytest
+
+from services.similarity import agglomerative, describe_clusters, kmeans, normalize, similarity_matrix, top_pairs
+
+def blobs(per_blob=30, dim=16, seed=0):
+    """Three tight groups of unit vectors around random directions"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(3, dim))
+    points = np.concatenate([center + rng.normal(scale=0.05, size=(per_blob, dim)) for center in centers])
+    return normalize(points), np.repeat(np.arange(3), per_blob)
+
+def same_partition(labels, expected):
+    pairs = {(a, b) for a, b in zip(labels.tolist(), expected.tolist())}
+    return len(pairs) == len(set(expected.tolist())) == len(set(labels.tolist()))
+
+def test_blocked_kernels_match_brute_force():
+    vectors = normalize(np.random.default_rng(1).normal(size=(50, 8)))
+    full = vectors @ vectors.T
+
+    assert similarity_matrix(vectors, block_size=7) == pytest.approx(full, abs=1e-6)
+
+    expected = sorted(
+        ((i, j, float(full[i, j])) for i in range(50) for j in range(i + 1, 50)),
+        key=lambda pair: -pair[2]
+    )[:15]
+    pairs = top_pairs(vectors, 15, block_size=7)
+    assert [(i, j) for i, j, _ in pairs] == [(i, j) for i, j, _ in expected]
+    assert all(score >= 0.5 for _, _, score in top_pairs(vectors, 15, min_score=0.5, block_size=7))
+
+def test_kmeans_finds_separated_groups():
+    vectors, expected = blobs()
+
+    assert same_partition(kmeans(vectors, 3, block_size=16), expected)
+    with pytest.raises(ValueError):
+        kmeans(vectors, 0)
+
+def test_agglomerative_by_count_and_threshold():
+    vectors, expected = blobs(per_blob=10)
+
+    assert same_partition(agglomerative(vectors, n_clusters=3), expected)
+    assert same_partition(agglomerative(vectors, threshold=0.9), expected)
+    assert len(set(agglomerative(vectors, threshold=1.01).tolist())) == len(vectors)
+    with pytest.raises(ValueError):
+        agglomerative(vectors)
+
+def test_describe_clusters_largest_first():
+    vectors = normalize([[1, 0], [1, 0.1], [1, -0.1], [0, 1]])
+
+    clusters = describe_clusters(vectors, np.array([1, 1, 1, 0]))
+
+    assert [(cluster["label"], cluster["members"], cluster["representative"]) for cluster in clusters] == [
+        (0, [0, 1, 2], 0),
+        (1, [3], 3)
+    ]
+
+def test_texts_and_stored_points_through_the_api(client, auth, collection):
+    stored = client.post(
+        "/v1/store",
+        params={"collection": collection},
+        json={"texts": ["red apples and pears", "green apples and pears"]},
+        headers=auth
+    ).json()["stored_ids"]
+    request = {"texts": ["red apples and pears", "engine oil change"], "ids": stored, "collection": collection}
+
+    matrix = client.post("/v1/similarity/matrix", json=request, headers=auth)
+    assert matrix.status_code == 200, matrix.text
+    assert [item.get("id") for item in matrix.json()["items"]] == [None, None] + stored
+    assert matrix.json()["matrix"][0][2] == pytest.approx(1.0, abs=1e-5)
+
+    pairs = client.post("/v1/similarity/pairs", json={**request, "top_k": 1}, headers=auth).json()["pairs"]
+    assert (pairs[0]["a"], pairs[0]["b"]) == (0, 2)
+
+    clusters = client.post(
+        "/v1/similarity/clusters", json={**request, "method": "agglomerative", "n_clusters": 2}, headers=auth
+    ).json()["clusters"]
+    assert [cluster["members"] for cluster in clusters] == [[0, 2, 3], [1]]
+
+def test_invalid_requests_are_400(client, auth, collection):
+    client.post("/v1/store", params={"collection": collection}, json={"texts": ["one"]}, headers=auth)
+
+    for path, request in [
+        ("/v1/similarity/matrix", {"ids": ["missing"], "collection": collection}),
+        ("/v1/similarity/matrix", {}),
+        ("/v1/similarity/clusters", {"texts": ["a", "b"], "method": "kmeans"})
+    ]:
+        assert client.post(path, json=request, headers=auth).status_code == 400, request
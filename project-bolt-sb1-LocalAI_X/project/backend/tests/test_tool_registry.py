@@ -0,0 +1,84 @@
+"""
+Tool registry: built-in and plugin tools, and the plugin table's enabled flag
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from core.config import settings
+from core.database import PluginRegistry, SessionLocal
+from services.tool_registry import PluginError, ToolRegistry
+
+def definition(name, *functions):
+    return {"name": name, "version": "1.0.0", "description": "Test plugin", "author": "tests",
+            "functions": [{"name": function, "description": function} for function in functions]}
+
+def set_enabled(name, enabled):
+    db = SessionLocal()
+    try:
+        db.query(PluginRegistry).filter(PluginRegistry.name == name).update({"enabled": enabled})
+        db.commit()
+    finally:
+        db.close()
+
+def test_load_registers_plugins_and_skips_disabled_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PLUGINS_DIRECTORY", str(tmp_path))
+    for plugin in [definition("load_on", "load_on_tool"), definition("load_off", "load_off_tool")]:
+        (tmp_path / f"{plugin['name']}.json").write_text(json.dumps(plugin))
+    asyncio.run(ToolRegistry().load())
+    set_enabled("load_off", False)
+
+    registry = ToolRegistry()
+    asyncio.run(registry.load())
+
+    assert [plugin["name"] for plugin in registry.plugins()] == ["load_on"]
+    assert registry.get("load_on_tool")["plugin"] == "load_on"
+    assert registry.get("load_off_tool") is None
+    assert registry.get("calculator")["plugin"] is None
+
+def test_tool_names_must_be_unique():
+    registry = ToolRegistry()
+
+    async def scenario():
+        await registry.register_plugin(definition("unique_a", "unique_tool"))
+        for plugin in [definition("unique_b", "unique_tool"), definition("unique_c", "search"), definition("unique_d", None)]:
+            with pytest.raises(PluginError):
+                await registry.register_plugin(plugin)
+        # A plugin may replace its own tools
+        await registry.register_plugin(definition("unique_a", "unique_tool", "unique_extra"))
+
+    asyncio.run(scenario())
+    assert {tool["name"] for tool in registry.list() if tool["plugin"] == "unique_a"} == {"unique_tool", "unique_extra"}
+
+def test_tool_info_comes_from_the_registry(client, auth):
+    calculator = client.get("/v1/tools/calculator", headers=auth)
+    assert calculator.status_code == 200
+    assert calculator.json()["parameters"]["required"] == ["expression"]
+    assert client.get("/v1/tools/no_such_tool", headers=auth).status_code == 404
+
+    response = client.post("/v1/plugins/register", json=definition("info_plugin", "info_tool"), headers=auth)
+    assert response.json()["enabled"] is True
+    tool = client.get("/v1/tools/info_tool", headers=auth).json()
+    assert (tool["name"], tool["plugin"]) == ("info_tool", "info_plugin")
+    assert "info_tool" in [tool["name"] for tool in client.get("/v1/tools", headers=auth).json()["tools"]]
+
+    client.delete("/v1/plugins/info_plugin", headers=auth)
+    assert client.get("/v1/tools/info_tool", headers=auth).status_code == 404
+
+def test_disabled_plugins_stay_unregistered(client, auth):
+    client.post("/v1/plugins/register", json=definition("switched_off", "switched_off_tool"), headers=auth)
+    set_enabled("switched_off", False)
+
+    response = client.post("/v1/plugins/register", json=definition("switched_off", "switched_off_tool"), headers=auth)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["enabled"] is False
+    assert client.get("/v1/tools/switched_off_tool", headers=auth).status_code == 404
+    assert "switched_off" not in [plugin["name"] for plugin in client.get("/v1/plugins", headers=auth).json()["plugins"]]
+    client.delete("/v1/plugins/switched_off", headers=auth)
+
+def test_conflicting_registration_is_400(client, auth):
+    response = client.post("/v1/plugins/register", json=definition("shadowing", "calculator"), headers=auth)
+    assert response.status_code == 400